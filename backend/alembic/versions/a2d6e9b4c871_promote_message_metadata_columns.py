@@ -0,0 +1,49 @@
+"""Promote source, roadmap_id and nudge_id from messages.message_metadata to indexed columns
+
+Revision ID: a2d6e9b4c871
+Revises: f1c5a8e3d264
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d6e9b4c871'
+down_revision: Union[str, None] = 'f1c5a8e3d264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('source', sa.String(), nullable=True))
+    op.add_column('messages', sa.Column('roadmap_id', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('nudge_id', sa.Integer(), nullable=True))
+
+    # Ids are only copied when they are integers; twilio_sid already exists and is only filled in where missing.
+    op.execute(
+        """
+        UPDATE messages
+        SET source = message_metadata->>'source',
+            roadmap_id = CASE WHEN (message_metadata->>'roadmap_id') ~ '^[0-9]+$' THEN (message_metadata->>'roadmap_id')::integer END,
+            nudge_id = CASE WHEN (message_metadata->>'nudge_id') ~ '^[0-9]+$' THEN (message_metadata->>'nudge_id')::integer END,
+            twilio_sid = COALESCE(twilio_sid, message_metadata->>'twilio_sid')
+        WHERE message_metadata IS NOT NULL
+        """
+    )
+
+    op.create_index('idx_messages_business_source_status', 'messages', ['business_id', 'source', 'status'], unique=False)
+    op.create_index('idx_messages_roadmap', 'messages', ['roadmap_id'], unique=False)
+    op.create_index('idx_messages_nudge', 'messages', ['nudge_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_nudge', table_name='messages')
+    op.drop_index('idx_messages_roadmap', table_name='messages')
+    op.drop_index('idx_messages_business_source_status', table_name='messages')
+    op.drop_column('messages', 'nudge_id')
+    op.drop_column('messages', 'roadmap_id')
+    op.drop_column('messages', 'source')
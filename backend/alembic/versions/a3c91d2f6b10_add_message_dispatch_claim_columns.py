@@ -0,0 +1,28 @@
+"""Add claimed_at and (status, scheduled_time) index to messages for the due-message dispatcher
+
+Revision ID: a3c91d2f6b10
+Revises: 784712d8523d
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91d2f6b10'
+down_revision: Union[str, None] = '784712d8523d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('claimed_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index('idx_message_status_scheduled', 'messages', ['status', 'scheduled_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_message_status_scheduled', table_name='messages')
+    op.drop_column('messages', 'claimed_at')
@@ -0,0 +1,26 @@
+"""Index consent_log for the pending-consent lookup by phone number
+
+Revision ID: a9c3e5f71d24
+Revises: f3b8d1e6a427
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f71d24'
+down_revision: Union[str, None] = 'f3b8d1e6a427'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_consent_log_phone_status_sent', 'consent_log', ['phone_number', 'status', 'sent_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_consent_log_phone_status_sent', table_name='consent_log')
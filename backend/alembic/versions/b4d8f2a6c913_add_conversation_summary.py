@@ -0,0 +1,91 @@
+"""Add conversation_summary inbox read model
+
+Revision ID: b4d8f2a6c913
+Revises: a9c3e5f71d24
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d8f2a6c913'
+down_revision: Union[str, None] = 'a9c3e5f71d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_summary',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_preview', sa.Text(), nullable=True),
+        sa.Column('last_message_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('latest_draft_id', sa.Integer(), nullable=True),
+        sa.Column('active_nudge_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_nudges', sa.JSON(), nullable=True),
+        sa.Column('consent_status', sa.String(), nullable=False, server_default='not_set'),
+        sa.Column('opted_in', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['business_profiles.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id'),
+    )
+    op.create_index('idx_conversation_summary_inbox', 'conversation_summary', ['business_id', 'unread_count', 'last_message_at'], unique=False)
+
+    # Backfill with the same rules as conversation_summary_service.refresh_conversation_summaries.
+    op.execute(
+        """
+        INSERT INTO conversation_summary (
+            customer_id, business_id, last_message_id, last_message_preview, last_message_at, unread_count,
+            latest_draft_id, active_nudge_count, active_nudges, consent_status, opted_in, updated_at
+        )
+        SELECT
+            c.id, c.business_id, lm.id, left(lm.content, 500), lm.created_at, COALESCE(u.unread_count, 0),
+            d.draft_id, COALESCE(n.nudge_count, 0), COALESCE(n.nudges, '[]'::json),
+            COALESCE(cl.status, CASE WHEN c.opted_in THEN 'opted_in' ELSE 'not_set' END),
+            COALESCE(cl.status, CASE WHEN c.opted_in THEN 'opted_in' ELSE 'not_set' END) = 'opted_in',
+            now()
+        FROM customers c
+        LEFT JOIN LATERAL (
+            SELECT m.id, m.content, m.created_at FROM messages m
+            WHERE m.customer_id = c.id AND m.is_hidden IS NOT TRUE
+            ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+        ) lm ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS unread_count FROM messages m
+            WHERE m.customer_id = c.id AND m.message_type = 'inbound'
+              AND (c.last_read_at IS NULL OR m.created_at > c.last_read_at)
+        ) u ON true
+        LEFT JOIN (
+            SELECT customer_id, max(id) AS draft_id FROM engagements
+            WHERE status = 'pending_review' AND ai_response IS NOT NULL
+            GROUP BY customer_id
+        ) d ON d.customer_id = c.id
+        LEFT JOIN (
+            SELECT customer_id, count(*) AS nudge_count,
+                   json_agg(json_build_object('type', nudge_type, 'text', COALESCE(ai_suggestion, '')) ORDER BY created_at DESC, id DESC) AS nudges
+            FROM co_pilot_nudges
+            WHERE status = 'active' AND customer_id IS NOT NULL
+            GROUP BY customer_id
+        ) n ON n.customer_id = c.id
+        LEFT JOIN LATERAL (
+            SELECT status FROM consent_log
+            WHERE customer_id = c.id
+            ORDER BY replied_at DESC NULLS LAST, id DESC LIMIT 1
+        ) cl ON true
+        WHERE c.business_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_conversation_summary_inbox', table_name='conversation_summary')
+    op.drop_table('conversation_summary')
@@ -0,0 +1,38 @@
+"""Add twilio_sid (indexed) and delivery_error_code to messages for delivery status callbacks
+
+Revision ID: c5d82e4a9f31
+Revises: a3c91d2f6b10
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d82e4a9f31'
+down_revision: Union[str, None] = 'a3c91d2f6b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('twilio_sid', sa.String(), nullable=True))
+    op.add_column('messages', sa.Column('delivery_error_code', sa.String(), nullable=True))
+    # Backfill from the SID previously kept only in message_metadata.
+    op.execute(
+        """
+        UPDATE messages
+        SET twilio_sid = COALESCE(message_metadata->>'twilio_sid', message_metadata->>'twilio_message_sid')
+        WHERE message_metadata IS NOT NULL
+          AND COALESCE(message_metadata->>'twilio_sid', message_metadata->>'twilio_message_sid') IS NOT NULL
+        """
+    )
+    op.create_index('idx_message_twilio_sid', 'messages', ['twilio_sid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_message_twilio_sid', table_name='messages')
+    op.drop_column('messages', 'delivery_error_code')
+    op.drop_column('messages', 'twilio_sid')
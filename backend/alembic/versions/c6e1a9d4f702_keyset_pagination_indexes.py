@@ -0,0 +1,35 @@
+"""Composite indexes for keyset pagination of the list endpoints
+
+Revision ID: c6e1a9d4f702
+Revises: b4d8f2a6c913
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e1a9d4f702'
+down_revision: Union[str, None] = 'b4d8f2a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Each index is the endpoint's filter columns followed by its full sort key, id last.
+    op.create_index('idx_messages_business_status_created', 'messages', ['business_id', 'status', 'created_at', 'id'], unique=False)
+    op.create_index('idx_messages_created', 'messages', ['created_at', 'id'], unique=False)
+    op.create_index('idx_customers_business_name', 'customers', ['business_id', 'customer_name', 'id'], unique=False)
+    op.drop_index('idx_conversation_summary_inbox', table_name='conversation_summary')
+    op.create_index('idx_conversation_summary_inbox', 'conversation_summary', ['business_id', 'unread_count', 'last_message_at', 'customer_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_conversation_summary_inbox', table_name='conversation_summary')
+    op.create_index('idx_conversation_summary_inbox', 'conversation_summary', ['business_id', 'unread_count', 'last_message_at'], unique=False)
+    op.drop_index('idx_customers_business_name', table_name='customers')
+    op.drop_index('idx_messages_created', table_name='messages')
+    op.drop_index('idx_messages_business_status_created', table_name='messages')
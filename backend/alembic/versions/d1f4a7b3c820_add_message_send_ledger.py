@@ -0,0 +1,36 @@
+"""Add message_send_ledger for idempotent scheduled sends
+
+Revision ID: d1f4a7b3c820
+Revises: c5d82e4a9f31
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f4a7b3c820'
+down_revision: Union[str, None] = 'c5d82e4a9f31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'message_send_ledger',
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('twilio_sid', sa.String(), nullable=True),
+        sa.Column('claimed_by', sa.String(), nullable=True),
+        sa.Column('claimed_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('completed_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('message_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('message_send_ledger')
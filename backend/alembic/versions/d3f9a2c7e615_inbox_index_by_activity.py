@@ -0,0 +1,37 @@
+"""Index the inbox by last activity only: unread_count is no longer a sort key
+
+Revision ID: d3f9a2c7e615
+Revises: b7e3c5f90d14
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f9a2c7e615'
+down_revision: Union[str, None] = 'b7e3c5f90d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Same expression as INBOX_LAST_ACTIVITY in app/models.py; inbox queries only use the index when they match it.
+    op.drop_index('idx_conversation_summary_inbox', table_name='conversation_summary')
+    op.create_index(
+        'idx_conversation_summary_inbox', 'conversation_summary',
+        ['business_id', sa.text("coalesce(last_message_at, '1970-01-01 00:00:00+00:00')"), 'customer_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_conversation_summary_inbox', table_name='conversation_summary')
+    op.create_index(
+        'idx_conversation_summary_inbox', 'conversation_summary',
+        ['business_id', 'unread_count', sa.text("coalesce(last_message_at, '1970-01-01 00:00:00+00:00')"), 'customer_id'],
+        unique=False,
+    )
@@ -0,0 +1,75 @@
+"""Add the customer consent projection and reconcile it with consent_log
+
+Revision ID: d8a3f5c2b917
+Revises: c6e1a9d4f702
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3f5c2b917'
+down_revision: Union[str, None] = 'c6e1a9d4f702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('customers', sa.Column('consent_status', sa.String(), nullable=False, server_default='not_set'))
+    op.add_column('customers', sa.Column('consent_updated_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index('idx_customers_business_consent', 'customers', ['business_id', 'consent_status'], unique=False)
+
+    # The projection is the customer's latest consent event: a reply counts from replied_at, a request from sent_at.
+    op.execute(
+        """
+        UPDATE customers c
+        SET consent_status = l.status, consent_updated_at = l.effective_at
+        FROM (
+            SELECT DISTINCT ON (customer_id) customer_id, status, COALESCE(replied_at, sent_at, created_at) AS effective_at
+            FROM consent_log
+            WHERE customer_id IS NOT NULL AND status IS NOT NULL
+            ORDER BY customer_id, COALESCE(replied_at, sent_at, created_at) DESC NULLS LAST, id DESC
+        ) l
+        WHERE l.customer_id = c.id
+        """
+    )
+    # Same rules as consent_service.apply_consent_state: only a reply moves the flags, so customers
+    # whose latest event is a request (pending) or who have no consent history keep theirs.
+    op.execute(
+        """
+        UPDATE customers
+        SET opted_in = (consent_status = 'opted_in'),
+            sms_opt_in_status = CASE
+                WHEN consent_status = 'declined' THEN 'not_set'
+                ELSE consent_status
+            END
+        WHERE consent_status IN ('opted_in', 'opted_out', 'declined')
+        """
+    )
+    op.execute(
+        """
+        UPDATE conversation_summary s
+        SET consent_status = CASE
+                WHEN c.consent_status <> 'not_set' THEN c.consent_status
+                WHEN c.opted_in THEN 'opted_in'
+                ELSE 'not_set'
+            END,
+            opted_in = CASE
+                WHEN c.consent_status <> 'not_set' THEN c.consent_status = 'opted_in'
+                ELSE COALESCE(c.opted_in, false)
+            END
+        FROM customers c
+        WHERE c.id = s.customer_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_customers_business_consent', table_name='customers')
+    op.drop_column('customers', 'consent_updated_at')
+    op.drop_column('customers', 'consent_status')
@@ -0,0 +1,43 @@
+"""Add business_inbox_counters and backfill it from conversation_summary
+
+Revision ID: e4b7c1d9a286
+Revises: d8a3f5c2b917
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c1d9a286'
+down_revision: Union[str, None] = 'd8a3f5c2b917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'business_inbox_counters',
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('unread_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['business_profiles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('business_id'),
+    )
+    # conversation_summary.unread_count was recounted on every write until now, so it is current.
+    op.execute(
+        """
+        INSERT INTO business_inbox_counters (business_id, unread_total, updated_at)
+        SELECT business_id, COALESCE(SUM(unread_count), 0), now()
+        FROM conversation_summary
+        GROUP BY business_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('business_inbox_counters')
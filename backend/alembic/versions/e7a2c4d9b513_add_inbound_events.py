@@ -0,0 +1,53 @@
+"""Add inbound_events for acknowledge-first inbound SMS processing
+
+Revision ID: e7a2c4d9b513
+Revises: d1f4a7b3c820
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c4d9b513'
+down_revision: Union[str, None] = 'd1f4a7b3c820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'inbound_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_sid', sa.String(), nullable=False),
+        sa.Column('from_number', sa.String(), nullable=False),
+        sa.Column('to_number', sa.String(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('business_id', sa.Integer(), nullable=True),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('received_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('processed_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['business_profiles.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_inbound_events_id'), 'inbound_events', ['id'], unique=False)
+    op.create_index('idx_inbound_event_sender_status', 'inbound_events', ['to_number', 'from_number', 'status'], unique=False)
+    op.create_index('idx_inbound_event_sid', 'inbound_events', ['message_sid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_inbound_event_sid', table_name='inbound_events')
+    op.drop_index('idx_inbound_event_sender_status', table_name='inbound_events')
+    op.drop_index(op.f('ix_inbound_events_id'), table_name='inbound_events')
+    op.drop_table('inbound_events')
@@ -0,0 +1,42 @@
+"""Record Twilio delivery receipts in messages.delivery_status instead of messages.status
+
+Revision ID: e9c2b6f4a137
+Revises: d3f9a2c7e615
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c2b6f4a137'
+down_revision: Union[str, None] = 'd3f9a2c7e615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('delivery_status', sa.String(), nullable=True))
+    # Move receipts already applied to status: a message Twilio accepted (it has a SID and sent_at)
+    # went out, so it is 'sent' again and the receipt lives in delivery_status.
+    op.execute(
+        """
+        UPDATE messages
+        SET delivery_status = status, status = 'sent'
+        WHERE status IN ('delivered', 'failed') AND twilio_sid IS NOT NULL AND sent_at IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        UPDATE messages
+        SET status = delivery_status
+        WHERE status = 'sent' AND delivery_status IN ('delivered', 'failed')
+        """
+    )
+    op.drop_column('messages', 'delivery_status')
@@ -0,0 +1,48 @@
+"""Add the business_daily_stats rollup and the range indexes it is built from
+
+Revision ID: f1c5a8e3d264
+Revises: e4b7c1d9a286
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c5a8e3d264'
+down_revision: Union[str, None] = 'e4b7c1d9a286'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows are filled by the rollup_daily_stats beat task; its first run backfills all history.
+    op.create_table(
+        'business_daily_stats',
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('messages_sent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('instant_nudges_sent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('replies_received', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('drafts_created', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('auto_replies', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('opt_ins', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('opt_outs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['business_profiles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('business_id', 'day'),
+    )
+    op.create_index('idx_business_daily_stats_day', 'business_daily_stats', ['day'], unique=False)
+    op.create_index('idx_messages_sent', 'messages', ['sent_at'], unique=False)
+    op.create_index('idx_engagement_created', 'engagements', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_engagement_created', table_name='engagements')
+    op.drop_index('idx_messages_sent', table_name='messages')
+    op.drop_index('idx_business_daily_stats_day', table_name='business_daily_stats')
+    op.drop_table('business_daily_stats')
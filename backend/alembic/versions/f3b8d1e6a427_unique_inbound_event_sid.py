@@ -0,0 +1,41 @@
+"""Make inbound_events.message_sid unique to dedupe Twilio webhook retries
+
+Revision ID: f3b8d1e6a427
+Revises: e7a2c4d9b513
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e6a427'
+down_revision: Union[str, None] = 'e7a2c4d9b513'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the first copy of any retry stored before the constraint existed.
+    op.execute(
+        """
+        DELETE FROM inbound_events
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY message_sid ORDER BY id) AS copy_number
+                FROM inbound_events
+            ) copies
+            WHERE copies.copy_number > 1
+        )
+        """
+    )
+    op.drop_index('idx_inbound_event_sid', table_name='inbound_events')
+    op.create_index('uq_inbound_event_sid', 'inbound_events', ['message_sid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_inbound_event_sid', table_name='inbound_events')
+    op.create_index('idx_inbound_event_sid', 'inbound_events', ['message_sid'], unique=False)
@@ -4,7 +4,9 @@ import os
 from dotenv import load_dotenv
 import logging
 from celery import Celery
+from kombu import Queue
 import ssl
+from app.config import settings
 # Removed unused SessionLocal import if not needed directly in this file
 # from app.database import SessionLocal
 
@@ -62,6 +64,89 @@ celery_app.conf.enable_utc = True
 celery_app.conf.timezone = 'UTC'
 # --- End Timezone Config ---
 
+# --- Queues & Routing ---
+# Sends are split into lanes so a large campaign cannot delay latency-sensitive messages.
+# Run one worker pool per queue, sized for its traffic, e.g.:
+#   celery -A app.celery_app worker -Q interactive -c 8 -n interactive@%h
+#   celery -A app.celery_app worker -Q reminders -c 4 -n reminders@%h
+#   celery -A app.celery_app worker -Q bulk -c 2 -n bulk@%h
+#   celery -A app.celery_app worker -Q celery -c 2 -n default@%h   (AI / Co-Pilot generation)
+#   celery -A app.celery_app worker -Q nudges -c 4 -n nudges@%h    (periodic nudge generation)
+# run_all_nudge_generation itself keeps at most NUDGE_GENERATION_MAX_CONCURRENCY businesses in
+# flight (see nudge_generation_run_service); size the nudges pool's -c to match. Each business
+# task stops starting detectors after NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS, has a soft time
+# limit 30s later and a hard one (process killed, recorded by nudge_generation_failed) 90s later.
+# The dispatcher routes each claimed batch to its lane's queue (see dispatch_due_messages_task).
+#
+# Inbound SMS processing is partitioned by customer: enqueue_inbound_events hashes
+# (business_id, phone) onto one of INBOUND_PARTITION_COUNT queues named inbound.<n>. Give every
+# partition exactly one single-process consumer so a customer's texts are handled in order, e.g.
+#   celery -A app.celery_app worker -Q inbound.0 -c 1 -n inbound0@%h   (one per partition)
+# and scale throughput by raising INBOUND_PARTITION_COUNT along with the number of these workers.
+celery_app.conf.task_queues = (
+    Queue('interactive'),
+    Queue('reminders'),
+    Queue('bulk'),
+    Queue('celery'),
+    Queue('nudges'),
+    *(Queue(f'inbound.{partition}') for partition in range(settings.INBOUND_PARTITION_COUNT)),
+)
+celery_app.conf.task_default_queue = 'celery'
+celery_app.conf.task_routes = {
+    'process_scheduled_message': {'queue': 'interactive'},        # Immediate sends (inbox replies)
+    'process_scheduled_messages_batch': {'queue': 'reminders'},   # Overridden per lane by the dispatcher
+    'dispatch_due_messages': {'queue': 'interactive'},            # Short sweeps; must not wait behind bulk work
+    'apply_delivery_status_updates': {'queue': 'interactive'},
+    'sweep_inbound_events': {'queue': 'interactive'},
+    'generate_business_nudges': {'queue': 'nudges'},
+}
+# --- End Queues & Routing ---
+
+# --- Delivery Guarantees ---
+# Send tasks use acks_late (see celery_tasks.py); the send ledger (message_send_ledger) makes a
+# redelivered send task a no-op for messages Twilio already accepted, so it is safe to requeue
+# tasks from lost workers and to prefetch more than one task per process.
+celery_app.conf.task_reject_on_worker_lost = True
+celery_app.conf.worker_prefetch_multiplier = settings.CELERY_WORKER_PREFETCH_MULTIPLIER
+# --- End Delivery Guarantees ---
+
+# --- Beat Schedule ---
+# Scheduled messages are not enqueued as ETA tasks; the DB is the source of truth and this
+# sweeper claims due rows (run with `celery -A app.celery_app beat` alongside the workers).
+celery_app.conf.beat_schedule = {
+    'dispatch-due-messages': {
+        'task': 'dispatch_due_messages',
+        'schedule': settings.MESSAGE_DISPATCH_INTERVAL_SECONDS,
+        'options': {'expires': settings.MESSAGE_DISPATCH_INTERVAL_SECONDS},  # Drop sweeps that could not run in time
+    },
+    'apply-delivery-status-updates': {
+        'task': 'apply_delivery_status_updates',
+        'schedule': settings.DELIVERY_STATUS_FLUSH_INTERVAL_SECONDS,
+        'options': {'expires': settings.DELIVERY_STATUS_FLUSH_INTERVAL_SECONDS},
+    },
+    'sweep-inbound-events': {
+        'task': 'sweep_inbound_events',
+        'schedule': settings.INBOUND_SWEEP_INTERVAL_SECONDS,
+        'options': {'expires': settings.INBOUND_SWEEP_INTERVAL_SECONDS},
+    },
+    'reconcile-scheduled-messages': {
+        'task': 'reconcile_scheduled_messages',
+        'schedule': settings.MESSAGE_RECONCILE_INTERVAL_SECONDS,
+        'options': {'expires': settings.MESSAGE_RECONCILE_INTERVAL_SECONDS},
+    },
+    'rollup-daily-stats': {
+        'task': 'rollup_daily_stats',
+        'schedule': settings.STATS_ROLLUP_INTERVAL_SECONDS,
+        'options': {'expires': settings.STATS_ROLLUP_INTERVAL_SECONDS},
+    },
+    'run-nudge-generation': {
+        'task': 'tasks.run_all_nudge_generation',
+        'schedule': settings.NUDGE_GENERATION_INTERVAL_SECONDS,
+        'options': {'expires': settings.NUDGE_GENERATION_INTERVAL_SECONDS},
+    },
+}
+# --- End Beat Schedule ---
+
 # ✅ Optional ping task (Example)
 @celery_app.task(name="ping")
 def ping():
@@ -3,17 +3,61 @@
 
 import asyncio
 import logging
+import time
 from datetime import datetime, timezone as dt_timezone
-from typing import Dict, Optional, Union, Any
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from fastapi import HTTPException
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_process_shutdown, worker_shutdown
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from redis.exceptions import LockError
 from app.celery_app import celery_app as celery
 from app.database import SessionLocal
-from app.models import BusinessProfile, Customer, Message, Engagement, RoadmapMessage
-from sqlalchemy.orm import Session
+from app.models import BusinessProfile, Customer, Message, MessageStatusEnum
 from app.services.twilio_service import send_sms_via_twilio
+from app.services.daily_stats_service import rollup_daily_stats
+from app.services.delivery_status_service import flush_buffered_receipts
+from app.services.inbound_pipeline_service import InboundPipeline, inbound_partition_queue, pending_senders
+from app.redis_client import redis_client
+from app.services.send_ledger_service import (
+    LEDGER_CLAIMED,
+    LEDGER_FAILED,
+    LEDGER_SENDING,
+    LEDGER_SENT,
+    SendClaimLost,
+    claim_sends,
+    get_ledger_entries,
+    is_stale,
+    mark_sending,
+    record_send_results,
+    resolve_abandoned_sends,
+)
+from app.services.message_dispatch_service import (
+    LANE_INTERACTIVE,
+    LANE_REMINDERS,
+    claim_due_messages,
+    find_schedule_drift,
+    group_by_lane,
+    requeue_stale_claims,
+    load_messages_for_send,
+    apply_send_outcomes,
+)
+from app.config import settings
+from app.twilio_client import close_async_twilio_client
+from app.worker_loop import run_async, stop_worker_loop
 from app.services.copilot_nudge_generation_service import CoPilotNudgeGenerationService
 from app.services.copilot_growth_opportunity_service import CoPilotGrowthOpportunityService
+from app.services.nudge_generation_run_service import (
+    BUSINESS_HARD_TIME_LIMIT,
+    BUSINESS_SOFT_TIME_LIMIT,
+    finish_nudge_run,
+    next_nudge_run_business,
+    nudge_run_deadline_seconds,
+    record_nudge_run_result,
+    start_nudge_run,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,167 +68,411 @@ def ping() -> str:
     return "pong"
 
 
-@celery.task(name='process_scheduled_message', bind=True, max_retries=3, default_retry_delay=60)
-def process_scheduled_message_task(self, message_id: int) -> Dict[str, Union[bool, str, None]]:
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_worker_event_loop(**kwargs) -> None:
+    """Closes the pooled Twilio session and stops this process's persistent event loop."""
+    stop_worker_loop(cleanup=close_async_twilio_client())
+
+
+async def _send_batch(db: Session, to_send: List[Tuple[Message, Customer, BusinessProfile]], lane: str, task_id: Optional[str]) -> List[Any]:
     """
-    Processes a scheduled message stored in the Message table by its ID.
-    Fetches message, customer, and business details, sends the SMS via Twilio,
-    and updates the message status accordingly ('sent' or 'failed').
-    **Also updates related Engagement status if source is 'manual_reply_inbox'.**
+    Sends a batch concurrently on the worker loop; each entry is a SID or the raised exception.
+    Each message's ledger claim is flipped to 'sending' right before its own Twilio call.
+    """
+    return await asyncio.gather(
+        *[
+            send_sms_via_twilio(
+                to=customer.phone, message=message.content, business=business, customer=customer, priority=lane,
+                before_send=partial(mark_sending, db, message.id, task_id),
+            )
+            for message, customer, business in to_send
+        ],
+        return_exceptions=True,
+    )
+
+
+def _process_scheduled_messages(task, message_ids: List[int], lane: str = LANE_INTERACTIVE) -> Dict[int, Dict[str, Any]]:
+    """
+    Sends a batch of claimed messages and records every outcome.
+    Each message is first claimed in the send ledger (committed before any other work) and marked
+    'sending' right before its Twilio call, so a redelivered or retried task re-sends messages
+    Twilio never got and never sends the same message twice.
+    Message, customer and business are loaded in one joined query, the sends run concurrently,
+    and all status transitions (Message, RoadmapMessage, Engagement) are written in one batch.
+    Returns a per-message result dict keyed by message ID.
     """
     db = SessionLocal()
-    message = None
-    log_prefix = f"[CELERY_TASK process_scheduled_message(MsgID:{message_id})]"
+    task_id = getattr(task.request, "id", None)
+    log_prefix = f"[CELERY_TASK process_scheduled_messages(MsgIDs:{message_ids})]"
     logger.info(f"{log_prefix} Task started.")
+    results: Dict[int, Dict[str, Any]] = {}
+    outcomes: List[Dict[str, Any]] = []
+    ledger_sent: Dict[int, str] = {}
+    ledger_failed: List[int] = []
+    ledger_released: List[int] = []
 
-    # NEW: Helper function to update the original RoadmapMessage.
-    def update_roadmap_status(db_session: Session, msg_record: Message, new_status: str):
-        if isinstance(msg_record.message_metadata, dict):
-            roadmap_id = msg_record.message_metadata.get('roadmap_id')
-            if roadmap_id:
-                roadmap_msg = db_session.query(RoadmapMessage).filter(RoadmapMessage.id == int(roadmap_id)).first()
-                if roadmap_msg:
-                    roadmap_msg.status = new_status
-                    logger.info(f"{log_prefix} Updated original RoadmapMessage (ID: {roadmap_id}) status to '{new_status}'.")
+    def fail(message: Message, reason: str, error: str) -> None:
+        outcomes.append({"message": message, "status": MessageStatusEnum.FAILED.value, "metadata": {'failure_reason': reason}})
+        results[message.id] = {"success": False, "error": error}
 
     try:
-        logger.info(f"{log_prefix} Fetching Message record from DB.")
-        message = db.query(Message).filter(Message.id == message_id).first()
-
-        if not message:
-            logger.error(f"{log_prefix} Message record not found in DB. Aborting task.")
-            return {"success": False, "error": "Message not found"}
-
-        if message.status != 'scheduled':
-            logger.warning(f"{log_prefix} Message status is '{message.status}', not 'scheduled'. Skipping sending.")
-            return {"success": False, "status": message.status, "info": "Skipped, status not 'scheduled'"}
-
-        logger.info(f"{log_prefix} Fetching Customer (ID: {message.customer_id}) and Business (ID: {message.business_id}).")
-        customer = db.query(Customer).filter(Customer.id == message.customer_id).first()
-        if not customer or not customer.phone:
-            err_msg = f"{log_prefix} Customer (ID: {message.customer_id}) or phone number not found."
-            logger.error(err_msg)
-            message.status = "failed"
-            update_roadmap_status(db, message, "failed") # NEW: Update roadmap status on failure
-            message.message_metadata = {**(message.message_metadata or {}), 'failure_reason': 'Customer/phone not found'}
-            db.commit()
-            return {"success": False, "error": "Customer or phone not found"}
-
-        if not customer.opted_in:
-             err_msg = f"{log_prefix} Customer (ID: {message.customer_id}) is opted-out. Skipping send."
-             logger.warning(err_msg)
-             message.status = "failed"
-             update_roadmap_status(db, message, "failed") # NEW: Update roadmap status on failure
-             message.message_metadata = {**(message.message_metadata or {}), 'failure_reason': 'Customer opted out'}
-             if message.message_metadata and message.message_metadata.get('source') == 'manual_reply_inbox':
-                 engagement_to_fail = db.query(Engagement).filter(Engagement.message_id == message.id).first()
-                 if engagement_to_fail:
-                     engagement_to_fail.status = "failed"
-                     logger.info(f"{log_prefix} Updated related engagement (ID: {engagement_to_fail.id}) status to failed due to opt-out.")
-             db.commit()
-             return {"success": False, "error": "Customer opted out"}
-
-        business = db.query(BusinessProfile).filter(BusinessProfile.id == message.business_id).first()
-        if not business:
-            err_msg = f"{log_prefix} Business (ID: {message.business_id}) not found."
-            logger.error(err_msg)
-            message.status = "failed"
-            update_roadmap_status(db, message, "failed") # NEW: Update roadmap status on failure
-            message.message_metadata = {**(message.message_metadata or {}), 'failure_reason': 'Business not found'}
-            db.commit()
-            return {"success": False, "error": "Business not found"}
-        
-        logger.info(f"{log_prefix} Found Customer: '{customer.customer_name}', Phone: '{customer.phone}'. Found Business: '{business.business_name}'.")
+        claimed_ids = claim_sends(db, message_ids, claimed_by=task_id)
+        rows = load_messages_for_send(db, message_ids)
+        found_ids = {message.id for message, _, _ in rows}
+        for missing_id in set(message_ids) - found_ids:
+            logger.error(f"{log_prefix} Message {missing_id} not found in DB.")
+            results[missing_id] = {"success": False, "error": "Message not found"}
 
-        try:
-            logger.info(f"{log_prefix} Calling asyncio.run(send_sms_via_twilio(...)) for customer {customer.phone}.")
-            message_sid = asyncio.run(send_sms_via_twilio(
-                to=customer.phone,
-                message=message.content,
-                business=business
-            ))
-            logger.info(f"{log_prefix} send_sms_via_twilio call completed. Returned SID: {message_sid}")
-
-            logger.info(f"{log_prefix} Attempting to update Message status to 'sent'.")
-            message.status = "sent"
-            update_roadmap_status(db, message, "sent") # NEW: Update roadmap status on success
-            message.sent_at = datetime.now(dt_timezone.utc)
-            message.message_metadata = {**(message.message_metadata or {}), 'twilio_sid': message_sid}
-            
-            if message.message_metadata and message.message_metadata.get('source') == 'manual_reply_inbox':
-                logger.info(f"{log_prefix} Source is manual_reply_inbox, finding related engagement.")
-                engagement_to_update = db.query(Engagement).filter(Engagement.message_id == message.id).first()
-                if engagement_to_update:
-                    engagement_to_update.status = "sent"
-                    engagement_to_update.sent_at = message.sent_at
-                    db.add(engagement_to_update)
-                    logger.info(f"{log_prefix} Found engagement (ID: {engagement_to_update.id}) and updated status to 'sent'.")
-            
-            db.commit()
-            logger.info(f"{log_prefix} Database commit successful. Message and potentially Engagement status updated to 'sent'.")
-            return {"success": True, "message_sid": message_sid}
-
-        except HTTPException as http_exc_send:
-             err_msg = f"HTTPException during send_sms_via_twilio: {http_exc_send.status_code} - {http_exc_send.detail}"
-             logger.error(f"{log_prefix} {err_msg}", exc_info=True)
-             message.status = "failed"
-             update_roadmap_status(db, message, "failed") # NEW: Update roadmap status on failure
-             message.message_metadata = {**(message.message_metadata or {}), 'failure_reason': f"Send Error: {http_exc_send.detail}"}
-             if message.message_metadata and message.message_metadata.get('source') == 'manual_reply_inbox':
-                 engagement_to_fail = db.query(Engagement).filter(Engagement.message_id == message.id).first()
-                 if engagement_to_fail:
-                     engagement_to_fail.status = "failed"
-                     logger.info(f"{log_prefix} Updated related engagement (ID: {engagement_to_fail.id}) status to failed due to send error.")
-             db.commit()
-             return {"success": False, "error": err_msg}
-
-        except Exception as send_error:
-            err_msg = f"Failed during send_sms_via_twilio call: {send_error}"
-            logger.error(f"{log_prefix} {err_msg}", exc_info=True)
-            message.status = "failed"
-            update_roadmap_status(db, message, "failed") # NEW: Update roadmap status on failure
-            message.message_metadata = {**(message.message_metadata or {}), 'failure_reason': f"Send Exception: {str(send_error)}"}
-            if message.message_metadata and message.message_metadata.get('source') == 'manual_reply_inbox':
-                engagement_to_fail = db.query(Engagement).filter(Engagement.message_id == message.id).first()
-                if engagement_to_fail:
-                    engagement_to_fail.status = "failed"
-                    logger.info(f"{log_prefix} Updated related engagement (ID: {engagement_to_fail.id}) status to failed due to send exception.")
-            db.commit()
-            return {"success": False, "error": err_msg}
+        already_attempted = get_ledger_entries(db, [
+            message.id for message, _, _ in rows
+            if message.id not in claimed_ids and message.status == MessageStatusEnum.PROCESSING_SEND.value
+        ])
+
+        to_send = []
+        for message, customer, business in rows:
+            entry = already_attempted.get(message.id)
+            # Only messages claimed by the dispatcher (or an immediate-send caller) are sent here.
+            # Legacy ETA tasks for still-'scheduled' rows are skipped; the sweeper owns those.
+            if message.status != MessageStatusEnum.PROCESSING_SEND.value:
+                logger.warning(f"{log_prefix} Message {message.id} status is '{message.status}', not '{MessageStatusEnum.PROCESSING_SEND.value}'. Skipping sending.")
+                results[message.id] = {"success": False, "status": message.status, "info": "Skipped, message not claimed for sending"}
+            elif entry is not None:
+                # A previous delivery of this task (or another worker) already handed it to Twilio.
+                if entry.status == LEDGER_SENT:
+                    logger.warning(f"{log_prefix} Message {message.id} already sent (SID {entry.twilio_sid}); recording without re-sending.")
+                    outcomes.append({"message": message, "status": MessageStatusEnum.SENT.value, "sent_at": entry.completed_at, "twilio_sid": entry.twilio_sid, "metadata": {'twilio_sid': entry.twilio_sid}})
+                    results[message.id] = {"success": True, "message_sid": entry.twilio_sid, "deduplicated": True}
+                elif entry.status in (LEDGER_CLAIMED, LEDGER_SENDING) and entry.claimed_by != task_id and not is_stale(entry):
+                    logger.warning(f"{log_prefix} Message {message.id} is being sent by task {entry.claimed_by}. Skipping.")
+                    results[message.id] = {"success": False, "status": message.status, "info": "Skipped, send already in progress"}
+                elif entry.status == LEDGER_FAILED:
+                    logger.error(f"{log_prefix} Message {message.id} already failed in an earlier attempt; recording it.")
+                    fail(message, 'Send failed', "Earlier send attempt failed")
+                else:
+                    # 'sending': Twilio may have accepted it, so it is failed rather than sent again.
+                    logger.error(f"{log_prefix} Message {message.id} has an unfinished earlier send attempt ({entry.status}); not re-sending.")
+                    fail(message, 'Send outcome unknown; not retried to avoid a duplicate SMS', "Earlier send attempt did not complete")
+                    ledger_failed.append(message.id)
+            elif not customer or not customer.phone:
+                logger.error(f"{log_prefix} Customer (ID: {message.customer_id}) or phone number not found for message {message.id}.")
+                fail(message, 'Customer/phone not found', "Customer or phone not found")
+                ledger_failed.append(message.id)
+            elif not customer.opted_in:
+                logger.warning(f"{log_prefix} Customer (ID: {message.customer_id}) is opted-out. Skipping message {message.id}.")
+                fail(message, 'Customer opted out', "Customer opted out")
+                ledger_failed.append(message.id)
+            elif not business:
+                logger.error(f"{log_prefix} Business (ID: {message.business_id}) not found for message {message.id}.")
+                fail(message, 'Business not found', "Business not found")
+                ledger_failed.append(message.id)
+            else:
+                to_send.append((message, customer, business))
+
+        if to_send:
+            logger.info(f"{log_prefix} Sending {len(to_send)} message(s) on the worker event loop.")
+            send_results = run_async(_send_batch(db, to_send, lane, task_id))
+            sent_at = datetime.now(dt_timezone.utc)
+            for (message, customer, business), send_result in zip(to_send, send_results):
+                if isinstance(send_result, SendClaimLost):
+                    # The dispatcher released the claim as stale and owns the message again; Twilio was not called.
+                    logger.warning(f"{log_prefix} Message {message.id}: {send_result}. Skipping.")
+                    results[message.id] = {"success": False, "status": message.status, "info": "Skipped, send claim was released"}
+                elif isinstance(send_result, HTTPException):
+                    if send_result.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                        # Sender is saturated: hand the row back to the dispatcher instead of failing it.
+                        logger.warning(f"{log_prefix} Message {message.id} rate limited ({send_result.detail}); releasing claim for a later sweep.")
+                        outcomes.append({"message": message, "status": MessageStatusEnum.SCHEDULED.value})
+                        results[message.id] = {"success": False, "rate_limited": True}
+                        ledger_released.append(message.id)
+                    else:
+                        err_msg = f"HTTPException during send_sms_via_twilio: {send_result.status_code} - {send_result.detail}"
+                        logger.error(f"{log_prefix} Message {message.id}: {err_msg}")
+                        fail(message, f"Send Error: {send_result.detail}", err_msg)
+                        ledger_failed.append(message.id)
+                elif isinstance(send_result, Exception):
+                    err_msg = f"Failed during send_sms_via_twilio call: {send_result}"
+                    logger.error(f"{log_prefix} Message {message.id}: {err_msg}", exc_info=send_result)
+                    fail(message, f"Send Exception: {str(send_result)}", err_msg)
+                    ledger_failed.append(message.id)
+                else:
+                    outcomes.append({"message": message, "status": MessageStatusEnum.SENT.value, "sent_at": sent_at, "twilio_sid": send_result, "metadata": {'twilio_sid': send_result}})
+                    results[message.id] = {"success": True, "message_sid": send_result}
+                    ledger_sent[message.id] = send_result
+
+        # Ledger first: if the status write below fails, a retry sees what Twilio already accepted.
+        record_send_results(db, sent=ledger_sent, failed=ledger_failed, released=ledger_released)
+        apply_send_outcomes(db, outcomes)
+        logger.info(f"{log_prefix} Recorded {len(outcomes)} outcome(s) in one batch.")
+        return results
 
     except Exception as e:
         err_msg = f"Unexpected task error: {str(e)}"
         logger.error(f"{log_prefix} {err_msg}", exc_info=True)
         db.rollback()
-        if message and message.status == 'scheduled':
-            try:
-                message_to_fail = db.query(Message).filter(Message.id == message_id).first()
-                if message_to_fail:
-                     message_to_fail.status = "failed"
-                     update_roadmap_status(db, message_to_fail, "failed") # NEW: Update roadmap status on failure
-                     message_to_fail.message_metadata = {**(message_to_fail.message_metadata or {}), 'failure_reason': f"Task Error: {str(e)}"}
-                     if message_to_fail.message_metadata and message_to_fail.message_metadata.get('source') == 'manual_reply_inbox':
-                         engagement_to_fail = db.query(Engagement).filter(Engagement.message_id == message_to_fail.id).first()
-                         if engagement_to_fail:
-                             engagement_to_fail.status = "failed"
-                             logger.info(f"{log_prefix} Updated related engagement (ID: {engagement_to_fail.id}) status to failed due to task error.")
-                     db.commit()
-                     logger.info(f"{log_prefix} Updated message status to failed after task error.")
-            except Exception as update_fail_error:
-                logger.error(f"{log_prefix} Could not update message/engagement status to failed after task error: {update_fail_error}", exc_info=True)
-                db.rollback()
+        # No blanket 'failed' marking here: the retry resolves each message from the send ledger
+        # (already sent -> recorded as sent, never claimed -> sent normally), so nothing is sent twice.
         try:
             logger.warning(f"{log_prefix} Retrying task due to unexpected error.")
-            self.retry(exc=e)
+            task.retry(exc=e)
         except Exception as retry_error:
              logger.error(f"{log_prefix} Failed to enqueue retry: {retry_error}")
-        return {"success": False, "error": err_msg}
-
+        return {message_id: {"success": False, "error": err_msg} for message_id in message_ids}
     finally:
-        if db:
-            db.close()
+        db.close()
         logger.info(f"{log_prefix} Task finished.")
 
+
+# acks_late: a worker that dies mid-task gets the task redelivered; the send ledger makes that safe.
+@celery.task(name='process_scheduled_message', bind=True, max_retries=3, default_retry_delay=60, acks_late=True)
+def process_scheduled_message_task(self, message_id: int) -> Dict[str, Union[bool, str, None]]:
+    """
+    Processes a scheduled message stored in the Message table by its ID.
+    Fetches message, customer, and business details, sends the SMS via Twilio,
+    and updates the message status accordingly ('sent' or 'failed').
+    **Also updates related Engagement status if source is 'manual_reply_inbox'.**
+    """
+    return _process_scheduled_messages(self, [message_id])[message_id]
+
+
+@celery.task(name='process_scheduled_messages_batch', bind=True, max_retries=3, default_retry_delay=60, acks_late=True)
+def process_scheduled_messages_batch_task(self, message_ids: List[int], lane: str = LANE_REMINDERS) -> Dict[str, int]:
+    """
+    Batch form of process_scheduled_message: sends every claimed message in `message_ids`
+    and returns counts of sent / failed / released (rate limited) / skipped messages.
+    `lane` is the send lane the batch was routed to; it sets the rate-limiter priority.
+    """
+    results = _process_scheduled_messages(self, message_ids, lane)
+    summary = {"sent": 0, "failed": 0, "released": 0, "skipped": 0}
+    for result in results.values():
+        if result.get("success"):
+            summary["sent"] += 1
+        elif result.get("rate_limited"):
+            summary["released"] += 1
+        elif "info" in result:
+            summary["skipped"] += 1
+        else:
+            summary["failed"] += 1
+    return summary
+
+
+@celery.task(name='dispatch_due_messages')
+def dispatch_due_messages_task() -> Dict[str, int]:
+    """
+    Periodic sweeper (run by Celery beat, see celery_app.py). Claims due scheduled messages
+    in batches (round-robin across businesses) and hands them to `process_scheduled_messages_batch_task`
+    on their lane's queue, MESSAGE_SEND_TASK_BATCH_SIZE ids per task.
+    Safe to run on several beats/workers at once: claims use FOR UPDATE SKIP LOCKED.
+    """
+    db = SessionLocal()
+    log_prefix = "[CELERY_TASK dispatch_due_messages]"
+    dispatched = 0
+    try:
+        requeued = requeue_stale_claims(db)
+        resolve_abandoned_sends(db)
+        for _ in range(settings.MESSAGE_DISPATCH_MAX_BATCHES):
+            message_ids = claim_due_messages(
+                db,
+                limit=settings.MESSAGE_DISPATCH_BATCH_SIZE,
+                per_business_limit=settings.MESSAGE_DISPATCH_PER_BUSINESS_LIMIT,
+            )
+            chunk_size = max(1, settings.MESSAGE_SEND_TASK_BATCH_SIZE)
+            for lane, lane_ids in group_by_lane(db, message_ids).items():
+                for i in range(0, len(lane_ids), chunk_size):
+                    chunk = lane_ids[i:i + chunk_size]
+                    try:
+                        process_scheduled_messages_batch_task.apply_async(args=[chunk], kwargs={"lane": lane}, queue=lane)
+                        dispatched += len(chunk)
+                    except Exception as enqueue_error:
+                        # Left in 'processing_send'; requeue_stale_claims returns them to the schedule.
+                        logger.error(f"{log_prefix} Failed to enqueue {lane} send batch for MsgIDs {chunk}: {enqueue_error}", exc_info=True)
+            if len(message_ids) < settings.MESSAGE_DISPATCH_BATCH_SIZE:
+                break
+        if dispatched or requeued:
+            logger.info(f"{log_prefix} Dispatched {dispatched} due message(s); re-queued {requeued} stale claim(s).")
+        return {"dispatched": dispatched, "requeued": requeued}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"{log_prefix} Sweep failed after dispatching {dispatched} message(s): {e}", exc_info=True)
+        return {"dispatched": dispatched, "requeued": 0}
+    finally:
+        db.close()
+
+
+@celery.task(name='apply_delivery_status_updates')
+def apply_delivery_status_updates_task() -> Dict[str, int]:
+    """
+    Periodic task (Celery beat, see celery_app.py) that applies buffered Twilio delivery
+    receipts to Messages in bulk UPDATE batches.
+    """
+    db = SessionLocal()
+    log_prefix = "[CELERY_TASK apply_delivery_status_updates]"
+    try:
+        summary = flush_buffered_receipts(db)
+        if summary["processed"] or summary["dropped"]:
+            logger.info(f"{log_prefix} Processed {summary['processed']} receipt(s); re-queued {summary['requeued']} unmatched, dropped {summary['dropped']}.")
+        return summary
+    except Exception as e:
+        logger.error(f"{log_prefix} Failed to apply delivery receipts: {e}", exc_info=True)
+        return {"processed": 0, "requeued": 0, "dropped": 0}
+    finally:
+        db.close()
+
+
+def _inbound_sender_lock_key(to_number: str, from_number: str) -> str:
+    return f"inbound_sender_lock:{to_number}:{from_number}"
+
+
+def enqueue_inbound_events(db: Session, to_number: str, from_number: str) -> None:
+    """Queues processing of a sender's inbound events on that customer's partition (see inbound_partition_queue)."""
+    process_inbound_events_task.apply_async(args=[to_number, from_number], queue=inbound_partition_queue(db, to_number, from_number))
+
+
+def _retry_inbound_sender(task, log_prefix: str, base_countdown: float, queue: str, summary: Dict[str, int]) -> Dict[str, int]:
+    """
+    Retries process_inbound_events with exponential backoff (capped at INBOUND_RETRY_MAX_BACKOFF_SECONDS).
+    Once max_retries is spent the sender's events are still 'received', so sweep_inbound_events re-enqueues them.
+    """
+    if task.request.retries >= task.max_retries:
+        logger.warning(f"{log_prefix} Giving up after {task.max_retries} retries; sweep_inbound_events will re-enqueue the sender.")
+        return summary
+    countdown = min(base_countdown * 2 ** task.request.retries, settings.INBOUND_RETRY_MAX_BACKOFF_SECONDS)
+    raise task.retry(countdown=countdown, queue=queue)
+
+
+@celery.task(name='process_inbound_events', bind=True, max_retries=settings.INBOUND_TASK_MAX_RETRIES)
+def process_inbound_events_task(self, to_number: str, from_number: str) -> Dict[str, int]:
+    """
+    Runs pending InboundEvents from `from_number` to `to_number` through the inbound pipeline,
+    oldest first. Tasks arrive on the customer's partition queue, whose single consumer keeps a
+    customer's texts in order; the Redis lock still guards against a partition being consumed by
+    more than one process (e.g. while INBOUND_PARTITION_COUNT is being changed).
+    """
+    log_prefix = f"[CELERY_TASK process_inbound_events(To:{to_number} From:{from_number})]"
+    lock_key = _inbound_sender_lock_key(to_number, from_number)
+    db = SessionLocal()
+    try:
+        queue = inbound_partition_queue(db, to_number, from_number)
+        # redis-py's Lock is held under a per-acquire token and released with a compare-and-delete
+        # script, so a drain that outlived the lock timeout cannot delete the lock another worker now holds.
+        sender_lock = redis_client.lock(lock_key, timeout=settings.INBOUND_SENDER_LOCK_SECONDS) if redis_client is not None else None
+        if sender_lock is not None and not sender_lock.acquire(blocking=False):
+            # Another worker is draining this sender and will normally take our event too; check again
+            # shortly in case it finished just before our event was committed.
+            return _retry_inbound_sender(self, log_prefix, 1, queue, {"deferred": 0})
+        try:
+            summary = run_async(InboundPipeline(db).drain_sender(to_number, from_number))
+        finally:
+            if sender_lock is not None:
+                try:
+                    sender_lock.release()
+                except LockError:
+                    logger.warning(f"{log_prefix} Sender lock expired before the drain finished; another worker may have taken over.")
+    finally:
+        db.close()
+    if summary["deferred"]:
+        logger.warning(f"{log_prefix} An event failed; retrying the sender with backoff from {settings.INBOUND_EVENT_RETRY_SECONDS}s.")
+        return _retry_inbound_sender(self, log_prefix, settings.INBOUND_EVENT_RETRY_SECONDS, queue, summary)
+    return summary
+
+
+@celery.task(name='sweep_inbound_events')
+def sweep_inbound_events_task() -> Dict[str, int]:
+    """
+    Periodic safety net (Celery beat, see celery_app.py): re-enqueues senders whose events are
+    still unprocessed, e.g. because the webhook could not reach the broker.
+    """
+    db = SessionLocal()
+    try:
+        senders = pending_senders(db, settings.INBOUND_SWEEP_MIN_AGE_SECONDS)
+        for to_number, from_number in senders:
+            enqueue_inbound_events(db, to_number, from_number)
+    finally:
+        db.close()
+    if senders:
+        logger.warning(f"[CELERY_TASK sweep_inbound_events] Re-enqueued {len(senders)} sender(s) with unprocessed inbound events.")
+    return {"enqueued": len(senders)}
+
+
+def _held_send_tasks() -> List[Tuple[str, Any]]:
+    """
+    (task id, message id) of every process_scheduled_message task a worker is holding with an ETA:
+    leftovers from the old per-message ETA scheduling, but also immediate sends waiting out their
+    retry delay (see _stale_held_send_tasks).
+    """
+    held = celery.control.inspect().scheduled() or {}
+    tasks = []
+    for entries in held.values():
+        for entry in entries:
+            request = entry.get("request", {})
+            if request.get("name") == "process_scheduled_message":
+                args = request.get("args") or [None]
+                tasks.append((request.get("id"), args[0]))
+    return tasks
+
+
+def _stale_held_send_tasks(db: Session, held_tasks: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """
+    The held tasks whose message is no longer claimed for sending. A message still in
+    processing_send belongs to a live send (e.g. an inbox reply retrying), so its task is kept.
+    """
+    message_ids = [message_id for _, message_id in held_tasks if isinstance(message_id, int)]
+    in_flight = {
+        message_id for (message_id,) in db.query(Message.id).filter(
+            Message.id.in_(message_ids), Message.status == MessageStatusEnum.PROCESSING_SEND.value
+        )
+    } if message_ids else set()
+    return [(task_id, message_id) for task_id, message_id in held_tasks if message_id not in in_flight]
+
+
+@celery.task(name='reconcile_scheduled_messages')
+def reconcile_scheduled_messages_task() -> Dict[str, Any]:
+    """
+    Periodic check (Celery beat, see celery_app.py) that the schedule in the Message table and
+    the work actually pending in Celery agree. Logs scheduled messages nothing is dispatching,
+    dispatched messages no worker finished and orphaned roadmap entries, and revokes send tasks
+    still parked in workers with an ETA for a message that is no longer being sent.
+    """
+    db = SessionLocal()
+    log_prefix = "[CELERY_TASK reconcile_scheduled_messages]"
+    try:
+        report = find_schedule_drift(db)
+        try:
+            held_tasks = _stale_held_send_tasks(db, _held_send_tasks())
+        except Exception as e:
+            logger.warning(f"{log_prefix} Could not inspect workers for held send tasks: {e}")
+            held_tasks = []
+        if held_tasks:
+            celery.control.revoke([task_id for task_id, _ in held_tasks])
+        report["revoked_tasks"] = {"count": len(held_tasks), "ids": [message_id for _, message_id in held_tasks]}
+        for name, entry in report.items():
+            if entry["count"]:
+                logger.warning(f"{log_prefix} {name}: {entry['count']} (e.g. IDs {entry['ids']})")
+        return report
+    finally:
+        db.close()
+
+
+@celery.task(name='rollup_daily_stats')
+def rollup_daily_stats_task() -> Dict[str, Any]:
+    """
+    Periodic task (Celery beat, see celery_app.py) that rolls completed days up into
+    business_daily_stats, which the dashboard and time-series endpoints read.
+    """
+    db = SessionLocal()
+    try:
+        summary = rollup_daily_stats(db)
+        if summary["days"]:
+            logger.info(f"[CELERY_TASK rollup_daily_stats] Rolled up {summary['days']} day(s) ({summary['start']}..{summary['end']}) into {summary['rows']} row(s).")
+        return summary
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[CELERY_TASK rollup_daily_stats] Failed to roll up daily stats: {e}", exc_info=True)
+        return {"days": 0, "rows": 0}
+    finally:
+        db.close()
+
+
 @celery.task(name='generate_sentiment_nudges')
 def generate_sentiment_nudges_task(business_id: int) -> Dict[str, any]:
     """
@@ -266,72 +554,132 @@ def trigger_strategic_engagement_plan_generation_task(
             db.close()
         logger.info(f"{log_prefix} Task finished.")  
 
-@celery.task(name="tasks.run_all_nudge_generation")
-def run_all_nudge_generation():
+# Detectors run for every business by run_all_nudge_generation: (name, service class, method).
+NUDGE_DETECTORS = (
+    ("positive_sentiment", CoPilotNudgeGenerationService, "detect_positive_sentiment_and_create_nudges"),
+    ("negative_sentiment", CoPilotNudgeGenerationService, "detect_negative_sentiment_and_create_nudges"),
+    ("timed_commitments", CoPilotNudgeGenerationService, "detect_potential_timed_commitments"),
+    ("referral_opportunities", CoPilotGrowthOpportunityService, "identify_referral_opportunities"),
+    ("re_engagement_opportunities", CoPilotGrowthOpportunityService, "identify_re_engagement_opportunities"),
+)
+
+
+def _dispatch_business_nudges(business_id: int, run_id: Optional[str]) -> None:
+    generate_business_nudges_task.apply_async(
+        (business_id, run_id), link_error=nudge_generation_failed_task.si({"business_id": business_id, "run_id": run_id})
+    )
+
+
+def _complete_business(run_id: Optional[str], result: Dict[str, Any]) -> None:
+    """Records a business's outcome in its run, starts the next waiting business and, after the last one, the summary."""
+    try:
+        if record_nudge_run_result(run_id, result):
+            summarize_nudge_generation_task.delay(run_id)
+        next_business_id = next_nudge_run_business(run_id)
+        if next_business_id is not None:
+            _dispatch_business_nudges(next_business_id, run_id)
+    except Exception as e:
+        # The backstop summary still reports this run; a business not dispatched shows up as missing.
+        logger.error(f"[CELERY_TASK generate_business_nudges(BusinessID:{result['business_id']})] Could not complete run {run_id}: {e}", exc_info=True)
+
+
+# Time limits: see nudge_generation_run_service.
+@celery.task(
+    name='generate_business_nudges',
+    soft_time_limit=BUSINESS_SOFT_TIME_LIMIT,
+    time_limit=BUSINESS_HARD_TIME_LIMIT,
+)
+def generate_business_nudges_task(business_id: int, run_id: Optional[str] = None) -> Dict[str, Any]:
     """
-    A periodic Celery task to run all nudge generation services for all businesses.
-    This includes reactive (sentiment, event) and proactive (growth) nudges. This
-    task should be scheduled to run periodically (e.g., every hour) via Celery Beat.
+    Runs every nudge detector for one business in its own DB session and records the result under
+    `run_id`. Never raises: a failing detector is recorded and the rest still run, and once the
+    time budget is spent (the soft time limit fired, or a detector swallowed it) the remaining
+    detectors are skipped.
     """
+    log_prefix = f"[CELERY_TASK generate_business_nudges(BusinessID:{business_id})]"
+    result = {"business_id": business_id, "nudges_created": 0, "failed_detectors": [], "timed_out": False}
+    deadline = time.monotonic() + settings.NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS
     db = SessionLocal()
     try:
-        logger.info("[CeleryTask] Starting run_all_nudge_generation for all businesses.")
-        businesses = db.query(BusinessProfile).all()
-        if not businesses:
-            logger.info("[CeleryTask] No businesses found to process.")
-            return
-
-        for business in businesses:
-            log_prefix = f"[CeleryTask B:{business.id}]"
-            logger.info(f"{log_prefix} Processing...")
-
-            # --- Initialize Services ---
-            reactive_nudge_service = CoPilotNudgeGenerationService(db)
-            proactive_growth_service = CoPilotGrowthOpportunityService(db)
-
-            # --- 1. Run Reactive Nudge Generation ---
-            # These services look for immediate opportunities in recent messages.
+        services = {service_class: service_class(db) for service_class in {service_class for _, service_class, _ in NUDGE_DETECTORS}}
+        for name, service_class, method in NUDGE_DETECTORS:
+            if time.monotonic() >= deadline:
+                raise SoftTimeLimitExceeded()
             try:
-                logger.info(f"{log_prefix} Running reactive sentiment and event analysis...")
-                reactive_nudge_service.detect_positive_sentiment_and_create_nudges(business.id)
-                reactive_nudge_service.detect_negative_sentiment_and_create_nudges(business.id)
-                reactive_nudge_service.detect_potential_timed_commitments(business.id)
-                logger.info(f"{log_prefix} Completed reactive analysis.")
+                result["nudges_created"] += len(getattr(services[service_class], method)(business_id) or [])
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
-                logger.error(f"{log_prefix} Error during reactive analysis: {e}", exc_info=True)
+                db.rollback()
+                logger.error(f"{log_prefix} Detector {name} failed: {e}", exc_info=True)
+                result["failed_detectors"].append(name)
+    except SoftTimeLimitExceeded:
+        db.rollback()
+        logger.error(f"{log_prefix} Timed out after {settings.NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS}s; remaining detectors skipped.")
+        result["timed_out"] = True
+    finally:
+        db.close()
+    log = logger.warning if result["failed_detectors"] or result["timed_out"] else logger.info
+    log(f"{log_prefix} Created {result['nudges_created']} nudge(s); failed detectors: {result['failed_detectors']}, "
+        f"timed out: {result['timed_out']}.")
+    _complete_business(run_id, result)
+    return result
 
-            # --- 2. Run Proactive Growth Opportunity Generation ---
-            # These services perform deeper analysis on customer history.
-            try:
-                logger.info(f"{log_prefix} Running referral opportunity analysis...")
-                proactive_growth_service.identify_referral_opportunities(business.id)
-                logger.info(f"{log_prefix} Completed referral opportunity analysis.")
-            except Exception as e:
-                logger.error(f"{log_prefix} Error during referral opportunity analysis: {e}", exc_info=True)
-            
-            try:
-                logger.info(f"{log_prefix} Running re-engagement opportunity analysis...")
-                proactive_growth_service.identify_re_engagement_opportunities(business.id)
-                logger.info(f"{log_prefix} Completed re-engagement opportunity analysis.")
-            except Exception as e:
-                logger.error(f"{log_prefix} Error during re-engagement opportunity analysis: {e}", exc_info=True)
 
-            logger.info(f"{log_prefix} Finished processing.")
+@celery.task(name='nudge_generation_failed')
+def nudge_generation_failed_task(job: Dict[str, Any]) -> None:
+    """
+    link_error of generate_business_nudges: the worker calls it when that task dies without
+    returning, e.g. killed by its hard time limit, so the business is still recorded (as killed)
+    and its concurrency slot passes to the next business. `job` is {"business_id", "run_id"}:
+    Celery calls an errback that takes more than one argument with (request, exc, traceback)
+    instead of its own arguments.
+    """
+    business_id, run_id = job["business_id"], job.get("run_id")
+    logger.error(f"[CELERY_TASK generate_business_nudges(BusinessID:{business_id})] Killed before finishing (hard time limit or worker loss).")
+    _complete_business(run_id, {"business_id": business_id, "nudges_created": 0, "failed_detectors": [], "timed_out": False, "killed": True})
 
-    except Exception as e:
-        logger.error(f"[CeleryTask] A critical error occurred in run_all_nudge_generation: {e}", exc_info=True)
+
+@celery.task(name='summarize_nudge_generation')
+def summarize_nudge_generation_task(run_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Aggregates a run's per-business results. Queued by the business that completes the run, and
+    as a backstop once the run's deadline has passed; whichever comes first summarizes, the other
+    returns None. Businesses with no result by then are reported as missing.
+    """
+    summary = finish_nudge_run(run_id)
+    if summary is None:
+        return None
+    log = logger.warning if summary["failed"] or summary["timed_out"] or summary["killed"] or summary["missing"] else logger.info
+    log(f"[CELERY_TASK summarize_nudge_generation] Run {run_id}: processed {summary['businesses']} business(es), "
+        f"created {summary['nudges_created']} nudge(s); failed: {summary['failed']}, timed out: {summary['timed_out']}, "
+        f"killed: {summary['killed']}, missing: {summary['missing']}.")
+    return summary
+
+
+@celery.task(name="tasks.run_all_nudge_generation")
+def run_all_nudge_generation() -> Dict[str, Any]:
+    """
+    Periodic task (Celery beat, see celery_app.py) that runs all nudge detectors, reactive
+    (sentiment, timed commitments) and proactive (growth), for every business.
+    Businesses run as independent generate_business_nudges tasks on the `nudges` queue, at most
+    NUDGE_GENERATION_MAX_CONCURRENCY at a time: the first wave is dispatched here and each
+    business that finishes or is killed dispatches the next one. A business whose task dies does
+    not hold up any other. The per-business results are aggregated by summarize_nudge_generation.
+    """
+    log_prefix = "[CELERY_TASK run_all_nudge_generation]"
+    db = SessionLocal()
+    try:
+        business_ids = [business_id for business_id, in db.query(BusinessProfile.id).order_by(BusinessProfile.id)]
     finally:
         db.close()
-        logger.info("[CeleryTask] run_all_nudge_generation finished and DB session closed.")
-
-# To schedule this task, you would add it to your Celery Beat schedule.
-# For example, in your celery_app.py or a config file:
-#
-# from celery.schedules import crontab
-#
-# celery_app.conf.beat_schedule = {
-#     'run-nudge-generation-every-hour': {
-#         'task': 'tasks.run_all_nudge_generation',
-#         'schedule': crontab(minute=0),  # Run at the top of every hour
-#     },
-# }
+    if not business_ids:
+        logger.info(f"{log_prefix} No businesses found to process.")
+        return {"businesses": 0}
+
+    run_id, first_wave = start_nudge_run(business_ids)
+    for business_id in first_wave:
+        _dispatch_business_nudges(business_id, run_id)
+    summarize_nudge_generation_task.apply_async((run_id,), countdown=nudge_run_deadline_seconds(len(business_ids)))
+    logger.info(f"{log_prefix} Run {run_id}: {len(business_ids)} business(es), {len(first_wave)} dispatched now.")
+    return {"run_id": run_id, "businesses": len(business_ids), "dispatched": len(first_wave)}
@@ -19,6 +19,41 @@ class Settings(BaseSettings):
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
     CELERY_BACKEND_URL: str = os.getenv("CELERY_BACKEND_URL", "redis://localhost:6379/0")
+    CELERY_WORKER_PREFETCH_MULTIPLIER: int = int(os.getenv("CELERY_WORKER_PREFETCH_MULTIPLIER", "4"))
+
+    # Scheduled message dispatcher (see app/services/message_dispatch_service.py)
+    MESSAGE_DISPATCH_INTERVAL_SECONDS: float = float(os.getenv("MESSAGE_DISPATCH_INTERVAL_SECONDS", "15"))
+    MESSAGE_DISPATCH_BATCH_SIZE: int = int(os.getenv("MESSAGE_DISPATCH_BATCH_SIZE", "200"))
+    MESSAGE_DISPATCH_MAX_BATCHES: int = int(os.getenv("MESSAGE_DISPATCH_MAX_BATCHES", "25"))
+    MESSAGE_DISPATCH_STALE_CLAIM_SECONDS: int = int(os.getenv("MESSAGE_DISPATCH_STALE_CLAIM_SECONDS", "900"))
+    MESSAGE_DISPATCH_PER_BUSINESS_LIMIT: int = int(os.getenv("MESSAGE_DISPATCH_PER_BUSINESS_LIMIT", "50"))  # Fair share per business per claim batch; 0 = no cap
+    MESSAGE_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("MESSAGE_RECONCILE_INTERVAL_SECONDS", "3600"))
+    MESSAGE_RECONCILE_OVERDUE_SECONDS: int = int(os.getenv("MESSAGE_RECONCILE_OVERDUE_SECONDS", "900"))  # Due this long and still 'scheduled' = not being dispatched
+
+    # Inbound SMS pipeline (webhook stores the event, a worker processes it)
+    INBOUND_EVENT_MAX_ATTEMPTS: int = int(os.getenv("INBOUND_EVENT_MAX_ATTEMPTS", "5"))
+    INBOUND_EVENT_RETRY_SECONDS: int = int(os.getenv("INBOUND_EVENT_RETRY_SECONDS", "30"))
+    INBOUND_SENDER_LOCK_SECONDS: int = int(os.getenv("INBOUND_SENDER_LOCK_SECONDS", "300"))  # Max time one worker drains a sender
+    INBOUND_TASK_MAX_RETRIES: int = int(os.getenv("INBOUND_TASK_MAX_RETRIES", "8"))  # Then sweep_inbound_events re-enqueues the sender
+    INBOUND_RETRY_MAX_BACKOFF_SECONDS: int = int(os.getenv("INBOUND_RETRY_MAX_BACKOFF_SECONDS", "600"))  # Cap on the doubling retry delay
+    INBOUND_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("INBOUND_SWEEP_INTERVAL_SECONDS", "30"))
+    INBOUND_PARTITION_COUNT: int = int(os.getenv("INBOUND_PARTITION_COUNT", "8"))  # inbound.<n> queues; each needs exactly one single-process consumer
+    INBOUND_DEDUPE_TTL_SECONDS: int = int(os.getenv("INBOUND_DEDUPE_TTL_SECONDS", "86400"))  # How long a MessageSid is remembered for retry dedupe
+    INBOUND_SWEEP_MIN_AGE_SECONDS: int = int(os.getenv("INBOUND_SWEEP_MIN_AGE_SECONDS", "30"))  # Only re-enqueue events the normal path has not picked up
+    TENANT_ROUTING_CACHE_TTL_SECONDS: int = int(os.getenv("TENANT_ROUTING_CACHE_TTL_SECONDS", "3600"))  # Twilio number/slug -> business in Redis
+    TENANT_ROUTING_NEGATIVE_TTL_SECONDS: int = int(os.getenv("TENANT_ROUTING_NEGATIVE_TTL_SECONDS", "60"))  # Unknown numbers/slugs
+    TENANT_ROUTING_LOCAL_TTL_SECONDS: float = float(os.getenv("TENANT_ROUTING_LOCAL_TTL_SECONDS", "30"))  # In-process copy; bounds staleness in other workers
+    TENANT_ROUTING_LOCAL_MAX_ENTRIES: int = int(os.getenv("TENANT_ROUTING_LOCAL_MAX_ENTRIES", "10000"))
+    CONSENT_PENDING_CACHE_TTL_SECONDS: int = int(os.getenv("CONSENT_PENDING_CACHE_TTL_SECONDS", "3600"))  # Remembers phones with no pending consent request
+    INBOX_EVENTS_HEARTBEAT_SECONDS: int = int(os.getenv("INBOX_EVENTS_HEARTBEAT_SECONDS", "15"))  # Keep-alive comment on an idle SSE stream
+    INBOX_EVENTS_RETRY_MS: int = int(os.getenv("INBOX_EVENTS_RETRY_MS", "3000"))  # EventSource reconnect delay sent to clients
+    STATS_ROLLUP_INTERVAL_SECONDS: float = float(os.getenv("STATS_ROLLUP_INTERVAL_SECONDS", "3600"))  # Beat interval of rollup_daily_stats
+    STATS_ROLLUP_LOOKBACK_DAYS: int = int(os.getenv("STATS_ROLLUP_LOOKBACK_DAYS", "2"))  # Rolled-up days recomputed each run, for late receipts and edits
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))  # Cached dashboard responses; writes retire them sooner
+    NUDGE_GENERATION_INTERVAL_SECONDS: float = float(os.getenv("NUDGE_GENERATION_INTERVAL_SECONDS", "3600"))  # Beat interval of run_all_nudge_generation
+    NUDGE_GENERATION_MAX_CONCURRENCY: int = int(os.getenv("NUDGE_GENERATION_MAX_CONCURRENCY", "4"))  # Businesses one run_all_nudge_generation run processes at once
+    NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS: int = int(os.getenv("NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS", "600"))  # Time budget for one business: no detector starts after it (soft limit +30s, hard +90s)
+    MESSAGE_SEND_TASK_BATCH_SIZE: int = int(os.getenv("MESSAGE_SEND_TASK_BATCH_SIZE", "20"))  # Message ids per send task
 
     # Twilio settings
     TWILIO_ACCOUNT_SID: str = os.getenv("TWILIO_ACCOUNT_SID", "")
@@ -29,6 +64,29 @@ class Settings(BaseSettings):
     TWILIO_DEFAULT_MESSAGING_SERVICE_SID: str = os.getenv("TWILIO_DEFAULT_MESSAGING_SERVICE_SID", "")
     TWILIO_SUPPORT_MESSAGING_SERVICE_SID: str = os.getenv("TWILIO_SUPPORT_MESSAGING_SERVICE_SID", "")
     print("🧪 Loaded TWILIO_DEFAULT_MESSAGING_SERVICE_SID:", TWILIO_DEFAULT_MESSAGING_SERVICE_SID)
+    # Async Twilio transport (shared keep-alive pool, see app/twilio_client.py)
+    TWILIO_API_BASE_URL: str = os.getenv("TWILIO_API_BASE_URL", "")  # Override only for local fakes/tests
+    TWILIO_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("TWILIO_HTTP_TIMEOUT_SECONDS", "10"))
+    TWILIO_HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("TWILIO_HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+    TWILIO_HTTP_MAX_CONNECTIONS: int = int(os.getenv("TWILIO_HTTP_MAX_CONNECTIONS", "50"))
+    TWILIO_HTTP_KEEPALIVE_SECONDS: float = float(os.getenv("TWILIO_HTTP_KEEPALIVE_SECONDS", "30"))
+    # Delivery receipts (see app/services/delivery_status_service.py). Leave the URL blank to rely on the
+    # Messaging Service's own status callback setting, e.g. https://api.example.com/twilio/status-callback
+    TWILIO_STATUS_CALLBACK_URL: str = os.getenv("TWILIO_STATUS_CALLBACK_URL", "")
+    DELIVERY_STATUS_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("DELIVERY_STATUS_FLUSH_INTERVAL_SECONDS", "5"))
+    DELIVERY_STATUS_BATCH_SIZE: int = int(os.getenv("DELIVERY_STATUS_BATCH_SIZE", "1000"))
+    DELIVERY_STATUS_MAX_BATCHES: int = int(os.getenv("DELIVERY_STATUS_MAX_BATCHES", "20"))
+    DELIVERY_STATUS_UNMATCHED_RETENTION_SECONDS: int = int(os.getenv("DELIVERY_STATUS_UNMATCHED_RETENTION_SECONDS", "300"))
+    # Outbound SMS pacing (Redis token buckets, see app/services/sms_rate_limiter.py). Rate 0 disables a bucket.
+    SMS_RATE_LIMIT_ENABLED: bool = os.getenv("SMS_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    SMS_RATE_LIMIT_PER_NUMBER_PER_SECOND: float = float(os.getenv("SMS_RATE_LIMIT_PER_NUMBER_PER_SECOND", "1"))
+    SMS_RATE_LIMIT_PER_NUMBER_BURST: int = int(os.getenv("SMS_RATE_LIMIT_PER_NUMBER_BURST", "3"))
+    SMS_RATE_LIMIT_PER_MSID_PER_SECOND: float = float(os.getenv("SMS_RATE_LIMIT_PER_MSID_PER_SECOND", "10"))
+    SMS_RATE_LIMIT_PER_MSID_BURST: int = int(os.getenv("SMS_RATE_LIMIT_PER_MSID_BURST", "20"))
+    SMS_RATE_LIMIT_ACCOUNT_PER_SECOND: float = float(os.getenv("SMS_RATE_LIMIT_ACCOUNT_PER_SECOND", "50"))
+    SMS_RATE_LIMIT_ACCOUNT_BURST: int = int(os.getenv("SMS_RATE_LIMIT_ACCOUNT_BURST", "100"))
+    SMS_RATE_LIMIT_MAX_WAIT_SECONDS: float = float(os.getenv("SMS_RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+    SMS_RATE_LIMIT_BULK_RESERVE_FRACTION: float = float(os.getenv("SMS_RATE_LIMIT_BULK_RESERVE_FRACTION", "0.2"))  # Burst share bulk sends may not use
 
     # OpenAI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
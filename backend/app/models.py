@@ -1,7 +1,8 @@
 # backend/app/models.py
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, UniqueConstraint, Index, JSON, func
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, DateTime, Boolean, UniqueConstraint, Index, JSON, func, literal
+from sqlalchemy import event
+from sqlalchemy.orm import relationship, backref, Session
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 from app.database import Base
 import datetime
@@ -106,6 +107,10 @@ class Customer(Base):
     timezone = Column(String, nullable=True)
     opted_in = Column(Boolean, default=False)
     sms_opt_in_status = Column(String, default=OptInStatus.NOT_SET.value, nullable=False)
+    # Consent projection: status of the customer's latest ConsentLog event and when it took effect.
+    # Written only through consent_service.apply_consent_state, which keeps opted_in and sms_opt_in_status in step.
+    consent_status = Column(String, default=OptInStatus.NOT_SET.value, nullable=False)
+    consent_updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
     is_generating_roadmap = Column(Boolean, default=False)
     last_generation_attempt = Column(DateTime, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), default=utc_now)
@@ -122,7 +127,7 @@ class Customer(Base):
     tags = relationship("Tag", secondary="customer_tags", back_populates="customers")
     co_pilot_nudges = relationship("CoPilotNudge", back_populates="customer", cascade="all, delete-orphan")
     targeted_events = relationship("TargetedEvent", back_populates="customer", cascade="all, delete-orphan")
-    __table_args__ = (UniqueConstraint("phone", "business_id", name="unique_customer_phone_per_business"),)
+    __table_args__ = (UniqueConstraint("phone", "business_id", name="unique_customer_phone_per_business"), Index('idx_customers_business_name', 'business_id', 'customer_name', 'id'), Index('idx_customers_business_consent', 'business_id', 'consent_status'),)
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -138,6 +143,60 @@ class Conversation(Base):
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     __table_args__ = (Index('idx_conversation_customer', 'customer_id'), Index('idx_conversation_business', 'business_id'), Index('idx_conversation_status', 'status'),)
 
+# Sort value of conversations with no visible message yet: sorts after every real timestamp in the
+# inbox's descending order. Rendered inline so queries match the expression index exactly.
+NO_ACTIVITY_AT = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+class ConversationSummary(Base):
+    """
+    Inbox read model: one row per customer with everything the inbox list shows, kept current in
+    the same transaction as the writes it summarizes (see conversation_summary_service).
+    """
+    __tablename__ = "conversation_summary"
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    business_id = Column(Integer, ForeignKey("business_profiles.id", ondelete="CASCADE"), nullable=False)
+    last_message_id = Column(Integer, nullable=True) # Latest visible message
+    last_message_preview = Column(Text, nullable=True)
+    last_message_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    unread_count = Column(Integer, nullable=False, default=0) # Incremented per inbound message, reset when read
+    latest_draft_id = Column(Integer, nullable=True) # Latest Engagement awaiting review with an AI draft
+    active_nudge_count = Column(Integer, nullable=False, default=0)
+    active_nudges = Column(JSON, nullable=True) # [{"type", "text"}], newest first
+    consent_status = Column(String, nullable=False, default=OptInStatus.NOT_SET.value)
+    opted_in = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(TIMESTAMP(timezone=True), default=utc_now, onupdate=utc_now)
+
+INBOX_LAST_ACTIVITY = func.coalesce(
+    ConversationSummary.last_message_at, literal(NO_ACTIVITY_AT, TIMESTAMP(timezone=True), literal_execute=True)
+)
+Index(
+    'idx_conversation_summary_inbox',
+    ConversationSummary.business_id, INBOX_LAST_ACTIVITY, ConversationSummary.customer_id,
+)
+
+class BusinessInboxCounter(Base):
+    """Per-business inbox badge: the sum of its conversation_summary.unread_count, maintained alongside it."""
+    __tablename__ = "business_inbox_counters"
+    business_id = Column(Integer, ForeignKey("business_profiles.id", ondelete="CASCADE"), primary_key=True)
+    unread_total = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP(timezone=True), default=utc_now, onupdate=utc_now)
+
+class BusinessDailyStats(Base):
+    """Per-business, per-UTC-day event counts rolled up from raw rows by daily_stats_service."""
+    __tablename__ = "business_daily_stats"
+    business_id = Column(Integer, ForeignKey("business_profiles.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    messages_sent = Column(Integer, nullable=False, default=0)
+    instant_nudges_sent = Column(Integer, nullable=False, default=0)
+    replies_received = Column(Integer, nullable=False, default=0)
+    drafts_created = Column(Integer, nullable=False, default=0)
+    auto_replies = Column(Integer, nullable=False, default=0)
+    opt_ins = Column(Integer, nullable=False, default=0)
+    opt_outs = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP(timezone=True), default=utc_now, onupdate=utc_now)
+
+    __table_args__ = (Index('idx_business_daily_stats_day', 'day'),)
+
 class Message(Base):
     __tablename__ = "messages"
     id = Column(Integer, primary_key=True, index=True)
@@ -153,12 +212,62 @@ class Message(Base):
     is_hidden = Column(Boolean, default=False)
     message_metadata = Column(JSON, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), default=utc_now)
+    claimed_at = Column(TIMESTAMP(timezone=True), nullable=True) # Set when the dispatcher claims a due message
+    twilio_sid = Column(String, nullable=True) # Twilio Message SID; delivery status callbacks are matched on it
+    delivery_status = Column(String, nullable=True) # Carrier receipt from the status callback: sent, delivered or failed. status stays 'sent'
+    delivery_error_code = Column(String, nullable=True) # Twilio ErrorCode from an undelivered/failed status callback
+    # Promoted from message_metadata so they can be indexed; kept in sync with it by _sync_message_metadata_columns
+    source = Column(String, nullable=True) # What created the message: 'roadmap', 'instant_nudge', 'manual_reply_inbox', ...
+    roadmap_id = Column(Integer, nullable=True) # RoadmapMessage this message was scheduled from
+    nudge_id = Column(Integer, nullable=True) # CoPilotNudge a campaign message was drafted from
 
     conversation = relationship("Conversation", back_populates="messages")
     business = relationship("BusinessProfile", back_populates="messages")
     customer = relationship("Customer", back_populates="messages")
     parent = relationship("Message", remote_side=[id])
-    __table_args__ = (Index('idx_message_conversation', 'conversation_id'), Index('idx_message_customer', 'customer_id'), Index('idx_message_business', 'business_id'), Index('idx_message_type', 'message_type'), Index('idx_message_status', 'status'), Index('idx_message_scheduled', 'scheduled_time'),)
+    __table_args__ = (Index('idx_message_conversation', 'conversation_id'), Index('idx_message_customer', 'customer_id'), Index('idx_message_business', 'business_id'), Index('idx_message_type', 'message_type'), Index('idx_message_status', 'status'), Index('idx_message_scheduled', 'scheduled_time'), Index('idx_message_status_scheduled', 'status', 'scheduled_time'), Index('idx_message_twilio_sid', 'twilio_sid'), Index('idx_messages_business_status_created', 'business_id', 'status', 'created_at', 'id'), Index('idx_messages_created', 'created_at', 'id'), Index('idx_messages_sent', 'sent_at'), Index('idx_messages_business_source_status', 'business_id', 'source', 'status'), Index('idx_messages_roadmap', 'roadmap_id'), Index('idx_messages_nudge', 'nudge_id'),)
+
+class MessageSendLedger(Base):
+    """
+    One row per Message claimed for a Twilio send. A worker inserts the row ('claimed') and commits
+    before any other work, and flips it to 'sending' right before its Twilio call, so a redelivered
+    or retried task re-sends only messages Twilio never got and never sends a message twice.
+    """
+    __tablename__ = "message_send_ledger"
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String, nullable=False, default="claimed") # claimed -> sending -> sent | failed
+    twilio_sid = Column(String, nullable=True)
+    claimed_by = Column(String, nullable=True) # Celery task id of the claiming attempt
+    claimed_at = Column(TIMESTAMP(timezone=True), nullable=False, default=utc_now)
+    completed_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+class InboundEvent(Base):
+    """
+    Raw inbound SMS webhook payload. The webhook stores it and acknowledges Twilio right away;
+    a Celery worker then runs it through the inbound pipeline (inbound_pipeline_service),
+    in arrival order per sender.
+    """
+    __tablename__ = "inbound_events"
+    id = Column(Integer, primary_key=True, index=True)
+    message_sid = Column(String, nullable=False)
+    from_number = Column(String, nullable=False)
+    to_number = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    payload = Column(JSON, nullable=False) # Full Twilio form post
+    status = Column(String, nullable=False, default="received") # received -> processed | discarded | failed
+    stage = Column(String, nullable=True) # Last pipeline stage completed, so a retry resumes after it
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    business_id = Column(Integer, ForeignKey("business_profiles.id", ondelete="SET NULL"), nullable=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"), nullable=True)
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="SET NULL"), nullable=True)
+    received_at = Column(TIMESTAMP(timezone=True), nullable=False, default=utc_now)
+    processed_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('idx_inbound_event_sender_status', 'to_number', 'from_number', 'status'),
+        Index('uq_inbound_event_sid', 'message_sid', unique=True), # Twilio retries of one message are stored once
+    )
 
 class RoadmapMessage(Base):
     __tablename__ = "roadmap_messages"
@@ -204,7 +313,7 @@ class Engagement(Base):
     customer = relationship("Customer", back_populates="engagements")
     business = relationship("BusinessProfile", back_populates="engagements")
     parent_engagement = relationship("Engagement", remote_side=[id])
-    __table_args__ = (Index('idx_engagement_customer', 'customer_id'), Index('idx_engagement_business', 'business_id'), Index('idx_engagement_status', 'status'), Index('idx_engagement_sent', 'sent_at'),)
+    __table_args__ = (Index('idx_engagement_customer', 'customer_id'), Index('idx_engagement_business', 'business_id'), Index('idx_engagement_status', 'status'), Index('idx_engagement_sent', 'sent_at'), Index('idx_engagement_created', 'created_at'),)
 
 class BusinessOwnerStyle(Base):
     __tablename__ = "business_owner_styles"
@@ -246,6 +355,7 @@ class ConsentLog(Base):
 
     customer = relationship("Customer", back_populates="consent_logs")
     business = relationship("BusinessProfile", back_populates="consent_logs")
+    __table_args__ = (Index('idx_consent_log_phone_status_sent', 'phone_number', 'status', 'sent_at'),)
 
 class ScheduledSMS(Base):
     __tablename__ = "scheduled_sms"
@@ -318,4 +428,71 @@ class TargetedEvent(Base):
     nudge = relationship("CoPilotNudge", back_populates="created_targeted_event")
     __table_args__ = (Index('idx_targetevent_biz_cust_dt', 'business_id', 'customer_id', 'event_datetime_utc'),)
     def __repr__(self):
-        return f"<TargetedEvent(id={self.id}, customer_id={self.customer_id}, datetime='{self.event_datetime_utc}', status='{self.status}')>"
\ No newline at end of file
+        return f"<TargetedEvent(id={self.id}, customer_id={self.customer_id}, datetime='{self.event_datetime_utc}', status='{self.status}')>"
+
+
+# message_metadata keys that are also Message columns, with the column's type.
+MESSAGE_METADATA_COLUMNS = {"source": str, "roadmap_id": int, "nudge_id": int, "twilio_sid": str}
+
+
+@event.listens_for(Message, "before_insert")
+@event.listens_for(Message, "before_update")
+def _sync_message_metadata_columns(mapper, connection, message):
+    # Writers set these in message_metadata, in the column, or both: the metadata value wins and is
+    # copied to the column, and a column set on its own is copied into the metadata.
+    metadata = message.message_metadata if isinstance(message.message_metadata, dict) else {}
+    missing = {}
+    for key, cast in MESSAGE_METADATA_COLUMNS.items():
+        value = metadata.get(key)
+        if value is not None:
+            try:
+                setattr(message, key, cast(value))
+            except (TypeError, ValueError):
+                pass
+        elif getattr(message, key) is not None:
+            missing[key] = getattr(message, key)
+    if missing and (message.message_metadata is None or isinstance(message.message_metadata, dict)):
+        message.message_metadata = {**metadata, **missing}
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_conversation_summaries(session, flush_context):
+    # Imported here: the service module imports these models.
+    from app.services.conversation_summary_service import refresh_after_flush
+    refresh_after_flush(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_live_events(session, flush_context):
+    from app.services.live_events_service import collect_after_flush
+    collect_after_flush(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_live_events(session):
+    from app.services.live_events_service import publish_after_commit
+    publish_after_commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_live_events(session):
+    from app.services.live_events_service import discard_after_rollback
+    discard_after_rollback(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_cache_generations(session, flush_context):
+    from app.services.response_cache_service import collect_after_flush
+    collect_after_flush(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_cache_generations(session):
+    from app.services.response_cache_service import bump_after_commit
+    bump_after_commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_generations(session):
+    from app.services.response_cache_service import discard_after_rollback
+    discard_after_rollback(session)
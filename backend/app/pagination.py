@@ -0,0 +1,105 @@
+# backend/app/pagination.py
+
+# Keyset (cursor) pagination shared by the list endpoints.
+# A page is ordered by a list of SortKeys ending in a unique column (the id), and the cursor is an
+# opaque token holding the sort values of the last row served. The next page is "rows strictly after
+# those values" in that order, which the matching composite index answers as a range scan: deep pages
+# cost the same as the first one, and rows inserted between requests cannot shift or repeat entries
+# the way they do with OFFSET. Keep sort keys non-null and in one direction where possible (COALESCE a
+# nullable column, see inbox_service): the filter is then a single row-value comparison. Keys marked
+# nullable sort their NULLs last on both dialects, at the cost of an OR'ed filter.
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, false, literal, or_, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class SortKey:
+    column: Any
+    descending: bool = False
+    nullable: bool = False  # NULLs sorted last explicitly; the index must order them the same way
+
+    def order_by(self):
+        ordered = self.column.desc() if self.descending else self.column.asc()
+        return ordered.nulls_last() if self.nullable else ordered
+
+    def after(self, value: Any):
+        """Rows that sort strictly after `value` on this key alone."""
+        if value is None:
+            return false()  # NULLs are last, nothing follows them
+        beyond = self.column < value if self.descending else self.column > value
+        return or_(beyond, self.column.is_(None)) if self.nullable else beyond
+
+    def equals(self, value: Any):
+        return self.column.is_(None) if value is None else self.column == value
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if hasattr(value, "value"):  # enums
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> List[Any]:
+    """Sort values from a cursor produced by encode_cursor for the same keys; 400 on anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(value) for value in json.loads(raw)]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+    return values
+
+
+def keyset_filter(keys: Sequence[SortKey], values: Sequence[Any]):
+    """
+    (k1, k2, ...) > (v1, v2, ...) in the keys' order. Non-null keys in one direction compare as a
+    single row value (an index range); mixed directions and nullable keys are expanded term by term.
+    """
+    if len({key.descending for key in keys}) == 1 and not any(key.nullable for key in keys):
+        columns = tuple_(*[key.column for key in keys])
+        bound = tuple_(*[literal(value, key.column.type) for key, value in zip(keys, values)])
+        return columns < bound if keys[0].descending else columns > bound
+    clauses = []
+    for i, key in enumerate(keys):
+        clauses.append(and_(*[keys[j].equals(values[j]) for j in range(i)], key.after(values[i])))
+    return or_(*clauses)
+
+
+def paginate(query, keys: Sequence[SortKey], cursor: Optional[str], limit: int):
+    """
+    Orders `query` (a Query or a select()) by `keys`, resumes after `cursor` and fetches one row
+    more than `limit`, which take_page() uses to tell whether another page exists.
+    """
+    if cursor:
+        query = query.filter(keyset_filter(keys, decode_cursor(cursor, keys)))
+    return query.order_by(*[key.order_by() for key in keys]).limit(limit + 1)
+
+
+def take_page(rows: Sequence[Any], limit: int, sort_values: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """Splits the rows of a paginate() query into the page and the cursor of the next one (None on the last page)."""
+    page = list(rows[:limit])
+    next_cursor = encode_cursor(sort_values(page[-1])) if len(rows) > limit else None
+    return page, next_cursor
@@ -3,35 +3,52 @@ import logging
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import update
 
 from app.database import get_db
 from app.models import Message, MessageStatusEnum, MessageTypeEnum
+from app.pagination import NEXT_CURSOR_HEADER, SortKey, paginate, take_page
+from app.services.message_service import MessageService
 # Make sure to import the new BulkActionPayload from your schemas
 from app.schemas import ApprovalQueueItem, ApprovePayload, BulkActionPayload
-from app.celery_tasks import process_scheduled_message_task
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/approvals", tags=["Approvals"])
 
+# Newest first, id as tiebreak; served by idx_messages_business_status_created.
+APPROVAL_SORT_KEYS = (SortKey(Message.created_at, descending=True), SortKey(Message.id, descending=True))
+
 @router.get("/", response_model=List[ApprovalQueueItem])
-def get_approval_queue(business_id: int, db: Session = Depends(get_db)):
-    """ Fetches all messages for a business that are in 'pending_approval' status. """
+def get_approval_queue(
+    business_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit for the whole queue."),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page."),
+    db: Session = Depends(get_db)
+):
+    """ Fetches messages for a business that are in 'pending_approval' status, a page at a time when `limit` is given. """
     logger.info(f"Fetching approval queue for business_id: {business_id}")
+    query = (
+        db.query(Message)
+        .options(joinedload(Message.customer))
+        .filter(
+            Message.business_id == business_id,
+            Message.status == MessageStatusEnum.PENDING_APPROVAL
+        )
+    )
     try:
-        approval_items = (
-            db.query(Message)
-            .options(joinedload(Message.customer))
-            .filter(
-                Message.business_id == business_id,
-                Message.status == MessageStatusEnum.PENDING_APPROVAL
-            )
-            .order_by(Message.created_at.desc())
-            .all()
+        if limit is None and cursor is None:
+            return query.order_by(*[key.order_by() for key in APPROVAL_SORT_KEYS]).all()
+        limit = limit or 100
+        approval_items, next_cursor = take_page(
+            paginate(query, APPROVAL_SORT_KEYS, cursor, limit).all(), limit, lambda m: (m.created_at, m.id)
         )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return approval_items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"DB error fetching approval queue for business_id {business_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Database error while fetching approval queue.")
@@ -59,25 +76,22 @@ def approve_message(
     message.scheduled_time = send_time
     
     try:
-        task = process_scheduled_message_task.apply_async(args=[message.id], eta=send_time)
-        metadata = message.message_metadata or {}
-        metadata['celery_task_id'] = task.id
-        message.message_metadata = metadata
         db.commit()
         db.refresh(message)
-        logger.info(f"Successfully approved and queued message {message_id}.")
+        logger.info(f"Successfully approved and scheduled message {message_id}.")
         return message
     except Exception as e:
         db.rollback()
-        logger.error(f"Celery task queueing failed for message {message_id}: {e}", exc_info=True)
+        logger.error(f"Scheduling failed for message {message_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to schedule message delivery.")
 
 @router.post("/{message_id}/reject", status_code=status.HTTP_204_NO_CONTENT)
 def reject_message(message_id: int, db: Session = Depends(get_db)):
     """ Rejects a single message from the queue. """
     logger.info(f"Attempting to reject message_id: {message_id}")
-    db.query(Message).filter(Message.id == message_id, Message.status == MessageStatusEnum.PENDING_APPROVAL).update({"status": MessageStatusEnum.REJECTED})
-    db.commit()
+    MessageService(db).update_message_statuses(
+        [message_id], MessageStatusEnum.REJECTED, from_statuses=[MessageStatusEnum.PENDING_APPROVAL]
+    )
     return None
 
 # --- NEW ENDPOINT FOR BULK ACTIONS ---
@@ -91,43 +105,28 @@ def bulk_action_messages(payload: BulkActionPayload, db: Session = Depends(get_d
 
     logger.info(f"Performing bulk action '{payload.action}' on {len(payload.message_ids)} messages.")
 
+    message_service = MessageService(db)
+    # Each action is a single UPDATE ... RETURNING; messages no longer pending approval are left as they are.
     if payload.action == 'reject':
-        stmt = (
-            update(Message)
-            .where(Message.id.in_(payload.message_ids), Message.status == MessageStatusEnum.PENDING_APPROVAL)
-            .values(status=MessageStatusEnum.REJECTED)
+        rejected_ids = message_service.update_message_statuses(
+            payload.message_ids, MessageStatusEnum.REJECTED, from_statuses=[MessageStatusEnum.PENDING_APPROVAL]
         )
-        result = db.execute(stmt)
-        db.commit()
-        return {"status": "success", "message": f"{result.rowcount} messages rejected."}
+        return {"status": "success", "message": f"{len(rejected_ids)} messages rejected.", "message_ids": rejected_ids}
 
     elif payload.action == 'approve':
         send_time = payload.send_datetime_utc or (datetime.now(timezone.utc) + timedelta(seconds=15))
-        
-        messages_to_approve = db.query(Message).filter(
-            Message.id.in_(payload.message_ids),
-            Message.status == MessageStatusEnum.PENDING_APPROVAL
-        ).all()
-
-        if not messages_to_approve:
-            return {"status": "success", "message": "No valid messages found to approve."}
-
-        for message in messages_to_approve:
-            message.status = MessageStatusEnum.SCHEDULED
-            message.message_type = MessageTypeEnum.SCHEDULED
-            message.scheduled_time = send_time
-            try:
-                task = process_scheduled_message_task.apply_async(args=[message.id], eta=send_time)
-                metadata = message.message_metadata or {}
-                metadata['celery_task_id'] = task.id
-                message.message_metadata = metadata
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Celery task queueing failed during bulk approve for message {message.id}: {e}", exc_info=True)
-                raise HTTPException(status_code=500, detail=f"Failed to schedule message ID {message.id}.")
-        
-        db.commit()
-        return {"status": "success", "message": f"{len(messages_to_approve)} messages scheduled successfully."}
+
+        scheduled_ids = message_service.update_message_statuses(
+            payload.message_ids,
+            MessageStatusEnum.SCHEDULED,
+            from_statuses=[MessageStatusEnum.PENDING_APPROVAL],
+            message_type=MessageTypeEnum.SCHEDULED.value,
+            scheduled_time=send_time,
+        )
+
+        if not scheduled_ids:
+            return {"status": "success", "message": "No valid messages found to approve.", "message_ids": []}
+        return {"status": "success", "message": f"{len(scheduled_ids)} messages scheduled successfully.", "message_ids": scheduled_ids}
 
     else:
         raise HTTPException(status_code=400, detail="Invalid action specified.")
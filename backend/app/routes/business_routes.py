@@ -16,6 +16,7 @@ from app.schemas import (
     BusinessProfileUpdate,
     BusinessPhoneUpdate
 )
+from app.services.tenant_routing_service import get_business_id_for_slug, invalidate_number, invalidate_slug
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +51,7 @@ def create_business_profile(
         db.add(db_business)
         db.commit()
         db.refresh(db_business)
+        invalidate_slug(slug)
         return db_business
     except IntegrityError:
         db.rollback()
@@ -83,6 +85,8 @@ def update_business_profile(
     if not update_data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No update data provided.")
 
+    old_slug = profile.slug
+    old_twilio_number = profile.twilio_number
     if 'business_name' in update_data and update_data['business_name'] != profile.business_name:
         new_slug = slugify(update_data['business_name'])
         if db.query(BusinessProfileModel).filter(BusinessProfileModel.slug == new_slug, BusinessProfileModel.id != business_id).first():
@@ -95,6 +99,12 @@ def update_business_profile(
     try:
         db.commit()
         db.refresh(profile)
+        if profile.slug != old_slug:
+            invalidate_slug(old_slug)
+            invalidate_slug(profile.slug)
+        if 'twilio_number' in update_data:
+            invalidate_number(old_twilio_number)
+            invalidate_number(profile.twilio_number)
         logger.info(f"Successfully updated business profile for ID: {business_id}")
         return profile
     except Exception as e:
@@ -105,13 +115,13 @@ def update_business_profile(
 @router.get("/business-id/slug/{slug}", response_model=dict)
 def get_business_id_by_slug(slug: str, db: Session = Depends(get_db)):
     try:
-        business = db.query(BusinessProfileModel.id).filter(BusinessProfileModel.slug == slug).first()
-        if not business:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Business with slug '{slug}' not found")
-        return {"business_id": business.id}
+        business_id = get_business_id_for_slug(db, slug)
     except Exception as e:
         logger.error(f"Error fetching business ID by slug '{slug}': {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching business ID by slug")
+    if business_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Business with slug '{slug}' not found")
+    return {"business_id": business_id}
 
 # --- FIX: Replaced placeholder with a functional implementation ---
 @router.get("/navigation-profile/slug/{slug}", response_model=BusinessProfile)
@@ -143,8 +153,11 @@ def cleanup_abandoned_profiles(db: Session = Depends(get_db)):
         BusinessProfileModel.twilio_number.is_(None),
         BusinessProfileModel.created_at < thirty_minutes_ago
     )
+    abandoned_slugs = [row.slug for row in abandoned_profiles_query.with_entities(BusinessProfileModel.slug).all()]
     count = abandoned_profiles_query.delete(synchronize_session=False)
     db.commit()
+    for slug in abandoned_slugs:
+        invalidate_slug(slug)
     return {"message": f"Deleted {count} abandoned profiles"}
 
 
@@ -33,6 +33,7 @@ from app.services.ai_service import AIService
 from app.services.consent_service import ConsentService
 from app.config import settings
 from app.services.twilio_service import TwilioService
+from app.services.message_dispatch_service import mark_claimed_for_immediate_send
 
 from app.schemas import (
     Customer as CustomerSchema,
@@ -206,8 +207,6 @@ def schedule_message_from_inbox(
     db.flush()
 
     try:
-        task = process_scheduled_message_task.apply_async(args=[db_message.id], eta=payload.send_datetime_utc)
-        db_message.message_metadata['celery_task_id'] = task.id
         db.commit()
         db.refresh(db_message)
         return db_message
@@ -325,41 +324,11 @@ def send_manual_reply(customer_id: int, payload: ManualReplyInput, db: Session =
         scheduled_time=now_utc,
         message_metadata={'source': 'manual_reply_inbox'}
     )
+    # Claimed up front so the sweeper does not also pick it up; handed to a worker after commit.
+    mark_claimed_for_immediate_send(message_record, now=now_utc)
     db.add(message_record)
     db.flush()
 
-    task_id_str = None
-    try:
-        eta_value = message_record.scheduled_time
-        if not isinstance(eta_value, datetime):
-            eta_value = datetime.fromisoformat(str(eta_value))
-        
-        if eta_value.tzinfo is None:
-            eta_value = pytz.utc.localize(eta_value)
-        else:
-            eta_value = eta_value.astimezone(pytz.utc)
-        
-        if eta_value < datetime.now(pytz.utc):
-            logger.warning(f"ETA for message {message_record.id} is in the past: {eta_value.isoformat()}.")
-
-        logger.info(f"Attempting to schedule Celery task for Message.id={message_record.id}, ETA='{eta_value.isoformat()}'")
-        
-        task_result = process_scheduled_message_task.apply_async(
-            args=[message_record.id],
-            eta=eta_value
-        )
-        task_id_str = task_result.id
-        
-        if not isinstance(message_record.message_metadata, dict):
-            message_record.message_metadata = {}
-        message_record.message_metadata['celery_task_id'] = task_id_str
-        logger.info(f"Celery task successfully queued. Task ID: {task_id_str} for Message.id: {message_record.id}")
-
-    except Exception as e:
-        logger.error(f"Failed to schedule task via Celery for Message.id: {message_record.id}. Exception: {str(e)}", exc_info=True)
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to add message to scheduling queue. Error: {str(e)}")
-
     new_engagement = Engagement(
         customer_id=customer.id,
         message_id=message_record.id,
@@ -382,6 +351,12 @@ def send_manual_reply(customer_id: int, payload: ManualReplyInput, db: Session =
         logger.error(f"send_manual_reply: Database commit error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to save reply to database.")
 
+    try:
+        process_scheduled_message_task.delay(message_record.id)
+        logger.info(f"send_manual_reply: Queued send for Message.id={message_record.id}")
+    except Exception as e:
+        logger.error(f"send_manual_reply: Failed to queue send for Message.id={message_record.id}, leaving it to the dispatcher: {e}", exc_info=True)
+
     return {
         "status": "success",
         "message": "Reply submitted for sending.",
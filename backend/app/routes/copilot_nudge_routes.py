@@ -2,7 +2,7 @@
 import logging
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query # Added Query import
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query # Added Query import
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 
@@ -15,6 +15,7 @@ from app.schemas import (
 )
 from app.auth import get_current_user # Uncommented: Needed for authenticated routes
 from app.services.copilot_nudge_action_service import CoPilotNudgeActionService
+from app.services.response_cache_service import NUDGES, cached_response
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +29,7 @@ def get_copilot_nudge_action_service(db: Session = Depends(get_db)) -> CoPilotNu
 
 @router.get("/nudges", response_model=List[CoPilotNudgeRead])
 async def get_active_nudges(
+    request: Request,
     db: Session = Depends(get_db),
     # REMOVED AUTH DEPENDENCY for public access to nudges for a given business_id:
     # current_business_profile: BusinessProfile = Depends(get_current_user)
@@ -38,12 +40,16 @@ async def get_active_nudges(
     Fetches active CoPilotNudge records for a specific business ID.
     This endpoint does NOT require authentication.
     Includes customer_name if the nudge is associated with a customer.
+    Cached until the business's nudges change.
     """
     logger.info("✅ --- Received request for /nudges endpoint. --- ✅")
     logger.info(f"Fetching active CoPilotNudges for provided business_id: {business_id} (without authentication)")
 
     # The business_id is now directly from the query parameter
+    return cached_response(request, business_id, NUDGES, lambda: _active_nudges(db, business_id))
 
+
+def _active_nudges(db: Session, business_id: int) -> List[CoPilotNudgeRead]:
     nudges_orm = (
         db.query(CoPilotNudge)
         .outerjoin(Customer, CoPilotNudge.customer_id == Customer.id) # outerjoin in case customer_id is None
@@ -5,15 +5,16 @@
 # including tag management, listing customers, and getting conversation history.
 # ----------------------------------------------------------------------
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, desc
 from datetime import datetime, timezone # Import timezone for utcnow() consistency
 from typing import Optional, List
 
 from app.database import get_db
-from app.models import Customer as CustomerModel, BusinessProfile, ConsentLog, Tag, CustomerTag, Message as MessageModel
+from app.models import Customer as CustomerModel, BusinessProfile, ConsentLog, OptInStatus, Tag, CustomerTag, Message as MessageModel
+from app.pagination import NEXT_CURSOR_HEADER, SortKey, paginate, take_page
 from app.schemas import (
     Customer, CustomerCreate, CustomerUpdate, TagRead, CustomerFindOrCreate,
     CustomerConversation, ConversationMessageForTimeline, CustomerSummarySchema,
@@ -26,6 +27,10 @@ import logging
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["customers"])
 
+# Alphabetical, id as tiebreak for duplicate names, unnamed customers last (ASC NULLS LAST is also the
+# index's own order); served by idx_customers_business_name.
+CUSTOMER_SORT_KEYS = (SortKey(CustomerModel.customer_name, nullable=True), SortKey(CustomerModel.id))
+
 
 @router.post("/find-or-create-by-phone", response_model=Customer)
 def find_or_create_customer_by_phone(
@@ -127,13 +132,16 @@ async def create_customer(
 @router.get("/by-business/{business_id}", response_model=List[CustomerSummarySchema])
 def get_customers_by_business(
     business_id: int,
+    response: Response,
     tags: Optional[str] = Query(None, description="Comma-separated list of tag names to filter by (lowercase)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for every customer."),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page."),
     db: Session = Depends(get_db)
 ):
     query = db.query(
         CustomerModel,
     ).options(
-        joinedload(CustomerModel.tags)
+        selectinload(CustomerModel.tags)
     ).filter(CustomerModel.business_id == business_id)
 
     if tags:
@@ -142,20 +150,28 @@ def get_customers_by_business(
             query = query.join(CustomerModel.tags).filter(Tag.name.in_(tag_names))
             query = query.group_by(CustomerModel.id).having(func.count(Tag.id) == len(tag_names))
 
-    customers_orm = query.order_by(CustomerModel.customer_name).all()
+    if limit is None and cursor is None:
+        customers_orm = query.order_by(*[key.order_by() for key in CUSTOMER_SORT_KEYS]).all()
+    else:
+        limit = limit or 200
+        customers_orm, next_cursor = take_page(
+            paginate(query, CUSTOMER_SORT_KEYS, cursor, limit).all(), limit, lambda c: (c.customer_name, c.id)
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     customers_response = []
     for customer_orm in customers_orm:
-        latest_consent = db.query(ConsentLog).filter(ConsentLog.customer_id == customer_orm.id).order_by(desc(ConsentLog.replied_at)).first()
+        has_consent_history = customer_orm.consent_status != OptInStatus.NOT_SET.value
         customers_response.append(
             CustomerSummarySchema(
                 id=customer_orm.id,
                 customer_name=customer_orm.customer_name,
                 phone=customer_orm.phone,
                 lifecycle_stage=customer_orm.lifecycle_stage,
-                opted_in=latest_consent.status == "opted_in" if latest_consent else customer_orm.opted_in,
-                latest_consent_status=latest_consent.status if latest_consent else None,
-                latest_consent_updated=latest_consent.replied_at if latest_consent else None,
+                opted_in=customer_orm.opted_in,
+                latest_consent_status=customer_orm.consent_status if has_consent_history else None,
+                latest_consent_updated=customer_orm.consent_updated_at if has_consent_history else None,
                 tags=[TagRead.from_orm(tag) for tag in customer_orm.tags],
                 business_id=customer_orm.business_id,
             )
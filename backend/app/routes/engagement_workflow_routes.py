@@ -7,6 +7,7 @@
 
 import logging
 
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, Body, status
 from sqlalchemy.orm import Session
 from app.database import get_db
@@ -16,12 +17,14 @@ from app.models import (
 )
 from app.config import settings
 from app.services.twilio_service import send_sms_via_twilio
+from app.twilio_client import get_async_twilio_client
+from app.services.sms_rate_limiter import wait_for_send_slot, SmsRateLimitExceeded
 from datetime import datetime, timezone as dt_timezone
 import uuid # For Conversation ID
 # import json # For message_metadata if needed as string, but dict is fine
 from pydantic import BaseModel
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from twilio.base import values
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +55,21 @@ from pydantic import BaseModel
 class SendDraftInput(BaseModel):
     updated_content: str
 
+
+async def _send_draft_sms(body: str, from_number: str, messaging_service_sid: str, to: str):
+    """Waits for a send slot and sends over the event loop's shared Twilio pool."""
+    await wait_for_send_slot(from_number, messaging_service_sid)
+    return await get_async_twilio_client().messages.create_async( # Shared keep-alive pool; no per-request Client
+        body=body,
+        messaging_service_sid=messaging_service_sid, # Use the shared service SID
+        from_=from_number,                           # Use the business's specific 'From' number
+        to=to,
+        status_callback=settings.TWILIO_STATUS_CALLBACK_URL or values.unset,
+    )
+
+
+# Sync route (threadpool) so its DB work never blocks the event loop; only the Twilio call runs
+# on the loop, via from_thread.run.
 @router.put("/reply/{id}/send")
 def send_reply(
     id: int,
@@ -109,16 +127,15 @@ def send_reply(
         logger.error("[SEND_REPLY] ❌ Twilio account credentials missing in settings.")
         raise HTTPException(status_code=500, detail="SMS provider account is not configured")
 
-    twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
     try:
         logger.info(f"[SEND_REPLY] 📤 Sending updated AI draft to {customer.phone} from {specific_from_number} via MS {shared_messaging_service_sid}")
-        
-        twilio_api_response = twilio_client.messages.create(
-            body=message_content,
-            messaging_service_sid=shared_messaging_service_sid, # Use the shared service SID
-            from_=specific_from_number,                         # Use the business's specific 'From' number
-            to=customer.phone
-        )
+        try:
+            twilio_api_response = from_thread.run(
+                _send_draft_sms, message_content, specific_from_number, shared_messaging_service_sid, customer.phone
+            )
+        except SmsRateLimitExceeded as e:
+            logger.warning(f"[SEND_REPLY] {e}")
+            raise HTTPException(status_code=429, detail="SMS send rate limit reached; try again shortly.")
 
         if twilio_api_response.status in ['failed', 'undelivered']:
             logger.error(f"[SEND_REPLY] Twilio reported message status: {twilio_api_response.status}. Error: {twilio_api_response.error_message} (SID: {twilio_api_response.sid})")
@@ -169,6 +186,7 @@ def send_reply(
             status=MessageStatusEnum.SENT.value,
             created_at=now_utc, # Align with engagement sent_at
             sent_at=now_utc,    # Align with engagement sent_at
+            twilio_sid=twilio_api_response.sid,
             message_metadata={
                 'source': 'ai_draft_sent',
                 'engagement_id': engagement.id,
@@ -197,6 +215,8 @@ def send_reply(
             "sms_sid": twilio_api_response.sid
         }
 
+    except HTTPException:
+        raise
     except TwilioRestException as e:
         db.rollback() # Ensure rollback if commit hasn't happened or if error occurs after commit attempt
         logger.error(f"[SEND_REPLY] TwilioRestException: {e.status} - {e.msg}", exc_info=True)
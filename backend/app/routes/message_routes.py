@@ -11,7 +11,7 @@
 # DEVELOPER PERSPECTIVE:
 # Routes:
 # - POST / - Creates a new message in the system
-# - GET / - Retrieves all messages with pagination
+# - GET / - Retrieves all messages with pagination (cursor in the X-Next-Cursor header)
 # - GET /{message_id} - Retrieves a specific message by ID
 # - PUT /{message_id} - Updates an existing message
 # - DELETE /{message_id} - Removes a message from the system
@@ -26,21 +26,26 @@
 # Each message belongs to a conversation and connects a business with a customer.
 # Uses get_current_user auth dependency for authentication on create operations.
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session, joinedload
 from app.database import get_db
 from app.models import Message as MessageModel
+from app.pagination import NEXT_CURSOR_HEADER, SortKey, paginate, take_page
 from app.schemas import (
     Message, MessageCreate, MessageUpdate,
     MessageSummarySchema, CustomerBasicInfo, BusinessBasicInfo # Import new schemas
 )
-from typing import List
+from typing import List, Optional
 from ..auth import get_current_user
 
 router = APIRouter(
     tags=["messages"]
 )
 
+# Newest first; id breaks ties between messages created in the same instant. created_at is always set
+# on insert, so the cursor is one row-value range over idx_messages_created, scanned backwards.
+MESSAGE_SORT_KEYS = (SortKey(MessageModel.created_at, descending=True), SortKey(MessageModel.id, descending=True))
+
 @router.post("/", response_model=Message)
 def create_message(
     message: MessageCreate,
@@ -55,8 +60,10 @@ def create_message(
 
 @router.get("/", response_model=List[Message])
 def get_messages(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page; replaces skip."),
     db: Session = Depends(get_db)
     # current_user: Message = Depends(get_current_user) # Assuming you might want to filter by user's business
 ):
@@ -72,10 +79,15 @@ def get_messages(
     # messages_query = messages_query.filter(MessageModel.business_id == current_user.id)
 
 
-    messages = messages_query.options(
+    messages_query = paginate(messages_query.options(
         joinedload(MessageModel.customer), # Assuming 'customer' is the relationship attribute name in MessageModel
         joinedload(MessageModel.business)  # Assuming 'business' is the relationship attribute name in MessageModel
-    ).order_by(MessageModel.created_at.desc()).offset(skip).limit(limit).all() # Added order_by for consistency
+    ), MESSAGE_SORT_KEYS, cursor, limit)
+    if skip and not cursor:
+        messages_query = messages_query.offset(skip)
+    messages, next_cursor = take_page(messages_query.all(), limit, lambda m: (m.created_at, m.id))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     # The Message schema should have customer: Optional[CustomerSchema] and business: Optional[BusinessProfileSchema]
     # and Config.orm_mode = True for this to be automatically serialized.
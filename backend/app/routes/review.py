@@ -4,27 +4,26 @@ import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 # The main 'func' object is used to call DB functions in a dialect-agnostic way.
-from sqlalchemy import desc, select, func, case, and_, or_, String
-# JSONB and aggregate_order_by are still needed for type casting and ordering within the aggregation.
-from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
-# REMOVED the direct import of jsonb_build_object and jsonb_agg
+from sqlalchemy import desc, select, func
 
 
 from app.database import get_db
+from app.pagination import paginate, take_page
+from app.redis_client import redis_client
+from app.services.inbox_service import INBOX_SORT_KEYS, get_unread_total, inbox_sort_values
+from app.services.live_events_service import stream_business_events
+from app.services.response_cache_service import INBOX, SCHEDULE, cached_response
 from app.models import (
+    ConversationSummary,
     Customer,
     Message,
     Engagement,
-    ConsentLog,
-    CoPilotNudge,
-    NudgeTypeEnum,
-    NudgeStatusEnum,
     MessageTypeEnum,
     MessageStatusEnum,
-    OptInStatus
 )
 from pydantic import BaseModel, Field
 
@@ -58,6 +57,11 @@ class PaginatedInboxSummaries(BaseModel):
     total_drafts: int
     total_opportunities: int
     total_unread: int
+    next_cursor: Optional[str] = None
+
+class InboxUnreadCount(BaseModel):
+    business_id: int
+    unread: int
 
 class CustomerBasicInfo(BaseModel):
     id: int
@@ -82,128 +86,94 @@ router = APIRouter(
 
 @router.get("/inbox/summaries", response_model=PaginatedInboxSummaries)
 def get_inbox_summaries(
+    request: Request,
     business_id: int = Query(..., description="The ID of the business to fetch inbox summaries for."),
-    page: int = Query(1, ge=1, description="Page number for pagination."),
+    page: int = Query(1, ge=1, description="Page number for pagination. Ignored when a cursor is given."),
     size: int = Query(20, ge=1, le=100, description="Number of items per page."),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
     db: Session = Depends(get_db)
 ):
     """
-    This optimized query loads the inbox list much faster and includes a list of active "nudges"
-    (such as AI drafts and opportunities) for each customer conversation.
+    Loads one page of the inbox from the conversation_summary read model (maintained on every
+    message/engagement/nudge/consent write), so the cost is an indexed range scan of one page
+    regardless of how much history the business has. Follow next_cursor for the next page;
+    `page` still works for jumping to a page number but scans all rows before it.
+    Pages are cached until the business's inbox changes and revalidate with ETag/If-None-Match.
     """
-    logger.info(f"Fetching V2 paginated inbox summaries for business_id={business_id}, page={page}, size={size}")
-    offset = (page - 1) * size
-
-    # Subquery to find the latest AI draft for each customer.
-    latest_draft_subquery = (
-        select(
-            Engagement.customer_id,
-            func.max(Engagement.id).label("latest_engagement_id")
-        )
-        .filter(
-            Engagement.business_id == business_id,
-            Engagement.status == MessageStatusEnum.PENDING_REVIEW.value,
-            Engagement.ai_response.isnot(None)
-        ).group_by(Engagement.customer_id).subquery("latest_drafts")
-    )
+    logger.info(f"Fetching V2 paginated inbox summaries for business_id={business_id}, page={page}, size={size}, cursor={bool(cursor)}")
+    return cached_response(request, business_id, INBOX, lambda: _inbox_summaries_page(db, business_id, page, size, cursor))
 
-    # Subquery to get all active nudges (e.g., opportunities) and aggregate them into a JSON array.
-    # FIX: Use func.jsonb_agg and func.jsonb_build_object instead of direct imports.
-    active_nudges_subquery = (
-        select(
-            CoPilotNudge.customer_id,
-            func.jsonb_agg(
-                aggregate_order_by(
-                    func.jsonb_build_object(
-                        'type', CoPilotNudge.nudge_type,
-                        'text', CoPilotNudge.ai_suggestion
-                    ),
-                    CoPilotNudge.created_at.desc()
-                )
-            ).label("nudges")
-        )
-        .filter(
-            CoPilotNudge.business_id == business_id,
-            CoPilotNudge.status == NudgeStatusEnum.ACTIVE.value,
-            CoPilotNudge.customer_id.isnot(None)
-        ).group_by(CoPilotNudge.customer_id).subquery("active_nudges")
-    )
 
-    # Subqueries for unread counts and last message content/timestamp.
-    last_msg_subquery = (
-        select(Message.customer_id, func.max(Message.created_at).label("last_message_timestamp"))
-        .filter(Message.business_id == business_id).group_by(Message.customer_id).subquery("last_msg_subquery")
-    )
-    unread_counts_subquery = (
-        select(Customer.id.label("customer_id"), func.count(Message.id).label("unread_count"))
-        .join(Message, Message.customer_id == Customer.id)
-        .filter(
-            Customer.business_id == business_id,
-            Message.message_type == MessageTypeEnum.INBOUND.value,
-            or_(Customer.last_read_at.is_(None), Message.created_at > Customer.last_read_at)
-        ).group_by(Customer.id).subquery("unread_counts_subquery")
+def _inbox_summaries_page(db: Session, business_id: int, page: int, size: int, cursor: Optional[str]) -> PaginatedInboxSummaries:
+    page_query = (
+        select(ConversationSummary, Customer.customer_name, Customer.phone, Engagement.ai_response.label("draft_text"))
+        .join(Customer, Customer.id == ConversationSummary.customer_id)
+        .outerjoin(Engagement, Engagement.id == ConversationSummary.latest_draft_id)
+        .filter(ConversationSummary.business_id == business_id)
     )
-    last_message_content_sq = select(
-        Message.customer_id, Message.content,
-        func.row_number().over(partition_by=Message.customer_id, order_by=Message.created_at.desc()).label("row_num")
-    ).filter(Message.business_id == business_id).subquery()
+    page_query = paginate(page_query, INBOX_SORT_KEYS, cursor, size)
+    if not cursor and page > 1:
+        page_query = page_query.offset((page - 1) * size)
+    results, next_cursor = take_page(db.execute(page_query).all(), size, lambda row: inbox_sort_values(row[0]))
 
-    # Main Query: Joins Customer data with all the pre-aggregated subquery results.
-    customer_summaries_query = (
+    # Totals for pagination and the filter bar counts, in one pass over the business's rows.
+    total_count, total_drafts, total_opportunities = db.execute(
         select(
-            Customer,
-            last_message_content_sq.c.content.label("last_message_content"),
-            last_msg_subquery.c.last_message_timestamp,
-            func.coalesce(unread_counts_subquery.c.unread_count, 0).label("unread_message_count"),
-            Engagement.ai_response.label("draft_text"),
-            active_nudges_subquery.c.nudges.label("opportunity_nudges")
-        )
-        .outerjoin(last_msg_subquery, Customer.id == last_msg_subquery.c.customer_id)
-        .outerjoin(unread_counts_subquery, Customer.id == unread_counts_subquery.c.customer_id)
-        .outerjoin(last_message_content_sq, and_(Customer.id == last_message_content_sq.c.customer_id, last_message_content_sq.c.row_num == 1))
-        .outerjoin(latest_draft_subquery, Customer.id == latest_draft_subquery.c.customer_id)
-        .outerjoin(Engagement, Engagement.id == latest_draft_subquery.c.latest_engagement_id)
-        .outerjoin(active_nudges_subquery, Customer.id == active_nudges_subquery.c.customer_id)
-        .filter(Customer.business_id == business_id)
-        .order_by(desc(func.coalesce(unread_counts_subquery.c.unread_count, 0)), desc(last_msg_subquery.c.last_message_timestamp).nulls_last())
-        .limit(size).offset(offset)
-    )
-
-    results = db.execute(customer_summaries_query).all()
-    total_count = db.query(Customer).filter(Customer.business_id == business_id).count()
+            func.count(ConversationSummary.customer_id),
+            func.count(ConversationSummary.latest_draft_id),
+            func.coalesce(func.sum(ConversationSummary.active_nudge_count), 0),
+        ).filter(ConversationSummary.business_id == business_id)
+    ).one()
 
-    # Process results into the final Pydantic schema for the response.
     summaries = []
-    for row in results:
-        customer, last_message_content, last_message_timestamp, unread_count, draft_text, opportunity_nudges = row
-
+    for summary, customer_name, phone, draft_text in results:
         active_nudges_list = []
         if draft_text:
             active_nudges_list.append(InboxNudge(type="draft", text=draft_text))
-        if opportunity_nudges:
-            for nudge in opportunity_nudges:
-                 active_nudges_list.append(InboxNudge(type=nudge.get('type', 'opportunity'), text=nudge.get('text', '')))
-
-        latest_consent = db.query(ConsentLog).filter(ConsentLog.customer_id == customer.id).order_by(desc(ConsentLog.replied_at)).first()
+        for nudge in summary.active_nudges or []:
+            active_nudges_list.append(InboxNudge(type=nudge.get('type', 'opportunity'), text=nudge.get('text', '')))
 
         summaries.append(InboxCustomerSummary(
-            customer_id=customer.id, customer_name=customer.customer_name, phone=customer.phone,
-            last_message_content=last_message_content, last_message_timestamp=last_message_timestamp,
-            unread_message_count=unread_count,
-            opted_in=latest_consent.status == "opted_in" if latest_consent else False,
-            consent_status=latest_consent.status if latest_consent else OptInStatus.NOT_SET.value,
+            customer_id=summary.customer_id, customer_name=customer_name, phone=phone,
+            last_message_content=summary.last_message_preview, last_message_timestamp=summary.last_message_at,
+            unread_message_count=summary.unread_count,
+            opted_in=summary.opted_in,
+            consent_status=summary.consent_status,
             active_nudges=active_nudges_list
         ))
 
-    # Calculate overall stats for pagination and filter bar counts.
-    total_unread = db.query(func.sum(unread_counts_subquery.c.unread_count)).scalar() or 0
-    total_drafts = db.query(func.count(latest_draft_subquery.c.customer_id)).scalar()
-    total_opportunities = db.query(CoPilotNudge.id).filter(CoPilotNudge.business_id == business_id, CoPilotNudge.status == NudgeStatusEnum.ACTIVE, CoPilotNudge.customer_id.isnot(None)).count()
     total_pages = (total_count + size - 1) // size if total_count > 0 else 0
 
     return PaginatedInboxSummaries(
         items=summaries, total=total_count, page=page, size=size, pages=total_pages,
-        total_drafts=total_drafts, total_opportunities=total_opportunities, total_unread=int(total_unread)
+        total_drafts=total_drafts, total_opportunities=int(total_opportunities), total_unread=get_unread_total(db, business_id),
+        next_cursor=next_cursor
+    )
+
+@router.get("/inbox/unread-count", response_model=InboxUnreadCount)
+def get_inbox_unread_count(
+    business_id: int = Query(..., description="The ID of the business whose unread badge to fetch."),
+    db: Session = Depends(get_db)
+):
+    """Unread inbound messages across the business's inbox, kept current on every write (O(1) read)."""
+    return InboxUnreadCount(business_id=business_id, unread=get_unread_total(db, business_id))
+
+@router.get("/inbox/events", summary="Stream live inbox events (Server-Sent Events)")
+async def stream_inbox_events(
+    request: Request,
+    business_id: int = Query(..., description="The ID of the business whose inbox events to stream."),
+):
+    """
+    Pushes message.received, draft.ready, nudge.created and status.changed events for a business as
+    they are committed, so the inbox loads /inbox/summaries once and applies deltas instead of polling.
+    """
+    if redis_client is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Live inbox events are unavailable.")
+    logger.info(f"Opening inbox event stream for business_id={business_id}")
+    return StreamingResponse(
+        stream_business_events(business_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 @router.get(
@@ -212,13 +182,19 @@ def get_inbox_summaries(
     summary="Get Autopilot Scheduled Flight Plan"
 )
 def get_autopilot_plan(
+    request: Request,
     business_id: int = Query(..., description="The ID of the business for the plan."),
     db: Session = Depends(get_db)
 ):
     """
     Retrieves all future scheduled messages for a business, representing the "flight plan".
+    Cached until the business's schedule changes.
     """
     logger.info(f"Fetching Autopilot flight plan for business_id: {business_id}")
+    return cached_response(request, business_id, SCHEDULE, lambda: _autopilot_plan(db, business_id))
+
+
+def _autopilot_plan(db: Session, business_id: int) -> List[AutopilotMessage]:
     now_utc = datetime.now(timezone.utc)
 
     try:
@@ -236,7 +212,7 @@ def get_autopilot_plan(
         )
 
         logger.info(f"Successfully found {len(scheduled_messages)} scheduled autopilot messages for business_id: {business_id}")
-        return scheduled_messages
+        return [AutopilotMessage.model_validate(message) for message in scheduled_messages]
 
     except Exception as e:
         logger.error(
@@ -1,8 +1,6 @@
 # backend/app/routes/roadmap_editor_routes.py
 import logging
 from typing import List
-from datetime import datetime
-import pytz
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -11,8 +9,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import RoadmapMessage, Message, Customer, Conversation, MessageStatusEnum, MessageTypeEnum
 from app.schemas import ScheduleEditedRoadmapsRequest
-from app.celery_tasks import process_scheduled_message_task
-from app.celery_app import celery_app
+from app.timezone_utils import ensure_utc
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Roadmap Editor"])
@@ -81,21 +78,13 @@ def schedule_edited_roadmaps(
                 content=item.content,
                 message_type=MessageTypeEnum.SCHEDULED,
                 status=MessageStatusEnum.SCHEDULED,
-                scheduled_time=item.send_datetime_utc,
+                scheduled_time=ensure_utc(item.send_datetime_utc),
                 message_metadata={'source': 'roadmap_editor', 'roadmap_id': roadmap_msg.id}
             )
             db.add(new_message)
             db.flush()
 
-            # 4. Schedule with Celery
-            eta_value = item.send_datetime_utc
-            if eta_value.tzinfo is None:
-                eta_value = pytz.utc.localize(eta_value)
-            
-            task = process_scheduled_message_task.apply_async(args=[new_message.id], eta=eta_value)
-            new_message.message_metadata['celery_task_id'] = task.id
-            
-            # 5. Mark original RoadmapMessage as processed
+            # 4. Mark original RoadmapMessage as processed
             roadmap_msg.status = "superseded"
             roadmap_msg.message_id = new_message.id
             
@@ -108,8 +97,7 @@ def schedule_edited_roadmaps(
         db.commit()
     except Exception as e:
         db.rollback()
-        # If commit fails, we should ideally try to revoke any tasks that were queued.
-        # This is a complex recovery pattern; for now, we raise a server error.
+        # Nothing was queued outside the transaction, so a rollback leaves no stray sends.
         logger.error(f"{log_prefix} Final DB commit failed. Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Database error occurred while finalizing schedule.")
 
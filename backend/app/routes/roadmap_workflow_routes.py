@@ -5,9 +5,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc, cast, Integer
 from datetime import datetime, timezone # Keep timezone for direct use if needed
 from app.database import get_db
-from app.models import RoadmapMessage, Message, Customer, Conversation
-from app.celery_tasks import process_scheduled_message_task
-from app.celery_app import celery_app # Import your Celery app instance for control tasks
+from app.models import RoadmapMessage, Message, MessageStatusEnum, Customer, Conversation
+from app.timezone_utils import ensure_utc
 import logging
 import uuid
 import pytz # For robust timezone handling
@@ -74,7 +73,12 @@ def schedule_message(roadmap_id: int, db: Session = Depends(get_db)):
         db.add(conversation)
         db.flush() 
 
-    # 🔹 Step 6: Create a new Message record
+    # 🔹 Step 6: Normalize the send time to UTC
+    send_time_utc = ensure_utc(roadmap_msg.send_datetime_utc)
+    if send_time_utc < datetime.now(pytz.utc):
+        logger.warning(f"⚠️ Send time for roadmap {roadmap_id} is in the past: {send_time_utc.isoformat()}. It will go out on the next dispatcher sweep.")
+
+    # 🔹 Step 7: Create a new Message record.
     new_scheduled_message = Message(
         conversation_id=conversation.id,
         customer_id=roadmap_msg.customer_id,
@@ -82,49 +86,15 @@ def schedule_message(roadmap_id: int, db: Session = Depends(get_db)):
         content=roadmap_msg.smsContent,
         message_type='scheduled',
         status="scheduled",
-        scheduled_time=roadmap_msg.send_datetime_utc,
+        scheduled_time=send_time_utc,
         message_metadata={
             'source': 'roadmap',
-            'roadmap_id': roadmap_msg.id,
-            'celery_task_id': None 
+            'roadmap_id': roadmap_msg.id
         }
     )
     db.add(new_scheduled_message)
     db.flush() 
 
-    # 🔹 Step 7: Schedule with Celery
-    task_id_str = None
-    try:
-        eta_value = roadmap_msg.send_datetime_utc
-        if not isinstance(eta_value, datetime):
-            eta_value = datetime.fromisoformat(str(eta_value))
-        
-        if eta_value.tzinfo is None:
-            eta_value = pytz.utc.localize(eta_value)
-        else:
-            eta_value = eta_value.astimezone(pytz.utc)
-        
-        if eta_value < datetime.now(pytz.utc):
-            logger.warning(f"⚠️ ETA for message {new_scheduled_message.id} is in the past: {eta_value.isoformat()}. Celery may execute immediately.")
-
-        logger.info(f"📤 Attempting to schedule Celery task for Message.id={new_scheduled_message.id}, ETA (UTC)='{eta_value.isoformat()}'")
-        
-        task_result = process_scheduled_message_task.apply_async(
-            args=[new_scheduled_message.id],
-            eta=eta_value
-        )
-        task_id_str = task_result.id
-        
-        if not isinstance(new_scheduled_message.message_metadata, dict):
-            new_scheduled_message.message_metadata = {}
-        new_scheduled_message.message_metadata['celery_task_id'] = task_id_str
-        logger.info(f"✅ Celery task successfully queued. Task ID: {task_id_str} for Message.id: {new_scheduled_message.id}")
-
-    except Exception as e:
-        logger.error(f"❌ Failed to schedule task via Celery for Message.id: {new_scheduled_message.id}. Exception: {str(e)}", exc_info=True)
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to add message to scheduling queue. Error: {str(e)}")
-
     # 🔹 Step 8: Update RoadmapMessage status and link to the new Message
     #
     # <<< THIS IS THE FIX >>>
@@ -138,22 +108,15 @@ def schedule_message(roadmap_id: int, db: Session = Depends(get_db)):
         db.commit()
         logger.info(f"💾 Database commit successful. RoadmapMessage ID {roadmap_id} status updated to 'superseded', linked to Message ID {new_scheduled_message.id}.")
     except Exception as e:
-        logger.error(f"❌ Database commit failed AFTER Celery task was queued for Message.id: {new_scheduled_message.id}. Task ID: {task_id_str}. Exception: {str(e)}", exc_info=True)
-        if task_id_str:
-            try:
-                logger.warning(f"Attempting to revoke Celery task {task_id_str} due to DB commit failure.")
-                celery_app.control.revoke(task_id_str, terminate=True)
-                logger.info(f"Celery task {task_id_str} revocation attempted.")
-            except Exception as revoke_exc:
-                logger.error(f"Failed to revoke Celery task {task_id_str}: {revoke_exc}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"DB commit failed after scheduling. Error: {str(e)}")
+        db.rollback()
+        logger.error(f"❌ Database commit failed while scheduling Message.id: {new_scheduled_message.id}. Exception: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"DB commit failed while scheduling. Error: {str(e)}")
 
 
     return {
         "status": "scheduled",
         "message_id": new_scheduled_message.id, 
         "roadmap_id": roadmap_msg.id,
-        "celery_task_id": task_id_str,
         "message": { 
             "id": new_scheduled_message.id,
             "customer_name": customer.customer_name,
@@ -165,8 +128,7 @@ def schedule_message(roadmap_id: int, db: Session = Depends(get_db)):
     }
 # ... (approve_all, update_message_time, delete_message functions remain the same as previously provided) ...
 # Ensure the other functions (approve_all, update_message_time, delete_message)
-# also have robust error handling and logging, especially around Celery and DB operations.
-# The provided code for those functions already includes Celery task management.
+# also have robust error handling and logging, especially around DB operations.
 
 # Make sure the rest of your file (approve_all, update_message_time, delete_message) is complete.
 # For brevity, I'm only showing the modified schedule_message and the surrounding structure.
@@ -231,52 +193,25 @@ def approve_all(customer_id: int, db: Session = Depends(get_db)):
             failed_to_schedule_ids.append({"roadmap_id": r_msg.id, "reason": "Already has a message_id."})
             continue
         
+        send_time_utc = ensure_utc(r_msg.send_datetime_utc)
         new_message = Message(
             conversation_id=conversation.id, customer_id=r_msg.customer_id, business_id=r_msg.business_id,
             content=r_msg.smsContent, message_type='scheduled', status="scheduled",
-            scheduled_time=r_msg.send_datetime_utc,
-            message_metadata={'source': 'roadmap_approve_all', 'roadmap_id': r_msg.id, 'celery_task_id': None}
+            scheduled_time=send_time_utc,
+            message_metadata={'source': 'roadmap_approve_all', 'roadmap_id': r_msg.id}
         )
         db.add(new_message)
         db.flush()
 
-        try:
-            eta_val = r_msg.send_datetime_utc
-            if not isinstance(eta_val, datetime): eta_val = datetime.fromisoformat(str(eta_val))
-            if eta_val.tzinfo is None: eta_val = pytz.utc.localize(eta_val)
-            else: eta_val = eta_val.astimezone(pytz.utc)
-
-            task_res = process_scheduled_message_task.apply_async(args=[new_message.id], eta=eta_val)
-            
-            if not isinstance(new_message.message_metadata, dict): new_message.message_metadata = {}
-            new_message.message_metadata['celery_task_id'] = task_res.id
-            
-            r_msg.status = "scheduled"
-            r_msg.message_id = new_message.id
-            scheduled_details.append({"roadmap_id": r_msg.id, "new_message_id": new_message.id, "celery_task_id": task_res.id})
-        except Exception as e:
-            logger.error(f"❌ Failed to schedule SMS task for Message.id {new_message.id} (from Roadmap {r_msg.id}) during approve-all: {str(e)}", exc_info=True)
-            failed_to_schedule_ids.append({"roadmap_id": r_msg.id, "reason": f"Celery scheduling error: {str(e)}"})
-            # Important: If one Celery task fails, we should ideally rollback the creation of its specific Message record
-            # and not update its RoadmapMessage. This requires more granular transaction control or collecting successful items.
-            # For now, this will attempt to commit all DB changes made so far in the loop.
-            # A better approach would be to add successful (r_msg, new_message) pairs to a list and commit them outside the loop,
-            # or use nested transactions if the DB supports it well with SQLAlchemy.
-            # For this iteration, we'll proceed and rely on the final commit.
-            db.rollback() # Rollback this specific message's changes
-            db.begin() # Start a new transaction for the next item if needed, or handle commit outside loop
-            continue # Skip to next message
+        r_msg.status = "scheduled"
+        r_msg.message_id = new_message.id
+        scheduled_details.append({"roadmap_id": r_msg.id, "new_message_id": new_message.id})
 
     try:
         db.commit()
     except Exception as e:
+        db.rollback()
         logger.error(f"❌ Final DB commit failed during approve-all for customer {customer_id}: {str(e)}", exc_info=True)
-        # This is tricky. Some tasks might be queued.
-        # A more robust system might try to revoke tasks for which DB commit failed.
-        # For now, we just log and report based on what was attempted.
-        # The actual number of successfully committed schedules might be less than len(scheduled_details) if this commit fails.
-        # This part needs careful thought for production systems.
-        # Let's assume for now that if this commit fails, nothing was truly scheduled.
         return {
             "scheduled": 0, 
             "skipped": len(roadmap_messages_to_schedule), 
@@ -319,7 +254,6 @@ def update_message_time(
 
     message_to_reschedule: Optional[Message] = None
     roadmap_message_to_update: Optional[RoadmapMessage] = None
-    old_celery_task_id: Optional[str] = None
 
     if source == "roadmap":
         roadmap_message_to_update = db.query(RoadmapMessage).filter(RoadmapMessage.id == id).first()
@@ -332,24 +266,23 @@ def update_message_time(
             roadmap_message_to_update.smsContent = new_content
 
         if roadmap_message_to_update.status == "scheduled" and roadmap_message_to_update.message_id:
-            message_to_reschedule = db.query(Message).filter(Message.id == roadmap_message_to_update.message_id).first()
+            # Row lock: the dispatcher skips locked rows, so it cannot claim this one mid-edit.
+            message_to_reschedule = db.query(Message).filter(Message.id == roadmap_message_to_update.message_id).with_for_update().first()
             if not message_to_reschedule:
                  logger.warning(f"RoadmapMessage {id} (status 'scheduled') has message_id {roadmap_message_to_update.message_id} but linked Message not found.")
             elif message_to_reschedule.status != "scheduled":
-                logger.warning(f"Linked Message {message_to_reschedule.id} for RoadmapMessage {id} is not 'scheduled' (status: {message_to_reschedule.status}). Not rescheduling Celery task.")
+                logger.warning(f"Linked Message {message_to_reschedule.id} for RoadmapMessage {id} is not 'scheduled' (status: {message_to_reschedule.status}). Not rescheduling it.")
                 message_to_reschedule = None 
             else:
-                logger.info(f"RoadmapMessage {id} is linked to scheduled Message {message_to_reschedule.id}. This Message will also be updated and its Celery task rescheduled.")
-                if message_to_reschedule.message_metadata and 'celery_task_id' in message_to_reschedule.message_metadata:
-                    old_celery_task_id = message_to_reschedule.message_metadata.get('celery_task_id')
+                logger.info(f"RoadmapMessage {id} is linked to scheduled Message {message_to_reschedule.id}. This Message will also be rescheduled.")
                 message_to_reschedule.scheduled_time = new_time_utc
                 if new_content is not None:
                     message_to_reschedule.content = new_content
-        # If roadmap_message_to_update.status is 'draft' or 'pending_review', no Celery task to manage yet.
+        # If roadmap_message_to_update.status is 'draft' or 'pending_review', there is no Message to reschedule yet.
         # Changes to its send_datetime_utc and smsContent will be used if it's scheduled later.
 
     elif source == "scheduled":
-        message_to_reschedule = db.query(Message).filter(Message.id == id, Message.message_type == 'scheduled').first()
+        message_to_reschedule = db.query(Message).filter(Message.id == id, Message.message_type == 'scheduled').with_for_update().first()
         if not message_to_reschedule:
             raise HTTPException(status_code=404, detail=f"Scheduled message (Message table) with ID {id} not found.")
 
@@ -357,9 +290,6 @@ def update_message_time(
             raise HTTPException(status_code=400, detail=f"Message {id} is not in 'scheduled' status (current: {message_to_reschedule.status}). Cannot update via this source type.")
 
         logger.info(f"Updating scheduled Message {id}. New time: {new_time_utc.isoformat()}. Content update: {'Yes' if new_content is not None else 'No'}")
-        if message_to_reschedule.message_metadata and 'celery_task_id' in message_to_reschedule.message_metadata:
-            old_celery_task_id = message_to_reschedule.message_metadata.get('celery_task_id')
-        
         message_to_reschedule.scheduled_time = new_time_utc
         if new_content is not None:
             message_to_reschedule.content = new_content
@@ -379,29 +309,6 @@ def update_message_time(
     else:
         raise HTTPException(status_code=400, detail="Invalid source. Must be 'roadmap' or 'scheduled'.")
 
-    new_celery_task_id_str: Optional[str] = None
-    if message_to_reschedule and message_to_reschedule.status == "scheduled": 
-        if old_celery_task_id:
-            logger.info(f"Revoking old Celery task {old_celery_task_id} for message {message_to_reschedule.id}")
-            try: celery_app.control.revoke(old_celery_task_id, terminate=True)
-            except Exception as revoke_exc: logger.error(f"Failed to revoke Celery task {old_celery_task_id}: {revoke_exc}. Proceeding with new task.", exc_info=True)
-        
-        try:
-            logger.info(f"Scheduling new Celery task for message {message_to_reschedule.id} with new ETA {new_time_utc.isoformat()}")
-            task_result = process_scheduled_message_task.apply_async(args=[message_to_reschedule.id], eta=new_time_utc)
-            new_celery_task_id_str = task_result.id
-            if not isinstance(message_to_reschedule.message_metadata, dict): message_to_reschedule.message_metadata = {}
-            message_to_reschedule.message_metadata['celery_task_id'] = new_celery_task_id_str
-            logger.info(f"New Celery task {new_celery_task_id_str} scheduled for message {message_to_reschedule.id}")
-        except Exception as e:
-            logger.error(f"Failed to create new Celery task for message {message_to_reschedule.id}: {str(e)}", exc_info=True)
-            # Critical decision: if rescheduling fails, do we rollback DB changes or proceed?
-            # Proceeding means DB shows new time/content, but old task might run or no task runs.
-            # Rolling back means edit effectively failed.
-            # For now, we'll log and let DB commit proceed, but this could lead to inconsistencies.
-            # A more robust solution might involve a state like 'update_failed_scheduling'.
-            pass # Allow DB commit but log the Celery error
-
     try:
         db.commit()
     except Exception as e:
@@ -411,15 +318,19 @@ def update_message_time(
         
     return {
         "status": "success", "updated_id": id, "source": source,
-        "new_time_utc": new_time_utc.isoformat(), "content_updated": new_content is not None,
-        "new_celery_task_id": new_celery_task_id_str, "old_celery_task_revoked": old_celery_task_id is not None
+        "new_time_utc": new_time_utc.isoformat(), "content_updated": new_content is not None
     }
 
 
+def _ensure_not_in_flight(message: Optional[Message]) -> None:
+    # A claimed message is already with a send worker; deleting it now cannot stop the SMS.
+    if message and message.status == MessageStatusEnum.PROCESSING_SEND.value:
+        raise HTTPException(status_code=409, detail=f"Message {message.id} is being sent right now and can no longer be cancelled.")
+
+
 @router.delete("/{id}")
 def delete_message(id: int, source: str = Query(..., description="Source of the message: 'roadmap' or 'scheduled'"), db: Session = Depends(get_db)):
     item_deleted_id = id
-    celery_task_to_revoke: Optional[str] = None
     deleted_from_description: str = ""
 
     if source == "roadmap":
@@ -432,25 +343,23 @@ def delete_message(id: int, source: str = Query(..., description="Source of the
         logger.info(f"Deleting RoadmapMessage {id} (status: {roadmap_message.status}).")
 
         if roadmap_message.message_id:
-            linked_message = db.query(Message).filter(Message.id == roadmap_message.message_id).first()
+            linked_message = db.query(Message).filter(Message.id == roadmap_message.message_id).with_for_update().first()
+            _ensure_not_in_flight(linked_message)
             if linked_message:
                 logger.info(f"RoadmapMessage {id} is linked to Message {linked_message.id}. Deleting linked Message.")
-                if linked_message.message_metadata and 'celery_task_id' in linked_message.message_metadata:
-                    celery_task_to_revoke = linked_message.message_metadata.get('celery_task_id')
                 db.delete(linked_message)
                 deleted_from_description += " and its linked Message entry"
         db.delete(roadmap_message)
 
     elif source == "scheduled":
         # This section had the bug.
-        scheduled_message = db.query(Message).filter(Message.id == id, Message.message_type == 'scheduled').first()
+        scheduled_message = db.query(Message).filter(Message.id == id, Message.message_type == 'scheduled').with_for_update().first()
         if not scheduled_message:
             raise HTTPException(status_code=404, detail=f"Scheduled message (Message table) with ID {id} not found.")
+        _ensure_not_in_flight(scheduled_message)
 
         deleted_from_description = "scheduled Message"
         logger.info(f"Deleting scheduled Message {id}.")
-        if scheduled_message.message_metadata and 'celery_task_id' in scheduled_message.message_metadata:
-            celery_task_to_revoke = scheduled_message.message_metadata.get('celery_task_id')
 
         if scheduled_message.message_metadata and 'roadmap_id' in scheduled_message.message_metadata:
             orig_roadmap_id = scheduled_message.message_metadata.get('roadmap_id')
@@ -473,14 +382,6 @@ def delete_message(id: int, source: str = Query(..., description="Source of the
     else:
         raise HTTPException(status_code=400, detail="Invalid source. Must be 'roadmap' or 'scheduled'.")
 
-    if celery_task_to_revoke:
-        logger.info(f"Revoking Celery task {celery_task_to_revoke} for deleted item (ID: {item_deleted_id}, source: {source})")
-        try:
-            celery_app.control.revoke(celery_task_to_revoke, terminate=True)
-            logger.info(f"Celery task {celery_task_to_revoke} revocation attempt successful.")
-        except Exception as revoke_exc:
-            logger.error(f"Failed to revoke Celery task {celery_task_to_revoke}: {revoke_exc}. DB changes will proceed.", exc_info=True)
-
     try:
         db.commit()
     except Exception as e:
@@ -488,7 +389,7 @@ def delete_message(id: int, source: str = Query(..., description="Source of the
         logger.error(f"Database commit failed during delete for ID {item_deleted_id}, source {source}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to delete item from database: {e}")
 
-    return {"success": True, "deleted_from": deleted_from_description, "id": item_deleted_id, "task_revoked": celery_task_to_revoke is not None}
+    return {"success": True, "deleted_from": deleted_from_description, "id": item_deleted_id}
 
 # Pydantic model for the request body
 class ScheduleBulkPayload(BaseModel):
@@ -556,74 +457,32 @@ def schedule_bulk(
                 db.add(conversation)
                 db.flush()
 
+            send_time_utc = ensure_utc(roadmap_msg.send_datetime_utc)
+            if send_time_utc < datetime.now(pytz.utc):
+                logger.warning(f"[SCHEDULE-BULK] Send time for Roadmap ID {roadmap_id} is in the past: {send_time_utc.isoformat()}. It will go out on the next dispatcher sweep.")
+
             new_message = Message(
                 conversation_id=conversation.id, customer_id=roadmap_msg.customer_id, business_id=roadmap_msg.business_id,
                 content=roadmap_msg.smsContent, message_type='scheduled', status="scheduled",
-                scheduled_time=roadmap_msg.send_datetime_utc,
+                scheduled_time=send_time_utc,
                 message_metadata={'source': 'roadmap', 'roadmap_id': roadmap_id}
             )
             db.add(new_message)
             db.flush() # Get new_message.id
 
-            task_id_str = None
-            try:
-                eta_value = roadmap_msg.send_datetime_utc
-                if not isinstance(eta_value, datetime):
-                    # Attempt to parse if it's a string, though it should be datetime from model
-                    try:
-                        eta_value = datetime.fromisoformat(str(eta_value))
-                    except ValueError:
-                        raise ValueError(f"Invalid send_datetime_utc format: {eta_value}")
-
-                if eta_value.tzinfo is None:
-                    eta_value = pytz.utc.localize(eta_value)
-                else:
-                    eta_value = eta_value.astimezone(pytz.utc)
-
-                if eta_value < datetime.now(pytz.utc):
-                    logger.warning(f"[SCHEDULE-BULK] ETA for Message ID {new_message.id} (Roadmap ID {roadmap_id}) is in the past: {eta_value.isoformat()}. Celery may execute immediately.")
-
-                logger.info(f"[SCHEDULE-BULK] Attempting to queue Celery task for Message ID {new_message.id} (Roadmap ID {roadmap_id}), ETA: {eta_value.isoformat()}")
-                task_result = process_scheduled_message_task.apply_async(
-                    args=[new_message.id],
-                    eta=eta_value
-                )
-                task_id_str = task_result.id
-
-                if not isinstance(new_message.message_metadata, dict):
-                    new_message.message_metadata = {} # Initialize if None or not a dict
-                new_message.message_metadata['celery_task_id'] = task_id_str
-                logger.info(f"[SCHEDULE-BULK] Celery task {task_id_str} queued for Message ID {new_message.id} (Roadmap ID {roadmap_id})")
-
-                # Only if Celery task is successfully queued, proceed to mark as superseded
-                roadmap_msg.status = "superseded"
-                roadmap_msg.message_id = new_message.id
-
-                scheduled_count += 1
-                results["scheduled"].append({
-                    "roadmap_id": roadmap_id,
-                    "new_message_id": new_message.id,
-                    "celery_task_id": task_id_str
-                })
-
-            except Exception as e_celery:
-                logger.error(f"[SCHEDULE-BULK] Celery task creation failed for Roadmap ID {roadmap_id}, Message ID {new_message.id}. Error: {str(e_celery)}")
-                skipped_count += 1
-                results["skipped"].append({
-                    "roadmap_id": roadmap_id,
-                    "new_message_id": new_message.id, # Message was created but Celery task failed
-                    "reason": f"Celery task scheduling error: {str(e_celery)}"
-                })
-                # The new_message is in session and will be committed, but without celery_task_id in metadata.
-                # RoadmapMessage status for this item will NOT be 'superseded'.
+            roadmap_msg.status = "superseded"
+            roadmap_msg.message_id = new_message.id
+
+            scheduled_count += 1
+            results["scheduled"].append({
+                "roadmap_id": roadmap_id,
+                "new_message_id": new_message.id
+            })
 
         except Exception as e_outer: # Catch exceptions from validation or Message creation
-            logger.warning(f"[SCHEDULE-BULK] ⚠️ Skipped Roadmap ID {roadmap_id} due to pre-Celery error. Reason: {str(e_outer)}")
+            logger.warning(f"[SCHEDULE-BULK] ⚠️ Skipped Roadmap ID {roadmap_id}. Reason: {str(e_outer)}")
             skipped_count += 1
             results["skipped"].append({"roadmap_id": roadmap_id, "reason": str(e_outer)})
-            # No new_message_id to add here if Message creation itself failed or was skipped.
-            # If new_message was added but this outer exception occurred after flush() but before Celery block,
-            # it would be committed without Celery task and without roadmap_msg update.
 
     try:
         db.commit()
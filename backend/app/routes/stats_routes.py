@@ -0,0 +1,97 @@
+# backend/app/routes/stats_routes.py
+# Per-day business metrics for dashboard charts, served from the business_daily_stats rollup
+# (see daily_stats_service), so a request costs the same regardless of history size. Responses are
+# cached per day until the business's stats change (see response_cache_service).
+
+import logging
+from datetime import date, timedelta
+from enum import Enum
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.daily_stats_service import get_daily_stats, utc_today
+from app.services.response_cache_service import STATS, cached_response
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_DAYS = 366
+
+
+class SeriesMetric(str, Enum):
+    SENDS = "sends"
+    INSTANT_NUDGES = "instant_nudges"
+    REPLIES = "replies"
+    DRAFTS = "drafts"
+    AUTO_REPLIES = "auto_replies"
+    OPT_INS = "opt_ins"
+    OPT_OUTS = "opt_outs"
+
+
+# Series name -> business_daily_stats column
+SERIES_COLUMNS = {
+    SeriesMetric.SENDS: "messages_sent",
+    SeriesMetric.INSTANT_NUDGES: "instant_nudges_sent",
+    SeriesMetric.REPLIES: "replies_received",
+    SeriesMetric.DRAFTS: "drafts_created",
+    SeriesMetric.AUTO_REPLIES: "auto_replies",
+    SeriesMetric.OPT_INS: "opt_ins",
+    SeriesMetric.OPT_OUTS: "opt_outs",
+}
+
+
+class DailyStats(BaseModel):
+    day: date
+    sends: int
+    instant_nudges: int
+    replies: int
+    drafts: int
+    auto_replies: int
+    opt_ins: int
+    opt_outs: int
+
+
+class SeriesPoint(BaseModel):
+    day: date
+    value: int
+
+
+def _window(days: int):
+    end_day = utc_today()
+    return end_day - timedelta(days=days - 1), end_day
+
+
+@router.get("/business/{business_id}/daily", response_model=List[DailyStats])
+def get_business_daily_stats(
+    business_id: int,
+    request: Request,
+    days: int = Query(30, ge=1, le=MAX_DAYS, description="Number of UTC days ending today."),
+    db: Session = Depends(get_db)
+):
+    """Every daily metric for the last `days` days, oldest first; quiet days are zeros."""
+    start_day, end_day = _window(days)
+    return cached_response(request, business_id, STATS, lambda: [
+        DailyStats(day=entry["day"], **{metric.value: entry[column] for metric, column in SERIES_COLUMNS.items()})
+        for entry in get_daily_stats(db, business_id, start_day, end_day)
+    ], vary=end_day.isoformat())
+
+
+@router.get("/business/{business_id}/timeseries/{metric}", response_model=List[SeriesPoint])
+def get_business_timeseries(
+    business_id: int,
+    metric: SeriesMetric,
+    request: Request,
+    days: int = Query(30, ge=1, le=MAX_DAYS, description="Number of UTC days ending today."),
+    db: Session = Depends(get_db)
+):
+    """One metric per day for the last `days` days, oldest first."""
+    start_day, end_day = _window(days)
+    column = SERIES_COLUMNS[metric]
+    return cached_response(request, business_id, STATS, lambda: [
+        SeriesPoint(day=entry["day"], value=entry[column]) for entry in get_daily_stats(db, business_id, start_day, end_day)
+    ], vary=end_day.isoformat())
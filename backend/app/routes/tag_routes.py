@@ -1,13 +1,14 @@
 import logging
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError # Import for handling unique constraint errors
 
 from app.database import get_db
 from app.models import Tag, CustomerTag, BusinessProfile # Import necessary models
 from app.schemas import TagCreate, TagRead # Import necessary schemas
+from app.services.response_cache_service import TAGS, cached_response
 # from app.auth import get_current_user # Keep commented unless auth is strictly needed *now*
 
 logger = logging.getLogger(__name__)
@@ -72,18 +73,21 @@ def create_tag_for_business(
 @router.get("/business/{business_id}/tags", response_model=List[TagRead])
 def list_tags_for_business(
     business_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Retrieve all tags associated with a specific business, ordered by name.
+    Cached until one of the business's tags changes.
     """
     # Check if business exists (optional, but good practice)
     business = db.query(BusinessProfile).filter(BusinessProfile.id == business_id).first()
     if not business:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Business with id {business_id} not found")
 
-    tags = db.query(Tag).filter(Tag.business_id == business_id).order_by(Tag.name).all()
-    return tags
+    return cached_response(request, business_id, TAGS, lambda: [
+        TagRead.model_validate(tag) for tag in db.query(Tag).filter(Tag.business_id == business_id).order_by(Tag.name).all()
+    ])
 
 @router.delete("/tags/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_tag(
@@ -7,14 +7,99 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.models import Customer, ConsentLog, BusinessProfile, Message, Conversation # MODIFIED: Added Message, Conversation
 from app.models import MessageTypeEnum, MessageStatusEnum, OptInStatus # ADDED
+from app.config import settings
+from app.redis_client import redis_client
 from app.services.twilio_service import TwilioService
 from typing import Optional, List, Dict, Any
 import logging
+import re
 from datetime import datetime, timezone
 import uuid # ADDED
 
 logger = logging.getLogger(__name__)
 
+# --- Consent keyword classifier ---
+# Every inbound SMS passes through process_sms_response, but only a bare keyword reply can change
+# consent. Classifying the body in memory first means ordinary conversation never touches ConsentLog.
+CONSENT_OPT_IN = "opt_in"
+CONSENT_DECLINE = "decline"
+CONSENT_OPT_OUT = "opt_out"
+CONSENT_HELP = "help"
+
+_CONSENT_KEYWORDS: Dict[str, str] = {
+    **dict.fromkeys(["yes", "y", "yep", "yeah", "ok", "okay", "sounds good", "sure", "affirmative", "i agree", "agree",
+                     "confirm", "confirmed", "alright", "absolutely", "definitely", "subscribe", "opt in", "opt-in",
+                     "start", "unstop"], CONSENT_OPT_IN),
+    **dict.fromkeys(["no", "nope", "nah", "decline", "i decline", "do not"], CONSENT_DECLINE),
+    # Carrier-standard opt-out keywords (CTIA) plus common variants.
+    **dict.fromkeys(["stop", "stopall", "stop all", "unsubscribe", "cancel", "end", "quit", "revoke", "optout",
+                     "opt out", "opt-out"], CONSENT_OPT_OUT),
+    **dict.fromkeys(["help", "info"], CONSENT_HELP),
+}
+_CONSENT_KEYWORD_MAX_LENGTH = max(len(keyword) for keyword in _CONSENT_KEYWORDS)
+_WHITESPACE_RE = re.compile(r"\s+")
+_KEYWORD_PUNCTUATION = "!.,?\"' \t\r\n"
+
+NO_PENDING_CONSENT_KEY_PREFIX = "consent:no_pending:"
+
+
+def classify_consent_keyword(text: Optional[str]) -> Optional[str]:
+    """Returns the CONSENT_* class of a keyword reply such as "Yes!" or "STOP", or None for any other message."""
+    if not text or len(text) > _CONSENT_KEYWORD_MAX_LENGTH * 2:
+        return None
+    normalized = _WHITESPACE_RE.sub(" ", text.strip(_KEYWORD_PUNCTUATION).lower())
+    return _CONSENT_KEYWORDS.get(normalized)
+
+
+def _known_to_have_no_pending_consent(phone_number: str) -> bool:
+    if redis_client is None:
+        return False
+    try:
+        return redis_client.get(f"{NO_PENDING_CONSENT_KEY_PREFIX}{phone_number}") is not None
+    except Exception as e:
+        logger.warning(f"[ConsentService] Pending-consent cache read failed for {phone_number}: {e}")
+        return False
+
+
+def _remember_no_pending_consent(phone_number: str) -> None:
+    if redis_client is None:
+        return
+    try:
+        redis_client.set(f"{NO_PENDING_CONSENT_KEY_PREFIX}{phone_number}", "1", ex=settings.CONSENT_PENDING_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"[ConsentService] Pending-consent cache write failed for {phone_number}: {e}")
+
+
+def invalidate_pending_consent(phone_number: Optional[str]) -> None:
+    """Call after committing a 'pending' ConsentLog for `phone_number` so its next keyword reply is looked up."""
+    if not phone_number or redis_client is None:
+        return
+    try:
+        redis_client.delete(f"{NO_PENDING_CONSENT_KEY_PREFIX}{phone_number}")
+    except Exception as e:
+        logger.warning(f"[ConsentService] Could not invalidate pending-consent cache for {phone_number}: {e}")
+
+# Statuses of a consent request that is still awaiting an answer.
+PENDING_CONSENT_STATUSES = (OptInStatus.PENDING.value, "pending_confirmation")
+
+
+def apply_consent_state(customer: Customer, consent_status: str, at: Optional[datetime] = None) -> None:
+    """
+    Updates the customer's consent projection for a ConsentLog event; call in the same transaction
+    that writes the log. consent_status follows the latest log. opted_in and sms_opt_in_status only
+    change on an answer: a new pending request leaves an existing opt-in (or opt-out) in place.
+    """
+    customer.consent_status = consent_status
+    customer.consent_updated_at = at or datetime.now(timezone.utc)
+    if consent_status in PENDING_CONSENT_STATUSES:
+        return
+    customer.opted_in = consent_status == OptInStatus.OPTED_IN.value
+    if consent_status in (OptInStatus.OPTED_IN.value, OptInStatus.OPTED_OUT.value):
+        customer.sms_opt_in_status = consent_status
+    elif consent_status == "declined":
+        customer.sms_opt_in_status = OptInStatus.NOT_SET.value
+
+
 class ConsentService:
     def __init__(self, db: Session):
         self.db = db
@@ -100,6 +185,7 @@ class ConsentService:
                 sent_timestamp = datetime.now(timezone.utc)
                 opt_in_message.status = MessageStatusEnum.SENT.value
                 opt_in_message.sent_at = sent_timestamp
+                opt_in_message.twilio_sid = sid
                 opt_in_message.message_metadata['twilio_message_sid'] = sid
                 if conversation: # Ensure conversation object exists to update
                     conversation.last_message_at = sent_timestamp
@@ -119,8 +205,10 @@ class ConsentService:
                 sent_at=consent_log_sent_at
             )
             self.db.add(consent_log)
+            apply_consent_state(customer, consent_log.status, consent_log_sent_at)
 
             self.db.commit()
+            invalidate_pending_consent(customer.phone)
 
             # Refresh objects to get DB-generated IDs and updated fields
             if opt_in_message and opt_in_message.id:
@@ -160,7 +248,12 @@ class ConsentService:
     async def process_sms_response(self, phone_number: str, response: str) -> Optional[PlainTextResponse]:
         """
         Process an SMS response for opt-in/out.
+        Messages that are not a consent keyword return None without touching the database.
         """
+        keyword_class = classify_consent_keyword(response)
+        if keyword_class is None or _known_to_have_no_pending_consent(phone_number):
+            return None
+
         try:
             consent_log = self.db.query(ConsentLog).filter(
                 ConsentLog.phone_number == phone_number,
@@ -168,6 +261,7 @@ class ConsentService:
             ).order_by(desc(ConsentLog.sent_at)).first()
 
             if not consent_log:
+                _remember_no_pending_consent(phone_number)
                 logger.info(f"[ConsentService] No pending consent log for {phone_number} to process response: '{response}'. Allowing other handlers.")
                 return None
 
@@ -177,50 +271,39 @@ class ConsentService:
                 # Potentially create a consent log indicating an orphaned response if business rules require.
                 return None # Or an appropriate error response if this should not happen.
 
-            normalized_response = response.strip("!.,? ").lower()
-
-            opt_in_keywords = ["yes", "yes!", "yep", "yeah", "ok", "okay", "sounds good", "sure", "affirmative", "i agree", "agree", "confirm", "confirmed", "alright", "absolutely", "definitely", "subscribe", "opt in", "opt-in"]
-            decline_keywords = ["no", "no!", "nope", "nah", "decline", "i decline", "do not"]
-            global_opt_out_keywords = ["stop", "stopall", "unsubscribe", "cancel", "end", "quit"]
-
-            # Ensure customer.opted_in_at is updated correctly
             now_utc = datetime.now(timezone.utc)
 
-            if normalized_response in opt_in_keywords:
-                customer.opted_in = True
-                customer.opted_in_at = now_utc # Set opt-in time
-                customer.sms_opt_in_status = OptInStatus.OPTED_IN.value # Update main customer status
+            if keyword_class == CONSENT_OPT_IN:
                 consent_log.status = "opted_in"
                 consent_log.replied_at = now_utc
+                apply_consent_state(customer, consent_log.status, now_utc)
                 self.db.commit()
+                invalidate_pending_consent(phone_number)
                 logger.info(f"[ConsentService] Customer {customer.id} OPTED IN via SMS: '{response}'. Log ID: {consent_log.id}")
                 return PlainTextResponse("Thanks for confirming! You're opted in. Reply STOP to unsubscribe.", status_code=status.HTTP_200_OK)
 
-            elif normalized_response in decline_keywords:
-                customer.opted_in = False
-                # customer.opted_in_at = None # Optionally clear if you only store opt-in time
-                customer.sms_opt_in_status = OptInStatus.NOT_SET.value # Or a "declined" status if you have one
+            elif keyword_class == CONSENT_DECLINE:
                 consent_log.status = "declined"
                 consent_log.replied_at = now_utc
+                apply_consent_state(customer, consent_log.status, now_utc)
                 self.db.commit()
+                invalidate_pending_consent(phone_number)
                 logger.info(f"[ConsentService] Customer {customer.id} DECLINED consent via SMS: '{response}'. Log ID: {consent_log.id}")
                 return PlainTextResponse("Okay, you won't receive these messages. Thanks.", status_code=status.HTTP_200_OK)
 
-            elif normalized_response in global_opt_out_keywords:
-                customer.opted_in = False
-                # customer.opted_in_at = None # Optionally clear
-                customer.sms_opt_in_status = OptInStatus.OPTED_OUT.value # Update main customer status
+            elif keyword_class == CONSENT_OPT_OUT:
                 consent_log.status = "opted_out"
                 consent_log.replied_at = now_utc
+                apply_consent_state(customer, consent_log.status, now_utc)
                 # consent_log.method = "sms_global_stop" # Optional refinement if method changes
                 self.db.commit()
+                invalidate_pending_consent(phone_number)
                 logger.info(f"[ConsentService] Customer {customer.id} OPTED OUT via global keyword: '{response}'. Log ID: {consent_log.id}")
                 return PlainTextResponse("You have successfully been unsubscribed. You will not receive any more messages from this number. Reply START to resubscribe.", status_code=status.HTTP_200_OK)
 
-            logger.info(f"[ConsentService] SMS response '{response}' from {phone_number} did not match consent keywords for log {consent_log.id}.")
-            # If response doesn't match any consent keyword, it might be a regular message.
-            # Returning None allows other webhook handlers (e.g., general message processing) to take over.
-            return None
+            # CONSENT_HELP: the request stays pending.
+            logger.info(f"[ConsentService] Customer {customer.id} asked for HELP while consent is pending. Log ID: {consent_log.id}")
+            return PlainTextResponse("Reply YES to receive updates and offers by text, or STOP to unsubscribe. Msg&Data rates may apply.", status_code=status.HTTP_200_OK)
 
         except Exception as e:
             logger.error(f"[ConsentService] Error processing SMS response from {phone_number}: {e}", exc_info=True)
@@ -272,9 +355,7 @@ class ConsentService:
             raise ValueError(f"Customer {customer_id} not found for business {business_id}")
 
         now_utc = datetime.now(timezone.utc)
-        customer.opted_in = True
-        customer.opted_in_at = now_utc
-        customer.sms_opt_in_status = OptInStatus.OPTED_IN.value # Ensure this is also set
+        apply_consent_state(customer, OptInStatus.OPTED_IN.value, now_utc)
 
         # Consider if an existing "pending" log should be updated or a new one created.
         # For manual override, creating a new log is usually clearest.
@@ -306,9 +387,7 @@ class ConsentService:
             raise ValueError(f"Customer {customer_id} not found for business {business_id}")
 
         now_utc = datetime.now(timezone.utc)
-        customer.opted_in = False
-        # customer.opted_in_at = None # Optionally clear opt-in timestamp
-        customer.sms_opt_in_status = OptInStatus.OPTED_OUT.value # Ensure this is also set
+        apply_consent_state(customer, OptInStatus.OPTED_OUT.value, now_utc)
 
         consent_log = ConsentLog(
             phone_number=phone_number, # Should be customer.phone
@@ -403,6 +482,7 @@ class ConsentService:
                 sent_timestamp = datetime.now(timezone.utc)
                 resent_opt_in_message.status = MessageStatusEnum.SENT.value
                 resent_opt_in_message.sent_at = sent_timestamp
+                resent_opt_in_message.twilio_sid = sid
                 resent_opt_in_message.message_metadata['twilio_message_sid'] = sid
                 if conversation: # Ensure conversation object exists to update
                     conversation.last_message_at = sent_timestamp
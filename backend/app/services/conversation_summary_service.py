@@ -0,0 +1,301 @@
+# backend/app/services/conversation_summary_service.py
+
+# Maintains conversation_summary, the inbox read model (one row per customer).
+# An after_flush hook (registered in app/models.py) collects the customers whose messages,
+# engagements, nudges, consent state or read marker changed in the flush and recomputes their rows
+# on the same connection, so a summary commits or rolls back together with the write it reflects.
+# Each recompute is a handful of per-customer indexed queries; the inbox itself then reads one
+# range of conversation_summary per page instead of aggregating the whole message history.
+#
+# unread_count is never recounted on the write path: the same hook adds the flush's new inbound
+# messages to it and zeroes it when last_read_at moves (mark-as-read), and applies the same change
+# to business_inbox_counters.unread_total, so both the per-conversation and the badge count are
+# single-row reads.
+#
+# Bulk Core UPDATEs bypass the hook. The ones in this codebase only change Message delivery
+# status, which the summary does not show; anything that changes summarized columns in bulk must
+# call refresh_conversation_summaries() itself. rebuild_conversation_summaries() repairs a business,
+# recounting unread messages from scratch.
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, case, delete, func, inspect, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import (
+    BusinessInboxCounter,
+    CoPilotNudge,
+    ConversationSummary,
+    Customer,
+    Engagement,
+    Message,
+    MessageStatusEnum,
+    MessageTypeEnum,
+    NudgeStatusEnum,
+    OptInStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 500
+
+# Columns whose change can alter a customer's summary, per model.
+_SUMMARIZED_ATTRIBUTES = {
+    Message: ("customer_id", "content", "is_hidden", "created_at", "message_type"),
+    Engagement: ("customer_id", "status", "ai_response"),
+    CoPilotNudge: ("customer_id", "status", "nudge_type", "ai_suggestion", "created_at"),
+    Customer: ("business_id", "last_read_at", "opted_in", "consent_status"),
+}
+
+
+def _insert(conn: Connection):
+    return sqlite_insert if conn.dialect.name == "sqlite" else pg_insert
+
+
+def _changed(instance: Any, attributes: Iterable[str]) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def affected_customer_ids(session: Session) -> Set[int]:
+    """Customers whose summary may be stale after the pending flush (call before it resets state)."""
+    customer_ids: Set[int] = set()
+    for instance in list(session.new) + list(session.deleted):
+        if type(instance) in _SUMMARIZED_ATTRIBUTES:
+            customer_ids.add(instance.id if isinstance(instance, Customer) else instance.customer_id)
+    for instance in session.dirty:
+        attributes = _SUMMARIZED_ATTRIBUTES.get(type(instance))
+        if attributes and _changed(instance, attributes):
+            customer_ids.add(instance.id if isinstance(instance, Customer) else instance.customer_id)
+            if not isinstance(instance, Customer):
+                # A row moved to another customer also changes the old customer's summary.
+                customer_ids.update(v for v in inspect(instance).attrs["customer_id"].history.deleted if v is not None)
+    customer_ids.discard(None)
+    return customer_ids
+
+
+@dataclass
+class UnreadChange:
+    """What one flush did to a customer's unread messages."""
+    read: bool = False  # last_read_at moved
+    received: List[datetime] = field(default_factory=list)  # created_at of new inbound messages
+    deleted: List[datetime] = field(default_factory=list)  # created_at of deleted inbound messages
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def _is_inbound(message: Message) -> bool:
+    return getattr(message.message_type, "value", message.message_type) == MessageTypeEnum.INBOUND.value
+
+
+def _is_unread(created_at: Optional[datetime], last_read_at: Optional[datetime]) -> bool:
+    return last_read_at is None or created_at is None or created_at > last_read_at
+
+
+def unread_changes(session: Session) -> Dict[int, UnreadChange]:
+    """Per-customer unread changes of the pending flush (call before it resets state)."""
+    changes: Dict[int, UnreadChange] = {}
+    for instance in session.new:
+        if isinstance(instance, Message) and instance.customer_id is not None and _is_inbound(instance):
+            changes.setdefault(instance.customer_id, UnreadChange()).received.append(_utc(instance.created_at) or datetime.now(timezone.utc))
+    for instance in session.deleted:
+        if isinstance(instance, Message) and instance.customer_id is not None and _is_inbound(instance):
+            changes.setdefault(instance.customer_id, UnreadChange()).deleted.append(_utc(instance.created_at))
+    for instance in session.dirty:
+        if isinstance(instance, Customer) and inspect(instance).attrs.last_read_at.history.has_changes():
+            changes.setdefault(instance.id, UnreadChange()).read = True
+    return changes
+
+
+def _bump_business_unread(conn: Connection, deltas: Dict[int, int]) -> None:
+    deltas = {business_id: delta for business_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    for business_id, delta in deltas.items():
+        total = BusinessInboxCounter.unread_total + delta
+        conn.execute(
+            _insert(conn)(BusinessInboxCounter)
+            .values(business_id=business_id, unread_total=max(delta, 0), updated_at=now)
+            .on_conflict_do_update(
+                index_elements=["business_id"],
+                set_={"unread_total": case((total < 0, 0), else_=total), "updated_at": now},
+            )
+        )
+
+
+def _apply_unread_changes(conn: Connection, customers: List[Any], changes: Dict[int, UnreadChange]) -> None:
+    """Adjusts unread_count of the flush's customers and their businesses' totals by the flush's changes."""
+    by_id = {row.id: row for row in customers}
+    read_ids = [customer_id for customer_id, change in changes.items() if change.read and customer_id in by_id]
+    previous = dict(conn.execute(
+        select(ConversationSummary.customer_id, ConversationSummary.unread_count).where(ConversationSummary.customer_id.in_(read_ids))
+    ).all()) if read_ids else {}
+
+    business_deltas: Dict[int, int] = {}
+    increments = []
+    for customer_id, change in changes.items():
+        customer = by_id.get(customer_id)
+        if customer is None:
+            continue
+        last_read_at = _utc(customer.last_read_at)
+        received = sum(1 for at in change.received if _is_unread(at, last_read_at))
+        if change.read:
+            # Marked read: only messages newer than the new read marker stay unread.
+            conn.execute(update(ConversationSummary).where(ConversationSummary.customer_id == customer_id).values(unread_count=received))
+            delta = received - previous.get(customer_id, 0)
+        else:
+            delta = received - sum(1 for at in change.deleted if _is_unread(at, last_read_at))
+            if delta:
+                increments.append({"b_customer_id": customer_id, "b_delta": delta})
+        business_deltas[customer.business_id] = business_deltas.get(customer.business_id, 0) + delta
+
+    if increments:
+        summaries = ConversationSummary.__table__
+        new_count = summaries.c.unread_count + bindparam("b_delta")
+        conn.execute(
+            update(summaries).where(summaries.c.customer_id == bindparam("b_customer_id"))
+            .values(unread_count=case((new_count < 0, 0), else_=new_count)),
+            increments,
+        )
+    _bump_business_unread(conn, business_deltas)
+
+
+def recount_unread(conn: Connection, customer_ids: Iterable[int]) -> None:
+    """Recounts unread_count of `customer_ids` from their messages (repair path; the write path is incremental)."""
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return
+    unread = dict(conn.execute(
+        select(Message.customer_id, func.count(Message.id))
+        .join(Customer, Customer.id == Message.customer_id)
+        .where(
+            Message.customer_id.in_(customer_ids),
+            Message.message_type == MessageTypeEnum.INBOUND.value,
+            or_(Customer.last_read_at.is_(None), Message.created_at > Customer.last_read_at),
+        )
+        .group_by(Message.customer_id)
+    ).all())
+    summaries = ConversationSummary.__table__
+    conn.execute(
+        update(summaries).where(summaries.c.customer_id == bindparam("b_customer_id")).values(unread_count=bindparam("b_unread")),
+        [{"b_customer_id": customer_id, "b_unread": unread.get(customer_id, 0)} for customer_id in customer_ids],
+    )
+
+
+def refresh_conversation_summaries(
+    conn: Connection, customer_ids: Iterable[int], unread: Optional[Dict[int, UnreadChange]] = None, now: Optional[datetime] = None
+) -> None:
+    """
+    Recomputes and upserts the summary rows of `customer_ids`; rows of deleted customers are removed.
+    `unread` carries the flush's unread changes (see unread_changes()); rows created here start at zero.
+    """
+    customer_ids = sorted(set(customer_ids))
+    if not customer_ids:
+        return
+    now = now or datetime.now(timezone.utc)
+
+    customers = conn.execute(
+        select(Customer.id, Customer.business_id, Customer.opted_in, Customer.consent_status, Customer.last_read_at)
+        .where(Customer.id.in_(customer_ids), Customer.business_id.is_not(None))
+    ).all()
+    gone = set(customer_ids) - {row.id for row in customers}
+    if gone:
+        removed: Dict[int, int] = {}
+        for row in conn.execute(
+            delete(ConversationSummary).where(ConversationSummary.customer_id.in_(gone))
+            .returning(ConversationSummary.business_id, ConversationSummary.unread_count)
+        ):
+            removed[row.business_id] = removed.get(row.business_id, 0) - row.unread_count
+        _bump_business_unread(conn, removed)
+    if not customers:
+        return
+    ids = [row.id for row in customers]
+
+    ranked_messages = select(
+        Message.customer_id, Message.id, Message.content, Message.created_at,
+        func.row_number().over(partition_by=Message.customer_id, order_by=(Message.created_at.desc(), Message.id.desc())).label("rn"),
+    ).where(Message.customer_id.in_(ids), or_(Message.is_hidden.is_(None), Message.is_hidden.is_(False))).subquery()
+    last_messages = {row.customer_id: row for row in conn.execute(select(ranked_messages).where(ranked_messages.c.rn == 1))}
+
+    drafts = dict(conn.execute(
+        select(Engagement.customer_id, func.max(Engagement.id))
+        .where(
+            Engagement.customer_id.in_(ids),
+            Engagement.status == MessageStatusEnum.PENDING_REVIEW.value,
+            Engagement.ai_response.is_not(None),
+        )
+        .group_by(Engagement.customer_id)
+    ).all())
+
+    nudges: Dict[int, List[Dict[str, str]]] = {}
+    for row in conn.execute(
+        select(CoPilotNudge.customer_id, CoPilotNudge.nudge_type, CoPilotNudge.ai_suggestion)
+        .where(CoPilotNudge.customer_id.in_(ids), CoPilotNudge.status == NudgeStatusEnum.ACTIVE.value)
+        .order_by(CoPilotNudge.customer_id, CoPilotNudge.created_at.desc(), CoPilotNudge.id.desc())
+    ):
+        nudges.setdefault(row.customer_id, []).append({"type": row.nudge_type, "text": row.ai_suggestion or ""})
+
+    rows = []
+    for customer in customers:
+        last = last_messages.get(customer.id)
+        consent_status = customer.consent_status
+        if consent_status == OptInStatus.NOT_SET.value and customer.opted_in:
+            # No consent history but opted in through the legacy flag. Without the flag the status stays
+            # not_set: no consent request was ever sent, so the customer is not "pending".
+            consent_status = OptInStatus.OPTED_IN.value
+        rows.append({
+            "customer_id": customer.id,
+            "business_id": customer.business_id,
+            "last_message_id": last.id if last else None,
+            "last_message_preview": (last.content or "")[:PREVIEW_LENGTH] if last else None,
+            "last_message_at": last.created_at if last else None,
+            "unread_count": 0,
+            "latest_draft_id": drafts.get(customer.id),
+            "active_nudge_count": len(nudges.get(customer.id, [])),
+            "active_nudges": nudges.get(customer.id, []),
+            "consent_status": consent_status,
+            "opted_in": consent_status == OptInStatus.OPTED_IN.value,
+            "updated_at": now,
+        })
+    insert = _insert(conn)(ConversationSummary).values(rows)
+    conn.execute(insert.on_conflict_do_update(
+        index_elements=["customer_id"],
+        set_={column: insert.excluded[column] for column in rows[0] if column not in ("customer_id", "unread_count")},
+    ))
+    if unread:
+        _apply_unread_changes(conn, customers, unread)
+
+
+def refresh_after_flush(session: Session) -> None:
+    """after_flush hook: keeps the summaries of customers touched by this flush current."""
+    customer_ids = affected_customer_ids(session)
+    if customer_ids:
+        refresh_conversation_summaries(session.connection(), customer_ids, unread_changes(session))
+
+
+def rebuild_conversation_summaries(db: Session, business_id: int, batch_size: int = 500) -> int:
+    """Recomputes every summary row and the unread total of a business (repair/backfill). Commits; returns the customer count."""
+    customer_ids = db.execute(select(Customer.id).where(Customer.business_id == business_id).order_by(Customer.id)).scalars().all()
+    conn = db.connection()
+    for start in range(0, len(customer_ids), batch_size):
+        batch = customer_ids[start:start + batch_size]
+        refresh_conversation_summaries(conn, batch)
+        recount_unread(conn, batch)
+    total = conn.execute(
+        select(func.coalesce(func.sum(ConversationSummary.unread_count), 0)).where(ConversationSummary.business_id == business_id)
+    ).scalar_one()
+    conn.execute(
+        _insert(conn)(BusinessInboxCounter)
+        .values(business_id=business_id, unread_total=total, updated_at=datetime.now(timezone.utc))
+        .on_conflict_do_update(index_elements=["business_id"], set_={"unread_total": total, "updated_at": datetime.now(timezone.utc)})
+    )
+    db.commit()
+    return len(customer_ids)
@@ -9,6 +9,7 @@ import sqlalchemy as sa
 import json
 
 import openai 
+from celery.exceptions import SoftTimeLimitExceeded
 from app.config import settings 
 
 from app.models import (
@@ -205,6 +206,10 @@ class CoPilotNudgeGenerationService:
             self.db.refresh(nudge)
             logger.info(f"{log_prefix} Successfully created STRATEGIC_ENGAGEMENT_OPPORTUNITY Nudge ID: {nudge.id}")
             return nudge
+        except SoftTimeLimitExceeded:
+            # Raised into the OpenAI call when a nudge generation task runs out of time; let the task stop.
+            self.db.rollback()
+            raise
         except Exception as e:
             logger.error(f"{log_prefix} Error during OpenAI call or processing: {e}", exc_info=True)
             self.db.rollback()
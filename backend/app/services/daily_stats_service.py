@@ -0,0 +1,218 @@
+# backend/app/services/daily_stats_service.py
+
+# Daily business metrics, pre-aggregated into business_daily_stats: one row per (business, UTC day)
+# that had activity. The rollup_daily_stats beat task (see celery_app.py) recomputes every day after
+# the newest rolled-up one, plus STATS_ROLLUP_LOOKBACK_DAYS before it for delivery receipts and edits
+# that land late, with one grouped query per source table. The first run therefore backfills history
+# and later runs only touch a couple of days.
+#
+# Readers take completed days from the rollup and compute the days after the newest rolled-up one
+# (normally just today) from raw rows, so dashboards cost the same regardless of history size and are
+# never stale when the job is behind.
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import BusinessDailyStats, ConsentLog, Engagement, Message, MessageStatusEnum, OptInStatus
+
+logger = logging.getLogger(__name__)
+
+METRICS = (
+    "messages_sent",
+    "instant_nudges_sent",
+    "replies_received",
+    "drafts_created",
+    "auto_replies",
+    "opt_ins",
+    "opt_outs",
+)
+
+DailyCounts = Dict[Tuple[int, date], Dict[str, int]]
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _utc_day(db: Session, column):
+    """The UTC calendar day of a timestamp column, independent of the session time zone."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+def _as_date(value: Any) -> date:
+    # SQLite returns date() as an ISO string.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def compute_daily_counts(db: Session, start_day: Optional[date], end_day: date, business_id: Optional[int] = None) -> DailyCounts:
+    """
+    Counts every metric per (business, day) from raw rows for days in [start_day, end_day]
+    (start_day None = from the beginning). Days without activity are absent.
+    """
+    counts: DailyCounts = {}
+
+    def add(rows, metrics):
+        for row in rows:
+            if row[0] is None:
+                continue
+            entry = counts.setdefault((row[0], _as_date(row[1])), dict.fromkeys(METRICS, 0))
+            for metric, value in zip(metrics, row[2:]):
+                entry[metric] += value
+
+    def in_range(column, business_column):
+        conditions = [column < _start_of(end_day + timedelta(days=1))]
+        if start_day is not None:
+            conditions.append(column >= _start_of(start_day))
+        if business_id is not None:
+            conditions.append(business_column == business_id)
+        return conditions
+
+    sent_day = _utc_day(db, Message.sent_at)
+    add(db.execute(
+        select(
+            Message.business_id, sent_day,
+            func.count(Message.id),
+            func.count(Message.id).filter(Message.source == "instant_nudge"),
+        )
+        .where(*in_range(Message.sent_at, Message.business_id))
+        .group_by(Message.business_id, sent_day)
+    ), ("messages_sent", "instant_nudges_sent"))
+
+    engagement_day = _utc_day(db, Engagement.created_at)
+    add(db.execute(
+        select(
+            Engagement.business_id, engagement_day,
+            func.count(Engagement.id).filter(Engagement.response.is_not(None)),
+            func.count(Engagement.id).filter(Engagement.ai_response.is_not(None)),
+            func.count(Engagement.id).filter(Engagement.status == MessageStatusEnum.AUTO_REPLIED_FAQ.value),
+        )
+        .where(*in_range(Engagement.created_at, Engagement.business_id))
+        .group_by(Engagement.business_id, engagement_day)
+    ), ("replies_received", "drafts_created", "auto_replies"))
+
+    # A consent change happens when the customer replies; manual changes only have created_at.
+    consent_at = func.coalesce(ConsentLog.replied_at, ConsentLog.created_at)
+    consent_day = _utc_day(db, consent_at)
+    add(db.execute(
+        select(
+            ConsentLog.business_id, consent_day,
+            func.count(ConsentLog.id).filter(ConsentLog.status == OptInStatus.OPTED_IN.value),
+            func.count(ConsentLog.id).filter(ConsentLog.status == OptInStatus.OPTED_OUT.value),
+        )
+        .where(ConsentLog.status.in_((OptInStatus.OPTED_IN.value, OptInStatus.OPTED_OUT.value)), *in_range(consent_at, ConsentLog.business_id))
+        .group_by(ConsentLog.business_id, consent_day)
+    ), ("opt_ins", "opt_outs"))
+
+    return counts
+
+
+def rolled_up_through(db: Session) -> Optional[date]:
+    """The newest day in business_daily_stats; later days are read from raw rows."""
+    return db.execute(select(func.max(BusinessDailyStats.day))).scalar_one_or_none()
+
+
+def _earliest_activity(db: Session) -> Optional[date]:
+    earliest = [
+        db.execute(select(func.min(column))).scalar_one_or_none()
+        for column in (Message.sent_at, Engagement.created_at, ConsentLog.created_at)
+    ]
+    earliest = [value for value in earliest if value is not None]
+    return min(earliest).date() if earliest else None
+
+
+def rollup_daily_stats(db: Session, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Recomputes business_daily_stats for every completed day after the newest rolled-up one (minus
+    the lookback window), replacing those days' rows in one transaction. Commits.
+    """
+    today = today or utc_today()
+    latest = rolled_up_through(db)
+    if latest is None:
+        start_day = _earliest_activity(db)
+        if start_day is None:
+            return {"days": 0, "rows": 0}
+    else:
+        start_day = latest + timedelta(days=1 - settings.STATS_ROLLUP_LOOKBACK_DAYS)
+    end_day = today - timedelta(days=1)
+    if start_day > end_day:
+        return {"days": 0, "rows": 0}
+
+    counts = compute_daily_counts(db, start_day, end_day)
+    now = datetime.now(timezone.utc)
+    db.execute(delete(BusinessDailyStats).where(BusinessDailyStats.day >= start_day, BusinessDailyStats.day <= end_day))
+    if counts:
+        db.execute(BusinessDailyStats.__table__.insert(), [
+            {"business_id": business_id, "day": day, "updated_at": now, **metrics}
+            for (business_id, day), metrics in counts.items()
+        ])
+    db.commit()
+    return {"days": (end_day - start_day).days + 1, "rows": len(counts), "start": start_day.isoformat(), "end": end_day.isoformat()}
+
+
+def get_daily_stats(db: Session, business_id: int, start_day: date, end_day: date) -> List[Dict[str, Any]]:
+    """One entry per day in [start_day, end_day] (zeros for quiet days), oldest first."""
+    latest = rolled_up_through(db)
+    by_day: Dict[date, Dict[str, int]] = {}
+    if latest is not None and start_day <= latest:
+        for row in db.execute(
+            select(BusinessDailyStats)
+            .where(BusinessDailyStats.business_id == business_id, BusinessDailyStats.day >= start_day, BusinessDailyStats.day <= min(end_day, latest))
+        ).scalars():
+            by_day[row.day] = {metric: getattr(row, metric) for metric in METRICS}
+    live_start = start_day if latest is None else max(start_day, latest + timedelta(days=1))
+    if live_start <= end_day:
+        for (_, day), metrics in compute_daily_counts(db, live_start, end_day, business_id).items():
+            by_day[day] = metrics
+
+    return [
+        {"day": start_day + timedelta(days=offset), **by_day.get(start_day + timedelta(days=offset), dict.fromkeys(METRICS, 0))}
+        for offset in range((end_day - start_day).days + 1)
+    ]
+
+
+def get_metric_totals(db: Session, business_id: int, *since_days: Optional[date]) -> List[Dict[str, int]]:
+    """
+    Metric totals through today, one dict per window start in `since_days` (None = all time), from
+    one rollup query plus one raw-row pass over the days after the rollup.
+    """
+    windows = since_days or (None,)
+    today = utc_today()
+    latest = rolled_up_through(db)
+    totals = [dict.fromkeys(METRICS, 0) for _ in windows]
+
+    if latest is not None:
+        sums = db.execute(
+            select(*[
+                func.coalesce(
+                    func.sum(getattr(BusinessDailyStats, metric)).filter(BusinessDailyStats.day >= since) if since
+                    else func.sum(getattr(BusinessDailyStats, metric)),
+                    0,
+                )
+                for since in windows for metric in METRICS
+            ]).where(BusinessDailyStats.business_id == business_id, BusinessDailyStats.day <= latest)
+        ).one()
+        for index, total in enumerate(totals):
+            for offset, metric in enumerate(METRICS):
+                total[metric] += sums[index * len(METRICS) + offset]
+
+    if latest is not None:
+        live_start = latest + timedelta(days=1)
+    else:
+        live_start = None if None in windows else min(windows)
+    if live_start is None or live_start <= today:
+        for (_, day), metrics in compute_daily_counts(db, live_start, today, business_id).items():
+            for since, total in zip(windows, totals):
+                if since is None or day >= since:
+                    for metric in METRICS:
+                        total[metric] += metrics[metric]
+    return totals
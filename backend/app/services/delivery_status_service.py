@@ -0,0 +1,185 @@
+# backend/app/services/delivery_status_service.py
+
+# Ingests Twilio delivery-status callbacks (queued/sent/delivered/undelivered/failed).
+# A receipt is recorded in Message.delivery_status; Message.status keeps saying the message went
+# out ('sent'), which is what the send paths, analytics and the UI read.
+# The webhook only appends each receipt to a Redis list; the periodic
+# `apply_delivery_status_updates` Celery task drains the list and applies every receipt in
+# a batch with one UPDATE keyed on messages.twilio_sid, so callback volume never becomes one
+# transaction per callback.
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, String, bindparam, case, column, select, update, values
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Message, MessageStatusEnum
+from app.redis_client import redis_client
+from app.services.live_events_service import publish_events, status_changed_event
+
+logger = logging.getLogger(__name__)
+
+STATUS_CALLBACK_QUEUE_KEY = "twilio:status_callbacks"
+
+# Twilio MessageStatus -> Message.delivery_status we record. Statuses that only say Twilio still has
+# the message (accepted/queued/sending) carry no new information once the send API returned a SID.
+CALLBACK_STATUS_MAP = {
+    "sent": MessageStatusEnum.SENT.value,
+    "delivered": MessageStatusEnum.DELIVERED.value,
+    "read": MessageStatusEnum.DELIVERED.value,
+    "undelivered": MessageStatusEnum.FAILED.value,
+    "failed": MessageStatusEnum.FAILED.value,
+}
+
+# Callbacks can arrive out of order; a receipt is applied only if it moves the delivery status forward.
+_STATUS_RANK = {
+    MessageStatusEnum.SENT.value: 1,
+    MessageStatusEnum.DELIVERED.value: 2,
+    MessageStatusEnum.FAILED.value: 2,
+}
+
+
+def _advances(delivery_status_column, new_rank):
+    # No receipt yet (NULL) ranks below every receipt.
+    return case(_STATUS_RANK, value=delivery_status_column, else_=0) < new_rank
+
+
+def parse_status_callback(form: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Builds a receipt from a StatusCallback form post, or None if it is not actionable."""
+    sid = form.get("MessageSid") or form.get("SmsSid")
+    twilio_status = (form.get("MessageStatus") or form.get("SmsStatus") or "").lower()
+    if not sid or twilio_status not in CALLBACK_STATUS_MAP:
+        return None
+    return {
+        "sid": sid,
+        "status": CALLBACK_STATUS_MAP[twilio_status],
+        "error_code": form.get("ErrorCode") or None,
+        "received_at": time.time(),
+    }
+
+
+def buffer_status_callback(db: Session, receipt: Dict[str, Any]) -> None:
+    """Queues a receipt for the next batch; applies it directly if Redis is unavailable."""
+    if redis_client is not None:
+        try:
+            redis_client.rpush(STATUS_CALLBACK_QUEUE_KEY, json.dumps(receipt))
+            return
+        except Exception as e:
+            logger.warning(f"[DeliveryStatus] Could not buffer receipt for {receipt['sid']}, applying inline: {e}")
+    apply_receipts(db, [receipt])
+
+
+def _collapse(receipts: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Keeps the most advanced receipt per SID (latest one on ties)."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for receipt in receipts:
+        current = latest.get(receipt["sid"])
+        if current is None or _STATUS_RANK[receipt["status"]] >= _STATUS_RANK[current["status"]]:
+            latest[receipt["sid"]] = receipt
+    return latest
+
+
+def build_values_update(rows: List[Dict[str, Any]]):
+    """UPDATE messages ... FROM (VALUES ...) statement applying `rows` (sid/status/rank/error_code)."""
+    receipts_table = values(
+        column("sid", String), column("status", String), column("rank", Integer), column("error_code", String),
+        name="receipts",
+    ).data([(r["sid"], r["status"], r["rank"], r["error_code"]) for r in rows])
+    return (
+        update(Message)
+        .where(Message.twilio_sid == receipts_table.c.sid, _advances(Message.delivery_status, receipts_table.c.rank))
+        .values(delivery_status=receipts_table.c.status, delivery_error_code=receipts_table.c.error_code)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_receipts(db: Session, receipts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Applies a batch of receipts in a single UPDATE and commits.
+    On PostgreSQL this is UPDATE ... FROM (VALUES ...); other dialects use one executemany UPDATE.
+    Returns the receipts whose SID matched no message yet (e.g. the send result is not committed).
+    """
+    latest = _collapse(receipts)
+    if not latest:
+        return []
+    rows = [
+        {"sid": r["sid"], "status": r["status"], "rank": _STATUS_RANK[r["status"]], "error_code": r["error_code"]}
+        for r in latest.values()
+    ]
+    known = db.execute(
+        select(Message.twilio_sid, Message.id, Message.business_id, Message.customer_id, Message.delivery_status)
+        .where(Message.twilio_sid.in_(list(latest)))
+    ).all()
+    known_sids = {row.twilio_sid for row in known}
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(build_values_update(rows))
+    else:
+        messages = Message.__table__
+        db.execute(
+            update(messages)
+            .where(messages.c.twilio_sid == bindparam("b_sid"), _advances(messages.c.delivery_status, bindparam("b_rank")))
+            .values(delivery_status=bindparam("b_status"), delivery_error_code=bindparam("b_error_code")),
+            [{"b_sid": r["sid"], "b_status": r["status"], "b_rank": r["rank"], "b_error_code": r["error_code"]} for r in rows],
+        )
+    db.commit()
+    # The bulk UPDATE bypasses the session hooks, so announce the rows it moved forward here, as kind
+    # 'delivery' so clients do not mistake a receipt for a change of the message's status.
+    publish_events([
+        status_changed_event("delivery", row.id, row.business_id, row.customer_id, latest[row.twilio_sid]["status"])
+        for row in known
+        if _STATUS_RANK.get(row.delivery_status, 0) < _STATUS_RANK[latest[row.twilio_sid]["status"]]
+    ])
+    return [receipt for sid, receipt in latest.items() if sid not in known_sids]
+
+
+def _take_batch(limit: int) -> List[str]:
+    pipe = redis_client.pipeline()
+    pipe.lrange(STATUS_CALLBACK_QUEUE_KEY, 0, limit - 1)
+    pipe.ltrim(STATUS_CALLBACK_QUEUE_KEY, limit, -1)
+    raw_items, _ = pipe.execute()
+    return raw_items
+
+
+def flush_buffered_receipts(db: Session) -> Dict[str, int]:
+    """
+    Drains buffered receipts in batches and applies each batch with apply_receipts().
+    Receipts for SIDs not yet in the DB are re-queued until DELIVERY_STATUS_UNMATCHED_RETENTION_SECONDS.
+    """
+    summary = {"processed": 0, "requeued": 0, "dropped": 0}
+    if redis_client is None:
+        return summary
+    retry_later: List[Dict[str, Any]] = []
+    for _ in range(settings.DELIVERY_STATUS_MAX_BATCHES):
+        raw_items = _take_batch(settings.DELIVERY_STATUS_BATCH_SIZE)
+        if not raw_items:
+            break
+        receipts = []
+        for raw in raw_items:
+            try:
+                receipts.append(json.loads(raw))
+            except (TypeError, ValueError):
+                summary["dropped"] += 1
+        try:
+            unmatched = apply_receipts(db, receipts)
+        except Exception:
+            db.rollback()
+            # Put the batch back at the head so the next run retries it in order.
+            redis_client.lpush(STATUS_CALLBACK_QUEUE_KEY, *reversed(raw_items))
+            raise
+        summary["processed"] += len(receipts)
+        cutoff = time.time() - settings.DELIVERY_STATUS_UNMATCHED_RETENTION_SECONDS
+        for receipt in unmatched:
+            if receipt["received_at"] >= cutoff:
+                retry_later.append(receipt)
+            else:
+                summary["dropped"] += 1
+        if len(raw_items) < settings.DELIVERY_STATUS_BATCH_SIZE:
+            break
+    if retry_later:
+        redis_client.rpush(STATUS_CALLBACK_QUEUE_KEY, *[json.dumps(r) for r in retry_later])
+        summary["requeued"] = len(retry_later)
+    return summary
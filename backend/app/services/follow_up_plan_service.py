@@ -19,8 +19,6 @@ from app.models import (
     MessageStatusEnum,
 )
 from app.schemas import ActivateEngagementPlanPayload
-from app.celery_tasks import process_scheduled_message_task
-from app.celery_app import celery_app # Import for revoking tasks
 
 logger = logging.getLogger(__name__)
 
@@ -94,9 +92,8 @@ class FollowUpPlanService:
         if existing_future_messages_count > 0:
             logger.warning(f"{log_prefix} Customer {payload.customer_id} already has {existing_future_messages_count} future message(s) scheduled. Proceeding with adding new plan messages.")
         
-        # --- 4. Create and Schedule Messages ---
+        # --- 4. Create Scheduled Messages ---
         created_message_ids = []
-        scheduled_tasks = []
 
         for message_data in payload.messages:
             scheduled_time = message_data.send_datetime_utc
@@ -123,24 +120,8 @@ class FollowUpPlanService:
             )
             self.db.add(new_message)
             self.db.flush()
-            
-            try:
-                task = process_scheduled_message_task.apply_async(
-                    args=[new_message.id],
-                    eta=scheduled_time
-                )
-                # Ensure SQLAlchemy detects the change to the JSON field
-                updated_metadata = new_message.message_metadata.copy()
-                updated_metadata['celery_task_id'] = task.id
-                new_message.message_metadata = updated_metadata
-
-                created_message_ids.append(new_message.id)
-                scheduled_tasks.append(task.id)
-                logger.info(f"{log_prefix} Queued Celery task {task.id} for Message ID {new_message.id} to be sent at {scheduled_time.isoformat()}.")
-            except Exception as celery_exc:
-                logger.error(f"{log_prefix} Failed to queue Celery task for Message ID {new_message.id}: {celery_exc}", exc_info=True)
-                self.db.rollback()
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to schedule messages in the background queue.")
+            created_message_ids.append(new_message.id)
+            logger.info(f"{log_prefix} Scheduled Message ID {new_message.id} to be sent at {scheduled_time.isoformat()}.")
 
 
         # --- 5. Update Nudge Status ---
@@ -154,15 +135,8 @@ class FollowUpPlanService:
                 "status": "success",
                 "message": f"Successfully activated follow-up nudge plan. {len(created_message_ids)} message(s) have been scheduled.",
                 "created_message_ids": created_message_ids,
-                "celery_task_ids": scheduled_tasks
             }
         except Exception as e:
             self.db.rollback()
-            logger.error(f"{log_prefix} Final DB commit failed after queueing Celery tasks. Attempting to revoke tasks. Error: {e}", exc_info=True)
-            # Attempt to revoke tasks that were queued but not committed
-            for task_id in scheduled_tasks:
-                try:
-                    celery_app.control.revoke(task_id, terminate=True)
-                except Exception as revoke_exc:
-                    logger.error(f"{log_prefix} Failed to revoke Celery task {task_id}: {revoke_exc}")
+            logger.error(f"{log_prefix} Final DB commit failed. No messages were scheduled. Error: {e}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to finalize plan activation due to a database error.")
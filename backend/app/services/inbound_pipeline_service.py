@@ -0,0 +1,433 @@
+# backend/app/services/inbound_pipeline_service.py
+
+# Processes inbound SMS after the /twilio/inbound webhook has stored them as InboundEvents and
+# acknowledged Twilio. Each event runs through the stages
+#   consent -> routing -> persistence -> AI draft -> notifications -> nudges
+# on a Celery worker (`process_inbound_events` task), so no OpenAI or Twilio call sits in the
+# webhook's request path.
+# Events from one sender to one business number are processed strictly in arrival order
+# (drain_sender). An event's `stage` records the last stage that committed, so a retried event
+# resumes after it instead of logging the message or the engagement twice. Customer-facing SMS
+# sends are committed as intent first (stage auto_reply / notify) and skipped when a retry finds
+# that intent, so a failure after the send can never text the customer or the owner twice.
+import json
+import logging
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.models import (
+    BusinessProfile,
+    ConsentLog,
+    Conversation as ConversationModel,
+    Customer,
+    Engagement,
+    InboundEvent,
+    Message,
+    MessageStatusEnum,
+    MessageTypeEnum,
+    OptInStatus,
+)
+from app.redis_client import redis_client
+from app.schemas import normalize_phone_number
+from app.services.ai_service import AIService
+from app.services.consent_service import (
+    CONSENT_HELP, PENDING_CONSENT_STATUSES, ConsentService, apply_consent_state, classify_consent_keyword, invalidate_pending_consent
+)
+from app.services.copilot_nudge_generation_service import CoPilotNudgeGenerationService
+from app.services.tenant_routing_service import get_business_for_number, get_business_id_for_number
+from app.services.twilio_service import TwilioService
+
+logger = logging.getLogger(__name__)
+
+EVENT_RECEIVED = "received"
+EVENT_PROCESSED = "processed"
+EVENT_DISCARDED = "discarded"  # Nothing to do: no business for the number, customer opted out
+EVENT_FAILED = "failed"        # Gave up after INBOUND_EVENT_MAX_ATTEMPTS
+
+STAGE_CONSENT = "consent"          # Consent reply handled; a HELP reply then continues to persistence
+STAGE_PERSISTENCE = "persistence"
+STAGE_AUTO_REPLY = "auto_reply"  # FAQ auto-reply committed as a queued Message; about to be sent
+STAGE_AI_DRAFT = "ai_draft"
+STAGE_NOTIFY = "notify"          # Owner alert about to be sent; a retry does not send it again
+STAGE_NUDGES = "nudges"
+
+INBOUND_SID_KEY_PREFIX = "twilio:inbound_sid:"
+INBOUND_QUEUE_PREFIX = "inbound."
+
+
+def inbound_sid_seen(message_sid: str) -> bool:
+    """
+    Fast-path dedupe for Twilio webhook retries: True when this SID's event is already stored.
+    Without Redis it returns False and the unique index on inbound_events.message_sid is what
+    rejects the duplicate.
+    """
+    if redis_client is None:
+        return False
+    try:
+        return bool(redis_client.exists(f"{INBOUND_SID_KEY_PREFIX}{message_sid}"))
+    except Exception as e:
+        logger.warning(f"INBOUND_SMS [SID:{message_sid}]: Dedupe check unavailable, relying on the unique index: {e}")
+        return False
+
+
+def remember_inbound_sid(message_sid: str) -> None:
+    """
+    Marks a SID as stored, for INBOUND_DEDUPE_TTL_SECONDS. Called only once its event has
+    committed, so a crash before the commit never turns Twilio's retry into a "duplicate".
+    """
+    if redis_client is None:
+        return
+    try:
+        redis_client.set(f"{INBOUND_SID_KEY_PREFIX}{message_sid}", 1, ex=settings.INBOUND_DEDUPE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"INBOUND_SMS [SID:{message_sid}]: Could not record dedupe key: {e}")
+
+
+def record_inbound_event(db: Session, form: Mapping[str, Any]) -> Optional[InboundEvent]:
+    """
+    Stores a Twilio inbound webhook form post as an InboundEvent and commits.
+    Returns None when From/To/Body are missing or unparseable.
+    """
+    try:
+        from_number = normalize_phone_number(form.get("From", ""))
+        to_number = normalize_phone_number(form.get("To", ""))
+    except ValueError:
+        return None
+    body = (form.get("Body") or "").strip()
+    if not all([from_number, to_number, body]):
+        return None
+    event = InboundEvent(
+        message_sid=form.get("MessageSid") or f"fallback-sid-{uuid.uuid4()}",
+        from_number=from_number,
+        to_number=to_number,
+        body=body,
+        payload=dict(form),
+        status=EVENT_RECEIVED,
+        attempts=0,
+    )
+    db.add(event)
+    db.commit()
+    return event
+
+
+def inbound_partition(business_key: Any, from_number: str, partitions: Optional[int] = None) -> int:
+    """
+    Partition for one customer's inbound events: a stable hash of (business, phone). crc32 rather
+    than hash(), which is salted per process and would scatter a customer across partitions.
+    """
+    partitions = partitions or settings.INBOUND_PARTITION_COUNT
+    return zlib.crc32(f"{business_key}:{from_number}".encode()) % partitions
+
+
+def inbound_partition_queue(db: Session, to_number: str, from_number: str) -> str:
+    """
+    Celery queue for the customer texting `to_number` from `from_number`. Each inbound.<n> queue is
+    consumed by a single worker process, so one customer's events run serially in arrival order
+    while different customers spread across partitions and run in parallel.
+    """
+    business_id = get_business_id_for_number(db, to_number)
+    business_key = business_id if business_id is not None else to_number
+    return f"{INBOUND_QUEUE_PREFIX}{inbound_partition(business_key, from_number)}"
+
+
+def pending_senders(db: Session, older_than_seconds: int, now: Optional[datetime] = None) -> List[Tuple[str, str]]:
+    """(to_number, from_number) pairs with events still 'received' after `older_than_seconds`."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=older_than_seconds)
+    return [
+        (to_number, from_number)
+        for to_number, from_number in db.execute(
+            select(InboundEvent.to_number, InboundEvent.from_number)
+            .where(InboundEvent.status == EVENT_RECEIVED, InboundEvent.received_at < cutoff)
+            .distinct()
+        ).all()
+    ]
+
+
+class InboundPipeline:
+    def __init__(self, db: Session):
+        self.db = db
+        self.twilio_service = TwilioService(db=db)
+        self.ai_service = AIService(db=db)
+        self.consent_service = ConsentService(db=db)
+
+    async def drain_sender(self, to_number: str, from_number: str) -> Dict[str, int]:
+        """
+        Processes every pending event from `from_number` to `to_number`, oldest first.
+        Stops at the first event that fails (and still has attempts left) so later messages are
+        never handled before it; "deferred" in the summary tells the caller to retry later.
+        """
+        summary = {EVENT_PROCESSED: 0, EVENT_DISCARDED: 0, EVENT_FAILED: 0, "deferred": 0}
+        while True:
+            event = self.db.execute(
+                select(InboundEvent)
+                .where(
+                    InboundEvent.to_number == to_number,
+                    InboundEvent.from_number == from_number,
+                    InboundEvent.status == EVENT_RECEIVED,
+                )
+                .order_by(InboundEvent.id)
+                .limit(1)
+            ).scalar_one_or_none()
+            if event is None:
+                return summary
+            event_id, message_sid = event.id, event.message_sid
+            try:
+                summary[await self.process(event)] += 1
+            except Exception as e:
+                self.db.rollback()
+                event = self.db.get(InboundEvent, event_id)
+                logger.error(f"INBOUND_SMS [SID:{message_sid}]: Pipeline failed after stage '{event.stage}': {e}", exc_info=True)
+                event.attempts += 1
+                event.error = str(e)[:1000]
+                if event.attempts < settings.INBOUND_EVENT_MAX_ATTEMPTS:
+                    self.db.commit()
+                    summary["deferred"] += 1
+                    return summary
+                event.status = EVENT_FAILED
+                self.db.commit()
+                summary[EVENT_FAILED] += 1
+
+    async def process(self, event: InboundEvent) -> str:
+        """Runs one event through the remaining pipeline stages and returns its final status."""
+        log_prefix = f"INBOUND_SMS [SID:{event.message_sid}]"
+        body_raw = event.body
+
+        if event.message_id is None:
+            # Priority 1: Handle direct STOP/YES consent replies
+            consent_reply = None
+            if event.stage != STAGE_CONSENT:
+                consent_reply = await self.consent_service.process_sms_response(phone_number=event.from_number, response=body_raw.lower())
+            if consent_reply is not None and classify_consent_keyword(body_raw) != CONSENT_HELP:
+                logger.info(f"{log_prefix}: Handled by consent service.")
+                await self._send_consent_reply(event, consent_reply.body.decode())
+                return self._finish(event, EVENT_PROCESSED, stage=STAGE_CONSENT)
+            if consent_reply is not None:
+                # HELP leaves consent pending and is logged and drafted like any other message.
+                logger.info(f"{log_prefix}: Sending HELP text, then continuing.")
+                event.stage = STAGE_CONSENT
+                self.db.commit()
+                await self._send_consent_reply(event, consent_reply.body.decode())
+
+            business = get_business_for_number(self.db, event.to_number)
+            if not business:
+                logger.error(f"{log_prefix}: No business for Twilio number {event.to_number}.")
+                return self._finish(event, EVENT_DISCARDED)
+            customer, created = self._get_or_create_customer(event, business)
+            if customer.sms_opt_in_status == OptInStatus.OPTED_OUT.value:
+                logger.warning(f"{log_prefix}: Customer {customer.id} is OPTED_OUT. Discarding message.")
+                return self._finish(event, EVENT_DISCARDED)
+
+            message = self._log_inbound_message(event, business, customer)
+            event.business_id, event.customer_id, event.message_id = business.id, customer.id, message.id
+            event.stage = STAGE_PERSISTENCE
+            self.db.commit()
+            if created:
+                invalidate_pending_consent(event.from_number)
+            logger.info(f"{log_prefix}: Customer message logged. MsgID: {message.id}.")
+        else:
+            message = self.db.get(Message, event.message_id)
+            business = self.db.get(BusinessProfile, event.business_id)
+            customer = self.db.get(Customer, event.customer_id)
+
+        if event.stage == STAGE_PERSISTENCE:
+            engagement = await self._draft_reply(event, business, customer, message)
+            event.stage = STAGE_AI_DRAFT
+            self.db.commit()
+        elif event.stage == STAGE_AUTO_REPLY:
+            engagement = self._resolve_unconfirmed_auto_reply(event, message)
+            event.stage = STAGE_AI_DRAFT
+            self.db.commit()
+        else:
+            engagement = self.db.query(Engagement).filter(Engagement.message_id == message.id).first()
+
+        if event.stage == STAGE_AI_DRAFT:
+            event.stage = STAGE_NOTIFY
+            self.db.commit()
+            await self._notify_owner(event, business, customer, engagement)
+        await self._request_opt_in(event, business, customer)
+        self._generate_nudges(event, business, customer, message, engagement)
+        return self._finish(event, EVENT_PROCESSED, stage=STAGE_NUDGES)
+
+    def _finish(self, event: InboundEvent, status: str, stage: Optional[str] = None) -> str:
+        event.status = status
+        if stage:
+            event.stage = stage
+        event.error = None
+        event.processed_at = datetime.now(timezone.utc)
+        self.db.commit()
+        return status
+
+    async def _send_consent_reply(self, event: InboundEvent, reply_text: str) -> None:
+        # These confirmations used to go back as the webhook's response body; now they are sent from here.
+        business = get_business_for_number(self.db, event.to_number)
+        if not business or not reply_text:
+            return
+        try:
+            await self.twilio_service.send_sms(to=event.from_number, message_body=reply_text, business=business, is_direct_reply=True)
+        except Exception as e:
+            logger.error(f"INBOUND_SMS [SID:{event.message_sid}]: Failed to send consent confirmation: {e}", exc_info=True)
+
+    def _get_or_create_customer(self, event: InboundEvent, business: BusinessProfile) -> Tuple[Customer, bool]:
+        customer = self.db.query(Customer).filter(Customer.phone == event.from_number, Customer.business_id == business.id).first()
+        if customer:
+            return customer, False
+        now_utc = datetime.now(timezone.utc)
+        customer = Customer(
+            phone=event.from_number, business_id=business.id,
+            customer_name=f"Inbound Lead ({event.from_number})",
+            sms_opt_in_status=OptInStatus.NOT_SET.value,
+            created_at=now_utc, lifecycle_stage="Lead",
+            pain_points="Unknown", interaction_history=f"First contact via SMS: {event.body[:100]}"
+        )
+        self.db.add(customer)
+        self.db.flush()
+        # Initial pending consent log for new inbound leads
+        self.db.add(ConsentLog(
+            customer_id=customer.id, phone_number=event.from_number, business_id=business.id,
+            method="customer_initiated_sms", status=OptInStatus.PENDING.value, sent_at=now_utc,
+        ))
+        apply_consent_state(customer, OptInStatus.PENDING.value, now_utc)
+        logger.info(f"INBOUND_SMS [SID:{event.message_sid}]: Created new Customer ID {customer.id} and initial 'pending' ConsentLog.")
+        return customer, True
+
+    def _log_inbound_message(self, event: InboundEvent, business: BusinessProfile, customer: Customer) -> Message:
+        received_at = event.received_at or datetime.now(timezone.utc)
+        conversation = self.db.query(ConversationModel).filter(ConversationModel.customer_id == customer.id, ConversationModel.status == 'active').first()
+        if not conversation:
+            conversation = ConversationModel(id=uuid.uuid4(), customer_id=customer.id, business_id=business.id, status='active', started_at=received_at)
+            self.db.add(conversation)
+        conversation.last_message_at = received_at
+        self.db.flush()
+        message = Message(
+            conversation_id=conversation.id, business_id=business.id, customer_id=customer.id,
+            content=event.body, message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value,
+            sent_at=received_at, message_metadata={'twilio_sid': event.message_sid, 'source': 'customer_reply'}
+        )
+        self.db.add(message)
+        self.db.flush()
+        return message
+
+    async def _draft_reply(self, event: InboundEvent, business: BusinessProfile, customer: Customer, message: Message) -> Engagement:
+        """AI draft (and FAQ auto-reply when autopilot is on), recorded as the message's Engagement."""
+        log_prefix = f"INBOUND_SMS [SID:{event.message_sid}]"
+        ai_response_data = None
+        try:
+            ai_response_data = await self.ai_service.generate_sms_response(message=event.body, customer_id=customer.id, business_id=business.id)
+        except Exception as e:
+            logger.error(f"{log_prefix}: AI response generation failed: {e}", exc_info=True)
+        ai_response_text = ai_response_data.get("text") if ai_response_data else None
+
+        engagement = Engagement(
+            customer_id=customer.id, business_id=business.id, message_id=message.id,
+            response=event.body, ai_response=json.dumps(ai_response_data) if ai_response_data else None,
+            status=MessageStatusEnum.PENDING_REVIEW.value, created_at=event.received_at,
+        )
+        self.db.add(engagement)
+        if not (business.enable_ai_faq_auto_reply and ai_response_data and ai_response_data.get("ai_should_reply_directly_as_faq") and ai_response_text):
+            return engagement
+
+        logger.info(f"{log_prefix}: AI identified FAQ. Attempting auto-reply.")
+        # Intent first: a retry that finds this queued reply knows the SMS may already be out and does not send it again.
+        reply = Message(
+            conversation_id=message.conversation_id, business_id=business.id, customer_id=customer.id, parent_id=message.id,
+            content=ai_response_text, message_type=MessageTypeEnum.OUTBOUND.value, status=MessageStatusEnum.QUEUED.value,
+            message_metadata={'source': 'ai_faq_auto_reply'}
+        )
+        self.db.add(reply)
+        engagement.status = MessageStatusEnum.PROCESSING_SEND.value
+        event.stage = STAGE_AUTO_REPLY
+        self.db.commit()
+        try:
+            reply_sid = await self.twilio_service.send_sms(to=customer.phone, message_body=ai_response_text, business=business, customer=customer, is_direct_reply=True)
+        except Exception as e:
+            logger.error(f"{log_prefix}: AI auto-reply failed to send; leaving the draft for review: {e}", exc_info=True)
+            self.db.delete(reply)
+            engagement.status = MessageStatusEnum.PENDING_REVIEW.value
+            return engagement
+        sent_at = datetime.now(timezone.utc)
+        reply.status, reply.sent_at, reply.twilio_sid = MessageStatusEnum.SENT.value, sent_at, reply_sid
+        reply.message_metadata = {**reply.message_metadata, 'twilio_sid': reply_sid}
+        engagement.status, engagement.sent_at = MessageStatusEnum.AUTO_REPLIED_FAQ.value, sent_at
+        logger.info(f"{log_prefix}: AI Auto-reply sent successfully. SID: {reply_sid}")
+        return engagement
+
+    def _resolve_unconfirmed_auto_reply(self, event: InboundEvent, message: Message) -> Optional[Engagement]:
+        """
+        A previous attempt committed the FAQ auto-reply intent but not its outcome. The SMS may have
+        gone out, so it is not sent again: the reply is marked failed (outcome unknown) and the
+        draft is left for the owner to review.
+        """
+        reply = self.db.query(Message).filter(
+            Message.parent_id == message.id, Message.status == MessageStatusEnum.QUEUED.value,
+            Message.source == 'ai_faq_auto_reply'
+        ).first()
+        if reply is not None:
+            logger.warning(f"INBOUND_SMS [SID:{event.message_sid}]: Auto-reply {reply.id} may already have been sent; not re-sending.")
+            reply.status = MessageStatusEnum.FAILED.value
+            reply.message_metadata = {**(reply.message_metadata or {}), 'failure_reason': 'Send outcome unknown; not retried to avoid a duplicate SMS'}
+        engagement = self.db.query(Engagement).filter(Engagement.message_id == message.id).first()
+        if engagement is not None and engagement.status == MessageStatusEnum.PROCESSING_SEND.value:
+            engagement.status = MessageStatusEnum.PENDING_REVIEW.value
+        return engagement
+
+    async def _notify_owner(self, event: InboundEvent, business: BusinessProfile, customer: Customer, engagement: Optional[Engagement]) -> None:
+        """Owner notification for replies awaiting review. Sent at most once: the notify stage is committed first."""
+        log_prefix = f"INBOUND_SMS [SID:{event.message_sid}]"
+        if not engagement or engagement.status != MessageStatusEnum.PENDING_REVIEW.value:
+            return
+        if business.notify_owner_on_reply_with_link and business.business_phone_number and business.slug:
+            notification_link = f"{settings.FRONTEND_APP_URL}/inbox/{business.slug}?activeCustomer={customer.id}"
+            notification_msg = f"AI Nudge: New reply from {customer.customer_name or customer.phone}. View: {notification_link}"
+            try:
+                await self.twilio_service.send_sms(to=business.business_phone_number, message_body=notification_msg, business=business, is_owner_notification=True)
+            except Exception as e:
+                logger.error(f"{log_prefix}: Owner notification failed: {e}", exc_info=True)
+
+    async def _request_opt_in(self, event: InboundEvent, business: BusinessProfile, customer: Customer) -> None:
+        """The double opt-in request for new leads; send_double_optin_sms itself skips customers asked recently."""
+        log_prefix = f"INBOUND_SMS [SID:{event.message_sid}]"
+        if customer.opted_in or customer.sms_opt_in_status not in (OptInStatus.NOT_SET.value, OptInStatus.PENDING.value):
+            return
+        if customer.consent_status != OptInStatus.NOT_SET.value and customer.consent_status not in PENDING_CONSENT_STATUSES:
+            return
+        logger.info(f"{log_prefix}: Customer {customer.id} requires opt-in. Triggering double opt-in SMS.")
+        try:
+            # send_double_optin_sms skips customers who were asked recently and commits its own ConsentLog updates.
+            await self.consent_service.send_double_optin_sms(customer_id=customer.id, business_id=business.id)
+        except Exception as e:
+            logger.error(f"{log_prefix}: Error sending double opt-in SMS for customer {customer.id}: {e}", exc_info=True)
+
+    def _generate_nudges(self, event: InboundEvent, business: BusinessProfile, customer: Customer, message: Message, engagement: Optional[Engagement]) -> None:
+        log_prefix = f"INBOUND_SMS [SID:{event.message_sid}]"
+        timed_event_nudge_created = False
+        try:
+            created = CoPilotNudgeGenerationService(self.db).detect_potential_timed_commitments(business_id=business.id, specific_message_id=message.id)
+            timed_event_nudge_created = bool(created)
+        except Exception as e:
+            logger.error(f"{log_prefix}: Error in detect_potential_timed_commitments: {e}", exc_info=True)
+
+        if engagement and engagement.status == MessageStatusEnum.PENDING_REVIEW.value and not timed_event_nudge_created:
+            last_business_message = (
+                self.db.query(Message)
+                .filter(Message.conversation_id == message.conversation_id, Message.message_type == MessageTypeEnum.OUTBOUND.value)
+                .order_by(Message.sent_at.desc())
+                .first()
+            )
+            trigger_data = {
+                "customer_reply": event.body,
+                "last_business_message": last_business_message.content if last_business_message else "No previous message.",
+                "original_message_id": message.id,
+            }
+            # By name: celery_tasks imports this module, so the task object cannot be imported here.
+            celery_app.send_task(
+                'trigger_strategic_engagement_plan_generation',
+                kwargs={"business_id": business.id, "customer_id": customer.id, "trigger_data": trigger_data},
+            )
@@ -1,163 +1,66 @@
 # backend/app/services/inbox_service.py
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, case, text, literal_column
-from app.models import Customer, Message, ConsentLog, OptInStatus, MessageTypeEnum # Import MessageTypeEnum
+from sqlalchemy import func, select
+from app.models import INBOX_LAST_ACTIVITY, NO_ACTIVITY_AT, BusinessInboxCounter, ConversationSummary, Customer
+from app.pagination import SortKey, paginate, take_page
 from app.schemas import InboxCustomerSummary
-from typing import List, Tuple, Optional, Dict, Any
-from datetime import datetime
-import math
+from typing import List, Tuple, Optional
 
-def get_paginated_inbox_summaries(
-    db: Session, business_id: int, page: int, size: int
-) -> Tuple[List[InboxCustomerSummary], int]:
-    """
-    Fetches paginated inbox summaries for a given business.
-    Each summary includes customer details, last message content and timestamp,
-    and a count of unread messages.
-    """
+# Inbox order: most recent activity first (conversations without any last, to keep every key
+# non-null). customer_id makes it total, so a cursor always points between two rows. Neither key
+# goes back when the inbox changes (activity only moves a conversation to the top, and reading it
+# moves nothing), so following a cursor never repeats or skips a row already behind it. Both keys
+# descend, so the cursor is one row-value range over idx_conversation_summary_inbox.
+INBOX_SORT_KEYS = (
+    SortKey(INBOX_LAST_ACTIVITY, descending=True),
+    SortKey(ConversationSummary.customer_id, descending=True),
+)
 
-    # Subquery to get the latest message ID and timestamp for each customer conversation
-    latest_message_subquery = (
-        db.query(
-            Message.customer_id,
-            func.max(Message.sent_at).label("latest_message_timestamp")
-        )
-        .filter(Message.business_id == business_id)
-        .filter(Message.is_hidden == False) # Exclude hidden messages from determining the latest
-        .group_by(Message.customer_id)
-        .subquery("latest_customer_message_times")
-    )
 
-    # Subquery to get the actual content of the latest message using the timestamp from above
-    actual_latest_message_subquery = (
-        db.query(
-            Message.customer_id,
-            Message.content.label("last_message_content"),
-            Message.sent_at.label("last_message_timestamp_val")
-        )
-        .join(
-            latest_message_subquery,
-            (Message.customer_id == latest_message_subquery.c.customer_id) &
-            (Message.sent_at == latest_message_subquery.c.latest_message_timestamp)
-        )
-        .filter(Message.business_id == business_id)
-        .filter(Message.is_hidden == False)
-        .distinct(Message.customer_id)
-        .subquery("actual_latest_messages")
-    )
+def inbox_sort_values(summary: ConversationSummary) -> Tuple:
+    return summary.last_message_at or NO_ACTIVITY_AT, summary.customer_id
 
-    # Subquery for the latest consent status
-    latest_consent_subquery = (
-        db.query(
-            ConsentLog.customer_id,
-            func.max(ConsentLog.created_at).label("latest_consent_created_at")
-        )
-        .filter(ConsentLog.business_id == business_id)
-        .group_by(ConsentLog.customer_id)
-        .subquery("latest_customer_consent_times")
-    )
 
-    actual_latest_consent_subquery = (
-        db.query(
-            ConsentLog.customer_id,
-            ConsentLog.status.label("consent_status_val"),
-            (ConsentLog.status == OptInStatus.OPTED_IN.value).label("opted_in_val") # Use .value for comparison
-        )
-        .join(
-            latest_consent_subquery,
-            (ConsentLog.customer_id == latest_consent_subquery.c.customer_id) &
-            (ConsentLog.created_at == latest_consent_subquery.c.latest_consent_created_at)
-        )
-        .filter(ConsentLog.business_id == business_id)
-        .distinct(ConsentLog.customer_id)
-        .subquery("actual_latest_consents")
-    )
-
-    # Subquery to calculate unread message count
-    # Count inbound messages where sent_at is after customer.last_read_at
-    unread_count_subquery = (
-        db.query(
-            Message.customer_id,
-            func.count(Message.id).label("unread_messages")
-        )
-        .join(Customer, Message.customer_id == Customer.id)
-        .filter(
-            Message.business_id == business_id,
-            Message.message_type == MessageTypeEnum.INBOUND.value, # Only count inbound as unread
-            Message.is_hidden == False,
-            # Only count if message was sent after customer's last_read_at (or if last_read_at is NULL, all are unread)
-            (Message.sent_at > Customer.last_read_at) | (Customer.last_read_at.is_(None))
-        )
-        .group_by(Message.customer_id)
-        .subquery("unread_message_counts")
-    )
+def get_unread_total(db: Session, business_id: int) -> int:
+    """The business's unread message badge: one primary-key read of business_inbox_counters."""
+    total = db.execute(
+        select(BusinessInboxCounter.unread_total).where(BusinessInboxCounter.business_id == business_id)
+    ).scalar_one_or_none()
+    return total or 0
 
 
-    # Main query to fetch customers and join with the latest message and consent data
+def get_paginated_inbox_summaries(
+    db: Session, business_id: int, size: int, cursor: Optional[str] = None
+) -> Tuple[List[InboxCustomerSummary], int, Optional[str]]:
+    """
+    Fetches one page of inbox summaries for a business from the conversation_summary read model.
+    Pass the returned cursor back to get the following page; it is None on the last page.
+    """
     query = (
-        db.query(
-            Customer.id.label("customer_id"),
-            Customer.customer_name,
-            Customer.phone,
-            actual_latest_consent_subquery.c.opted_in_val.label("opted_in"),
-            actual_latest_consent_subquery.c.consent_status_val.label("consent_status"),
-            actual_latest_message_subquery.c.last_message_content,
-            actual_latest_message_subquery.c.last_message_timestamp_val.label("last_message_timestamp"),
-            unread_count_subquery.c.unread_messages.label("unread_message_count"), # Use calculated unread count
-            Customer.business_id
-        )
-        .filter(Customer.business_id == business_id) # Start with Customer table, filter by business_id
-        .outerjoin( # Use outerjoin in case a customer has no messages
-            actual_latest_message_subquery,
-            Customer.id == actual_latest_message_subquery.c.customer_id
-        )
-        .outerjoin( # Use outerjoin in case a customer has no consent logs
-            actual_latest_consent_subquery,
-            Customer.id == actual_latest_consent_subquery.c.customer_id
-        )
-        .outerjoin( # Outer join with unread count subquery
-            unread_count_subquery,
-            Customer.id == unread_count_subquery.c.customer_id
-        )
+        select(ConversationSummary, Customer.customer_name, Customer.phone)
+        .join(Customer, Customer.id == ConversationSummary.customer_id)
+        .filter(ConversationSummary.business_id == business_id)
     )
+    rows = db.execute(paginate(query, INBOX_SORT_KEYS, cursor, size)).all()
+    page, next_cursor = take_page(rows, size, lambda row: inbox_sort_values(row[0]))
 
-    # Get total count before pagination
-    total_customers_for_business = db.query(func.count(Customer.id)).filter(Customer.business_id == business_id).scalar()
+    total = db.execute(
+        select(func.count(ConversationSummary.customer_id)).filter(ConversationSummary.business_id == business_id)
+    ).scalar_one()
 
-    if total_customers_for_business is None:
-        total_customers_for_business = 0
-
-    # Apply ordering: customers with more recent messages first, then by customer ID
-    # Coalesce last_message_timestamp to a very old date for customers with no messages to sort them last.
-    # Order by unread count (descending) first, then by last message timestamp (descending)
-    query = query.order_by(
-        desc(func.coalesce(unread_count_subquery.c.unread_messages, 0)), # Unread messages first
-        desc(func.coalesce(actual_latest_message_subquery.c.last_message_timestamp_val, datetime.min)),
-        Customer.id
-    )
-
-    # Apply pagination
-    offset = (page - 1) * size
-    paginated_results = query.offset(offset).limit(size).all()
-
-    # Convert results to the Pydantic schema
-    summaries = []
-    for row in paginated_results:
-        summary = InboxCustomerSummary(
-            customer_id=row.customer_id,
-            customer_name=row.customer_name,
-            phone=row.phone,
-            # If no consent log, default opted_in to False and consent_status to NOT_SET or PENDING
-            opted_in=row.opted_in if row.opted_in is not None else False,
-            consent_status=row.consent_status if row.consent_status else OptInStatus.NOT_SET.value, # Default if no consent log
-            last_message_content=row.last_message_content,
-            last_message_timestamp=row.last_message_timestamp,
-            unread_message_count=row.unread_message_count if row.unread_message_count is not None else 0, # Default to 0 if NULL
-            business_id=row.business_id,
-            # is_unread will now be derived from unread_message_count on the frontend if needed
-            is_unread=row.unread_message_count > 0 if row.unread_message_count is not None else False, # Explicitly set for backward comp.
+    summaries = [
+        InboxCustomerSummary(
+            customer_id=summary.customer_id,
+            customer_name=customer_name or "",
+            phone=phone,
+            opted_in=summary.opted_in,
+            consent_status=summary.consent_status,
+            last_message_content=summary.last_message_preview,
+            last_message_timestamp=summary.last_message_at,
+            unread_message_count=summary.unread_count,
+            business_id=summary.business_id,
         )
-        summaries.append(summary)
-
-    return summaries, total_customers_for_business
\ No newline at end of file
+        for summary, customer_name, phone in page
+    ]
+    return summaries, total, next_cursor
@@ -18,13 +18,11 @@ import openai
 
 # --- App Specific Imports ---
 from app.database import SessionLocal # Keep SessionLocal if used, or just Session type hint
-from app.models import BusinessProfile, Message, Engagement, Customer, Conversation # Ensure all are imported
-# Correctly import the NEW celery task that processes messages by ID
-# Make sure this task exists and handles sending based on Message ID
-from app.celery_tasks import process_scheduled_message_task # Assuming this task exists
+from app.celery_app import celery_app
+from app.config import settings
+from app.models import BusinessProfile, Message, Customer, Conversation # Ensure all are imported
+from app.services.message_dispatch_service import LANE_BULK, mark_claimed_for_immediate_send
 from app.services.style_service import get_style_guide # Assuming async
-from app.services.twilio_service import TwilioService # Import the service class
-from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
@@ -113,12 +111,16 @@ async def handle_instant_nudge_batch(
 ) -> Dict[str, Any]:
     """
     Handles sending or scheduling an Instant Nudge message to a list of customers.
+    Scheduled messages are left to the dispatch_due_messages sweeper. Immediate ones are claimed
+    and handed to the bulk send lane (see _enqueue_bulk_sends), so a campaign never competes with
+    inbox replies and OTPs for rate-limit headroom; "sent_count" counts the messages queued there.
     """
     if not customer_ids:
         logger.warning("handle_instant_nudge_batch called with empty customer_ids list.")
         return {"processed_message_ids": [], "sent_count": 0, "scheduled_count": 0, "failed_count": 0}
 
     processed_message_ids = []
+    immediate_message_ids = []
     sent_count = 0
     scheduled_count = 0
     failed_count = 0
@@ -158,11 +160,6 @@ async def handle_instant_nudge_batch(
             logger.error(f"Invalid ISO format for send_datetime_iso: '{send_datetime_iso}'. Error: {e}. Sending immediately.")
             # Fallback to immediate send if parsing fails
 
-    # --- Initialize Twilio Service (if sending immediately) ---
-    twilio_service = None
-    if not is_scheduling:
-         twilio_service = TwilioService(db) # Initialize only if needed
-
     # --- Process Each Customer ---
     for customer_id in customer_ids:
         # Wrap per-customer logic in try/except to allow batch continuation on single failure
@@ -204,82 +201,39 @@ async def handle_instant_nudge_batch(
                 db.flush() # Get conversation.id assigned
 
             # --- Create Message DB Record ---
-            message_status = "scheduled" if is_scheduling else "pending_send" # Use intermediate status for immediate send
             message = Message(
                 conversation_id=conversation.id,
                 customer_id=customer_id,
                 business_id=business_id,
                 content=personalized_message,
                 message_type='scheduled', # Consistent type for outbound planned messages
-                status=message_status,
+                status="scheduled",
                 scheduled_time=scheduled_time_utc if is_scheduling else now_utc, # Store target time or now
-                sent_at=None, # sent_at is set upon successful delivery confirmation (or attempt for immediate)
+                sent_at=None, # sent_at is set by the send worker
+                source='instant_nudge',
                 message_metadata={'source': 'instant_nudge'}
             )
+            if not is_scheduling:
+                # Claimed up front so the sweeper does not also pick it up; queued on the bulk lane after the loop.
+                mark_claimed_for_immediate_send(message, now=now_utc)
             db.add(message)
             db.flush() # Get message.id
-            message_record_id = message.id # Store for logging/Celery
+            message_record_id = message.id # Store for logging
 
-            # --- Perform Action: Schedule or Send ---
+            try:
+                db.commit()
+            except Exception as commit_err:
+                db.rollback()
+                failed_count += 1
+                logger.error(f"❌ Failed to save instant nudge Message ID {message_record_id} (Customer {customer_id}): {commit_err}", exc_info=True)
+                continue
+            processed_message_ids.append(message_record_id)
             if is_scheduling:
-                # Schedule Celery Task
-                try:
-                    # Ensure process_scheduled_message_task takes message.id as arg
-                    process_scheduled_message_task.apply_async(args=[message.id], eta=scheduled_time_utc)
-                    # Commit *after* successful queuing
-                    db.commit()
-                    processed_message_ids.append(message.id)
-                    scheduled_count += 1
-                    logger.info(f"✅ Successfully scheduled Message ID {message.id} for customer {customer_id} at {scheduled_time_utc} UTC.")
-                except Exception as celery_err:
-                    db.rollback() # Rollback message creation if Celery fails
-                    failed_count += 1
-                    logger.error(f"❌ Failed to schedule Celery task for Message ID {message_record_id} (Customer {customer_id}): {celery_err}", exc_info=True)
-
+                scheduled_count += 1
+                logger.info(f"✅ Successfully scheduled Message ID {message_record_id} for customer {customer_id} at {scheduled_time_utc} UTC.")
             else:
-                # Send Immediately using Twilio Service
-                try:
-                    # Use the TwilioService instance initialized earlier
-                    sent_sid = await twilio_service.send_sms(
-                         to=customer.phone,
-                         message_body=personalized_message, # <<< CORRECTED ARGUMENT NAME
-                         business=business, # Pass the fetched business object
-                         customer=customer, # Recommended: Also pass the customer object for consistency with consent checks
-                         is_direct_reply=False # Assuming instant nudges are proactive, not direct replies
-                         )
-
-                    # Update status and sent_at on successful send attempt
-                    message.status = "sent" # Mark as sent immediately on successful API call
-                    message.sent_at = datetime.now(timezone.utc)
-                    db.add(message) # Re-add to session after modification
-
-                    # Optionally create Engagement record for immediate sends
-                    engagement = Engagement(
-                         customer_id=customer_id,
-                         message_id=message.id,
-                         ai_response=personalized_message, # Log sent message
-                         status="sent",
-                         sent_at=message.sent_at
-                         )
-                    db.add(engagement)
-
-                    db.commit() # Commit message update and engagement together
-                    processed_message_ids.append(message.id)
-                    sent_count += 1
-                    logger.info(f"✅ Successfully sent immediate SMS for Message ID {message.id} (Customer {customer_id}). SID: {sent_sid}")
-
-                except HTTPException as http_send_err:
-                    # Handle errors raised by twilio_service.send_sms (e.g., config error)
-                    db.rollback()
-                    failed_count += 1
-                    logger.error(f"❌ HTTP error sending immediate SMS for Message ID {message_record_id} (Customer {customer_id}): {http_send_err.status_code} - {http_send_err.detail}")
-                    # Optionally update message status to 'failed' here
-                except Exception as send_err:
-                     # Catch other unexpected send errors
-                     db.rollback()
-                     failed_count += 1
-                     logger.error(f"❌ Failed to send immediate SMS for Message ID {message_record_id} (Customer {customer_id}): {send_err}", exc_info=True)
-                     # Optionally update message status to 'failed'
+                immediate_message_ids.append(message_record_id)
+                sent_count += 1
 
         except Exception as per_customer_err:
              # Catch unexpected errors within the customer loop
@@ -288,6 +242,8 @@ async def handle_instant_nudge_batch(
              # Rollback any partial changes for this customer
              db.rollback()
 
+    _enqueue_bulk_sends(immediate_message_ids)
+
     # --- Return Summary ---
     logger.info(f"Batch processing summary: Sent={sent_count}, Scheduled={scheduled_count}, Failed/Skipped={failed_count}")
     return {
@@ -297,6 +253,20 @@ async def handle_instant_nudge_batch(
         "failed_count": failed_count
     }
 
+def _enqueue_bulk_sends(message_ids: List[int]) -> None:
+    """
+    Queues claimed immediate-send messages on the bulk send lane, MESSAGE_SEND_TASK_BATCH_SIZE per
+    task, as dispatch_due_messages does for due campaign messages. A batch that cannot be queued
+    stays claimed; requeue_stale_claims returns it to the schedule for the sweeper.
+    """
+    chunk_size = max(1, settings.MESSAGE_SEND_TASK_BATCH_SIZE)
+    for i in range(0, len(message_ids), chunk_size):
+        chunk = message_ids[i:i + chunk_size]
+        try:
+            celery_app.send_task('process_scheduled_messages_batch', args=[chunk], kwargs={"lane": LANE_BULK}, queue=LANE_BULK)
+        except Exception as enqueue_error:
+            logger.error(f"❌ Failed to queue instant nudge send batch for MsgIDs {chunk}; the sweeper will retry them: {enqueue_error}", exc_info=True)
+
 # Note: Ensure Session management (SessionLocal() and db.close()) is handled correctly
 # if this function is called directly without FastAPI's Depends(get_db).
 # If called *only* from routes using Depends(get_db), passing the db session is sufficient.
\ No newline at end of file
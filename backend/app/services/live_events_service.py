@@ -0,0 +1,145 @@
+# backend/app/services/live_events_service.py
+
+# Live inbox events over Redis pub/sub, one channel per business.
+# Writers never call this module directly: an after_flush hook (registered in app/models.py) turns
+# the flush's new inbound messages, ready drafts, new nudges and status changes into events, holds them
+# on the session and publishes them after the commit, so the webhook, Celery tasks and workflow routes
+# all emit events without per-call-site code, and a rolled-back write never announces anything.
+# Bulk Core UPDATEs bypass the hook and publish themselves (see delivery_status_service,
+# message_dispatch_service.apply_send_outcomes, MessageService.update_message_statuses).
+#
+# The inbox fetches /review/inbox/summaries once, then follows GET /review/inbox/events (SSE) and
+# applies each event to the row of `customer_id`. Events are fire-and-forget: a client that was
+# disconnected refetches the list on reconnect.
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as aioredis
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import CoPilotNudge, Engagement, Message, MessageStatusEnum, MessageTypeEnum, NudgeStatusEnum
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "inbox_events:"
+PREVIEW_LENGTH = 500
+_PENDING_KEY = "live_events.pending"
+
+MESSAGE_RECEIVED = "message.received"
+DRAFT_READY = "draft.ready"
+NUDGE_CREATED = "nudge.created"
+STATUS_CHANGED = "status.changed"
+
+
+def channel_for(business_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{business_id}"
+
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def _event(event_type: str, business_id: Optional[int], **data: Any) -> Optional[Dict[str, Any]]:
+    if business_id is None:
+        return None
+    return {"type": event_type, "business_id": business_id, "data": data}
+
+
+def publish_events(events: List[Optional[Dict[str, Any]]]) -> None:
+    """Publishes events to their business channels; failures are logged, never raised to the writer."""
+    events = [event for event in events if event is not None]
+    if redis_client is None or not events:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for event in events:
+            pipe.publish(channel_for(event["business_id"]), json.dumps(event, default=str))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[LiveEvents] Could not publish {len(events)} event(s): {e}")
+
+
+def status_changed_event(kind: str, row_id: int, business_id: Optional[int], customer_id: Optional[int], status: Any) -> Optional[Dict[str, Any]]:
+    return _event(STATUS_CHANGED, business_id, kind=kind, id=row_id, customer_id=customer_id, status=_value(status))
+
+
+def _draft_ready(engagement: Engagement) -> Optional[Dict[str, Any]]:
+    if engagement.ai_response and _value(engagement.status) == MessageStatusEnum.PENDING_REVIEW.value:
+        return _event(DRAFT_READY, engagement.business_id, customer_id=engagement.customer_id,
+                      engagement_id=engagement.id, text=engagement.ai_response)
+    return None
+
+
+def events_for_flush(session: Session) -> List[Dict[str, Any]]:
+    """Events for the pending flush (call from after_flush, before the session resets its state)."""
+    events: List[Optional[Dict[str, Any]]] = []
+    for instance in session.new:
+        if isinstance(instance, Message) and _value(instance.message_type) == MessageTypeEnum.INBOUND.value:
+            events.append(_event(MESSAGE_RECEIVED, instance.business_id, customer_id=instance.customer_id,
+                                 message_id=instance.id, content=(instance.content or "")[:PREVIEW_LENGTH],
+                                 created_at=instance.created_at))
+        elif isinstance(instance, Engagement):
+            events.append(_draft_ready(instance))
+        elif isinstance(instance, CoPilotNudge) and _value(instance.status) == NudgeStatusEnum.ACTIVE.value:
+            events.append(_event(NUDGE_CREATED, instance.business_id, customer_id=instance.customer_id,
+                                 nudge_id=instance.id, nudge_type=instance.nudge_type, text=instance.ai_suggestion or ""))
+    for instance in session.dirty:
+        if not isinstance(instance, (Message, Engagement, CoPilotNudge)):
+            continue
+        attrs = inspect(instance).attrs
+        if attrs.status.history.has_changes():
+            kind = {Message: "message", Engagement: "draft", CoPilotNudge: "nudge"}[type(instance)]
+            events.append(status_changed_event(kind, instance.id, instance.business_id, instance.customer_id, instance.status))
+        if isinstance(instance, Engagement) and (attrs.ai_response.history.has_changes() or attrs.status.history.has_changes()):
+            events.append(_draft_ready(instance))
+    return [event for event in events if event is not None]
+
+
+def collect_after_flush(session: Session) -> None:
+    """after_flush hook: queues this flush's events until the transaction commits."""
+    events = events_for_flush(session)
+    if events:
+        session.info.setdefault(_PENDING_KEY, []).extend(events)
+
+
+def publish_after_commit(session: Session) -> None:
+    """after_commit hook."""
+    publish_events(session.info.pop(_PENDING_KEY, []))
+
+
+def discard_after_rollback(session: Session) -> None:
+    """after_rollback hook."""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def stream_business_events(business_id: int, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """
+    Yields Server-Sent Events for one business until the client disconnects. Each connection has
+    its own subscription; a comment line is sent when the channel has been quiet for a heartbeat
+    interval so proxies keep the connection open.
+    """
+    client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(channel_for(business_id))
+        yield f"retry: {settings.INBOX_EVENTS_RETRY_MS}\n\n"
+        while not await is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=settings.INBOX_EVENTS_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                yield format_sse(json.loads(message["data"]))
+            except (TypeError, ValueError):
+                logger.warning(f"[LiveEvents] Skipping malformed event on {channel_for(business_id)}")
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,282 @@
+# backend/app/services/message_dispatch_service.py
+
+# Claims due scheduled Messages for sending.
+# The Message table is the single source of truth for the send schedule: callers only write
+# rows with status='scheduled' and a scheduled_time, and the periodic `dispatch_due_messages`
+# Celery task claims due rows in batches and fans them out to the send workers. Nothing is
+# queued in Celery when a message is scheduled, so a route or service that schedules messages
+# only has to commit them; rescheduling is an UPDATE of scheduled_time and deleting the row
+# cancels the send. A send the caller hands to a worker right away is claimed first
+# (mark_claimed_for_immediate_send); if it is never enqueued, its claim goes stale and
+# requeue_stale_claims returns it to the schedule for the next sweep.
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import BusinessProfile, Customer, Engagement, Message, MessageSendLedger, MessageStatusEnum, RoadmapMessage
+from app.services.live_events_service import publish_events, status_changed_event
+from app.services.response_cache_service import MODEL_SCOPES, bump_generations
+
+logger = logging.getLogger(__name__)
+
+
+# Send lanes, each served by its own Celery queue and worker pool (see celery_app.py).
+LANE_INTERACTIVE = "interactive"  # Someone is waiting on it: inbox replies, OTPs, owner alerts
+LANE_REMINDERS = "reminders"      # Time-sensitive scheduled sends: roadmap, follow-ups, event reminders
+LANE_BULK = "bulk"                # Campaign fan-out: instant nudges, growth campaigns
+SEND_LANES = (LANE_INTERACTIVE, LANE_REMINDERS, LANE_BULK)
+
+_INTERACTIVE_SOURCES = {'manual_reply_inbox', 'manual_inbox_reply', 'ai_draft_sent', 'ai_faq_auto_reply', 'event_confirmation_to_owner'}
+_BULK_SOURCES = {'instant_nudge', 'copilot_growth_campaign'}
+
+
+def lane_for_source(source: Optional[str]) -> str:
+    """Classifies a scheduled message into a send lane by its source."""
+    if source in _INTERACTIVE_SOURCES:
+        return LANE_INTERACTIVE
+    if source in _BULK_SOURCES:
+        return LANE_BULK
+    return LANE_REMINDERS
+
+
+def claim_due_messages(db: Session, limit: int, now: Optional[datetime] = None, per_business_limit: Optional[int] = None) -> List[int]:
+    """
+    Atomically moves up to `limit` due messages from 'scheduled' to 'processing_send' and
+    returns their IDs, oldest first.
+
+    Due rows are taken round-robin across businesses (each business's oldest message first, then
+    its second oldest, ...), and at most `per_business_limit` per business per call, so one
+    tenant's campaign backlog cannot crowd everyone else out of a sweep.
+
+    The due rows are selected with FOR UPDATE SKIP LOCKED, so several dispatchers can run
+    concurrently without claiming the same message twice.
+    """
+    now = now or datetime.now(timezone.utc)
+    ranked = (
+        select(
+            Message.id,
+            func.row_number().over(
+                partition_by=Message.business_id,
+                order_by=(Message.scheduled_time, Message.id),
+            ).label("business_rank"),
+        )
+        .where(
+            Message.status == MessageStatusEnum.SCHEDULED.value,
+            Message.scheduled_time <= now,
+        )
+        .subquery()
+    )
+    fair_ids = select(ranked.c.id).order_by(ranked.c.business_rank, ranked.c.id).limit(limit)
+    if per_business_limit:
+        fair_ids = fair_ids.where(ranked.c.business_rank <= per_business_limit)
+    # Window functions cannot be combined with FOR UPDATE, so the lock is taken in an outer select.
+    due_ids = (
+        select(Message.id)
+        .where(Message.id.in_(fair_ids), Message.status == MessageStatusEnum.SCHEDULED.value)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.execute(
+        update(Message)
+        .where(Message.id.in_(due_ids))
+        .values(status=MessageStatusEnum.PROCESSING_SEND.value, claimed_at=now)
+        .returning(Message.id, Message.business_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    bump_generations({business_id for _, business_id in claimed}, MODEL_SCOPES[Message])
+    return sorted(message_id for message_id, _ in claimed)
+
+
+def group_by_lane(db: Session, message_ids: List[int]) -> Dict[str, List[int]]:
+    """Splits claimed message IDs by send lane (one query), preserving ID order within a lane."""
+    lanes: Dict[str, List[int]] = {}
+    if not message_ids:
+        return lanes
+    rows = db.execute(
+        select(Message.id, Message.source).where(Message.id.in_(message_ids)).order_by(Message.id)
+    ).all()
+    for message_id, source in rows:
+        lanes.setdefault(lane_for_source(source), []).append(message_id)
+    return lanes
+
+
+def requeue_stale_claims(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Returns messages to 'scheduled' when they were claimed but never finished sending
+    (e.g. the worker died or the task was lost), so the next sweep picks them up again.
+    Messages with a send-ledger row already reached Twilio (or may have) and are left to
+    send_ledger_service.resolve_abandoned_sends instead.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=settings.MESSAGE_DISPATCH_STALE_CLAIM_SECONDS)
+    business_ids = db.execute(
+        update(Message)
+        .where(
+            Message.status == MessageStatusEnum.PROCESSING_SEND.value,
+            Message.claimed_at.is_not(None),
+            Message.claimed_at < cutoff,
+            ~exists().where(MessageSendLedger.message_id == Message.id),
+        )
+        .values(status=MessageStatusEnum.SCHEDULED.value, claimed_at=None)
+        .returning(Message.business_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    if business_ids:
+        bump_generations(set(business_ids), MODEL_SCOPES[Message])
+        logger.warning(f"[MessageDispatch] Re-queued {len(business_ids)} stale claimed message(s) older than {cutoff.isoformat()}.")
+    return len(business_ids)
+
+
+def find_schedule_drift(db: Session, now: Optional[datetime] = None, sample_size: int = 20) -> Dict[str, Dict[str, Any]]:
+    """
+    Reconciliation report of scheduled sends that the sweeper is not going to handle as expected.
+    Each entry has a "count" and up to `sample_size` example "ids":
+      - overdue_scheduled: 'scheduled' rows due longer than MESSAGE_RECONCILE_OVERDUE_SECONDS ago
+        (nothing is dispatching them, e.g. beat is down)
+      - stale_claims: 'processing_send' rows claimed longer ago than the stale-claim window
+        (dispatched, but no worker finished them)
+      - orphan_roadmap: RoadmapMessages marked 'scheduled' whose Message row no longer exists
+    """
+    now = now or datetime.now(timezone.utc)
+    overdue_cutoff = now - timedelta(seconds=settings.MESSAGE_RECONCILE_OVERDUE_SECONDS)
+    stale_cutoff = now - timedelta(seconds=settings.MESSAGE_DISPATCH_STALE_CLAIM_SECONDS)
+    checks = {
+        "overdue_scheduled": select(Message.id).where(
+            Message.status == MessageStatusEnum.SCHEDULED.value,
+            Message.scheduled_time < overdue_cutoff,
+        ),
+        "stale_claims": select(Message.id).where(
+            Message.status == MessageStatusEnum.PROCESSING_SEND.value,
+            Message.claimed_at < stale_cutoff,
+        ),
+        "orphan_roadmap": select(RoadmapMessage.id).where(
+            RoadmapMessage.status == MessageStatusEnum.SCHEDULED.value,
+            ~exists().where(Message.id == RoadmapMessage.message_id),
+        ),
+    }
+    report = {}
+    for name, query in checks.items():
+        ids_query = query.subquery()
+        count = db.execute(select(func.count()).select_from(ids_query)).scalar_one()
+        sample = db.execute(select(ids_query.c.id).order_by(ids_query.c.id).limit(sample_size)).scalars().all()
+        report[name] = {"count": count, "ids": sample}
+    return report
+
+
+def mark_claimed_for_immediate_send(message: Message, now: Optional[datetime] = None) -> None:
+    """
+    Claims a message the caller is about to hand to a worker right away (e.g. an inbox reply),
+    so the sweeper does not dispatch it a second time. The caller commits, then enqueues.
+    """
+    message.status = MessageStatusEnum.PROCESSING_SEND.value
+    message.claimed_at = now or datetime.now(timezone.utc)
+
+
+def load_messages_for_send(db: Session, message_ids: List[int]) -> List[Tuple[Message, Optional[Customer], Optional[BusinessProfile]]]:
+    """
+    Loads each message with its customer and business in a single joined query.
+    Customer/business are None when the referenced row no longer exists.
+    """
+    if not message_ids:
+        return []
+    rows = db.execute(
+        select(Message, Customer, BusinessProfile)
+        .outerjoin(Customer, Customer.id == Message.customer_id)
+        .outerjoin(BusinessProfile, BusinessProfile.id == Message.business_id)
+        .where(Message.id.in_(message_ids))
+        .order_by(Message.id)
+    ).all()
+    return [(message, customer, business) for message, customer, business in rows]
+
+
+def apply_send_outcomes(db: Session, outcomes: List[Dict[str, Any]]) -> None:
+    """
+    Writes the result of a batch of send attempts and commits once.
+
+    Each outcome is a dict with:
+      - "message": the Message that was attempted
+      - "status": 'sent', 'failed', or 'scheduled' (claim released; the dispatcher retries it later)
+      - "sent_at", "twilio_sid": send timestamp and Twilio SID for 'sent'
+      - "metadata": keys to merge into message_metadata (e.g. twilio_sid, failure_reason)
+
+    Messages, the originating RoadmapMessages and inbox-reply Engagements are each updated with
+    one executemany UPDATE instead of a load-modify-flush per row; a sent instant nudge is logged
+    as a 'sent' Engagement in one INSERT. The UPDATEs bypass the flush
+    hooks, so the cache bump and status.changed events are issued here after the commit.
+    """
+    if not outcomes:
+        return
+    message_rows, roadmap_rows, sent_engagements, failed_engagements, events = [], [], [], [], []
+    nudge_engagements = []
+    for outcome in outcomes:
+        message = outcome["message"]
+        new_status = outcome["status"]
+        events.append(status_changed_event("message", message.id, message.business_id, message.customer_id, new_status))
+        metadata = message.message_metadata if isinstance(message.message_metadata, dict) else {}
+        row = {"id": message.id, "status": new_status, "message_metadata": {**metadata, **outcome.get("metadata", {})}}
+        if new_status == MessageStatusEnum.SCHEDULED.value:
+            row["claimed_at"] = None
+            message_rows.append(row)
+            continue
+        if new_status == MessageStatusEnum.SENT.value:
+            row["sent_at"] = outcome["sent_at"]
+            row["twilio_sid"] = outcome.get("twilio_sid")
+        message_rows.append(row)
+
+        if message.roadmap_id:
+            roadmap_rows.append({"id": message.roadmap_id, "status": new_status})
+        if message.source == "manual_reply_inbox":
+            if new_status == MessageStatusEnum.SENT.value:
+                sent_engagements.append({"b_message_id": message.id, "b_status": new_status, "b_sent_at": outcome["sent_at"]})
+            else:
+                failed_engagements.append({"b_message_id": message.id, "b_status": new_status})
+        elif message.source == "instant_nudge" and new_status == MessageStatusEnum.SENT.value:
+            nudge_engagements.append({
+                "customer_id": message.customer_id, "message_id": message.id, "ai_response": message.content,
+                "status": new_status, "sent_at": outcome["sent_at"],
+            })
+
+    # Rows with and without sent_at/claimed_at are grouped into separate executemany batches by the ORM.
+    db.execute(update(Message), message_rows)
+    if roadmap_rows:
+        existing = set(db.execute(
+            select(RoadmapMessage.id).where(RoadmapMessage.id.in_([r["id"] for r in roadmap_rows]))
+        ).scalars())
+        roadmap_rows = [r for r in roadmap_rows if r["id"] in existing]
+        if roadmap_rows:
+            db.execute(update(RoadmapMessage), roadmap_rows)
+    engagement_statuses = {row["b_message_id"]: row["b_status"] for row in sent_engagements + failed_engagements}
+    if engagement_statuses:
+        events.extend(
+            status_changed_event("draft", engagement_id, business_id, customer_id, engagement_statuses[message_id])
+            for engagement_id, business_id, customer_id, message_id in db.execute(
+                select(Engagement.id, Engagement.business_id, Engagement.customer_id, Engagement.message_id)
+                .where(Engagement.message_id.in_(engagement_statuses))
+            )
+        )
+    engagements = Engagement.__table__
+    if sent_engagements:
+        db.execute(
+            update(engagements)
+            .where(engagements.c.message_id == bindparam("b_message_id"))
+            .values(status=bindparam("b_status"), sent_at=bindparam("b_sent_at")),
+            sent_engagements,
+        )
+    if failed_engagements:
+        db.execute(
+            update(engagements)
+            .where(engagements.c.message_id == bindparam("b_message_id"))
+            .values(status=bindparam("b_status")),
+            failed_engagements,
+        )
+    if nudge_engagements:
+        db.execute(insert(Engagement), nudge_engagements)
+    business_ids = {outcome["message"].business_id for outcome in outcomes}
+    db.commit()
+    bump_generations(business_ids, MODEL_SCOPES[Message])
+    publish_events(events)
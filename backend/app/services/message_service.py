@@ -1,9 +1,13 @@
 from enum import Enum
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Tuple
+from typing import Any, Optional, List, Dict, Iterable, Tuple
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, desc # Added desc
-from app.models import Message, RoadmapMessage, Customer, ConsentLog, Conversation, BusinessProfile, OptInStatus # Added OptInStatus
+from sqlalchemy import and_, any_, desc, literal, update # Added desc
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Integer
+from app.models import Message, MessageStatusEnum, RoadmapMessage, Customer, ConsentLog, Conversation, BusinessProfile, OptInStatus # Added OptInStatus
+from app.services.live_events_service import publish_events, status_changed_event
+from app.services.response_cache_service import MODEL_SCOPES, bump_generations
 import logging
 import uuid
 
@@ -16,6 +20,20 @@ class MessageStatus(Enum):
     REJECTED = "rejected"
     DELETED = "deleted"
 
+_S = MessageStatusEnum
+# Target status -> statuses a message may be moved from by update_message_statuses().
+ALLOWED_STATUS_TRANSITIONS: Dict[str, set] = {
+    _S.PENDING_APPROVAL.value: {_S.DRAFT.value},
+    _S.APPROVED.value: {_S.PENDING_APPROVAL.value, _S.PENDING_REVIEW.value},
+    _S.SCHEDULED.value: {_S.PENDING_APPROVAL.value, _S.PENDING_REVIEW.value, _S.APPROVED.value, _S.DRAFT.value, _S.PENDING.value},
+    _S.REJECTED.value: {_S.PENDING_APPROVAL.value, _S.PENDING_REVIEW.value},
+    _S.REJECTED_DRAFT.value: {_S.DRAFT.value, _S.PENDING_REVIEW.value},
+    _S.DELETED.value: {_S.DRAFT.value, _S.PENDING_REVIEW.value, _S.PENDING_APPROVAL.value, _S.APPROVED.value, _S.SCHEDULED.value, _S.REJECTED.value},
+    _S.SENT.value: {_S.PENDING.value, _S.QUEUED.value, _S.SCHEDULED.value, _S.PROCESSING_SEND.value},
+    _S.FAILED.value: {_S.QUEUED.value, _S.SCHEDULED.value, _S.PROCESSING_SEND.value},
+    _S.DELIVERED.value: {_S.SENT.value},
+}
+
 class MessageService:
     def __init__(self, db: Session):
         self.db = db
@@ -73,18 +91,10 @@ class MessageService:
             .first()
         )
 
-        # More efficient query for the latest consent log
-        latest_consent_log_entry = (
-            self.db.query(ConsentLog)
-            .filter(ConsentLog.customer_id == customer_id)
-            .order_by(desc(ConsentLog.replied_at)) # Order by replied_at descending
-            .first()
-        )
-
         consent_status = "pending" # Default
-        if latest_consent_log_entry:
-            consent_status = latest_consent_log_entry.status
-        elif customer and customer.opted_in: # Fallback if no consent logs but customer exists and opted_in is true
+        if customer and customer.consent_status != OptInStatus.NOT_SET.value:
+            consent_status = customer.consent_status
+        elif customer and customer.opted_in: # Fallback if no consent history but customer exists and opted_in is true
             consent_status = OptInStatus.OPTED_IN.value # Ensure OptInStatus is imported from app.models
 
 
@@ -156,6 +166,51 @@ class MessageService:
             self.db.refresh(message)
         return message
 
+    def update_message_statuses(
+        self,
+        message_ids: Iterable[int],
+        status: str,
+        from_statuses: Optional[Iterable[str]] = None,
+        **values: Any
+    ) -> List[int]:
+        """
+        Moves every message in `message_ids` that is currently in one of `from_statuses`
+        (default: every status allowed by ALLOWED_STATUS_TRANSITIONS) to `status` with one
+        UPDATE ... RETURNING, commits, and returns the IDs that transitioned.
+        Extra column values (e.g. scheduled_time) are set on the same rows.
+        Raises ValueError for a transition that is not allowed.
+        """
+        status = MessageStatusEnum(status).value
+        allowed = ALLOWED_STATUS_TRANSITIONS.get(status, set())
+        from_statuses = allowed if from_statuses is None else {MessageStatusEnum(s).value for s in from_statuses}
+        if not from_statuses or not from_statuses <= allowed:
+            raise ValueError(f"Cannot move messages to '{status}' from {sorted(from_statuses - allowed) or 'no status'}")
+        message_ids = list(message_ids)
+        if not message_ids:
+            return []
+
+        if self.db.get_bind().dialect.name == "postgresql":
+            # One array parameter (id = ANY(:ids)) however many ids there are.
+            id_filter = Message.id == any_(literal(message_ids, ARRAY(Integer)))
+        else:
+            id_filter = Message.id.in_(message_ids)
+        if status == MessageStatusEnum.SENT.value:
+            values.setdefault("sent_at", datetime.now(timezone.utc))
+        transitioned = self.db.execute(
+            update(Message)
+            .where(id_filter, Message.status.in_(sorted(from_statuses)))
+            .values(status=status, **values)
+            .returning(Message.id, Message.business_id, Message.customer_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        self.db.commit()
+        bump_generations({business_id for _, business_id, _ in transitioned}, MODEL_SCOPES[Message])
+        publish_events([
+            status_changed_event("message", message_id, business_id, customer_id, status)
+            for message_id, business_id, customer_id in transitioned
+        ])
+        return sorted(message_id for message_id, _, _ in transitioned)
+
     # This function is now integrated into get_customer_messages
     # def _get_customer_consent_status(self, customer_id: int) -> str:
     #     """Get latest consent status for a customer"""
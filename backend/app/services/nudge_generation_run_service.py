@@ -0,0 +1,121 @@
+# backend/app/services/nudge_generation_run_service.py
+
+# Bookkeeping for one run_all_nudge_generation run, kept in Redis under a run id.
+# At most NUDGE_GENERATION_MAX_CONCURRENCY businesses run at once: the run dispatches that many,
+# the rest wait in the run's pending list, and every business that finishes (or is killed)
+# dispatches the next one. Each outcome is recorded in the run's results hash; the business that
+# completes the run, or the backstop summarize task, aggregates them into the run's summary.
+import json
+import logging
+import math
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+RUN_KEY_PREFIX = "nudge_generation_run:"
+
+# Time limits of one generate_business_nudges task. No detector starts after the business's
+# budget; the soft limit interrupts a detector still running 30s later, and the hard limit only
+# catches one stuck in C code.
+BUSINESS_SOFT_TIME_LIMIT = settings.NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS + 30
+BUSINESS_HARD_TIME_LIMIT = settings.NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS + 90
+
+
+def _keys(run_id: str) -> Tuple[str, str, str]:
+    """(meta hash, pending list, results hash) of a run."""
+    prefix = f"{RUN_KEY_PREFIX}{run_id}"
+    return f"{prefix}:meta", f"{prefix}:pending", f"{prefix}:results"
+
+
+def nudge_run_deadline_seconds(business_count: int) -> int:
+    """Longest a run can take if every wave of businesses runs into the hard time limit."""
+    waves = math.ceil(business_count / max(1, settings.NUDGE_GENERATION_MAX_CONCURRENCY))
+    return waves * BUSINESS_HARD_TIME_LIMIT + 60
+
+
+def start_nudge_run(business_ids: List[int]) -> Tuple[str, List[int]]:
+    """
+    Registers a run over `business_ids` and returns (run_id, businesses to dispatch now). Without
+    Redis every business is returned, and only the nudges pool's concurrency bounds the run.
+    """
+    run_id = uuid.uuid4().hex
+    concurrency = max(1, settings.NUDGE_GENERATION_MAX_CONCURRENCY)
+    if redis_client is None:
+        logger.warning(f"[NudgeGenerationRun {run_id}] Redis unavailable; dispatching all {len(business_ids)} business(es) at once.")
+        return run_id, list(business_ids)
+    meta_key, pending_key, _ = _keys(run_id)
+    ttl = nudge_run_deadline_seconds(len(business_ids)) + 3600
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(meta_key, mapping={"business_ids": json.dumps(list(business_ids))})
+        if business_ids[concurrency:]:
+            pipe.rpush(pending_key, *business_ids[concurrency:])
+        pipe.expire(meta_key, ttl)
+        pipe.expire(pending_key, ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[NudgeGenerationRun {run_id}] Could not register run; dispatching all {len(business_ids)} business(es) at once: {e}")
+        return run_id, list(business_ids)
+    return run_id, list(business_ids[:concurrency])
+
+
+def next_nudge_run_business(run_id: Optional[str]) -> Optional[int]:
+    """Takes the next waiting business of the run, or None when none is left."""
+    if run_id is None or redis_client is None:
+        return None
+    try:
+        business_id = redis_client.lpop(_keys(run_id)[1])
+    except Exception as e:
+        logger.warning(f"[NudgeGenerationRun {run_id}] Could not take the next business: {e}")
+        return None
+    return int(business_id) if business_id is not None else None
+
+
+def record_nudge_run_result(run_id: Optional[str], result: Dict[str, Any]) -> bool:
+    """Records one business's outcome; returns True when it was the last outcome the run waited for."""
+    if run_id is None or redis_client is None:
+        return False
+    meta_key, _, results_key = _keys(run_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(results_key, str(result["business_id"]), json.dumps(result))
+        pipe.hlen(results_key)
+        pipe.hget(meta_key, "business_ids")
+        pipe.ttl(meta_key)
+        _, recorded, business_ids, ttl = pipe.execute()
+        if recorded == 1 and ttl > 0:
+            # The results hash only exists from its first result on; give it the run's expiry.
+            redis_client.expire(results_key, ttl)
+    except Exception as e:
+        logger.warning(f"[NudgeGenerationRun {run_id}] Could not record result for business {result['business_id']}: {e}")
+        return False
+    return business_ids is not None and recorded >= len(json.loads(business_ids))
+
+
+def summarize_nudge_run(run_id: str, business_ids: List[int], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals the per-business results; businesses without one are reported as missing."""
+    return {
+        "run_id": run_id,
+        "businesses": len(business_ids),
+        "nudges_created": sum(result.get("nudges_created", 0) for result in results),
+        "failed": sorted(result["business_id"] for result in results if result.get("failed_detectors")),
+        "timed_out": sorted(result["business_id"] for result in results if result.get("timed_out")),
+        "killed": sorted(result["business_id"] for result in results if result.get("killed")),
+        "missing": sorted(set(business_ids) - {result["business_id"] for result in results}),
+    }
+
+
+def finish_nudge_run(run_id: str) -> Optional[Dict[str, Any]]:
+    """Aggregates the run's summary, once: returns None if the run was already summarized or is unknown."""
+    if redis_client is None:
+        return None
+    meta_key, _, results_key = _keys(run_id)
+    business_ids = redis_client.hget(meta_key, "business_ids")
+    if business_ids is None or not redis_client.hsetnx(meta_key, "summarized", 1):
+        return None
+    results = [json.loads(raw) for raw in (redis_client.hgetall(results_key) or {}).values()]
+    return summarize_nudge_run(run_id, json.loads(business_ids), results)
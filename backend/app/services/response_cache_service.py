@@ -0,0 +1,148 @@
+# backend/app/services/response_cache_service.py
+
+# Redis response cache for read-heavy dashboard endpoints, invalidated by writes.
+# Each business has a generation counter per scope (inbox, stats, schedule, tags, nudges). Cached
+# bodies are keyed by the scope's current generation, so bumping the counter retires every cached
+# response of that scope at once without scanning keys. Writers never call this module directly: an
+# after_flush hook (registered in app/models.py) records the businesses and scopes a flush touched and
+# bumps them after the commit, covering the webhook, Celery tasks and workflow routes alike. Bulk Core
+# UPDATEs bypass the hook and bump themselves (see message_dispatch_service, MessageService).
+#
+# Responses carry an ETag (a hash of the body); a client revalidating with If-None-Match gets a 304
+# with no body while nothing in the scope changed. Without Redis, endpoints are computed on every
+# request but still answer conditional requests.
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import CoPilotNudge, ConsentLog, Customer, Engagement, Message, RoadmapMessage, Tag
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY_PREFIX = "cache_generation:"
+RESPONSE_KEY_PREFIX = "response_cache:"
+_PENDING_KEY = "response_cache.pending"
+
+INBOX = "inbox"
+STATS = "stats"
+SCHEDULE = "schedule"
+TAGS = "tags"
+NUDGES = "nudges"
+
+# Cached scopes whose responses a write to each model can change.
+MODEL_SCOPES = {
+    Message: (INBOX, STATS, SCHEDULE),
+    Engagement: (INBOX, STATS),
+    CoPilotNudge: (INBOX, NUDGES),
+    Customer: (INBOX, STATS, SCHEDULE, NUDGES),
+    ConsentLog: (STATS,),
+    RoadmapMessage: (STATS,),
+    Tag: (TAGS,),
+}
+
+
+def _generation_key(business_id: int, scope: str) -> str:
+    return f"{GENERATION_KEY_PREFIX}{business_id}:{scope}"
+
+
+def bump_generations(business_ids: Iterable[Optional[int]], scopes: Iterable[str]) -> None:
+    """Retires the cached responses of `scopes` for each business; failures are logged, never raised."""
+    pairs = {(business_id, scope) for business_id in business_ids if business_id is not None for scope in scopes}
+    _bump(pairs)
+
+
+def _bump(pairs: Set[Tuple[int, str]]) -> None:
+    if redis_client is None or not pairs:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for business_id, scope in pairs:
+            pipe.incr(_generation_key(business_id, scope))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[ResponseCache] Could not bump {len(pairs)} cache generation(s): {e}")
+
+
+def generations_for_flush(session: Session) -> Set[Tuple[int, str]]:
+    """(business_id, scope) pairs the pending flush invalidates (call from after_flush)."""
+    pairs: Set[Tuple[int, str]] = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        scopes = MODEL_SCOPES.get(type(instance))
+        business_id = getattr(instance, "business_id", None)
+        if scopes and business_id is not None:
+            pairs.update((business_id, scope) for scope in scopes)
+    return pairs
+
+
+def collect_after_flush(session: Session) -> None:
+    """after_flush hook: remembers what this flush invalidated until the transaction commits."""
+    pairs = generations_for_flush(session)
+    if pairs:
+        session.info.setdefault(_PENDING_KEY, set()).update(pairs)
+
+
+def bump_after_commit(session: Session) -> None:
+    """after_commit hook."""
+    _bump(session.info.pop(_PENDING_KEY, set()))
+
+
+def discard_after_rollback(session: Session) -> None:
+    """after_rollback hook."""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _etag(body: str) -> str:
+    return f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _response_key(request: Request, business_id: int, scope: str, generation: str, vary: str) -> str:
+    query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    return f"{RESPONSE_KEY_PREFIX}{business_id}:{scope}:{generation}:{request.url.path}?{query}#{vary}"
+
+
+def cached_response(request: Request, business_id: int, scope: str, build: Callable[[], Any], vary: str = "") -> Response:
+    """
+    Serves `build()` as JSON from the cache of (business, scope) or computes and stores it, answering
+    304 when the client's If-None-Match is current. `vary` distinguishes responses that also depend on
+    something other than the request and the scope's writes (e.g. the current day).
+    """
+    key = None
+    cached: Optional[Dict[str, str]] = None
+    if redis_client is not None:
+        try:
+            generation = redis_client.get(_generation_key(business_id, scope)) or "0"
+            key = _response_key(request, business_id, scope, generation, vary)
+            raw = redis_client.get(key)
+            cached = json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"[ResponseCache] Cache read failed for {request.url.path} (business {business_id}), computing: {e}")
+            key = None
+
+    if cached is None:
+        body = json.dumps(jsonable_encoder(build()), separators=(",", ":"))
+        cached = {"etag": _etag(body), "body": body}
+        if key is not None:
+            try:
+                redis_client.set(key, json.dumps(cached), ex=settings.RESPONSE_CACHE_TTL_SECONDS)
+            except Exception as e:
+                logger.warning(f"[ResponseCache] Cache write failed for {request.url.path} (business {business_id}): {e}")
+
+    headers = {"ETag": cached["etag"], "Cache-Control": "private, no-cache"}
+    if _matches(request, cached["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached["body"], media_type="application/json", headers=headers)
@@ -0,0 +1,183 @@
+# backend/app/services/send_ledger_service.py
+
+# Idempotency ledger for outbound scheduled sends (message_send_ledger).
+# A worker claims a message by inserting a 'claimed' ledger row and committing before it does any
+# other work, then flips that row to 'sending' immediately before the message's own Twilio call.
+# The primary key makes the claim exclusive. A redelivered task (acks_late, visibility timeout) or
+# a retry re-sends rows still 'claimed' (Twilio was never called) and never re-sends a row that
+# reached 'sending' or 'sent'. Twilio's Messages API has no idempotency key of its own, so this
+# ledger is the dedupe.
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, exists, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Message, MessageSendLedger, MessageStatusEnum
+from app.services.message_dispatch_service import apply_send_outcomes
+
+logger = logging.getLogger(__name__)
+
+LEDGER_CLAIMED = "claimed"
+LEDGER_SENDING = "sending"
+LEDGER_SENT = "sent"
+LEDGER_FAILED = "failed"
+
+
+class SendClaimLost(Exception):
+    """Raised by mark_sending when the claim is gone, so the caller must not call Twilio."""
+
+
+def _insert(db: Session):
+    return sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+
+
+def claim_sends(db: Session, message_ids: List[int], claimed_by: Optional[str] = None, now: Optional[datetime] = None) -> Set[int]:
+    """
+    Claims every message in `message_ids` that is claimed for sending ('processing_send') and has
+    no ledger row yet by inserting a 'claimed' row, and takes over 'claimed' rows this task
+    (`claimed_by`, a redelivery or retry) or a stale claimer left behind without calling Twilio.
+    Commits and returns the IDs the caller may send; each must still pass mark_sending first.
+    """
+    if not message_ids:
+        return set()
+    now = now or datetime.now(timezone.utc)
+    eligible = select(
+        Message.id, literal(LEDGER_CLAIMED), literal(claimed_by), literal(now)
+    ).where(
+        Message.id.in_(message_ids),
+        Message.status == MessageStatusEnum.PROCESSING_SEND.value,
+    )
+    claimed = set(db.execute(
+        _insert(db)(MessageSendLedger)
+        .from_select(["message_id", "status", "claimed_by", "claimed_at"], eligible)
+        .on_conflict_do_nothing(index_elements=["message_id"])
+        .returning(MessageSendLedger.message_id)
+    ).scalars().all())
+    stale_cutoff = now - timedelta(seconds=settings.MESSAGE_DISPATCH_STALE_CLAIM_SECONDS)
+    claimed.update(db.execute(
+        update(MessageSendLedger)
+        .where(
+            MessageSendLedger.message_id.in_(message_ids),
+            MessageSendLedger.status == LEDGER_CLAIMED,
+            or_(MessageSendLedger.claimed_by == claimed_by, MessageSendLedger.claimed_at < stale_cutoff),
+            exists().where(Message.id == MessageSendLedger.message_id, Message.status == MessageStatusEnum.PROCESSING_SEND.value),
+        )
+        .values(claimed_by=claimed_by, claimed_at=now)
+        .returning(MessageSendLedger.message_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all())
+    db.commit()
+    return claimed
+
+
+def mark_sending(db: Session, message_id: int, claimed_by: Optional[str] = None) -> None:
+    """
+    Flips this caller's 'claimed' row to 'sending' in its own transaction; call it immediately
+    before handing the message to Twilio. Raises SendClaimLost if the claim no longer belongs
+    to the caller (e.g. the dispatcher released it as stale), in which case nothing may be sent.
+    """
+    ledger = MessageSendLedger.__table__
+    with db.get_bind().begin() as conn:
+        flipped = conn.execute(
+            update(ledger)
+            .where(ledger.c.message_id == message_id, ledger.c.status == LEDGER_CLAIMED, ledger.c.claimed_by == claimed_by)
+            .values(status=LEDGER_SENDING)
+        ).rowcount
+    if not flipped:
+        raise SendClaimLost(f"Send claim for message {message_id} is no longer held by {claimed_by}")
+
+
+def get_ledger_entries(db: Session, message_ids: Iterable[int]) -> Dict[int, MessageSendLedger]:
+    message_ids = list(message_ids)
+    if not message_ids:
+        return {}
+    entries = db.execute(select(MessageSendLedger).where(MessageSendLedger.message_id.in_(message_ids))).scalars()
+    return {entry.message_id: entry for entry in entries}
+
+
+def is_stale(entry: MessageSendLedger, now: Optional[datetime] = None) -> bool:
+    """True when a claim is older than the dispatcher's stale-claim window."""
+    now = now or datetime.now(timezone.utc)
+    claimed_at = entry.claimed_at if entry.claimed_at.tzinfo else entry.claimed_at.replace(tzinfo=timezone.utc)
+    return claimed_at < now - timedelta(seconds=settings.MESSAGE_DISPATCH_STALE_CLAIM_SECONDS)
+
+
+def record_send_results(
+    db: Session,
+    sent: Dict[int, str],
+    failed: Iterable[int] = (),
+    released: Iterable[int] = (),
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Records what happened to claimed sends in its own transaction, ahead of the Message status
+    writes, so a crash between the two still leaves the ledger saying whether Twilio accepted the
+    message. Uses a separate connection so the session's loaded Messages are not expired.
+      - sent: message_id -> Twilio SID
+      - failed: Twilio rejected the send (or it raised), or the outcome of a 'sending' row is unknown;
+        never retried automatically
+      - released: Twilio was never called (e.g. rate limited); the row is deleted so it can be claimed again
+    """
+    now = now or datetime.now(timezone.utc)
+    failed, released = list(failed), list(released)
+    if not (sent or failed or released):
+        return
+    ledger = MessageSendLedger.__table__
+    with db.get_bind().begin() as conn:
+        if sent:
+            conn.execute(
+                update(ledger)
+                .where(ledger.c.message_id == bindparam("b_message_id"))
+                .values(status=LEDGER_SENT, twilio_sid=bindparam("b_twilio_sid"), completed_at=now),
+                [{"b_message_id": message_id, "b_twilio_sid": sid} for message_id, sid in sent.items()],
+            )
+        if failed:
+            conn.execute(update(ledger).where(ledger.c.message_id.in_(failed)).values(status=LEDGER_FAILED, completed_at=now))
+        if released:
+            conn.execute(ledger.delete().where(ledger.c.message_id.in_(released)))
+
+
+def resolve_abandoned_sends(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Finishes messages stuck in 'processing_send' past the stale-claim window that have a ledger
+    row, using the ledger as the record of what Twilio got:
+      - 'claimed': Twilio was never called; the claim is released and the message re-scheduled
+      - 'sent': the message is completed
+      - 'sending' / 'failed': the message is failed (and a 'sending' row marked failed), never re-sent
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=settings.MESSAGE_DISPATCH_STALE_CLAIM_SECONDS)
+    rows = db.execute(
+        select(Message, MessageSendLedger)
+        .join(MessageSendLedger, MessageSendLedger.message_id == Message.id)
+        .where(
+            Message.status == MessageStatusEnum.PROCESSING_SEND.value,
+            Message.claimed_at.is_not(None),
+            Message.claimed_at < cutoff,
+        )
+    ).all()
+    outcomes, failed, released = [], [], []
+    for message, entry in rows:
+        if entry.status == LEDGER_CLAIMED:
+            outcomes.append({"message": message, "status": MessageStatusEnum.SCHEDULED.value})
+            released.append(message.id)
+        elif entry.status == LEDGER_SENT:
+            outcomes.append({
+                "message": message, "status": MessageStatusEnum.SENT.value, "sent_at": entry.completed_at or now,
+                "twilio_sid": entry.twilio_sid, "metadata": {'twilio_sid': entry.twilio_sid},
+            })
+        else:
+            reason = 'Send failed' if entry.status == LEDGER_FAILED else 'Send outcome unknown; not retried to avoid a duplicate SMS'
+            outcomes.append({"message": message, "status": MessageStatusEnum.FAILED.value, "metadata": {'failure_reason': reason}})
+            if entry.status == LEDGER_SENDING:
+                failed.append(message.id)
+    record_send_results(db, sent={}, failed=failed, released=released, now=now)
+    apply_send_outcomes(db, outcomes)
+    if outcomes:
+        logger.warning(f"[SendLedger] Resolved {len(outcomes)} abandoned send(s) from the ledger ({len(released)} never sent, re-scheduled).")
+    return len(outcomes)
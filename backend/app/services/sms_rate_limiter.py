@@ -0,0 +1,201 @@
+# backend/app/services/sms_rate_limiter.py
+
+# Redis-backed token buckets that pace outbound SMS across every API process and Celery worker.
+# One bucket per sending number, per messaging service and one for the whole Twilio account;
+# a send takes a token from all applicable buckets atomically, or waits until it can.
+import asyncio
+import logging
+import math
+import random
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "sms_rate_limit:metrics"
+
+# KEYS: bucket keys. ARGV: rate (tokens/sec), capacity and reserve for each key, in KEYS order.
+# A send may only take a token while more than `reserve` tokens would remain, which keeps
+# headroom for higher-priority lanes.
+# Returns {0, 0} when a token was taken from every bucket, otherwise {wait_ms, index} for the
+# bucket that needs the longest wait (1-based); nothing is consumed in that case.
+# Uses the Redis server clock so workers with skewed clocks share one timeline.
+_TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tokens = {}
+local wait_ms, limiting = 0, 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[3 * i - 2]) / 1000
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local reserve = tonumber(ARGV[3 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if available == nil or ts == nil then
+        available, ts = capacity, now_ms
+    end
+    available = math.min(capacity, available + math.max(0, now_ms - ts) * rate)
+    tokens[i] = available
+    if available - reserve < 1 then
+        local needed = math.ceil((1 + reserve - available) / rate)
+        if needed > wait_ms then
+            wait_ms, limiting = needed, i
+        end
+    end
+end
+if wait_ms > 0 then
+    return {wait_ms, limiting}
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[3 * i - 2]) / 1000
+    local capacity = tonumber(ARGV[3 * i - 1])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now_ms)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate) + 1000)
+end
+return {0, 0}
+"""
+
+_script = None
+_script_client = None
+
+
+class SmsRateLimitExceeded(Exception):
+    """Raised when a send slot could not be obtained within the allowed wait."""
+
+    def __init__(self, scope: str, waited_seconds: float):
+        self.scope = scope
+        self.waited_seconds = waited_seconds
+        super().__init__(f"SMS rate limit for '{scope}' not cleared after waiting {waited_seconds:.2f}s")
+
+
+def _get_script():
+    global _script, _script_client
+    if _script is None or _script_client is not redis_client:
+        _script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+        _script_client = redis_client
+    return _script
+
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_REMINDERS = "reminders"
+PRIORITY_BULK = "bulk"
+
+
+def build_buckets(
+    from_number: Optional[str],
+    messaging_service_sid: Optional[str],
+    priority: str = PRIORITY_INTERACTIVE,
+) -> List[Tuple[str, str, float, int, int]]:
+    """
+    Returns (scope, redis_key, rate_per_second, burst, reserve) for every bucket a send must draw from.
+    Bulk sends leave SMS_RATE_LIMIT_BULK_RESERVE_FRACTION of each shared bucket untouched so
+    OTPs, inbox replies and reminders are not queued behind a campaign.
+    """
+    buckets = []
+    if from_number:
+        buckets.append(("number", f"sms_rate_limit:number:{from_number}",
+                        settings.SMS_RATE_LIMIT_PER_NUMBER_PER_SECOND, settings.SMS_RATE_LIMIT_PER_NUMBER_BURST))
+    if messaging_service_sid:
+        buckets.append(("messaging_service", f"sms_rate_limit:msid:{messaging_service_sid}",
+                        settings.SMS_RATE_LIMIT_PER_MSID_PER_SECOND, settings.SMS_RATE_LIMIT_PER_MSID_BURST))
+    buckets.append(("account", "sms_rate_limit:account",
+                    settings.SMS_RATE_LIMIT_ACCOUNT_PER_SECOND, settings.SMS_RATE_LIMIT_ACCOUNT_BURST))
+    reserve_fraction = settings.SMS_RATE_LIMIT_BULK_RESERVE_FRACTION if priority == PRIORITY_BULK else 0
+    return [
+        (scope, key, rate, burst, bulk_reserve(burst, reserve_fraction))
+        for scope, key, rate, burst in buckets
+        if rate > 0
+    ]
+
+
+def bulk_reserve(burst: int, fraction: float) -> int:
+    """
+    Tokens of a `burst`-sized bucket that bulk sends may not take: the fraction rounded up, so even
+    a small bucket (the per-number default of 3) keeps one token for other lanes, but never the
+    whole bucket, or bulk could not send at all.
+    """
+    if fraction <= 0:
+        return 0
+    return min(math.ceil(burst * fraction), max(0, burst - 1))
+
+
+def _try_take(buckets: List[Tuple[str, str, float, int, int]]) -> Tuple[float, Optional[str]]:
+    """One atomic attempt. Returns (seconds_to_wait, limiting_scope); (0, None) means a token was taken."""
+    args = []
+    for _, _, rate, burst, reserve in buckets:
+        args.extend([rate, max(1, burst), reserve])
+    wait_ms, limiting_index = _get_script()(keys=[b[1] for b in buckets], args=args)
+    if not wait_ms:
+        return 0.0, None
+    return int(wait_ms) / 1000.0, buckets[int(limiting_index) - 1][0]
+
+
+def _record_wait(scope: str, waited_seconds: float) -> None:
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrbyfloat(METRICS_KEY, "wait_seconds_total", waited_seconds)
+        pipe.hincrbyfloat(METRICS_KEY, f"wait_seconds:{scope}", waited_seconds)
+        pipe.hincrby(METRICS_KEY, "waited_sends_total", 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[SmsRateLimiter] Failed to record wait metrics: {e}")
+
+
+def get_rate_limit_metrics() -> dict:
+    """Cumulative wait metrics across all processes (empty when Redis is unavailable)."""
+    if redis_client is None:
+        return {}
+    try:
+        return {k: float(v) for k, v in (redis_client.hgetall(METRICS_KEY) or {}).items()}
+    except Exception as e:
+        logger.warning(f"[SmsRateLimiter] Failed to read metrics: {e}")
+        return {}
+
+
+async def wait_for_send_slot(
+    from_number: Optional[str],
+    messaging_service_sid: Optional[str],
+    max_wait_seconds: Optional[float] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+) -> float:
+    """
+    Blocks (without blocking the event loop) until a send may go out for this sender, and returns
+    the seconds spent waiting. Sleeps for exactly the time the bucket needs to refill rather than
+    retrying, and fails open if Redis is unavailable.
+
+    `priority` is the send lane (interactive / reminders / bulk); bulk sends keep clear of the
+    reserved headroom. Raises SmsRateLimitExceeded if the slot is not available within `max_wait_seconds`.
+    """
+    if redis_client is None or not settings.SMS_RATE_LIMIT_ENABLED:
+        return 0.0
+    buckets = build_buckets(from_number, messaging_service_sid, priority)
+    if not buckets:
+        return 0.0
+    max_wait = settings.SMS_RATE_LIMIT_MAX_WAIT_SECONDS if max_wait_seconds is None else max_wait_seconds
+
+    waited = 0.0
+    limiting_scope = None
+    while True:
+        try:
+            wait, scope = await asyncio.to_thread(_try_take, buckets)
+        except Exception as e:
+            logger.warning(f"[SmsRateLimiter] Redis unavailable, sending without rate limit: {e}")
+            break
+        if wait <= 0:
+            break
+        limiting_scope = scope
+        if waited + wait > max_wait:
+            _record_wait(limiting_scope, waited)
+            raise SmsRateLimitExceeded(limiting_scope, waited)
+        # Small jitter so workers released by the same refill don't collide on the next token.
+        wait += random.uniform(0, wait * 0.1)
+        await asyncio.sleep(wait)
+        waited += wait
+
+    if waited > 0:
+        _record_wait(limiting_scope, waited)
+        logger.info(f"[SmsRateLimiter] Waited {waited:.3f}s for '{limiting_scope}' bucket (from={from_number}, msid={messaging_service_sid}).")
+    return waited
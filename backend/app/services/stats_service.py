@@ -1,113 +1,73 @@
 # backend/app/services/stats_service.py
 
 from sqlalchemy.orm import Session
-from app.models import Customer, RoadmapMessage, Message, Engagement, ConsentLog
-from sqlalchemy import func, desc, distinct # Added distinct
+from app.models import Customer, RoadmapMessage, Message, Engagement, OptInStatus
+from app.services.daily_stats_service import get_metric_totals, utc_today
+from sqlalchemy import exists, func
 from loguru import logger
 from datetime import datetime, timedelta, timezone # Added timedelta, timezone
 
 def get_stats_for_business(business_id: int, db: Session):
+    """
+    Dashboard stats in a fixed number of set-based queries, independent of the number of customers
+    and of history size: one grouped pass over the business's customers (size, consent breakdown,
+    customers without a plan), one pass over its current message states, and the sent/reply totals
+    from the business_daily_stats rollup (see daily_stats_service).
+    sentLast7Days and repliesLast7Days count whole UTC calendar days, today and the 6 days before,
+    to match the rollup's daily rows; before the rollup they were a rolling window of the last 168 hours.
+    """
     logger.info(f"📊 Fetching dashboard stats for business_id={business_id}")
+    now_utc = datetime.now(timezone.utc)
 
-    # Community size = count of customers
-    communitySize = db.query(Customer).filter(Customer.business_id == business_id).count()
-    logger.info(f"👥 Community size: {communitySize}")
+    # Without Plan = customers with no messages at all (Roadmap or Scheduled)
+    has_roadmap = exists().where(RoadmapMessage.customer_id == Customer.id, RoadmapMessage.business_id == business_id)
+    has_scheduled = exists().where(
+        Message.customer_id == Customer.id, Message.business_id == business_id, Message.message_type == 'scheduled'
+    )
 
-    # Replace the simple opt-in status counting with a more accurate approach
-    optedIn = optedOut = optInPending = 0
-
-    # Get all customers for this business
-    customers = db.query(Customer).filter(Customer.business_id == business_id).all()
-
-    for customer in customers:
-        # Get latest consent status from ConsentLog
-        latest_consent = (
-            db.query(ConsentLog)
-            .filter(
-                ConsentLog.phone_number == customer.phone,
-                ConsentLog.business_id == business_id
-                )
-            .order_by(desc(ConsentLog.replied_at))
-            .first()
+    communitySize = optedIn = optedOut = optInPending = withoutPlanCount = 0
+    for consent_status, count, without_plan in (
+        db.query(
+            Customer.consent_status,
+            func.count(Customer.id),
+            func.count(Customer.id).filter(~has_roadmap, ~has_scheduled),
         )
-
-        if latest_consent:
-            if latest_consent.status == "opted_in":
-                optedIn += 1
-            elif latest_consent.status == "opted_out":
-                optedOut += 1
-            elif latest_consent.status in ["pending", "waiting"]: # Check for multiple pending states
-                optInPending += 1
-            # Handle potential edge cases or assume pending if status is unexpected
-            else:
-                 optInPending += 1
+        .filter(Customer.business_id == business_id)
+        .group_by(Customer.consent_status)
+        .all()
+    ):
+        # Consent counts come from the customers' consent projection.
+        communitySize += count
+        withoutPlanCount += without_plan
+        if consent_status == OptInStatus.OPTED_IN.value:
+            optedIn += count
+        elif consent_status == OptInStatus.OPTED_OUT.value:
+            optedOut += count
         else:
-            # No consent log means pending opt-in request
-            optInPending += 1
+            # Pending, declined or never asked all count as awaiting opt-in
+            optInPending += count
 
+    logger.info(f"👥 Community size: {communitySize}")
     logger.info(f"✅ Opted In: {optedIn}, ⏳ Pending Opt-in: {optInPending}, ❌ Opted Out: {optedOut}")
-
-    # Without Plan = customers with no messages at all (Roadmap or Scheduled)
-    subquery_roadmap = db.query(RoadmapMessage.customer_id).filter(RoadmapMessage.business_id == business_id).distinct()
-    subquery_scheduled = db.query(Message.customer_id).filter(Message.business_id == business_id, Message.message_type == 'scheduled').distinct()
-
-    customers_with_plan = subquery_roadmap.union(subquery_scheduled).subquery()
-
-    withoutPlanCount = db.query(Customer).filter(
-        Customer.business_id == business_id,
-        ~Customer.id.in_(customers_with_plan)
-    ).count()
     logger.info(f"📭 Customers without plan: {withoutPlanCount}")
 
+    pending, scheduled, rejected = db.query(
+        # Pending = outgoing message awaiting review (often 0, kept for potential future use)
+        func.count(Message.id).filter(Message.status == "pending_review", Message.message_type == 'scheduled'),
+        # Scheduled = status "scheduled" with an upcoming scheduled_time
+        func.count(Message.id).filter(Message.status == "scheduled", Message.scheduled_time >= now_utc),
+        func.count(Message.id).filter(Message.status == "rejected"),
+    ).filter(Message.business_id == business_id).one()
 
-    # Pending = message.status == "pending_review" (Often 0 for outgoing, keep for potential future use)
-    pending = db.query(Message).filter(
-        Message.business_id == business_id,
-        Message.status == "pending_review",
-        Message.message_type == 'scheduled' # Ensure it's outgoing type
-    ).count()
-
-    # Scheduled = message.status == "scheduled" AND scheduled_time in the future
-    now_utc = datetime.now(timezone.utc)
-    scheduled = db.query(Message).filter(
-        Message.business_id == business_id,
-        Message.status == "scheduled",
-        Message.scheduled_time != None, # Ensure time is set
-        Message.scheduled_time >= now_utc # Ensure it's upcoming
-    ).count()
-
-    # Sent = message.sent_at is not null (Total historical sent)
-    sent = db.query(Message).filter(
-        Message.business_id == business_id,
-        Message.sent_at.isnot(None)
-    ).count()
-
-    # Rejected = message.status == "rejected" (if used)
-    rejected = db.query(Message).filter(
-        Message.business_id == business_id,
-        Message.status == "rejected"
-    ).count()
+    # Sent = message.sent_at is not null (Total historical sent); recent activity covers today and the 6 days before.
+    all_time, last_7_days = get_metric_totals(db, business_id, None, utc_today() - timedelta(days=6))
+    sent = all_time["messages_sent"]
+    sent_last_7_days = last_7_days["messages_sent"]
+    replies_last_7_days = last_7_days["replies_received"]
 
     logger.info(f"🕓 Pending Outgoing: {pending}, 📅 Scheduled: {scheduled}, ✅ Sent (Total): {sent}, ❌ Rejected: {rejected}")
-
-    # --- Calculate recent activity ---
-    seven_days_ago = now_utc - timedelta(days=7)
-
-    sent_last_7_days = db.query(Message).filter(
-        Message.business_id == business_id,
-        Message.sent_at != None,
-        Message.sent_at >= seven_days_ago
-    ).count()
     logger.info(f"📤 Sent Last 7 Days: {sent_last_7_days}")
-
-    # Use created_at for replies as sent_at might be null until AI response is sent
-    replies_last_7_days = db.query(Engagement).filter(
-        Engagement.business_id == business_id,
-        Engagement.response != None,
-        Engagement.created_at >= seven_days_ago
-    ).count()
     logger.info(f"📥 Replies Last 7 Days: {replies_last_7_days}")
-    # --- End Recent Activity ---
 
     return {
         "communitySize": communitySize,
@@ -142,11 +102,8 @@ def calculate_reply_stats(business_id: int, db: Session):
     customers_waiting = drafts_query.distinct(Engagement.customer_id).count()
     logger.info(f"👥 Customers with Waiting Drafts (Unique): {customers_waiting}")
 
-    # Count of received messages (Engagements with a customer response)
-    received_count = db.query(Engagement).filter(
-        Engagement.business_id == business_id,
-        Engagement.response != None # Count engagements initiated by customer response
-    ).count()
+    # Count of received messages (Engagements with a customer response), from the daily rollup
+    received_count = get_metric_totals(db, business_id)[0]["replies_received"]
     logger.info(f"📩 Received Messages (Total): {received_count}")
 
     # Map to the keys expected by the frontend API calls:
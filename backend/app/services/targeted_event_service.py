@@ -17,7 +17,6 @@ from app.models import (
 )
 from app.schemas import ConfirmTimedCommitmentPayload
 from app.services.twilio_service import TwilioService
-from app.celery_tasks import process_scheduled_message_task
 
 logger = logging.getLogger(__name__)
 
@@ -111,18 +110,8 @@ class TargetedEventService:
             )
             self.db.add(new_message)
             self.db.flush()
-            
-            try:
-                task = process_scheduled_message_task.apply_async(
-                    args=[new_message.id],
-                    eta=scheduled_time_utc
-                )
-                new_message.message_metadata['celery_task_id'] = task.id
-                created_message_ids.append(new_message.id)
-                logger.info(f"{log_prefix} Queued Celery task {task.id} for reminder Message ID {new_message.id} at {scheduled_time_utc.isoformat()}.")
-            except Exception as celery_exc:
-                logger.error(f"{log_prefix} Failed to queue Celery task for reminder {new_message.id}: {celery_exc}", exc_info=True)
-                self.db.rollback()
+            created_message_ids.append(new_message.id)
+            logger.info(f"{log_prefix} Scheduled reminder Message ID {new_message.id} for {scheduled_time_utc.isoformat()}.")
         
         logger.info(f"{log_prefix} Scheduled {len(created_message_ids)} reminders.")
         return created_message_ids
@@ -207,6 +196,7 @@ class TargetedEventService:
                 message_type=MessageTypeEnum.OUTBOUND.value,
                 status=MessageStatusEnum.SENT.value,
                 sent_at=datetime.now(timezone.utc),
+                twilio_sid=twilio_sid,
                 message_metadata={
                     'source': 'event_confirmation_to_customer',
                     'targeted_event_id': new_event.id,
@@ -0,0 +1,126 @@
+# backend/app/services/tenant_routing_service.py
+
+# Resolves which business an inbound Twilio number or a dashboard URL slug belongs to without
+# querying Postgres on every request: a small process-local cache, then Redis, then the DB.
+# Code that changes a mapping (number purchase/release, profile create/update) calls
+# invalidate_number() / invalidate_slug(). That deletes the Redis entry and this process's local
+# entry right away; other processes drop theirs within TENANT_ROUTING_LOCAL_TTL_SECONDS.
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import BusinessProfile
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+NUMBER_KEY_PREFIX = "tenant_routing:number:"
+SLUG_KEY_PREFIX = "tenant_routing:slug:"
+
+# key -> (expires_at monotonic, business id or None for "no such business")
+_local_cache: Dict[str, Tuple[float, Optional[int]]] = {}
+_local_lock = threading.Lock()
+
+
+def _local_get(key: str) -> Tuple[bool, Optional[int]]:
+    with _local_lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] < time.monotonic():
+            del _local_cache[key]
+            return False, None
+        return True, entry[1]
+
+
+def _local_set(key: str, business_id: Optional[int], ttl: float) -> None:
+    with _local_lock:
+        if len(_local_cache) >= settings.TENANT_ROUTING_LOCAL_MAX_ENTRIES:
+            _local_cache.clear()
+        _local_cache[key] = (time.monotonic() + ttl, business_id)
+
+
+def clear_local_cache() -> None:
+    with _local_lock:
+        _local_cache.clear()
+
+
+def _resolve(key: str, load: Callable[[], Optional[int]]) -> Optional[int]:
+    hit, business_id = _local_get(key)
+    if hit:
+        return business_id
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(key)
+            if cached is not None:
+                business_id = json.loads(cached)
+                _local_set(key, business_id, settings.TENANT_ROUTING_LOCAL_TTL_SECONDS)
+                return business_id
+        except Exception as e:
+            logger.warning(f"[TenantRouting] Redis read failed for {key}, using the DB: {e}")
+
+    business_id = load()
+    # Misses are cached briefly so unknown numbers and mistyped slugs don't reach the DB every time.
+    ttl = settings.TENANT_ROUTING_CACHE_TTL_SECONDS if business_id is not None else settings.TENANT_ROUTING_NEGATIVE_TTL_SECONDS
+    if redis_client is not None:
+        try:
+            redis_client.set(key, json.dumps(business_id), ex=ttl)
+        except Exception as e:
+            logger.warning(f"[TenantRouting] Redis write failed for {key}: {e}")
+    _local_set(key, business_id, min(ttl, settings.TENANT_ROUTING_LOCAL_TTL_SECONDS))
+    return business_id
+
+
+def get_business_id_for_number(db: Session, twilio_number: Optional[str]) -> Optional[int]:
+    """ID of the business that owns `twilio_number`, or None."""
+    if not twilio_number:
+        return None
+
+    def load() -> Optional[int]:
+        row = db.query(BusinessProfile.id).filter(BusinessProfile.twilio_number == twilio_number).first()
+        return row.id if row else None
+
+    return _resolve(f"{NUMBER_KEY_PREFIX}{twilio_number}", load)
+
+
+def get_business_id_for_slug(db: Session, slug: Optional[str]) -> Optional[int]:
+    """ID of the business with URL slug `slug`, or None."""
+    if not slug:
+        return None
+
+    def load() -> Optional[int]:
+        row = db.query(BusinessProfile.id).filter(BusinessProfile.slug == slug).first()
+        return row.id if row else None
+
+    return _resolve(f"{SLUG_KEY_PREFIX}{slug}", load)
+
+
+def get_business_for_number(db: Session, twilio_number: Optional[str]) -> Optional[BusinessProfile]:
+    """The business that owns `twilio_number`, loaded by primary key once routing is resolved."""
+    business_id = get_business_id_for_number(db, twilio_number)
+    return db.get(BusinessProfile, business_id) if business_id is not None else None
+
+
+def _invalidate(key: str) -> None:
+    with _local_lock:
+        _local_cache.pop(key, None)
+    if redis_client is not None:
+        try:
+            redis_client.delete(key)
+        except Exception as e:
+            logger.warning(f"[TenantRouting] Could not invalidate {key}: {e}")
+
+
+def invalidate_number(twilio_number: Optional[str]) -> None:
+    if twilio_number:
+        _invalidate(f"{NUMBER_KEY_PREFIX}{twilio_number}")
+
+
+def invalidate_slug(slug: Optional[str]) -> None:
+    if slug:
+        _invalidate(f"{SLUG_KEY_PREFIX}{slug}")
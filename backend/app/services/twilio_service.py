@@ -1,9 +1,10 @@
 # backend/app/services/twilio_service.py
 
 # Manages all Twilio-related operations including SMS sending, phone number management, and OTP delivery
+import asyncio
 from datetime import datetime, timezone
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import json # Import json to handle structured message bodies
 
 from fastapi import status
@@ -15,6 +16,9 @@ from twilio.base.exceptions import TwilioRestException
 
 from app.config import settings
 from app.database import SessionLocal
+from app.twilio_client import get_async_twilio_client
+from app.services.sms_rate_limiter import wait_for_send_slot, SmsRateLimitExceeded, PRIORITY_INTERACTIVE
+from app.services.tenant_routing_service import invalidate_number
 from app.models import BusinessProfile, Customer, Message, OptInStatus
 from app.models import BusinessProfile as BusinessProfileModel, Customer as CustomerModel, ConsentLog as ConsentLogModel, OptInStatus # Make sure OptInStatus is imported from models
 from app.schemas import normalize_phone_number # Ensure this is imported from schemas
@@ -125,10 +129,13 @@ class TwilioService:
                 # Consider if releasing the purchased number is appropriate here if attachment fails.
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to attach number to messaging service.")
 
+            previous_number = business.twilio_number
             business.twilio_number = phone_number
             business.twilio_sid = purchase_result.get('sid')
             business.messaging_service_sid = messaging_service_sid
             self.db.commit()
+            invalidate_number(previous_number)
+            invalidate_number(phone_number)
 
             logger.info(f"Twilio number {phone_number} purchased and assigned to business {business.business_name} (id={business_id})")
             return {
@@ -172,10 +179,12 @@ class TwilioService:
             logger.error(f"❌ Failed to release Twilio number (SID: {business.twilio_sid}) for business_id={business_id}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Failed to release Twilio number from provider: {str(e)}")
 
+        released_number = business.twilio_number
         business.twilio_number = None
         business.twilio_sid = None
         # business.messaging_service_sid = None # Decide if MSID should also be cleared
         self.db.commit()
+        invalidate_number(released_number)
         logger.info(f"🧹 Cleared assigned Twilio number for business ID {business_id}")
         return {"status": "success", "message": "Assigned Twilio number released and cleared from business profile"}
 
@@ -190,7 +199,9 @@ class TwilioService:
         business: BusinessProfileModel,
         customer: Optional[CustomerModel] = None,
         is_direct_reply: bool = False,
-        is_owner_notification: bool = False # ADDED THIS NEW PARAMETER
+        is_owner_notification: bool = False, # ADDED THIS NEW PARAMETER
+        priority: str = PRIORITY_INTERACTIVE, # Send lane for rate limiting: interactive / reminders / bulk
+        before_send: Optional[Callable[[], None]] = None # Sync hook run right before the Twilio API call; raising aborts the send
     ) -> Optional[str]: # Return type is Optional[str] for the SID or None on failure
         db = self.db 
         log_prefix = f"[TwilioService.send_sms BIZ:{business.id} TO:{to}]"
@@ -295,6 +306,10 @@ class TwilioService:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot send proactive message: Recipient is not an opted-in customer of this business.")
         # --- END OF MODIFIED CONSENT CHECK ---
 
+        await self._wait_for_rate_limit(log_prefix, from_number_to_use, messaging_service_sid_to_use, priority)
+        if before_send is not None:
+            await asyncio.to_thread(before_send)
+
         try:
             # Ensure actual_twilio_message_body is a string
             actual_twilio_message_body = message_body
@@ -309,8 +324,11 @@ class TwilioService:
             }
             if from_number_to_use: # Only add 'from_' if it's specified (e.g., not for support MSID pool)
                 create_params['from_'] = from_number_to_use
+            if settings.TWILIO_STATUS_CALLBACK_URL:
+                create_params['status_callback'] = settings.TWILIO_STATUS_CALLBACK_URL
             
-            twilio_msg = self.client.messages.create(**create_params)
+            # Non-blocking send over the shared keep-alive pool (see app/twilio_client.py)
+            twilio_msg = await get_async_twilio_client().messages.create_async(**create_params)
             
             logger.info(f"{log_prefix} SMS sent via Twilio. SID: {twilio_msg.sid}, Status: {twilio_msg.status}")
             return twilio_msg.sid
@@ -333,6 +351,17 @@ class TwilioService:
             )
 
 
+    async def _wait_for_rate_limit(self, log_prefix: str, from_number: Optional[str], messaging_service_sid: Optional[str], priority: str = PRIORITY_INTERACTIVE) -> None:
+        """Paces the send through the shared per-number/per-MSID/account token buckets."""
+        try:
+            await wait_for_send_slot(from_number, messaging_service_sid, priority=priority)
+        except SmsRateLimitExceeded as e:
+            logger.warning(f"{log_prefix} {e}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"SMS send rate limit reached for {e.scope}; try again shortly."
+            )
+
     # In class TwilioService:
     async def send_scheduled_message(self, message_id: int):
         log_prefix = f"[TwilioService.send_scheduled_message MSG_ID:{message_id}]"
@@ -396,6 +425,7 @@ class TwilioService:
 
             db_message_to_send.status = "sent"
             db_message_to_send.sent_at = datetime.now(timezone.utc)
+            db_message_to_send.twilio_sid = sid
             db_message_to_send.message_metadata = {
                 **(db_message_to_send.message_metadata or {}),
                 'twilio_message_sid': sid,
@@ -452,7 +482,8 @@ class TwilioService:
                     detail="OTP provider is not configured."
                 )
 
-            twilio_msg = self.client.messages.create(
+            await self._wait_for_rate_limit(f"[TwilioService.send_otp TO:{phone_number}]", None, settings.TWILIO_SUPPORT_MESSAGING_SERVICE_SID)
+            twilio_msg = await get_async_twilio_client().messages.create_async(
                 body=f"Your AI Nudge login code is: {otp}. Expires in 5 minutes.",
                 messaging_service_sid=settings.TWILIO_SUPPORT_MESSAGING_SERVICE_SID,
                 to=phone_number
@@ -479,17 +510,25 @@ class TwilioService:
 
 # Standalone function for backward compatibility or direct calls.
 # Uses TwilioService internally.
-async def send_sms_via_twilio(to: str, message: str, business: BusinessProfile) -> str:
+async def send_sms_via_twilio(
+    to: str,
+    message: str,
+    business: BusinessProfile,
+    customer: Optional[CustomerModel] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    before_send: Optional[Callable[[], None]] = None,
+) -> str:
     """
     Standalone function to send SMS via Twilio for backward compatibility or direct calls.
-    Uses TwilioService internally.
+    Uses TwilioService internally. Pass `customer` when it is already loaded to skip the consent lookup query.
+    `before_send` runs (in a thread) after consent and rate-limit checks, immediately before the Twilio call.
     """
     db = None # Initialize db to None for finally block
     try:
         db = SessionLocal()
         service = TwilioService(db) # Pass the new session to the service
         # Assuming standalone calls like this are NOT direct replies to customer inbound SMS
-        return await service.send_sms(to=to, message_body=message, business=business, is_direct_reply=False)
+        return await service.send_sms(to=to, message_body=message, business=business, customer=customer, is_direct_reply=False, priority=priority, before_send=before_send)
     # No need to catch exceptions here if service.send_sms handles them and raises HTTPExceptions
     finally:
         if db:
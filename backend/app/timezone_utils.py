@@ -36,6 +36,17 @@ def convert_to_utc(dt: datetime, timezone_str: str) -> datetime:
         dt = tz.localize(dt)
     return dt.astimezone(pytz.UTC)
 
+def ensure_utc(dt: Union[datetime, str]) -> datetime:
+    """
+    Normalize a stored send time to timezone-aware UTC. Naive values are taken to be UTC already;
+    strings are parsed as ISO 8601.
+    """
+    if not isinstance(dt, datetime):
+        dt = datetime.fromisoformat(str(dt))
+    if dt.tzinfo is None:
+        return pytz.UTC.localize(dt)
+    return dt.astimezone(pytz.UTC)
+
 def convert_from_utc(dt: datetime, timezone_str: str) -> datetime:
     """
     Convert a UTC datetime to a given timezone.
@@ -0,0 +1,113 @@
+# backend/app/twilio_client.py
+
+# Shared, non-blocking Twilio REST client.
+# One pooled keep-alive aiohttp session is kept per event loop, so every async send in the
+# process reuses warm connections instead of blocking the loop on a synchronous HTTP call.
+import asyncio
+import logging
+import weakref
+from typing import Dict, Optional, Tuple
+
+from aiohttp import BasicAuth, ClientSession, ClientTimeout, TCPConnector
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.http.response import Response
+from twilio.rest import Client
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event loop -> Twilio Client bound to a session created on that loop.
+# aiohttp sessions cannot be shared across loops, hence the per-loop cache.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Client]" = weakref.WeakKeyDictionary()
+
+
+class PooledAsyncTwilioHttpClient(AsyncTwilioHttpClient):
+    """
+    AsyncTwilioHttpClient backed by a bounded keep-alive connection pool.
+
+    The stock client forwards `timeout=None` to aiohttp, which disables the timeout
+    entirely; this one always applies the configured connect/total limits.
+    """
+
+    def __init__(
+        self,
+        total_timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        keepalive_timeout: float,
+    ):
+        super().__init__(pool_connections=False, timeout=total_timeout)
+        self.client_timeout = ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self.session = ClientSession(
+            connector=TCPConnector(limit=max_connections, keepalive_timeout=keepalive_timeout),
+            timeout=self.client_timeout,
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, object]] = None,
+        data: Optional[Dict[str, object]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        auth: Optional[Tuple[str, str]] = None,
+        timeout: Optional[float] = None,
+        allow_redirects: bool = False,
+    ) -> Response:
+        kwargs = {
+            "method": method.upper(),
+            "url": url,
+            "params": params,
+            "data": data,
+            "headers": headers,
+            "auth": BasicAuth(login=auth[0], password=auth[1]) if auth else None,
+            "allow_redirects": allow_redirects,
+            "timeout": (
+                ClientTimeout(total=timeout, connect=self.client_timeout.connect)
+                if timeout is not None else self.client_timeout
+            ),
+        }
+        self.log_request(kwargs)
+        async with self.session.request(**kwargs) as response:
+            body = await response.text()
+            self.log_response(response.status, response)
+            return Response(response.status, body, response.headers)
+
+
+def _build_client() -> Client:
+    http_client = PooledAsyncTwilioHttpClient(
+        total_timeout=settings.TWILIO_HTTP_TIMEOUT_SECONDS,
+        connect_timeout=settings.TWILIO_HTTP_CONNECT_TIMEOUT_SECONDS,
+        max_connections=settings.TWILIO_HTTP_MAX_CONNECTIONS,
+        keepalive_timeout=settings.TWILIO_HTTP_KEEPALIVE_SECONDS,
+    )
+    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+    if settings.TWILIO_API_BASE_URL:
+        client.api.base_url = settings.TWILIO_API_BASE_URL.rstrip("/")
+    return client
+
+
+def get_async_twilio_client() -> Client:
+    """
+    Returns the Twilio client for the running event loop, creating it on first use.
+    Must be called from inside a coroutine; use the `*_async` resource methods with it.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.http_client.session.closed:
+        client = _build_client()
+        _clients[loop] = client
+        logger.info(
+            f"Created pooled async Twilio client (max_connections={settings.TWILIO_HTTP_MAX_CONNECTIONS}, "
+            f"timeout={settings.TWILIO_HTTP_TIMEOUT_SECONDS}s)"
+        )
+    return client
+
+
+async def close_async_twilio_client() -> None:
+    """Closes the running loop's pooled session. Call before the loop shuts down."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.http_client.close()
+        logger.info("Closed pooled async Twilio client")
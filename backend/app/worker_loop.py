@@ -0,0 +1,75 @@
+# backend/app/worker_loop.py
+
+# One long-lived asyncio event loop per worker process, running on a daemon thread.
+# Sync code (Celery tasks) submits coroutines to it with `run_async(...)`, so loop-bound
+# resources such as the pooled Twilio HTTP session are created once and reused across tasks
+# instead of being rebuilt and torn down by asyncio.run() for every message.
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_owner_pid: Optional[int] = None
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns this process's background loop, starting it on first use.
+    A loop inherited across fork() has no running thread, so a child process gets its own.
+    """
+    global _loop, _thread, _owner_pid
+    with _lock:
+        if _loop is None or _owner_pid != os.getpid() or _loop.is_closed() or not _thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_run_loop, args=(_loop,), name="worker-event-loop", daemon=True)
+            _thread.start()
+            _owner_pid = os.getpid()
+            logger.info(f"[WorkerLoop] Started persistent event loop in process {_owner_pid}.")
+        return _loop
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Runs `coro` on the worker loop and blocks the calling thread until it finishes."""
+    loop = get_worker_loop()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def stop_worker_loop(cleanup: Optional[Awaitable[Any]] = None, timeout: float = 10) -> None:
+    """
+    Runs an optional `cleanup` coroutine (e.g. closing HTTP sessions) on the loop, then stops it.
+    Safe to call when no loop was started in this process.
+    """
+    global _loop, _thread, _owner_pid
+    with _lock:
+        loop, thread = _loop, _thread
+        owned = _owner_pid == os.getpid()
+        _loop = _thread = _owner_pid = None
+    if loop is None or not owned or not thread.is_alive():
+        if cleanup is not None and hasattr(cleanup, "close"):
+            cleanup.close()  # Never scheduled; avoid "coroutine was never awaited"
+        return
+    if cleanup is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(cleanup, loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"[WorkerLoop] Cleanup before loop shutdown failed: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    loop.close()
+    logger.info("[WorkerLoop] Stopped persistent event loop.")
@@ -0,0 +1,143 @@
+# backend/benchmarks/bench_consent_fast_path.py
+
+# Consent work per inbound SMS in ConsentService.process_sms_response:
+#   before: every message ran the pending-ConsentLog query before the body was looked at
+#   after:  the body is classified in memory and only keyword replies reach ConsentLog, with
+#           phones known to have no pending request skipped via the Redis flag
+#
+# Runs against an in-memory SQLite database seeded with customers (a share of them with a pending
+# double opt-in request) and a corpus where most messages are ordinary conversation. Redis is a
+# dict-backed stand-in so the numbers count database round trips, not network latency.
+#
+# Usage (from backend/):  python -m benchmarks.bench_consent_fast_path --messages 20000
+import argparse
+import asyncio
+import random
+import time
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, desc, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import BusinessProfile, ConsentLog, Customer
+from app.services import consent_service
+from app.services.consent_service import ConsentService
+
+CONVERSATION = [
+    "Hi, do you have anything open this Thursday afternoon?",
+    "Thanks so much! See you then",
+    "Can I move my appointment to next week?",
+    "What time do you close on Saturdays?",
+    "Running about 10 minutes late, sorry!",
+    "How much is a color and cut?",
+    "ok sounds good, what's the address again?",
+    "Yes please book me for 3pm",
+    "Is parking available nearby?",
+    "Got it, thank you",
+    "Do you take walk-ins?",
+    "Can you send me the invoice?",
+]
+KEYWORDS = ["YES", "Yes!", "STOP", "stop", "No", "HELP", "Unsubscribe", "ok"]
+
+
+class _DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _seed(db, customers: int, pending_share: float) -> list:
+    business = BusinessProfile(business_name="Bench Salon", industry="Beauty", business_goal="Retention",
+                               primary_services="Hair", representative_name="Sam", timezone="UTC")
+    db.add(business)
+    db.flush()
+    phones = []
+    for i in range(customers):
+        phone = f"+1555{i:07d}"
+        customer = Customer(customer_name=f"Customer {i}", phone=phone, lifecycle_stage="Lead", business_id=business.id)
+        db.add(customer)
+        db.flush()
+        if random.random() < pending_share:
+            db.add(ConsentLog(customer_id=customer.id, business_id=business.id, phone_number=phone,
+                              method="sms_double_optin", status="pending_confirmation"))
+        phones.append(phone)
+    db.commit()
+    return phones
+
+
+def _corpus(phones: list, messages: int, keyword_share: float) -> list:
+    return [
+        (random.choice(phones), random.choice(KEYWORDS) if random.random() < keyword_share else random.choice(CONVERSATION))
+        for _ in range(messages)
+    ]
+
+
+def _before(db, phone: str, body: str) -> None:
+    # The query the old code ran for every inbound message.
+    db.query(ConsentLog).filter(
+        ConsentLog.phone_number == phone,
+        ConsentLog.status.in_(["pending_confirmation", "pending"])
+    ).order_by(desc(ConsentLog.sent_at)).first()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consent fast-path benchmark")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--keyword-share", type=float, default=0.04)
+    parser.add_argument("--pending-share", type=float, default=0.05)
+    args = parser.parse_args()
+    random.seed(7)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    phones = _seed(db, args.customers, args.pending_share)
+    corpus = _corpus(phones, args.messages, args.keyword_share)
+
+    consent_queries = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "consent_log" in statement:
+            consent_queries["n"] += 1
+
+    started = time.perf_counter()
+    for phone, body in corpus:
+        _before(db, phone, body)
+    before_s, before_queries = time.perf_counter() - started, consent_queries["n"]
+
+    consent_queries["n"] = 0
+    service = ConsentService.__new__(ConsentService)  # no Twilio client needed for replies
+    service.db = db
+
+    async def run_after():
+        for phone, body in corpus:
+            await service.process_sms_response(phone_number=phone, response=body.lower())
+
+    with patch.object(consent_service, "redis_client", _DictRedis()):
+        started = time.perf_counter()
+        asyncio.run(run_after())
+        after_s, after_queries = time.perf_counter() - started, consent_queries["n"]
+
+    print(f"{args.messages} inbound messages, {args.keyword_share:.0%} keyword replies, "
+          f"{args.pending_share:.0%} of {args.customers} customers with a pending request")
+    print(f"{'query every message':<24} consent_log queries={before_queries:6d}  total={before_s:6.2f}s  "
+          f"per message={before_s / args.messages * 1e6:7.1f}us")
+    print(f"{'keyword-gated':<24} consent_log queries={after_queries:6d}  total={after_s:6.2f}s  "
+          f"per message={after_s / args.messages * 1e6:7.1f}us")
+    print(f"messages answered without a consent_log query: {1 - after_queries / args.messages:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# backend/benchmarks/bench_worker_event_loop.py
+
+# Per-task overhead of running the async Twilio send from a sync Celery task:
+#   before: asyncio.run() per task (new loop + new HTTP session + new TCP connection each time)
+#   after:  run_async() on the persistent worker loop (pooled keep-alive session reused)
+#
+# Sends go to a local stub of the Twilio Messages API, so the numbers isolate the
+# loop/session/connection setup cost rather than network latency.
+#
+# Usage (from backend/):  python -m benchmarks.bench_worker_event_loop --sends 3000
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from aiohttp import web
+
+from app.config import settings
+from app.twilio_client import close_async_twilio_client, get_async_twilio_client
+from app.worker_loop import run_async, stop_worker_loop
+
+ACCOUNT_SID = "AC" + "0" * 32
+
+
+def _start_stub_twilio() -> str:
+    """Starts a Messages.json stub on a background thread and returns its base URL."""
+    counter = {"n": 0}
+
+    async def create_message(request: web.Request) -> web.Response:
+        form = await request.post()
+        counter["n"] += 1
+        return web.json_response({
+            "sid": f"SM{counter['n']:032d}", "status": "queued",
+            "to": form.get("To"), "body": form.get("Body"),
+            "account_sid": request.match_info["sid"],
+        }, status=201)
+
+    app = web.Application()
+    app.router.add_post("/2010-04-01/Accounts/{sid}/Messages.json", create_message)
+    ready = threading.Event()
+    holder = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        holder["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{holder['port']}"
+
+
+async def _send(i: int) -> str:
+    message = await get_async_twilio_client().messages.create_async(
+        to="+15550000000", from_="+15551111111", body=f"benchmark {i}"
+    )
+    return message.sid
+
+
+async def _send_and_close(i: int) -> str:
+    try:
+        return await _send(i)
+    finally:
+        await close_async_twilio_client()
+
+
+def _per_task_ms(run_one, sends: int) -> list:
+    timings = []
+    for i in range(sends):
+        started = time.perf_counter()
+        run_one(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    ordered = sorted(timings)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(f"{label:<28} total={sum(timings) / 1000:7.2f}s  mean={statistics.mean(timings):6.3f}ms  "
+          f"p50={statistics.median(timings):6.3f}ms  p99={p99:6.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Celery task event-loop overhead benchmark")
+    parser.add_argument("--sends", type=int, default=3000)
+    args = parser.parse_args()
+
+    settings.TWILIO_API_BASE_URL = _start_stub_twilio()
+    settings.TWILIO_ACCOUNT_SID = ACCOUNT_SID
+    settings.TWILIO_AUTH_TOKEN = "benchmark-token"
+
+    before = _per_task_ms(lambda i: asyncio.run(_send_and_close(i)), args.sends)
+    after = _per_task_ms(lambda i: run_async(_send(i)), args.sends)
+    stop_worker_loop(cleanup=close_async_twilio_client())
+
+    print(f"{args.sends} stubbed sends per mode")
+    _report("asyncio.run() per task", before)
+    _report("persistent worker loop", after)
+    print(f"per-task overhead saved: {statistics.mean(before) - statistics.mean(after):.3f}ms "
+          f"({statistics.mean(before) / statistics.mean(after):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from starlette.middleware.sessions import SessionMiddleware
 from app.celery_app import ping
 from app.config import settings
 from app.database import Base, engine
+from app.twilio_client import close_async_twilio_client
 from app.routes import (
     ai_routes,
     approval_routes,
@@ -39,7 +40,8 @@ from app.routes import (
     tag_routes,
     follow_up_plan_routes,
     copilot_growth_routes,
-    roadmap_editor_routes
+    roadmap_editor_routes,
+    stats_routes
 )
 
 logger = logging.getLogger(__name__)
@@ -71,7 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor", "ETag"],  # "*" is not honoured for credentialed requests
 )
 
 Base.metadata.create_all(bind=engine)
@@ -115,6 +117,12 @@ app.include_router(message_workflow_routes.router, prefix="/message-workflow", t
 app.include_router(engagement_routes.router, prefix="/engagements", tags=["engagements"])
 app.include_router(onboarding_preview_route.router, prefix="/onboarding-preview", tags=["onboarding"])
 app.include_router(roadmap_editor_routes.router, prefix="/roadmap-editor", tags=["Roadmap Editor"])
+app.include_router(stats_routes.router, prefix="/stats", tags=["stats"])
+
+
+@app.on_event("shutdown")
+async def close_twilio_transport() -> None:
+    await close_async_twilio_client()
 
 
 # --- Root and Debug Endpoints ---
@@ -1,5 +1,8 @@
+import asyncio
+import itertools
 import sys
 import os
+import threading
 # Add the 'backend' directory to sys.path to allow 'from app...' imports
 BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BACKEND_DIR not in sys.path:
@@ -8,6 +11,7 @@ if BACKEND_DIR not in sys.path:
 import pytest # Ensure pytest is imported
 # os is already imported above
 
+from aiohttp import web
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.database import Base # Changed from backend.app.database
@@ -81,6 +85,13 @@ def mock_customer(db: Session, mock_business: BusinessProfile): # Changed db_ses
     db.refresh(customer)
     return customer
 
+@pytest.fixture(scope="function")
+def opted_in_customer(db: Session, mock_customer: Customer):
+    """mock_customer with opted_in set, for tests that send to it."""
+    mock_customer.opted_in = True
+    db.commit()
+    return mock_customer
+
 @pytest.fixture(scope="function")
 def mock_current_user_fixture():
     """Returns a mock BusinessProfile object for API tests."""
@@ -99,3 +110,105 @@ def test_app_client_fixture():
     from main import app # Changed from backend.main
     with TestClient(app) as client:
         yield client
+
+
+# --- Local fake Twilio REST API ---
+
+class FakeTwilioServer:
+    """
+    Minimal stand-in for the Twilio Messages API, served by aiohttp on a background thread.
+    Point the app at it via settings.TWILIO_API_BASE_URL (done by the `fake_twilio` fixture).
+    """
+
+    def __init__(self):
+        self.requests = []          # Form payloads of every Messages.json POST
+        self.peers = set()          # Client (host, port) pairs seen; one per TCP connection
+        self.delay_seconds = 0.0    # Artificial latency per request
+        self.error = None           # (http_status, twilio_error_code, message) to fail requests
+        self._sid_counter = itertools.count(1)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.base_url = None
+
+    async def _create_message(self, request: web.Request) -> web.Response:
+        form = dict(await request.post())
+        self.requests.append(form)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.delay_seconds:
+            await asyncio.sleep(self.delay_seconds)
+        account_sid = request.match_info["account_sid"]
+        if self.error:
+            http_status, code, message = self.error
+            return web.json_response(
+                {"code": code, "message": message, "more_info": "", "status": http_status},
+                status=http_status,
+            )
+        sid = f"SM{next(self._sid_counter):032d}"
+        return web.json_response({
+            "sid": sid,
+            "account_sid": account_sid,
+            "messaging_service_sid": form.get("MessagingServiceSid"),
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "body": form.get("Body"),
+            "status": "accepted" if form.get("MessagingServiceSid") else "queued",
+            "error_code": None,
+            "error_message": None,
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+        }, status=201)
+
+    def start(self):
+        started = threading.Event()
+
+        async def _serve():
+            app = web.Application()
+            app.router.add_post("/2010-04-01/Accounts/{account_sid}/Messages.json", self._create_message)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            port = self._runner.addresses[0][1]
+            self.base_url = f"http://127.0.0.1:{port}"
+            started.set()
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(_serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        started.wait(timeout=5)
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture(scope="function")
+def fake_twilio(monkeypatch):
+    """Runs FakeTwilioServer and points the pooled Twilio client (app/twilio_client.py) at it."""
+    from app.config import settings
+    server = FakeTwilioServer().start()
+    monkeypatch.setattr(settings, "TWILIO_API_BASE_URL", server.base_url)
+    monkeypatch.setattr(settings, "TWILIO_ACCOUNT_SID", "ACfake00000000000000000000000000")
+    monkeypatch.setattr(settings, "TWILIO_AUTH_TOKEN", "fake-auth-token")
+    monkeypatch.setattr(settings, "TWILIO_SUPPORT_MESSAGING_SERVICE_SID", "MGsupport0000000000000000000000")
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture(autouse=True)
+def isolated_lookup_caches(monkeypatch):
+    """IDs and phone numbers are reused as tables are recreated, so lookup caches must not outlive a test."""
+    from app.services import consent_service, tenant_routing_service
+    monkeypatch.setattr(tenant_routing_service, "redis_client", None)
+    monkeypatch.setattr(consent_service, "redis_client", None)
+    tenant_routing_service.clear_local_cache()
+    yield
+    tenant_routing_service.clear_local_cache()
@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from fastapi.responses import PlainTextResponse
 
-from app.services.consent_service import ConsentService
+from app.services.consent_service import ConsentService, apply_consent_state, classify_consent_keyword, invalidate_pending_consent, CONSENT_HELP, CONSENT_OPT_IN, CONSENT_OPT_OUT
 from app.models import (
     Customer,
     BusinessProfile,
@@ -255,6 +255,49 @@ async def test_process_sms_response_no_pending_log(
     # Assert
     assert response is None
 
+@pytest.mark.parametrize("text, expected", [
+    ("YES", CONSENT_OPT_IN), ("  Yes! ", CONSENT_OPT_IN), ("start", CONSENT_OPT_IN),
+    ("Stop", CONSENT_OPT_OUT), ("STOP ALL", CONSENT_OPT_OUT), ("opt  out", CONSENT_OPT_OUT),
+    ("help", CONSENT_HELP), ("Yes, is Tuesday at 3 still open?", None), ("stop by tomorrow", None), ("", None),
+])
+def test_classify_consent_keyword(text, expected):
+    assert classify_consent_keyword(text) == expected
+
+@pytest.mark.asyncio
+async def test_process_sms_response_skips_db_for_conversation(consent_service_instance: ConsentService, mock_customer: Customer):
+    with patch.object(consent_service_instance.db, "query") as mock_query:
+        response = await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="Can I move my appointment?")
+    assert response is None
+    mock_query.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_process_sms_response_caches_phones_without_pending_consent(
+    db: Session, consent_service_instance: ConsentService, mock_business: BusinessProfile, mock_customer: Customer
+):
+    cache = {}
+    mock_redis = MagicMock()
+    mock_redis.get.side_effect = cache.get
+    mock_redis.set.side_effect = lambda key, value, ex=None: cache.__setitem__(key, value)
+    mock_redis.delete.side_effect = lambda key: cache.pop(key, None)
+
+    with patch('app.services.consent_service.redis_client', mock_redis):
+        assert await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="yes") is None
+        with patch.object(db, "query") as mock_query:
+            assert await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="yes") is None
+        mock_query.assert_not_called()
+
+        db.add(ConsentLog(customer_id=mock_customer.id, business_id=mock_business.id, phone_number=mock_customer.phone,
+                          status="pending_confirmation", method="sms_double_optin"))
+        db.commit()
+        invalidate_pending_consent(mock_customer.phone)
+        response = await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="HELP")
+        assert "Reply YES" in response.body.decode()
+        response = await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="yes")
+
+    assert "You're opted in" in response.body.decode()
+    db.refresh(mock_customer)
+    assert mock_customer.sms_opt_in_status == OptInStatus.OPTED_IN.value
+
 @pytest.mark.asyncio
 async def test_check_consent_true(consent_service_instance: ConsentService, mock_customer: Customer, db: Session):
     # Arrange
@@ -345,3 +388,26 @@ async def test_handle_opt_out_manual(db: Session, consent_service_instance: Cons
     assert mock_customer.opted_in is False # Corrected
 
 # Final newline for PEP8
+
+
+@pytest.mark.asyncio
+async def test_consent_projection_follows_each_consent_event(db: Session, consent_service_instance: ConsentService, mock_business: BusinessProfile, mock_customer: Customer):
+    await consent_service_instance.handle_opt_out(phone_number=mock_customer.phone, business_id=mock_business.id, customer_id=mock_customer.id)
+    db.refresh(mock_customer)
+    assert (mock_customer.consent_status, mock_customer.sms_opt_in_status, mock_customer.opted_in) == ("opted_out", "opted_out", False)
+
+    # A new request is shown as pending but does not lift the opt-out until the customer answers.
+    apply_consent_state(mock_customer, "pending_confirmation")
+    db.add(ConsentLog(customer_id=mock_customer.id, business_id=mock_business.id, phone_number=mock_customer.phone,
+                      status="pending_confirmation", method="sms_double_optin"))
+    db.commit()
+    assert (mock_customer.consent_status, mock_customer.sms_opt_in_status) == ("pending_confirmation", "opted_out")
+
+    await consent_service_instance.process_sms_response(phone_number=mock_customer.phone, response="yes")
+    db.refresh(mock_customer)
+    assert (mock_customer.consent_status, mock_customer.sms_opt_in_status, mock_customer.opted_in) == ("opted_in", "opted_in", True)
+    assert mock_customer.consent_updated_at is not None
+
+    # Asking an opted-in customer again keeps the opt-in until they answer.
+    apply_consent_state(mock_customer, "pending_confirmation")
+    assert (mock_customer.consent_status, mock_customer.sms_opt_in_status, mock_customer.opted_in) == ("pending_confirmation", "opted_in", True)
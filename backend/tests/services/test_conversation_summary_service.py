@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+
+from app.services.consent_service import apply_consent_state
+from app.services.conversation_summary_service import rebuild_conversation_summaries
+from app.models import (
+    BusinessInboxCounter, BusinessProfile, CoPilotNudge, ConsentLog, ConversationSummary, Customer, Engagement, Message,
+    MessageStatusEnum, MessageTypeEnum, NudgeStatusEnum, OptInStatus
+)
+
+
+def _summary(db: Session, customer: Customer) -> ConversationSummary:
+    db.expire_all()
+    return db.get(ConversationSummary, customer.id)
+
+
+def _unread_total(db: Session, business: BusinessProfile) -> int:
+    db.expire_all()
+    counter = db.get(BusinessInboxCounter, business.id)
+    return counter.unread_total if counter else 0
+
+
+def _inbound(db: Session, customer: Customer, content: str, at: datetime) -> Message:
+    message = Message(customer_id=customer.id, business_id=customer.business_id, content=content,
+                      message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value, created_at=at)
+    db.add(message)
+    db.commit()
+    return message
+
+
+def test_summary_follows_message_engagement_nudge_and_consent_writes(db: Session, mock_customer: Customer):
+    summary = _summary(db, mock_customer)
+    assert (summary.business_id, summary.unread_count, summary.last_message_at) == (mock_customer.business_id, 0, None)
+
+    now = datetime.now(timezone.utc)
+    _inbound(db, mock_customer, "Is Tuesday open?", now - timedelta(minutes=2))
+    latest = _inbound(db, mock_customer, "Or Wednesday", now - timedelta(minutes=1))
+    db.add(Engagement(customer_id=mock_customer.id, business_id=mock_customer.business_id, message_id=latest.id,
+                      ai_response="Wednesday works!", status=MessageStatusEnum.PENDING_REVIEW.value))
+    db.add(CoPilotNudge(customer_id=mock_customer.id, business_id=mock_customer.business_id, nudge_type="goal_opportunity",
+                        ai_suggestion="Offer a rebooking discount", status=NudgeStatusEnum.ACTIVE.value))
+    db.add(ConsentLog(customer_id=mock_customer.id, business_id=mock_customer.business_id, phone_number=mock_customer.phone,
+                      method="sms_double_optin", status=OptInStatus.OPTED_IN.value, replied_at=now))
+    apply_consent_state(mock_customer, OptInStatus.OPTED_IN.value, now)
+    db.commit()
+
+    summary = _summary(db, mock_customer)
+    assert (summary.last_message_id, summary.last_message_preview) == (latest.id, "Or Wednesday")
+    assert summary.unread_count == 2
+    assert summary.latest_draft_id is not None
+    assert (summary.active_nudge_count, summary.active_nudges) == (1, [{"type": "goal_opportunity", "text": "Offer a rebooking discount"}])
+    assert (summary.consent_status, summary.opted_in) == (OptInStatus.OPTED_IN.value, True)
+
+    mock_customer.last_read_at = now
+    db.commit()
+    assert _summary(db, mock_customer).unread_count == 0
+
+
+def test_summary_consent_stays_not_set_until_a_request_is_sent(db: Session, mock_customer: Customer):
+    mock_customer.opted_in = False
+    db.commit()
+    assert (_summary(db, mock_customer).consent_status, _summary(db, mock_customer).opted_in) == (OptInStatus.NOT_SET.value, False)
+
+    apply_consent_state(mock_customer, OptInStatus.PENDING.value, datetime.now(timezone.utc))
+    db.commit()
+    assert (_summary(db, mock_customer).consent_status, _summary(db, mock_customer).opted_in) == (OptInStatus.PENDING.value, False)
+
+
+def test_summary_rolls_back_with_the_write(db: Session, mock_customer: Customer):
+    _inbound(db, mock_customer, "First", datetime.now(timezone.utc))
+    db.add(Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="Never committed",
+                   message_type=MessageTypeEnum.INBOUND.value))
+    db.flush()
+    db.rollback()
+
+    summary = _summary(db, mock_customer)
+    assert (summary.last_message_preview, summary.unread_count) == ("First", 1)
+
+
+def test_rebuild_restores_missing_rows(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    _inbound(db, mock_customer, "Hello", datetime.now(timezone.utc))
+    db.query(ConversationSummary).delete()
+    db.commit()
+
+    assert rebuild_conversation_summaries(db, mock_business.id) == 1
+    assert _summary(db, mock_customer).last_message_preview == "Hello"
+
+
+def test_unread_counters_move_with_inbound_messages_and_mark_as_read(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    other = Customer(business_id=mock_business.id, customer_name="Other", phone="+15550009999", lifecycle_stage="Lead")
+    db.add(other)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    _inbound(db, mock_customer, "One", now - timedelta(minutes=3))
+    second = _inbound(db, mock_customer, "Two", now - timedelta(minutes=2))
+    _inbound(db, other, "Hey", now - timedelta(minutes=1))
+    db.add(Message(customer_id=mock_customer.id, business_id=mock_business.id, content="Our reply",
+                   message_type=MessageTypeEnum.OUTBOUND.value, status=MessageStatusEnum.SENT.value))
+    db.commit()
+    assert (_summary(db, mock_customer).unread_count, _unread_total(db, mock_business)) == (2, 3)
+
+    db.delete(second)
+    db.commit()
+    assert (_summary(db, mock_customer).unread_count, _unread_total(db, mock_business)) == (1, 2)
+
+    mock_customer.last_read_at = now
+    db.commit()
+    assert (_summary(db, mock_customer).unread_count, _unread_total(db, mock_business)) == (0, 1)
+
+    db.delete(other)
+    db.commit()
+    assert _unread_total(db, mock_business) == 0
+
+
+def test_rebuild_recounts_drifted_unread_counters(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    _inbound(db, mock_customer, "Hello", datetime.now(timezone.utc))
+    db.query(ConversationSummary).update({"unread_count": 7})
+    db.query(BusinessInboxCounter).update({"unread_total": 7})
+    db.commit()
+
+    rebuild_conversation_summaries(db, mock_business.id)
+    assert (_summary(db, mock_customer).unread_count, _unread_total(db, mock_business)) == (1, 1)
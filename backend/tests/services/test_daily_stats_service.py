@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.models import (
+    BusinessDailyStats, BusinessProfile, ConsentLog, Customer, Engagement, Message, MessageStatusEnum, OptInStatus
+)
+from app.services.daily_stats_service import get_daily_stats, get_metric_totals, rollup_daily_stats, utc_today
+
+
+def _sent(db: Session, customer: Customer, at: datetime, source: str = "roadmap") -> Message:
+    message = Message(customer_id=customer.id, business_id=customer.business_id, content="Hi", message_type="scheduled",
+                      status=MessageStatusEnum.SENT.value, sent_at=at, created_at=at, message_metadata={"source": source})
+    db.add(message)
+    db.flush()
+    return message
+
+
+def _seed(db: Session, customer: Customer, now: datetime) -> None:
+    three_days_ago, yesterday = now - timedelta(days=3), now - timedelta(days=1)
+    _sent(db, customer, three_days_ago)
+    _sent(db, customer, three_days_ago, source="instant_nudge")
+    reply_to = _sent(db, customer, yesterday)
+    db.add(Engagement(customer_id=customer.id, business_id=customer.business_id, message_id=reply_to.id, response="Thanks!",
+                      ai_response="You're welcome", status=MessageStatusEnum.AUTO_REPLIED_FAQ.value, created_at=yesterday))
+    db.add(ConsentLog(customer_id=customer.id, business_id=customer.business_id, phone_number=customer.phone,
+                      method="sms_double_optin", status=OptInStatus.OPTED_IN.value, replied_at=yesterday))
+    _sent(db, customer, now)
+    db.commit()
+
+
+def test_rollup_covers_completed_days_and_reads_top_up_today(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    now = datetime.now(timezone.utc).replace(hour=12)
+    today = utc_today()
+    _seed(db, mock_customer, now)
+
+    assert rollup_daily_stats(db, today)["rows"] == 2
+    rows = {row.day: row for row in db.query(BusinessDailyStats).filter(BusinessDailyStats.business_id == mock_business.id)}
+    assert set(rows) == {today - timedelta(days=3), today - timedelta(days=1)}  # today is never rolled up
+    assert (rows[today - timedelta(days=3)].messages_sent, rows[today - timedelta(days=3)].instant_nudges_sent) == (2, 1)
+    yesterday = rows[today - timedelta(days=1)]
+    assert (yesterday.replies_received, yesterday.drafts_created, yesterday.auto_replies, yesterday.opt_ins) == (1, 1, 1, 1)
+
+    _sent(db, mock_customer, now)
+    db.commit()
+    series = get_daily_stats(db, mock_business.id, today - timedelta(days=3), today)
+    assert [entry["messages_sent"] for entry in series] == [2, 0, 1, 2]
+
+    all_time, last_2_days = get_metric_totals(db, mock_business.id, None, today - timedelta(days=1))
+    assert (all_time["messages_sent"], last_2_days["messages_sent"], last_2_days["opt_ins"]) == (5, 3, 1)
+
+
+def test_rollup_recomputes_the_lookback_window_only(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    now = datetime.now(timezone.utc).replace(hour=12)
+    today = utc_today()
+    _seed(db, mock_customer, now)
+    rollup_daily_stats(db, today)
+
+    # A late receipt for yesterday is picked up by the next run; nothing is rolled up twice.
+    _sent(db, mock_customer, now - timedelta(days=1))
+    db.commit()
+    summary = rollup_daily_stats(db, today)
+
+    assert (summary["start"], summary["end"]) == ((today - timedelta(days=2)).isoformat(), (today - timedelta(days=1)).isoformat())
+    assert db.get(BusinessDailyStats, (mock_business.id, today - timedelta(days=1))).messages_sent == 2
+    assert db.query(BusinessDailyStats).count() == 2
@@ -0,0 +1,130 @@
+import json
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.services.delivery_status_service import (
+    parse_status_callback,
+    buffer_status_callback,
+    apply_receipts,
+    build_values_update,
+    flush_buffered_receipts,
+    STATUS_CALLBACK_QUEUE_KEY,
+)
+from app.models import Message, Customer, MessageStatusEnum, MessageTypeEnum
+
+
+def _sent_message(db: Session, customer: Customer, sid: str, status: str = MessageStatusEnum.SENT.value) -> Message:
+    message = Message(
+        customer_id=customer.id,
+        business_id=customer.business_id,
+        content="Outbound hello",
+        message_type=MessageTypeEnum.SCHEDULED.value,
+        status=status,
+        sent_at=datetime.now(timezone.utc),
+        twilio_sid=sid,
+    )
+    db.add(message)
+    db.commit()
+    return message
+
+
+def _receipt(sid: str, twilio_status: str, error_code: str = None) -> dict:
+    form = {"MessageSid": sid, "MessageStatus": twilio_status}
+    if error_code:
+        form["ErrorCode"] = error_code
+    return parse_status_callback(form)
+
+
+def test_parse_status_callback_maps_twilio_statuses():
+    assert _receipt("SM1", "delivered")["status"] == MessageStatusEnum.DELIVERED.value
+    assert _receipt("SM1", "undelivered", "30003") == {
+        "sid": "SM1", "status": MessageStatusEnum.FAILED.value, "error_code": "30003", "received_at": pytest.approx(time.time(), abs=5)
+    }
+    assert parse_status_callback({"MessageSid": "SM1", "MessageStatus": "queued"}) is None
+    assert parse_status_callback({"MessageStatus": "delivered"}) is None
+
+
+def test_apply_receipts_updates_matching_messages_in_one_batch(db: Session, mock_customer: Customer):
+    delivered = _sent_message(db, mock_customer, "SMdelivered")
+    undelivered = _sent_message(db, mock_customer, "SMundelivered")
+    untouched = _sent_message(db, mock_customer, "SMother")
+    ids = (delivered.id, undelivered.id, untouched.id)
+
+    unmatched = apply_receipts(db, [
+        _receipt("SMdelivered", "sent"),
+        _receipt("SMdelivered", "delivered"),
+        _receipt("SMundelivered", "undelivered", "30003"),
+        _receipt("SMunknown", "delivered"),
+    ])
+
+    assert [r["sid"] for r in unmatched] == ["SMunknown"]
+    db.expire_all()
+    assert db.query(Message).get(ids[0]).delivery_status == MessageStatusEnum.DELIVERED.value
+    assert db.query(Message).get(ids[1]).delivery_status == MessageStatusEnum.FAILED.value
+    assert db.query(Message).get(ids[1]).delivery_error_code == "30003"
+    assert db.query(Message).get(ids[2]).delivery_status is None
+    # The receipt never rewrites status: every one of them still went out.
+    assert [db.query(Message).get(message_id).status for message_id in ids] == [MessageStatusEnum.SENT.value] * 3
+
+
+def test_apply_receipts_ignores_out_of_order_receipts_and_keeps_status(db: Session, mock_customer: Customer):
+    late_id = _sent_message(db, mock_customer, "SMlate").id
+    faq_id = _sent_message(db, mock_customer, "SMfaq", status=MessageStatusEnum.AUTO_REPLIED_FAQ.value).id
+
+    apply_receipts(db, [_receipt("SMlate", "delivered")])
+    apply_receipts(db, [_receipt("SMlate", "sent")])
+    apply_receipts(db, [_receipt("SMfaq", "delivered")])
+
+    db.expire_all()
+    assert db.query(Message).get(late_id).delivery_status == MessageStatusEnum.DELIVERED.value
+    assert db.query(Message).get(faq_id).status == MessageStatusEnum.AUTO_REPLIED_FAQ.value
+    assert db.query(Message).get(faq_id).delivery_status == MessageStatusEnum.DELIVERED.value
+
+
+def test_build_values_update_uses_update_from_values_on_postgres():
+    statement = build_values_update([{"sid": "SM1", "status": "delivered", "rank": 2, "error_code": None}])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("UPDATE messages SET delivery_status=receipts.status")
+    assert "FROM (VALUES" in sql
+    assert "messages.twilio_sid = receipts.sid" in sql
+
+
+def test_buffer_status_callback_pushes_to_redis(db: Session):
+    mock_redis = MagicMock()
+    receipt = _receipt("SM1", "delivered")
+    with patch('app.services.delivery_status_service.redis_client', mock_redis):
+        buffer_status_callback(db, receipt)
+
+    mock_redis.rpush.assert_called_once_with(STATUS_CALLBACK_QUEUE_KEY, json.dumps(receipt))
+
+
+def test_buffer_status_callback_applies_inline_without_redis(db: Session, mock_customer: Customer):
+    message_id = _sent_message(db, mock_customer, "SMinline").id
+    with patch('app.services.delivery_status_service.redis_client', None):
+        buffer_status_callback(db, _receipt("SMinline", "delivered"))
+
+    db.expire_all()
+    assert db.query(Message).get(message_id).delivery_status == MessageStatusEnum.DELIVERED.value
+
+
+def test_flush_buffered_receipts_applies_batch_and_requeues_unmatched(db: Session, mock_customer: Customer):
+    message_id = _sent_message(db, mock_customer, "SMbatch").id
+    stale = {**_receipt("SMgone", "delivered"), "received_at": time.time() - 3600}
+    buffered = [json.dumps(_receipt("SMbatch", "delivered")), json.dumps(_receipt("SMnotyet", "sent")), json.dumps(stale)]
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value.execute.return_value = [buffered, True]
+
+    with patch('app.services.delivery_status_service.redis_client', mock_redis):
+        summary = flush_buffered_receipts(db)
+
+    assert summary == {"processed": 3, "requeued": 1, "dropped": 1}
+    requeued = mock_redis.rpush.call_args.args
+    assert requeued[0] == STATUS_CALLBACK_QUEUE_KEY
+    assert json.loads(requeued[1])["sid"] == "SMnotyet"
+    db.expire_all()
+    assert db.query(Message).get(message_id).delivery_status == MessageStatusEnum.DELIVERED.value
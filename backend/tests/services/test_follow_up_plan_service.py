@@ -20,7 +20,6 @@ from app.models import (
 )
 from app.services.follow_up_plan_service import FollowUpPlanService
 from app.schemas import ActivateEngagementPlanPayload, PlanMessage # MessageData for payload
-from app.celery_app import celery_app # For mocking revoke
 
 # Assuming conftest.py provides:
 # - db: Session fixture
@@ -82,18 +81,13 @@ async def test_activate_plan_success_new_conversation(
 
     nudge = create_follow_up_nudge(db, mock_business.id, mock_customer.id)
 
-    mock_celery_task_result = MagicMock()
-    mock_celery_task_result.id = "test-celery-task-id-" + str(uuid.uuid4())
-
-    with patch('app.services.follow_up_plan_service.process_scheduled_message_task.apply_async', return_value=mock_celery_task_result) as mock_apply_async:
-        # Act
-        result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
+    # Act
+    result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
 
     # Assert
     assert result["status"] == "success"
     assert result["created_message_ids"] is not None
     assert len(result["created_message_ids"]) == 2
-    assert len(result["celery_task_ids"]) == 2
 
     db.refresh(nudge)
     assert nudge.status == NudgeStatusEnum.ACTIONED
@@ -112,21 +106,16 @@ async def test_activate_plan_success_new_conversation(
 
     assert messages[0].content == "Follow up message 1"
     assert messages[0].status == MessageStatusEnum.SCHEDULED.value
-    assert messages[0].message_metadata['celery_task_id'] is not None
+    assert messages[0].claimed_at is None # Left for the dispatch_due_messages sweeper
     assert messages[0].message_metadata['source'] == 'follow_up_nudge_plan'
 
     assert messages[1].content == "Follow up message 2"
     assert messages[1].status == MessageStatusEnum.SCHEDULED.value
 
-    assert mock_apply_async.call_count == 2
-    # Check ETA for the first call (example)
-    first_call_args = mock_apply_async.call_args_list[0]
-    assert first_call_args.kwargs['args'][0] == result["created_message_ids"][0] # message.id
-    # Ensure ETA is timezone-aware if scheduled_time is
-    expected_eta1 = message_data_list[0].send_datetime_utc
-    if expected_eta1.tzinfo is None: # if naive from schema
-        expected_eta1 = pytz.utc.localize(expected_eta1)
-    assert first_call_args.kwargs['eta'] == expected_eta1
+    expected_time1 = message_data_list[0].send_datetime_utc
+    if expected_time1.tzinfo is None: # if naive from schema
+        expected_time1 = pytz.utc.localize(expected_time1)
+    assert messages[0].scheduled_time.replace(tzinfo=pytz.utc) == expected_time1
 
 
 @pytest.mark.asyncio
@@ -153,12 +142,8 @@ async def test_activate_plan_success_existing_conversation(
     payload = ActivateEngagementPlanPayload(customer_id=mock_customer.id, messages=message_data_list)
     nudge = create_follow_up_nudge(db, mock_business.id, mock_customer.id)
 
-    mock_celery_task_result = MagicMock()
-    mock_celery_task_result.id = "celery-task-existing-convo"
-
-    with patch('app.services.follow_up_plan_service.process_scheduled_message_task.apply_async', return_value=mock_celery_task_result) as mock_apply_async:
-        # Act
-        result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
+    # Act
+    result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
 
     # Assert
     assert result["status"] == "success"
@@ -171,7 +156,7 @@ async def test_activate_plan_success_existing_conversation(
     assert len(messages) == 1 # Assuming no other messages for this customer in this test setup
     assert messages[0].conversation_id == existing_convo.id # Verify existing convo was used
     assert messages[0].content == "Follow up message 3"
-    mock_apply_async.assert_called_once()
+    assert messages[0].status == MessageStatusEnum.SCHEDULED.value
 
 @pytest.mark.asyncio
 async def test_activate_plan_nudge_not_found(follow_up_service: FollowUpPlanService, mock_business: BusinessProfile, mock_customer: Customer):
@@ -228,11 +213,7 @@ async def test_activate_plan_some_messages_past_dated(
     payload = ActivateEngagementPlanPayload(customer_id=mock_customer.id, messages=message_data_list)
     nudge = create_follow_up_nudge(db, mock_business.id, mock_customer.id)
 
-    mock_celery_task_result = MagicMock()
-    mock_celery_task_result.id = "celery-task-past-dated"
-
-    with patch('app.services.follow_up_plan_service.process_scheduled_message_task.apply_async', return_value=mock_celery_task_result) as mock_apply_async:
-        result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
+    result = await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
 
     assert result["status"] == "success"
     assert len(result["created_message_ids"]) == 1 # Only future message
@@ -240,29 +221,6 @@ async def test_activate_plan_some_messages_past_dated(
     messages = db.query(Message).filter(Message.customer_id == mock_customer.id).all()
     assert len(messages) == 1
     assert messages[0].content == "Future message"
-    mock_apply_async.assert_called_once() # Called only for the future message
-
-@pytest.mark.asyncio
-async def test_activate_plan_celery_apply_async_fails(
-    follow_up_service: FollowUpPlanService, db: Session, mock_business: BusinessProfile, mock_customer: Customer
-):
-    now_utc = datetime.now(pytz.utc)
-    message_data_list = [PlanMessage(text="Test message", send_datetime_utc=now_utc + timedelta(days=1))]
-    payload = ActivateEngagementPlanPayload(customer_id=mock_customer.id, messages=message_data_list)
-    nudge = create_follow_up_nudge(db, mock_business.id, mock_customer.id)
-
-    with patch('app.services.follow_up_plan_service.process_scheduled_message_task.apply_async', side_effect=Exception("Celery down")) as mock_apply_async:
-        with pytest.raises(HTTPException) as exc_info:
-            await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
-
-    assert exc_info.value.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
-    assert "Failed to schedule messages" in exc_info.value.detail
-
-    db.refresh(nudge) # Nudge status should not change
-    assert nudge.status == NudgeStatusEnum.ACTIVE
-
-    messages_count = db.query(Message).filter(Message.customer_id == mock_customer.id).count()
-    assert messages_count == 0 # No messages should be committed
 
 @pytest.mark.asyncio
 async def test_activate_plan_final_commit_fails(
@@ -273,12 +231,7 @@ async def test_activate_plan_final_commit_fails(
     payload = ActivateEngagementPlanPayload(customer_id=mock_customer.id, messages=message_data_list)
     nudge = create_follow_up_nudge(db, mock_business.id, mock_customer.id)
 
-    mock_celery_task_result = MagicMock()
-    mock_celery_task_result.id = "celery-task-commit-fail"
-
-    with patch('app.services.follow_up_plan_service.process_scheduled_message_task.apply_async', return_value=mock_celery_task_result) as mock_apply_async, \
-         patch.object(db, 'commit', side_effect=Exception("Final commit failed")) as mock_db_commit, \
-         patch('app.services.follow_up_plan_service.celery_app.control.revoke') as mock_celery_revoke:
+    with patch.object(db, 'commit', side_effect=Exception("Final commit failed")) as mock_db_commit:
 
         with pytest.raises(HTTPException) as exc_info:
             await follow_up_service.activate_plan_from_nudge(nudge.id, payload, mock_business.id)
@@ -286,14 +239,9 @@ async def test_activate_plan_final_commit_fails(
     assert exc_info.value.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "Failed to finalize plan activation" in exc_info.value.detail
 
-    # Check that commit was attempted (after flush, before final exception)
-    # The service has multiple db.commit() points; the one after celery tasks is the target.
-    # For simplicity, we check it was called at least once before the mocked failure.
-    # The critical one is the *last* commit. Here, we mock the final one.
-    assert mock_db_commit.call_count > 0 # It's called after adding messages and before updating nudge
-
-    mock_celery_revoke.assert_called_once_with("celery-task-commit-fail", terminate=True)
+    assert mock_db_commit.call_count > 0
 
     db.rollback() # Clean up session from failed commit attempt in test
     db.refresh(nudge)
     assert nudge.status == NudgeStatusEnum.ACTIVE # Status should not have changed
+    assert db.query(Message).filter(Message.customer_id == mock_customer.id).count() == 0 # Nothing left scheduled
@@ -0,0 +1,250 @@
+import pytest
+from celery.exceptions import Retry
+from redis.exceptions import LockNotOwnedError
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.services.inbound_pipeline_service import (
+    InboundPipeline,
+    inbound_partition,
+    inbound_partition_queue,
+    record_inbound_event,
+    pending_senders,
+    EVENT_PROCESSED,
+    EVENT_RECEIVED,
+    STAGE_AI_DRAFT,
+    STAGE_CONSENT,
+    STAGE_NOTIFY,
+    STAGE_NUDGES,
+)
+from app.celery_tasks import process_inbound_events_task, sweep_inbound_events_task
+from app.models import (
+    BusinessProfile, Customer, Engagement, InboundEvent, Message, MessageStatusEnum, MessageTypeEnum, OptInStatus
+)
+
+BUSINESS_NUMBER = "+15557778888"
+CUSTOMER_NUMBER = "+15551112222"
+
+
+@pytest.fixture
+def routed_customer(db: Session, mock_business: BusinessProfile) -> Customer:
+    mock_business.twilio_number = BUSINESS_NUMBER
+    mock_business.messaging_service_sid = "MGtest"
+    mock_business.notify_owner_on_reply_with_link = False
+    customer = Customer(
+        customer_name="Texter", phone=CUSTOMER_NUMBER, lifecycle_stage="Lead", business_id=mock_business.id,
+        opted_in=True, sms_opt_in_status=OptInStatus.OPTED_IN.value
+    )
+    db.add(customer)
+    db.commit()
+    return customer
+
+
+@pytest.fixture
+def services():
+    consent = MagicMock()
+    consent.process_sms_response = AsyncMock(return_value=None)
+    ai = MagicMock()
+    ai.generate_sms_response = AsyncMock(return_value={"text": "Draft reply", "ai_should_reply_directly_as_faq": False})
+    twilio = MagicMock()
+    twilio.send_sms = AsyncMock(return_value="SMreply")
+    with patch('app.services.inbound_pipeline_service.ConsentService', return_value=consent), \
+         patch('app.services.inbound_pipeline_service.AIService', return_value=ai), \
+         patch('app.services.inbound_pipeline_service.TwilioService', return_value=twilio), \
+         patch('app.services.inbound_pipeline_service.CoPilotNudgeGenerationService') as nudges, \
+         patch('app.services.inbound_pipeline_service.celery_app') as celery_app:
+        nudges.return_value.detect_potential_timed_commitments.return_value = []
+        yield {"consent": consent, "ai": ai, "twilio": twilio, "celery_app": celery_app}
+
+
+def _event(db: Session, sid: str, body: str) -> InboundEvent:
+    return record_inbound_event(db, {"MessageSid": sid, "From": CUSTOMER_NUMBER, "To": BUSINESS_NUMBER, "Body": body})
+
+
+@pytest.mark.asyncio
+async def test_drain_sender_processes_events_in_arrival_order(db: Session, routed_customer: Customer, services):
+    first = _event(db, "SMfirst", "Is Tuesday open?")
+    second = _event(db, "SMsecond", "Actually Wednesday")
+    assert pending_senders(db, older_than_seconds=-60) == [(BUSINESS_NUMBER, CUSTOMER_NUMBER)]
+
+    summary = await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER)
+
+    assert summary == {"processed": 2, "discarded": 0, "failed": 0, "deferred": 0}
+    inbound = db.query(Message).filter(Message.message_type == MessageTypeEnum.INBOUND.value).order_by(Message.id).all()
+    assert [m.content for m in inbound] == ["Is Tuesday open?", "Actually Wednesday"]
+    assert [db.get(InboundEvent, e.id).message_id for e in (first, second)] == [m.id for m in inbound]
+    engagements = db.query(Engagement).order_by(Engagement.id).all()
+    assert [e.status for e in engagements] == [MessageStatusEnum.PENDING_REVIEW.value] * 2
+    assert services["ai"].generate_sms_response.await_count == 2
+    services["twilio"].send_sms.assert_not_called()
+    assert services["celery_app"].send_task.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_event_holds_back_later_ones_and_resumes_after_last_stage(db: Session, routed_customer: Customer, services):
+    first = _event(db, "SMfirst", "Hello")
+    second = _event(db, "SMsecond", "Hello again")
+    services["celery_app"].send_task.side_effect = [ConnectionError("broker down"), None, None]
+
+    summary = await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER)
+
+    assert summary["deferred"] == 1
+    db.expire_all()
+    failed_event = db.get(InboundEvent, first.id)
+    assert (failed_event.status, failed_event.stage, failed_event.attempts) == (EVENT_RECEIVED, STAGE_NOTIFY, 1)
+    assert db.get(InboundEvent, second.id).message_id is None
+
+    summary = await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER)
+
+    assert summary["processed"] == 2
+    # The retried event was not logged or drafted a second time.
+    assert db.query(Message).filter(Message.message_type == MessageTypeEnum.INBOUND.value).count() == 2
+    assert db.query(Engagement).count() == 2
+    assert services["ai"].generate_sms_response.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_faq_auto_reply_is_not_resent_when_the_stage_commit_fails(db: Session, mock_business: BusinessProfile, routed_customer: Customer, services):
+    mock_business.enable_ai_faq_auto_reply = True
+    db.commit()
+    services["ai"].generate_sms_response.return_value = {"text": "We open at 9.", "ai_should_reply_directly_as_faq": True}
+    event = _event(db, "SMfaq", "When do you open?")
+    real_commit, failures = db.commit, []
+
+    def _commit_failing_once():
+        if not failures and any(isinstance(obj, InboundEvent) and obj.stage == STAGE_AI_DRAFT for obj in db.dirty):
+            failures.append(1)
+            raise RuntimeError("db went away")
+        real_commit()
+
+    with patch.object(db, "commit", side_effect=_commit_failing_once):
+        assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["deferred"] == 1
+        assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["processed"] == 1
+
+    services["twilio"].send_sms.assert_awaited_once()
+    db.expire_all()
+    reply = db.query(Message).filter(Message.message_type == MessageTypeEnum.OUTBOUND.value).one()
+    assert reply.status == MessageStatusEnum.FAILED.value  # Outcome unknown after the lost commit
+    assert db.query(Engagement).one().status == MessageStatusEnum.PENDING_REVIEW.value
+    assert db.get(InboundEvent, event.id).status == EVENT_PROCESSED
+
+
+@pytest.mark.asyncio
+async def test_owner_alert_is_sent_once_when_a_later_stage_fails(db: Session, mock_business: BusinessProfile, routed_customer: Customer, services):
+    mock_business.notify_owner_on_reply_with_link = True
+    mock_business.business_phone_number = "+15550001111"
+    mock_business.slug = "test-business"
+    db.commit()
+    _event(db, "SMalert", "Can I reschedule?")
+    services["celery_app"].send_task.side_effect = [ConnectionError("broker down"), None]
+
+    assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["deferred"] == 1
+    assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["processed"] == 1
+
+    services["twilio"].send_sms.assert_awaited_once()
+    assert services["twilio"].send_sms.call_args.kwargs["to"] == "+15550001111"
+
+
+@pytest.mark.asyncio
+async def test_consent_reply_is_sent_through_twilio_and_not_logged(db: Session, routed_customer: Customer, services):
+    event = _event(db, "SMstop", "STOP")
+    services["consent"].process_sms_response.return_value = PlainTextResponse("You have successfully been unsubscribed.")
+
+    await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER)
+
+    services["consent"].process_sms_response.assert_awaited_once_with(phone_number=CUSTOMER_NUMBER, response="stop")
+    assert services["twilio"].send_sms.call_args.kwargs["message_body"] == "You have successfully been unsubscribed."
+    db.expire_all()
+    stored = db.get(InboundEvent, event.id)
+    assert (stored.status, stored.stage) == (EVENT_PROCESSED, STAGE_CONSENT)
+    assert db.query(Message).count() == 0
+    services["ai"].generate_sms_response.assert_not_called()
+
+
+def test_inbound_partition_is_stable_per_customer_and_spreads_customers():
+    phones = [f"+1555{i:07d}" for i in range(200)]
+    partitions = [inbound_partition(42, phone, partitions=8) for phone in phones]
+    assert partitions == [inbound_partition(42, phone, partitions=8) for phone in phones]
+    assert set(partitions) == set(range(8))
+
+
+def test_sweep_requeues_each_sender_on_its_partition_queue(db: Session, routed_customer: Customer):
+    event = _event(db, "SMlate", "Anyone there?")
+    event.received_at = event.received_at.replace(year=2020)
+    db.commit()
+    expected_queue = f"inbound.{inbound_partition(routed_customer.business_id, CUSTOMER_NUMBER)}"
+    assert inbound_partition_queue(db, BUSINESS_NUMBER, CUSTOMER_NUMBER) == expected_queue
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.process_inbound_events_task') as mock_task:
+        assert sweep_inbound_events_task.run() == {"enqueued": 1}
+
+    mock_task.apply_async.assert_called_once_with(args=[BUSINESS_NUMBER, CUSTOMER_NUMBER], queue=expected_queue)
+
+
+
+def _run_inbound_task(db: Session, redis, retries: int = 0, summary: dict = None):
+    summary = summary or {"processed": 1, "discarded": 0, "failed": 0, "deferred": 0}
+    process_inbound_events_task.push_request(id="task-1", retries=retries)
+    try:
+        with patch('app.celery_tasks.SessionLocal', return_value=db), \
+             patch('app.celery_tasks.redis_client', redis), \
+             patch('app.celery_tasks.InboundPipeline') as pipeline, \
+             patch('app.celery_tasks.run_async', return_value=summary), \
+             patch.object(process_inbound_events_task, 'retry', side_effect=Retry()) as retry:
+            try:
+                result = process_inbound_events_task.run(BUSINESS_NUMBER, CUSTOMER_NUMBER)
+            except Retry:
+                result = None
+    finally:
+        process_inbound_events_task.pop_request()
+    return result, retry
+
+
+def test_sender_lock_is_released_by_token_not_by_key(db: Session, routed_customer: Customer):
+    redis = MagicMock()
+    redis.lock.return_value.acquire.return_value = True
+    # Our lock expired mid-drain and another worker now holds it: the token check refuses the release.
+    redis.lock.return_value.release.side_effect = LockNotOwnedError("not owned")
+
+    result, retry = _run_inbound_task(db, redis)
+
+    assert result["processed"] == 1
+    redis.lock.assert_called_once_with(f"inbound_sender_lock:{BUSINESS_NUMBER}:{CUSTOMER_NUMBER}", timeout=300)
+    redis.lock.return_value.acquire.assert_called_once_with(blocking=False)
+    redis.lock.return_value.release.assert_called_once()
+    redis.delete.assert_not_called()
+    retry.assert_not_called()
+
+
+def test_inbound_task_retries_with_backoff_then_leaves_the_sender_to_the_sweep(db: Session, routed_customer: Customer, monkeypatch):
+    monkeypatch.setattr(process_inbound_events_task, "max_retries", 3)
+    deferred = {"processed": 0, "discarded": 0, "failed": 0, "deferred": 1}
+    busy = MagicMock()
+    busy.lock.return_value.acquire.return_value = False
+
+    _, retry = _run_inbound_task(db, busy, retries=2)
+    assert retry.call_args.kwargs["countdown"] == 4  # Lock contention: 1s, doubling
+    _, retry = _run_inbound_task(db, None, retries=1, summary=deferred)
+    assert retry.call_args.kwargs["countdown"] == 60  # Deferred event: INBOUND_EVENT_RETRY_SECONDS, doubling
+    result, retry = _run_inbound_task(db, None, retries=3, summary=deferred)
+    assert result == deferred  # Event still 'received', so sweep_inbound_events picks it up
+    retry.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_help_reply_is_sent_once_and_the_message_is_still_logged(db: Session, routed_customer: Customer, services):
+    event = _event(db, "SMhelp", "HELP")
+    services["consent"].process_sms_response.return_value = PlainTextResponse("Reply YES to receive updates, or STOP to unsubscribe.")
+    services["celery_app"].send_task.side_effect = [ConnectionError("broker down"), None]
+
+    assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["deferred"] == 1
+    assert (await InboundPipeline(db).drain_sender(BUSINESS_NUMBER, CUSTOMER_NUMBER))["processed"] == 1
+
+    services["twilio"].send_sms.assert_awaited_once()
+    assert services["twilio"].send_sms.call_args.kwargs["message_body"] == "Reply YES to receive updates, or STOP to unsubscribe."
+    db.expire_all()
+    stored = db.get(InboundEvent, event.id)
+    assert (stored.status, stored.stage) == (EVENT_PROCESSED, STAGE_NUDGES)
+    assert db.get(Message, stored.message_id).content == "HELP"
+    services["ai"].generate_sms_response.assert_awaited_once()
@@ -14,7 +14,6 @@ from app.models import BusinessProfile, Customer, Message, Conversation, Message
 from app.schemas import PlanMessage
 from app.config import settings
 from app.celery_tasks import process_scheduled_message_task
-from app.services.twilio_service import TwilioService
 
 # Assuming conftest.py provides:
 # - db: Session fixture
@@ -115,10 +114,8 @@ async def test_handle_instant_nudge_batch_send_immediately_success(
 ):
     message_content_template = "Hi {customer_name}, this is an instant nudge!"
     customer_ids = [customer1.id, customer2.id]
-    mock_twilio_service_instance = MagicMock(spec=TwilioService)
-    mock_twilio_service_instance.send_sms = AsyncMock(return_value="SMmocksendimmediately")
 
-    with patch('app.services.instant_nudge_service.TwilioService', return_value=mock_twilio_service_instance) as MockTwilioService, \
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app, \
          patch('app.services.instant_nudge_service.datetime') as mock_datetime:
         mock_now = datetime.now(timezone.utc)
         mock_datetime.now.return_value = mock_now
@@ -129,24 +126,33 @@ async def test_handle_instant_nudge_batch_send_immediately_success(
     assert result["scheduled_count"] == 0
     assert result["failed_count"] == 0
     assert len(result["processed_message_ids"]) == 2
-    MockTwilioService.assert_called_once_with(db)
-    assert mock_twilio_service_instance.send_sms.call_count == 2
-    calls = mock_twilio_service_instance.send_sms.call_args_list
-    kwargs_c1 = calls[0].kwargs
-    assert kwargs_c1['to'] == customer1.phone and "Cust One Instant" in kwargs_c1['message_body']
-    kwargs_c2 = calls[1].kwargs
-    assert kwargs_c2['to'] == customer2.phone and "Cust Two Instant" in kwargs_c2['message_body']
+    # Campaign sends go to the bulk lane, not the interactive one used for inbox replies.
+    mock_celery_app.send_task.assert_called_once_with(
+        'process_scheduled_messages_batch', args=[result["processed_message_ids"]], kwargs={"lane": "bulk"}, queue="bulk"
+    )
 
-    messages = db.query(Message).filter(Message.customer_id.in_(customer_ids)).all()
+    messages = db.query(Message).filter(Message.customer_id.in_(customer_ids)).order_by(Message.customer_id).all()
     assert len(messages) == 2
+    assert "Cust One Instant" in messages[0].content and "Cust Two Instant" in messages[1].content
     for msg in messages:
-        assert msg.status == MessageStatusEnum.SENT.value
+        # Claimed for the send worker, which sets sent_at; the sweeper skips it.
+        assert msg.status == MessageStatusEnum.PROCESSING_SEND.value
         assert msg.message_type == MessageTypeEnum.SCHEDULED.value
-        assert msg.sent_at is not None
-        sent_at_aware = msg.sent_at.replace(tzinfo=timezone.utc) if msg.sent_at.tzinfo is None else msg.sent_at.astimezone(timezone.utc)
-        assert (mock_now - sent_at_aware).total_seconds() < 5
-        engagement = db.query(Engagement).filter(Engagement.message_id == msg.id).first()
-        assert engagement is not None and engagement.status == "sent"
+        assert msg.source == "instant_nudge"
+        assert msg.claimed_at is not None and msg.sent_at is None
+
+@pytest.mark.asyncio
+async def test_handle_instant_nudge_batch_send_immediately_chunks_bulk_tasks(
+    db: Session, mock_business: BusinessProfile, customer1: Customer, customer2: Customer, monkeypatch
+):
+    monkeypatch.setattr(settings, "MESSAGE_SEND_TASK_BATCH_SIZE", 1)
+
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app:
+        result = await handle_instant_nudge_batch(db, mock_business.id, [customer1.id, customer2.id], "Hi {customer_name}")
+
+    calls = mock_celery_app.send_task.call_args_list
+    assert [c.kwargs["args"] for c in calls] == [[[message_id]] for message_id in result["processed_message_ids"]]
+    assert all(c.kwargs["kwargs"] == {"lane": "bulk"} and c.kwargs["queue"] == "bulk" for c in calls)
 
 @pytest.mark.asyncio
 async def test_handle_instant_nudge_batch_schedule_success(
@@ -157,10 +163,8 @@ async def test_handle_instant_nudge_batch_schedule_success(
     now_utc = datetime.now(pytz.utc)
     future_datetime = now_utc + timedelta(hours=2)
     send_datetime_iso_str = future_datetime.isoformat()
-    mock_celery_task_result = MagicMock(id="celery-task-schedule-success")
 
-    with patch('app.services.instant_nudge_service.process_scheduled_message_task.apply_async', return_value=mock_celery_task_result) as mock_apply_async, \
-         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service, \
+    with patch('app.services.instant_nudge_service.datetime') as mock_datetime_service, \
          patch('app.services.instant_nudge_service.pytz.UTC.localize') as mock_pytz_localize:
         mock_datetime_service.now.return_value = now_utc
         naive_future_dt = datetime.fromisoformat(send_datetime_iso_str.replace('Z', '').split('+')[0])
@@ -170,12 +174,11 @@ async def test_handle_instant_nudge_batch_schedule_success(
             db, mock_business.id, customer_ids, message_content_template, send_datetime_iso=send_datetime_iso_str
         )
     assert result["scheduled_count"] == 1 and result["sent_count"] == 0
-    mock_apply_async.assert_called_once()
-    call_kwargs = mock_apply_async.call_args.kwargs
-    assert call_kwargs['args'][0] == result["processed_message_ids"][0]
-    assert call_kwargs['eta'] == future_datetime
+    # No ETA task is queued; the dispatch_due_messages sweeper sends the row when it is due.
     message = db.query(Message).get(result["processed_message_ids"][0])
     assert message is not None and message.status == MessageStatusEnum.SCHEDULED.value
+    assert message.scheduled_time.replace(tzinfo=pytz.utc) == future_datetime
+    assert message.claimed_at is None
 
 @pytest.mark.asyncio
 async def test_handle_instant_nudge_batch_schedule_past_datetime_sends_immediately(
@@ -185,22 +188,17 @@ async def test_handle_instant_nudge_batch_schedule_past_datetime_sends_immediate
     customer_ids = [customer1.id]
     now_utc = datetime.now(pytz.utc)
     past_datetime_iso_str = (now_utc - timedelta(hours=1)).isoformat()
-    mock_twilio_service_instance = MagicMock(spec=TwilioService)
-    mock_twilio_service_instance.send_sms = AsyncMock(return_value="SMmockpastschedule")
-
-    with patch('app.services.instant_nudge_service.TwilioService', return_value=mock_twilio_service_instance) as MockTwilioService, \
-         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service, \
-         patch('app.services.instant_nudge_service.process_scheduled_message_task.apply_async') as mock_apply_async:
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app, \
+         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
         mock_datetime_service.now.return_value = now_utc
         mock_datetime_service.fromisoformat.return_value = datetime.fromisoformat(past_datetime_iso_str.replace('Z', '+00:00'))
         result = await handle_instant_nudge_batch(
             db, mock_business.id, customer_ids, message_content_template, send_datetime_iso=past_datetime_iso_str
         )
     assert result["sent_count"] == 1 and result["scheduled_count"] == 0
-    mock_apply_async.assert_not_called()
-    mock_twilio_service_instance.send_sms.assert_called_once()
+    mock_celery_app.send_task.assert_called_once()
     message = db.query(Message).get(result["processed_message_ids"][0])
-    assert message.status == MessageStatusEnum.SENT.value
+    assert message.status == MessageStatusEnum.PROCESSING_SEND.value
 
 @pytest.mark.asyncio
 async def test_handle_instant_nudge_batch_schedule_invalid_iso_sends_immediately(
@@ -209,20 +207,15 @@ async def test_handle_instant_nudge_batch_schedule_invalid_iso_sends_immediately
     message_content_template = "Invalid schedule, send now!"
     customer_ids = [customer1.id]
     invalid_iso_str = "not-a-valid-iso-date"
-    mock_twilio_service_instance = MagicMock(spec=TwilioService)
-    mock_twilio_service_instance.send_sms = AsyncMock(return_value="SMmockinvalidschedule")
-
-    with patch('app.services.instant_nudge_service.TwilioService', return_value=mock_twilio_service_instance) as MockTwilioService, \
-         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service, \
-         patch('app.services.instant_nudge_service.process_scheduled_message_task.apply_async') as mock_apply_async:
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app, \
+         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
         mock_datetime_service.now.return_value = datetime.now(pytz.utc)
         mock_datetime_service.fromisoformat.side_effect = ValueError("Invalid ISO format")
         result = await handle_instant_nudge_batch(
             db, mock_business.id, customer_ids, message_content_template, send_datetime_iso=invalid_iso_str
         )
     assert result["sent_count"] == 1 and result["scheduled_count"] == 0
-    mock_apply_async.assert_not_called()
-    mock_twilio_service_instance.send_sms.assert_called_once()
+    mock_celery_app.send_task.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_handle_instant_nudge_batch_empty_customer_ids(
@@ -242,10 +235,7 @@ async def test_handle_instant_nudge_batch_some_customers_invalid_or_opted_out(
 ):
     customer2.opted_in = False; db.add(customer2); db.commit()
     customer_ids = [customer1.id, customer2.id, 999] # 999 is non-existent
-    mock_twilio_service_instance = MagicMock(spec=TwilioService)
-    mock_twilio_service_instance.send_sms = AsyncMock(return_value="SMmockpartial")
-
-    with patch('app.services.instant_nudge_service.TwilioService', return_value=mock_twilio_service_instance) as MockTwilioService, \
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app, \
          patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
         mock_datetime_service.now.return_value = datetime.now(pytz.utc)
         result = await handle_instant_nudge_batch(
@@ -253,70 +243,45 @@ async def test_handle_instant_nudge_batch_some_customers_invalid_or_opted_out(
         )
     assert result["sent_count"] == 1 and result["failed_count"] == 2
     assert len(result["processed_message_ids"]) == 1
-    mock_twilio_service_instance.send_sms.assert_called_once()
-    args_c1, kwargs_c1 = mock_twilio_service_instance.send_sms.call_args
-    assert kwargs_c1['to'] == customer1.phone
+    mock_celery_app.send_task.assert_called_once()
+    assert mock_celery_app.send_task.call_args.kwargs["args"] == [result["processed_message_ids"]]
     messages = db.query(Message).filter(Message.business_id == mock_business.id).all()
-    assert len(messages) == 1 and messages[0].customer_id == customer1.id and messages[0].status == MessageStatusEnum.SENT.value
+    assert len(messages) == 1 and messages[0].customer_id == customer1.id and messages[0].status == MessageStatusEnum.PROCESSING_SEND.value
 
 @pytest.mark.asyncio
-async def test_handle_instant_nudge_batch_twilio_send_fails_for_one_customer(
+async def test_handle_instant_nudge_batch_enqueue_failure_leaves_messages_claimed(
     db: Session, mock_business: BusinessProfile, customer1: Customer, customer2: Customer
 ):
     customer_ids = [customer1.id, customer2.id]
-    mock_twilio_service_instance = MagicMock(spec=TwilioService)
-    async def send_sms_side_effect(to: str, message_body: str, business: Any, customer: Any, is_direct_reply: bool):
-        if to == customer1.phone: raise HTTPException(status_code=500, detail="Twilio fake error")
-        return "SMmock_success_c2"
-    mock_twilio_service_instance.send_sms = AsyncMock(side_effect=send_sms_side_effect)
 
-    with patch('app.services.instant_nudge_service.TwilioService', return_value=mock_twilio_service_instance) as MockTwilioService, \
-         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
-        mock_datetime_service.now.return_value = datetime.now(pytz.utc)
+    with patch('app.services.instant_nudge_service.celery_app') as mock_celery_app:
+        mock_celery_app.send_task.side_effect = ConnectionError("broker down")
         result = await handle_instant_nudge_batch(
-            db, mock_business.id, customer_ids, "Trying to send to two, one will fail.", send_datetime_iso=None
+            db, mock_business.id, customer_ids, "Broker is down.", send_datetime_iso=None
         )
-    assert result["sent_count"] == 1 and result["failed_count"] == 1
-    assert len(result["processed_message_ids"]) == 1 # Only customer2's message ID
-    msg_c1 = db.query(Message).filter(Message.customer_id == customer1.id).first()
-    msg_c2 = db.query(Message).filter(Message.customer_id == customer2.id).first()
-
-    assert msg_c1 is None # Because its transaction should have been rolled back
-    assert msg_c2 is not None and msg_c2.status == MessageStatusEnum.SENT.value
+    assert result["sent_count"] == 2 and result["failed_count"] == 0
+    # The rows stay claimed; requeue_stale_claims hands them back to the sweeper.
+    messages = db.query(Message).filter(Message.customer_id.in_(customer_ids)).all()
+    assert len(messages) == 2
+    assert all(m.status == MessageStatusEnum.PROCESSING_SEND.value and m.claimed_at is not None for m in messages)
 
 @pytest.mark.asyncio
-async def test_handle_instant_nudge_batch_celery_schedule_fails_for_one_customer(
+async def test_handle_instant_nudge_batch_schedule_multiple_customers_leaves_rows_for_dispatcher(
     db: Session, mock_business: BusinessProfile, customer1: Customer, customer2: Customer
 ):
     customer_ids = [customer1.id, customer2.id]
     now_utc = datetime.now(pytz.utc)
     future_datetime = now_utc + timedelta(hours=2)
     send_datetime_iso_str = future_datetime.isoformat()
-    apply_async_mock = MagicMock()
-    def side_effect_based_on_call_count(*args, **kwargs):
-        # This side effect needs to be robust to the actual message ID generated.
-        # We assume customer1 (ID 101) is processed first.
-        # The message ID is generated by DB sequence, so it might be > 1 if other tests ran.
-        # A more robust mock might inspect args[0] (the message ID) and map it back to customer ID if needed.
-        # For this test, just failing on the first call is sufficient.
-        if apply_async_mock.call_count == 1:
-            raise Exception("Celery down for first customer")
-        mock_res = MagicMock(id="celery-task-c2-success")
-        return mock_res
-    apply_async_mock.side_effect = side_effect_based_on_call_count
 
-    with patch('app.services.instant_nudge_service.process_scheduled_message_task.apply_async', apply_async_mock) as mock_apply_async_patched, \
-         patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
+    with patch('app.services.instant_nudge_service.datetime') as mock_datetime_service:
         mock_datetime_service.now.return_value = now_utc
         mock_datetime_service.fromisoformat.return_value = datetime.fromisoformat(send_datetime_iso_str.replace('Z', '+00:00'))
         result = await handle_instant_nudge_batch(
-            db, mock_business.id, customer_ids, "Scheduling two, one celery will fail.", send_datetime_iso=send_datetime_iso_str
+            db, mock_business.id, customer_ids, "Scheduling two.", send_datetime_iso=send_datetime_iso_str
         )
-    assert result["scheduled_count"] == 1 and result["failed_count"] == 1
-    assert len(result["processed_message_ids"]) == 1
-    msg_c1_final = db.query(Message).filter(Message.customer_id == customer1.id).first()
-    assert msg_c1_final is None # Rolled back
-    msg_c2_final = db.query(Message).filter(Message.customer_id == customer2.id).first()
-    assert msg_c2_final is not None and msg_c2_final.status == MessageStatusEnum.SCHEDULED.value
-    # Service does not currently add celery_task_id to message_metadata for handle_instant_nudge_batch scheduling
-    # If it did: assert msg_c2_final.message_metadata['celery_task_id'] == "celery-task-c2-success"
+    assert result["scheduled_count"] == 2 and result["failed_count"] == 0
+    messages = db.query(Message).filter(Message.business_id == mock_business.id).all()
+    assert len(messages) == 2
+    assert all(m.status == MessageStatusEnum.SCHEDULED.value for m in messages)
+    assert all('celery_task_id' not in (m.message_metadata or {}) for m in messages)
@@ -0,0 +1,146 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import CoPilotNudge, Customer, Engagement, Message, MessageStatusEnum, MessageTypeEnum, NudgeStatusEnum
+from app.services import delivery_status_service, live_events_service
+from app.services.message_dispatch_service import apply_send_outcomes
+from app.services.message_service import MessageService
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def publish(self, channel, data):
+        self.published.append((channel, json.loads(data)))
+
+    def execute(self):
+        return []
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(live_events_service, "redis_client", fake)
+    return fake
+
+
+def _inbound(customer: Customer, content: str = "Hi there") -> Message:
+    return Message(customer_id=customer.id, business_id=customer.business_id, content=content,
+                   message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value)
+
+
+def test_committed_writes_publish_typed_events_to_the_business_channel(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    message = _inbound(mock_customer)
+    db.add(message)
+    db.add(CoPilotNudge(customer_id=mock_customer.id, business_id=mock_customer.business_id, nudge_type="sentiment_positive",
+                        ai_suggestion="Ask for a review", status=NudgeStatusEnum.ACTIVE.value))
+    db.flush()
+    assert fake_redis.published == []  # nothing leaves before the commit
+
+    db.add(Engagement(customer_id=mock_customer.id, business_id=mock_customer.business_id, message_id=message.id,
+                      ai_response="Happy to help!", status=MessageStatusEnum.PENDING_REVIEW.value))
+    db.commit()
+
+    channels = {channel for channel, _ in fake_redis.published}
+    events = {event["type"]: event["data"] for _, event in fake_redis.published}
+    assert channels == {f"inbox_events:{mock_customer.business_id}"}
+    assert events["message.received"]["content"] == "Hi there"
+    assert events["nudge.created"]["text"] == "Ask for a review"
+    assert events["draft.ready"]["text"] == "Happy to help!"
+
+    fake_redis.published.clear()
+    message.status = MessageStatusEnum.AUTO_REPLIED_FAQ.value
+    db.commit()
+    assert [event["data"] for _, event in fake_redis.published] == [
+        {"kind": "message", "id": message.id, "customer_id": mock_customer.id, "status": MessageStatusEnum.AUTO_REPLIED_FAQ.value}
+    ]
+
+
+def test_rolled_back_writes_publish_nothing(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    db.add(_inbound(mock_customer))
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert fake_redis.published == []
+
+
+def test_bulk_delivery_receipts_publish_status_changes(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    message = Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="Reminder",
+                      message_type=MessageTypeEnum.SCHEDULED.value, status=MessageStatusEnum.SENT.value, twilio_sid="SM1")
+    db.add(message)
+    db.commit()
+    fake_redis.published.clear()
+
+    receipt = {"sid": "SM1", "status": MessageStatusEnum.DELIVERED.value, "error_code": None,
+               "received_at": datetime.now(timezone.utc).timestamp()}
+    delivery_status_service.apply_receipts(db, [receipt])
+    delivery_status_service.apply_receipts(db, [receipt])  # already delivered: no second event
+
+    assert [(event["data"]["kind"], event["data"]["status"]) for _, event in fake_redis.published] == [("delivery", MessageStatusEnum.DELIVERED.value)]
+
+
+def test_bulk_send_outcomes_and_status_moves_publish_status_changes(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    reply = Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="On my way",
+                    message_type=MessageTypeEnum.OUTBOUND.value, status=MessageStatusEnum.PROCESSING_SEND.value,
+                    source="manual_reply_inbox")
+    draft = Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="Draft",
+                    message_type=MessageTypeEnum.SCHEDULED.value, status=MessageStatusEnum.PENDING_APPROVAL.value)
+    db.add_all([reply, draft])
+    db.flush()
+    engagement = Engagement(customer_id=mock_customer.id, business_id=mock_customer.business_id, message_id=reply.id,
+                            status=MessageStatusEnum.PROCESSING_SEND.value)
+    db.add(engagement)
+    db.commit()
+    fake_redis.published.clear()
+
+    apply_send_outcomes(db, [{"message": reply, "status": MessageStatusEnum.SENT.value,
+                              "sent_at": datetime.now(timezone.utc), "twilio_sid": "SM2"}])
+    MessageService(db).update_message_statuses([draft.id], MessageStatusEnum.SCHEDULED,
+                                               from_statuses=[MessageStatusEnum.PENDING_APPROVAL])
+
+    assert {channel for channel, _ in fake_redis.published} == {f"inbox_events:{mock_customer.business_id}"}
+    assert [event["type"] for _, event in fake_redis.published] == ["status.changed"] * 3
+    assert [event["data"] for _, event in fake_redis.published] == [
+        {"kind": "message", "id": reply.id, "customer_id": mock_customer.id, "status": MessageStatusEnum.SENT.value},
+        {"kind": "draft", "id": engagement.id, "customer_id": mock_customer.id, "status": MessageStatusEnum.SENT.value},
+        {"kind": "message", "id": draft.id, "customer_id": mock_customer.id, "status": MessageStatusEnum.SCHEDULED.value},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_formats_events_and_heartbeats(monkeypatch):
+    messages = [None, {"type": "message", "data": json.dumps({"type": "draft.ready", "business_id": 1, "data": {}})}]
+
+    class _PubSub:
+        async def subscribe(self, channel):
+            assert channel == "inbox_events:1"
+
+        async def get_message(self, ignore_subscribe_messages, timeout):
+            return messages.pop(0)
+
+        async def aclose(self):
+            pass
+
+    class _Client:
+        def pubsub(self):
+            return _PubSub()
+
+        async def aclose(self):
+            pass
+
+    monkeypatch.setattr(live_events_service.aioredis, "from_url", lambda *args, **kwargs: _Client())
+
+    async def disconnected():
+        return not messages
+
+    chunks = [chunk async for chunk in live_events_service.stream_business_events(1, disconnected)]
+    assert chunks[0].startswith("retry:")
+    assert chunks[1] == ": keep-alive\n\n"
+    assert chunks[2].startswith("event: draft.ready\ndata: ")
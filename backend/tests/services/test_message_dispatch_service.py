@@ -0,0 +1,296 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+
+from app.services.message_dispatch_service import (
+    claim_due_messages,
+    requeue_stale_claims,
+    mark_claimed_for_immediate_send,
+    load_messages_for_send,
+    find_schedule_drift,
+    LANE_BULK,
+    LANE_INTERACTIVE,
+    LANE_REMINDERS,
+)
+from app.celery_tasks import (
+    dispatch_due_messages_task,
+    process_scheduled_message_task,
+    process_scheduled_messages_batch_task,
+    reconcile_scheduled_messages_task,
+)
+from app.models import (
+    Message, Customer, BusinessProfile, Engagement, RoadmapMessage, MessageStatusEnum, MessageTypeEnum
+)
+
+
+def _scheduled_message(db: Session, customer: Customer, scheduled_time: datetime, status: str = MessageStatusEnum.SCHEDULED.value) -> Message:
+    message = Message(
+        customer_id=customer.id,
+        business_id=customer.business_id,
+        content="Scheduled hello",
+        message_type=MessageTypeEnum.SCHEDULED.value,
+        status=status,
+        scheduled_time=scheduled_time,
+        message_metadata={'source': 'roadmap'}
+    )
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    return message
+
+
+def test_claim_due_messages_claims_only_due_scheduled_rows(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    due_old = _scheduled_message(db, mock_customer, now - timedelta(minutes=10))
+    due_new = _scheduled_message(db, mock_customer, now - timedelta(minutes=1))
+    future = _scheduled_message(db, mock_customer, now + timedelta(hours=1))
+    already_sent = _scheduled_message(db, mock_customer, now - timedelta(minutes=5), status=MessageStatusEnum.SENT.value)
+
+    claimed = claim_due_messages(db, limit=10, now=now)
+
+    assert claimed == [due_old.id, due_new.id]
+    db.expire_all()
+    assert db.query(Message).get(due_old.id).status == MessageStatusEnum.PROCESSING_SEND.value
+    assert db.query(Message).get(due_old.id).claimed_at is not None
+    assert db.query(Message).get(future.id).status == MessageStatusEnum.SCHEDULED.value
+    assert db.query(Message).get(already_sent.id).status == MessageStatusEnum.SENT.value
+    # A second sweep must not hand out the same rows again.
+    assert claim_due_messages(db, limit=10, now=now) == []
+
+
+def test_claim_due_messages_respects_batch_limit_oldest_first(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    messages = [_scheduled_message(db, mock_customer, now - timedelta(minutes=m)) for m in (1, 3, 2)]
+
+    first_batch = claim_due_messages(db, limit=2, now=now)
+    second_batch = claim_due_messages(db, limit=2, now=now)
+
+    assert first_batch == sorted([messages[1].id, messages[2].id])
+    assert second_batch == [messages[0].id]
+
+
+def test_requeue_stale_claims_returns_abandoned_rows_to_schedule(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    stale = _scheduled_message(db, mock_customer, now - timedelta(hours=1))
+    fresh = _scheduled_message(db, mock_customer, now - timedelta(minutes=1))
+    claim_due_messages(db, limit=10, now=now - timedelta(hours=1))  # claims only `stale`
+    claim_due_messages(db, limit=10, now=now)  # claims `fresh`
+
+    requeued = requeue_stale_claims(db, now=now)
+
+    assert requeued == 1
+    db.expire_all()
+    assert db.query(Message).get(stale.id).status == MessageStatusEnum.SCHEDULED.value
+    assert db.query(Message).get(stale.id).claimed_at is None
+    assert db.query(Message).get(fresh.id).status == MessageStatusEnum.PROCESSING_SEND.value
+
+
+def test_mark_claimed_for_immediate_send_hides_row_from_sweeper(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    message = _scheduled_message(db, mock_customer, now - timedelta(seconds=1))
+    mark_claimed_for_immediate_send(message, now=now)
+    db.commit()
+
+    assert claim_due_messages(db, limit=10, now=now) == []
+
+
+def test_dispatch_due_messages_task_fans_out_claimed_ids_in_batches(db: Session, mock_customer: Customer, monkeypatch):
+    monkeypatch.setattr("app.celery_tasks.settings.MESSAGE_SEND_TASK_BATCH_SIZE", 2)
+    now = datetime.now(timezone.utc)
+    due_ids = [_scheduled_message(db, mock_customer, now - timedelta(minutes=m)).id for m in (3, 2, 1)]
+    _scheduled_message(db, mock_customer, now + timedelta(hours=1))
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.process_scheduled_messages_batch_task.apply_async') as mock_apply:
+        result = dispatch_due_messages_task()
+
+    assert result == {"dispatched": 3, "requeued": 0}
+    assert [c.kwargs["args"][0] for c in mock_apply.call_args_list] == [due_ids[:2], due_ids[2:]]
+    assert {c.kwargs["queue"] for c in mock_apply.call_args_list} == {LANE_REMINDERS}
+
+
+def test_dispatch_routes_each_lane_to_its_queue(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc) - timedelta(minutes=1)
+    campaign = _scheduled_message(db, mock_customer, now)
+    campaign.message_metadata = {'source': 'instant_nudge'}
+    reply = _scheduled_message(db, mock_customer, now)
+    reply.message_metadata = {'source': 'manual_reply_inbox'}
+    db.commit()
+    campaign_id, reply_id = campaign.id, reply.id
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.process_scheduled_messages_batch_task.apply_async') as mock_apply:
+        dispatch_due_messages_task()
+
+    routed = {c.kwargs["queue"]: (c.kwargs["args"][0], c.kwargs["kwargs"]["lane"]) for c in mock_apply.call_args_list}
+    assert routed == {LANE_BULK: ([campaign_id], LANE_BULK), LANE_INTERACTIVE: ([reply_id], LANE_INTERACTIVE)}
+
+
+def test_claim_due_messages_shares_batch_fairly_across_businesses(db: Session, mock_customer: Customer):
+    other_business = BusinessProfile(business_name="Other Business", industry="Retail", business_goal="Goal",
+                                     primary_services="Services", representative_name="Rep", timezone="UTC")
+    db.add(other_business)
+    db.commit()
+    other_customer = Customer(customer_name="Other", phone="5550001234", lifecycle_stage="Lead", business_id=other_business.id)
+    db.add(other_customer)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    # A big, older campaign for one business and a couple of newer reminders for another.
+    campaign_ids = [_scheduled_message(db, mock_customer, now - timedelta(hours=1, minutes=m)).id for m in range(10)]
+    reminder_ids = [_scheduled_message(db, other_customer, now - timedelta(minutes=m)).id for m in (1, 2)]
+
+    claimed = claim_due_messages(db, limit=4, now=now)
+    assert set(reminder_ids) <= set(claimed)
+    assert len(claimed) == 4
+
+    capped = claim_due_messages(db, limit=100, now=now, per_business_limit=3)
+    assert len(capped) == 3
+    assert set(capped) <= set(campaign_ids)
+
+
+def test_process_scheduled_message_skips_unclaimed_rows(db: Session, mock_customer: Customer):
+    message_id = _scheduled_message(db, mock_customer, datetime.now(timezone.utc) - timedelta(minutes=1)).id
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio') as mock_send:
+        result = process_scheduled_message_task.run(message_id)
+
+    assert result["success"] is False
+    mock_send.assert_not_called()
+
+
+def _claimed_message(db: Session, customer: Customer, metadata: dict) -> Message:
+    message = _scheduled_message(db, customer, datetime.now(timezone.utc) - timedelta(minutes=1), status=MessageStatusEnum.PROCESSING_SEND.value)
+    message.message_metadata = metadata
+    db.commit()
+    return message
+
+
+def test_load_messages_for_send_returns_customer_and_business_in_one_query(db: Session, opted_in_customer: Customer, mock_business: BusinessProfile):
+    message_ids = [_claimed_message(db, opted_in_customer, {}).id for _ in range(3)]
+    db.expire_all()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        rows = load_messages_for_send(db, message_ids)
+        assert [(m.id, c.id, b.id) for m, c, b in rows] == [(mid, opted_in_customer.id, mock_business.id) for mid in message_ids]
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    assert len(statements) == 1
+
+
+def test_batch_task_records_all_transitions_in_one_batch(db: Session, opted_in_customer: Customer, mock_business: BusinessProfile):
+    roadmap = RoadmapMessage(customer_id=opted_in_customer.id, business_id=mock_business.id, smsContent="Hi", status=MessageStatusEnum.SCHEDULED.value)
+    db.add(roadmap)
+    db.commit()
+    roadmap_msg = _claimed_message(db, opted_in_customer, {'source': 'roadmap', 'roadmap_id': roadmap.id})
+    inbox_msg = _claimed_message(db, opted_in_customer, {'source': 'manual_reply_inbox'})
+    failing_msg = _claimed_message(db, opted_in_customer, {'source': 'roadmap'})
+    engagement = Engagement(customer_id=opted_in_customer.id, business_id=mock_business.id, message_id=inbox_msg.id, status=MessageStatusEnum.PROCESSING_SEND.value)
+    db.add(engagement)
+    db.commit()
+    ids = {"roadmap": roadmap_msg.id, "inbox": inbox_msg.id, "failing": failing_msg.id}
+    roadmap_id, engagement_id = roadmap.id, engagement.id
+
+    async def _fake_send(to, message, business, customer=None, priority=None, before_send=None):
+        before_send()
+        if message.startswith("boom"):
+            raise RuntimeError("twilio down")
+        return f"SM-{to}-{len(message)}"
+
+    db.query(Message).filter(Message.id == ids["failing"]).update({"content": "boom"})
+    db.commit()
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send:
+        summary = process_scheduled_messages_batch_task.run(list(ids.values()))
+
+    assert summary == {"sent": 2, "failed": 1, "released": 0, "skipped": 0}
+    assert mock_send.call_count == 3
+    db.expire_all()
+    sent = db.query(Message).get(ids["roadmap"])
+    assert sent.status == MessageStatusEnum.SENT.value
+    assert sent.sent_at is not None
+    assert sent.message_metadata["twilio_sid"].startswith("SM-")
+    assert sent.message_metadata["roadmap_id"] == roadmap_id
+    assert db.query(RoadmapMessage).get(roadmap_id).status == MessageStatusEnum.SENT.value
+    assert db.query(Engagement).get(engagement_id).status == MessageStatusEnum.SENT.value
+    assert db.query(Engagement).get(engagement_id).sent_at is not None
+    failed = db.query(Message).get(ids["failing"])
+    assert failed.status == MessageStatusEnum.FAILED.value
+    assert failed.message_metadata["failure_reason"] == "Send Exception: twilio down"
+
+
+def test_sent_instant_nudge_is_logged_as_a_sent_engagement(db: Session, opted_in_customer: Customer):
+    nudge_id = _claimed_message(db, opted_in_customer, {'source': 'instant_nudge'}).id
+
+    async def _fake_send(to, message, business, customer=None, priority=None, before_send=None):
+        before_send()
+        return "SM-nudge"
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send):
+        process_scheduled_messages_batch_task.run([nudge_id])
+
+    db.expire_all()
+    engagement = db.query(Engagement).filter(Engagement.message_id == nudge_id).one()
+    assert (engagement.customer_id, engagement.status, engagement.ai_response) == \
+        (opted_in_customer.id, MessageStatusEnum.SENT.value, "Scheduled hello")
+    assert engagement.sent_at == db.query(Message).get(nudge_id).sent_at
+
+
+def test_find_schedule_drift_reports_undispatched_and_orphaned_schedule(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    overdue = _scheduled_message(db, mock_customer, now - timedelta(hours=2))
+    _scheduled_message(db, mock_customer, now - timedelta(minutes=1))  # Due, next sweep takes it
+    stuck = _scheduled_message(db, mock_customer, now - timedelta(hours=2), status=MessageStatusEnum.PROCESSING_SEND.value)
+    stuck.claimed_at = now - timedelta(hours=1)
+    orphan = RoadmapMessage(customer_id=mock_customer.id, business_id=mock_customer.business_id, smsContent="Gone",
+                            status=MessageStatusEnum.SCHEDULED.value, message_id=None)
+    db.add(orphan)
+    db.commit()
+
+    report = find_schedule_drift(db, now=now)
+
+    assert report["overdue_scheduled"] == {"count": 1, "ids": [overdue.id]}
+    assert report["stale_claims"] == {"count": 1, "ids": [stuck.id]}
+    assert report["orphan_roadmap"] == {"count": 1, "ids": [orphan.id]}
+
+
+def test_reconcile_task_revokes_send_tasks_held_with_an_eta(db: Session, mock_customer: Customer):
+    now = datetime.now(timezone.utc)
+    handled = _scheduled_message(db, mock_customer, now, status=MessageStatusEnum.SENT.value)
+    retrying = _scheduled_message(db, mock_customer, now, status=MessageStatusEnum.PROCESSING_SEND.value)
+    held = {"worker@a": [
+        {"eta": "2026-01-01T00:00:00", "request": {"id": "task-1", "name": "process_scheduled_message", "args": [handled.id]}},
+        {"eta": "2026-01-01T00:00:00", "request": {"id": "task-2", "name": "generate_sentiment_nudges", "args": [1]}},
+        # An immediate send waiting out its retry delay: its message is still claimed, so it is kept.
+        {"eta": "2026-01-01T00:00:00", "request": {"id": "task-3", "name": "process_scheduled_message", "args": [retrying.id]}},
+    ]}
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.celery.control') as mock_control:
+        mock_control.inspect.return_value.scheduled.return_value = held
+        report = reconcile_scheduled_messages_task()
+
+    mock_control.revoke.assert_called_once_with(["task-1"])
+    assert report["revoked_tasks"] == {"count": 1, "ids": [handled.id]}
+    assert report["overdue_scheduled"]["count"] == 0
+
+
+def test_metadata_keys_and_columns_are_written_together(db: Session, mock_customer: Customer):
+    from_metadata = _scheduled_message(db, mock_customer, datetime.now(timezone.utc))
+    from_metadata.message_metadata = {'source': 'copilot_growth_campaign', 'nudge_id': '7', 'roadmap_id': 'not-an-id'}
+    db.commit()
+    from_columns = Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="Hi",
+                           message_type=MessageTypeEnum.SCHEDULED.value, source='instant_nudge', twilio_sid='SM9')
+    db.add(from_columns)
+    db.commit()
+    db.expire_all()
+
+    assert (from_metadata.source, from_metadata.nudge_id, from_metadata.roadmap_id) == ('copilot_growth_campaign', 7, None)
+    assert from_columns.message_metadata == {'source': 'instant_nudge', 'twilio_sid': 'SM9'}
+    assert db.query(Message).filter(Message.source == 'instant_nudge').one().id == from_columns.id
@@ -7,6 +7,7 @@ from fastapi import HTTPException
 from datetime import datetime, timedelta, timezone
 
 from app.services.message_service import MessageService
+from app.services.consent_service import apply_consent_state
 from app.models import (
     Message,
     Customer,
@@ -183,6 +184,43 @@ async def test_update_message_status_message_not_found(message_service_instance:
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_update_message_statuses_moves_only_eligible_messages(db: Session, message_service_instance: MessageService, mock_business: BusinessProfile, mock_customer: Customer):
+    # Arrange
+    pending = [
+        message_service_instance.create_message(customer_id=mock_customer.id, business_id=mock_business.id, content=f"draft {i}")
+        for i in range(3)
+    ]
+    for msg in pending:
+        msg.status = MessageStatusEnum.PENDING_APPROVAL.value
+    already_sent = message_service_instance.create_message(customer_id=mock_customer.id, business_id=mock_business.id, content="sent")
+    already_sent.status = MessageStatusEnum.SENT.value
+    db.commit()
+    send_time = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    # Act
+    transitioned = message_service_instance.update_message_statuses(
+        [m.id for m in pending] + [already_sent.id, 99999],
+        MessageStatusEnum.SCHEDULED,
+        from_statuses=[MessageStatusEnum.PENDING_APPROVAL],
+        scheduled_time=send_time,
+    )
+
+    # Assert
+    assert transitioned == sorted(m.id for m in pending)
+    db.expire_all()
+    assert {db.get(Message, m.id).status for m in pending} == {MessageStatusEnum.SCHEDULED.value}
+    assert db.get(Message, already_sent.id).status == MessageStatusEnum.SENT.value
+
+
+@pytest.mark.asyncio
+async def test_update_message_statuses_rejects_disallowed_transitions(message_service_instance: MessageService):
+    with pytest.raises(ValueError):
+        message_service_instance.update_message_statuses([1], MessageStatusEnum.SCHEDULED, from_statuses=[MessageStatusEnum.SENT])
+    with pytest.raises(ValueError):
+        message_service_instance.update_message_statuses([1], MessageStatusEnum.RECEIVED)
+
+
 @pytest.mark.asyncio
 async def test_get_customer_messages_all_future(db: Session, message_service_instance: MessageService, mock_business: BusinessProfile, mock_customer: Customer):
     # Arrange
@@ -280,11 +318,7 @@ async def test_get_customer_messages_consent_status_scenarios(db: Session, messa
     customer3 = Customer(customer_name="Cust3 Logs LatestOptIn", phone="1003", business_id=mock_business.id)
     db.add(customer3)
     db.commit()
-    cl3_1 = ConsentLog(customer_id=customer3.id, business_id=mock_business.id, phone_number=customer3.phone, method="sms", status=OptInStatus.OPTED_OUT.value, replied_at=datetime.now(timezone.utc) - timedelta(days=2))
-    cl3_2 = ConsentLog(customer_id=customer3.id, business_id=mock_business.id, phone_number=customer3.phone, method="sms", status=OptInStatus.OPTED_IN.value, replied_at=datetime.now(timezone.utc) - timedelta(days=1)) # Latest
-    cl3_3 = ConsentLog(customer_id=customer3.id, business_id=mock_business.id, phone_number=customer3.phone, method="sms", status=OptInStatus.PENDING.value, replied_at=datetime.now(timezone.utc) - timedelta(days=3))
-    db.add_all([cl3_1, cl3_2, cl3_3])
-    db.commit()
+    _record_consent_history(db, customer3, [(OptInStatus.OPTED_OUT.value, 2), (OptInStatus.OPTED_IN.value, 1), (OptInStatus.PENDING.value, 3)])
     result3 = message_service_instance.get_customer_messages(customer3.id)
     assert result3["consent_status"] == OptInStatus.OPTED_IN.value
 
@@ -292,10 +326,7 @@ async def test_get_customer_messages_consent_status_scenarios(db: Session, messa
     customer4 = Customer(customer_name="Cust4 Logs LatestOptOut", phone="1004", business_id=mock_business.id)
     db.add(customer4)
     db.commit()
-    cl4_1 = ConsentLog(customer_id=customer4.id, business_id=mock_business.id, phone_number=customer4.phone, method="sms", status=OptInStatus.OPTED_IN.value, replied_at=datetime.now(timezone.utc) - timedelta(days=2))
-    cl4_2 = ConsentLog(customer_id=customer4.id, business_id=mock_business.id, phone_number=customer4.phone, method="sms", status=OptInStatus.OPTED_OUT.value, replied_at=datetime.now(timezone.utc) - timedelta(days=1)) # Latest
-    db.add_all([cl4_1, cl4_2])
-    db.commit()
+    _record_consent_history(db, customer4, [(OptInStatus.OPTED_IN.value, 2), (OptInStatus.OPTED_OUT.value, 1)])
     result4 = message_service_instance.get_customer_messages(customer4.id)
     assert result4["consent_status"] == OptInStatus.OPTED_OUT.value
 
@@ -303,11 +334,17 @@ async def test_get_customer_messages_consent_status_scenarios(db: Session, messa
     customer5 = Customer(customer_name="Cust5 Logs LatestPending", phone="1005", business_id=mock_business.id)
     db.add(customer5)
     db.commit()
-    cl5_1 = ConsentLog(customer_id=customer5.id, business_id=mock_business.id, phone_number=customer5.phone, method="sms", status=OptInStatus.OPTED_OUT.value, replied_at=datetime.now(timezone.utc) - timedelta(days=2))
-    cl5_2 = ConsentLog(customer_id=customer5.id, business_id=mock_business.id, phone_number=customer5.phone, method="sms", status=OptInStatus.PENDING.value, replied_at=datetime.now(timezone.utc) - timedelta(days=1)) # Latest
-    db.add_all([cl5_1, cl5_2])
-    db.commit()
+    _record_consent_history(db, customer5, [(OptInStatus.OPTED_OUT.value, 2), (OptInStatus.PENDING.value, 1)])
     result5 = message_service_instance.get_customer_messages(customer5.id)
     assert result5["consent_status"] == OptInStatus.PENDING.value
 
+
+def _record_consent_history(db: Session, customer: Customer, history):
+    """Writes (status, days_ago) consent events in time order, the way ConsentService records them."""
+    for status, days_ago in sorted(history, key=lambda event: -event[1]):
+        at = datetime.now(timezone.utc) - timedelta(days=days_ago)
+        db.add(ConsentLog(customer_id=customer.id, business_id=customer.business_id, phone_number=customer.phone, method="sms", status=status, replied_at=at))
+        apply_consent_state(customer, status, at)
+    db.commit()
+
 # Final newline for PEP8
\ No newline at end of file
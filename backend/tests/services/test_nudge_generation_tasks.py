@@ -0,0 +1,191 @@
+import signal
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy.orm import Session
+
+from app.celery_tasks import (
+    generate_business_nudges_task,
+    nudge_generation_failed_task,
+    run_all_nudge_generation,
+    summarize_nudge_generation_task,
+)
+from app.models import BusinessProfile, Customer
+from app.services import nudge_generation_run_service
+from app.services.copilot_growth_opportunity_service import CoPilotGrowthOpportunityService
+from app.services.copilot_nudge_generation_service import CoPilotNudgeGenerationService
+
+
+def test_a_failing_detector_does_not_stop_the_others(db: Session, mock_business: BusinessProfile):
+    business_id = mock_business.id
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch.object(CoPilotNudgeGenerationService, 'detect_positive_sentiment_and_create_nudges', return_value=['n1', 'n2']), \
+         patch.object(CoPilotNudgeGenerationService, 'detect_negative_sentiment_and_create_nudges', side_effect=RuntimeError("AI down")), \
+         patch.object(CoPilotNudgeGenerationService, 'detect_potential_timed_commitments', return_value=[]), \
+         patch.object(CoPilotGrowthOpportunityService, 'identify_referral_opportunities', return_value=['n3']), \
+         patch.object(CoPilotGrowthOpportunityService, 'identify_re_engagement_opportunities', side_effect=SoftTimeLimitExceeded()):
+        result = generate_business_nudges_task.run(business_id)
+
+    assert result == {"business_id": business_id, "nudges_created": 3, "failed_detectors": ["negative_sentiment"], "timed_out": True}
+
+
+def test_a_detector_that_swallows_the_soft_limit_still_stops_the_business(db: Session, mock_business: BusinessProfile, monkeypatch):
+    business_id = mock_business.id
+    monkeypatch.setattr("app.celery_tasks.settings.NUDGE_GENERATION_BUSINESS_TIMEOUT_SECONDS", 0.05)
+
+    def _raise_soft_limit(signum, frame):
+        raise SoftTimeLimitExceeded()
+
+    def _slow_detector_that_catches_everything(business_id):
+        try:
+            time.sleep(5)
+        except Exception:
+            return None
+
+    # What the worker does when the soft limit (which fires after the detector deadline) is reached:
+    # raise SoftTimeLimitExceeded in the running code.
+    previous_handler = signal.signal(signal.SIGALRM, _raise_soft_limit)
+    signal.setitimer(signal.ITIMER_REAL, 0.1)
+    try:
+        with patch('app.celery_tasks.SessionLocal', return_value=db), \
+             patch.object(CoPilotNudgeGenerationService, 'detect_positive_sentiment_and_create_nudges', side_effect=_slow_detector_that_catches_everything), \
+             patch.object(CoPilotNudgeGenerationService, 'detect_negative_sentiment_and_create_nudges') as later_detector:
+            started = time.monotonic()
+            result = generate_business_nudges_task.run(business_id)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+    assert time.monotonic() - started < 1
+    assert result["timed_out"] is True
+    later_detector.assert_not_called()
+
+
+def test_strategic_plan_lets_the_soft_limit_through(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    service = CoPilotNudgeGenerationService(db)
+    service.openai_client = MagicMock()
+    service.openai_client.chat.completions.create.side_effect = SoftTimeLimitExceeded()
+
+    with pytest.raises(SoftTimeLimitExceeded):
+        service.generate_strategic_engagement_plan(mock_business.id, mock_customer.id, "nuanced_sms", {"customer_reply": "Maybe"})
+
+
+class _FakeRedis:
+    """Just enough Redis for nudge_generation_run_service; pipelines run their commands on execute()."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.data.setdefault(key, {}).update(mapping or {field: value})
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hsetnx(self, key, field, value):
+        if field in self.data.setdefault(key, {}):
+            return False
+        self.data[key][field] = str(value)
+        return True
+
+    def hlen(self, key):
+        return len(self.data.get(key, {}))
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(str(value) for value in values)
+
+    def lpop(self, key):
+        items = self.data.get(key) or []
+        return items.pop(0) if items else None
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def ttl(self, key):
+        return 3600 if key in self.data else -2
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(nudge_generation_run_service, "redis_client", fake)
+    return fake
+
+
+def _three_businesses(db: Session) -> list:
+    for name in ("Second", "Third"):
+        db.add(BusinessProfile(business_name=name, industry="Tech", business_goal="Goal", primary_services="Services",
+                               representative_name="Rep", timezone="UTC"))
+    db.commit()
+    return [business.id for business in db.query(BusinessProfile).order_by(BusinessProfile.id)]
+
+
+def test_run_dispatches_no_more_businesses_than_the_concurrency_cap(db: Session, mock_business: BusinessProfile, fake_redis: _FakeRedis, monkeypatch):
+    monkeypatch.setattr("app.services.nudge_generation_run_service.settings.NUDGE_GENERATION_MAX_CONCURRENCY", 2)
+    business_ids = _three_businesses(db)
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch.object(generate_business_nudges_task, 'apply_async') as mock_apply_async, \
+         patch.object(summarize_nudge_generation_task, 'apply_async') as mock_backstop:
+        result = run_all_nudge_generation.run()
+
+    run_id = result["run_id"]
+    assert result == {"run_id": run_id, "businesses": 3, "dispatched": 2}
+    assert [call.args[0] for call in mock_apply_async.call_args_list] == [(business_id, run_id) for business_id in business_ids[:2]]
+    # A business killed by its hard time limit is still recorded, through its link_error.
+    errbacks = [call.kwargs["link_error"] for call in mock_apply_async.call_args_list]
+    assert [(errback.task, errback.args, errback.immutable) for errback in errbacks] == \
+        [('nudge_generation_failed', ({"business_id": business_id, "run_id": run_id},), True) for business_id in business_ids[:2]]
+    assert mock_backstop.call_args.args[0] == (run_id,)
+    assert mock_backstop.call_args.kwargs["countdown"] == nudge_generation_run_service.nudge_run_deadline_seconds(3)
+
+
+def test_run_refills_its_wave_and_summarizes_every_outcome(db: Session, mock_business: BusinessProfile, fake_redis: _FakeRedis, monkeypatch):
+    monkeypatch.setattr("app.services.nudge_generation_run_service.settings.NUDGE_GENERATION_MAX_CONCURRENCY", 2)
+    first, second, third = _three_businesses(db)
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch.object(generate_business_nudges_task, 'apply_async') as mock_apply_async, \
+         patch.object(summarize_nudge_generation_task, 'apply_async'), \
+         patch.object(summarize_nudge_generation_task, 'delay') as mock_summarize, \
+         patch.object(CoPilotNudgeGenerationService, 'detect_positive_sentiment_and_create_nudges', return_value=['n1']), \
+         patch.object(CoPilotNudgeGenerationService, 'detect_negative_sentiment_and_create_nudges', side_effect=RuntimeError("AI down")), \
+         patch.object(CoPilotNudgeGenerationService, 'detect_potential_timed_commitments', return_value=[]), \
+         patch.object(CoPilotGrowthOpportunityService, 'identify_referral_opportunities', return_value=['n2']), \
+         patch.object(CoPilotGrowthOpportunityService, 'identify_re_engagement_opportunities', return_value=[]):
+        run_id = run_all_nudge_generation.run()["run_id"]
+        mock_apply_async.reset_mock()
+
+        generate_business_nudges_task.run(first, run_id)
+        # The finished business hands its slot to the one still waiting.
+        assert [call.args[0] for call in mock_apply_async.call_args_list] == [(third, run_id)]
+        nudge_generation_failed_task.run({"business_id": second, "run_id": run_id})
+        mock_summarize.assert_not_called()
+        generate_business_nudges_task.run(third, run_id)
+
+    mock_summarize.assert_called_once_with(run_id)
+    assert summarize_nudge_generation_task.run(run_id) == {
+        "run_id": run_id, "businesses": 3, "nudges_created": 4, "failed": [first, third], "timed_out": [],
+        "killed": [second], "missing": [],
+    }
+    # The backstop finds the run already summarized.
+    assert summarize_nudge_generation_task.run(run_id) is None
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from app.models import Customer, Message, MessageStatusEnum, MessageTypeEnum, Tag
+from app.services import response_cache_service
+from app.services.message_dispatch_service import claim_due_messages
+from app.services.response_cache_service import INBOX, SCHEDULE, TAGS, cached_response
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(response_cache_service, "redis_client", fake)
+    return fake
+
+
+def _request(path: str = "/review/inbox/summaries", query: str = "business_id=1", etag: str = None) -> Request:
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": headers})
+
+
+def test_cached_until_a_committed_write_bumps_the_scope(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    business_id = mock_customer.business_id
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"items": len(builds)}
+
+    first = cached_response(_request(), business_id, INBOX, build)
+    second = cached_response(_request(), business_id, INBOX, build)
+    assert (first.body, second.body, len(builds)) == (b'{"items":1}', b'{"items":1}', 1)
+
+    # Revalidation while nothing changed: 304 without a body.
+    not_modified = cached_response(_request(etag=first.headers["ETag"]), business_id, INBOX, build)
+    assert (not_modified.status_code, not_modified.body, len(builds)) == (304, b"", 1)
+
+    db.add(Tag(business_id=business_id, name="vip"))
+    db.commit()
+    assert cached_response(_request(), business_id, INBOX, build).body == b'{"items":1}'  # other scopes keep their cache
+
+    db.add(Message(customer_id=mock_customer.id, business_id=business_id, content="Hi",
+                   message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value))
+    db.flush()
+    assert cached_response(_request(), business_id, INBOX, build).body == b'{"items":1}'  # not before the commit
+    db.commit()
+    changed = cached_response(_request(etag=first.headers["ETag"]), business_id, INBOX, build)
+    assert (changed.status_code, changed.body) == (200, b'{"items":2}')
+    assert fake_redis.get(f"cache_generation:{business_id}:{TAGS}") == "1"
+
+
+def test_bulk_claims_bump_the_schedule_scope(db: Session, mock_customer: Customer, fake_redis: _FakeRedis):
+    db.add(Message(customer_id=mock_customer.id, business_id=mock_customer.business_id, content="Reminder",
+                   message_type=MessageTypeEnum.SCHEDULED.value, status=MessageStatusEnum.SCHEDULED.value,
+                   scheduled_time=datetime.now(timezone.utc) - timedelta(minutes=1)))
+    db.commit()
+    before = fake_redis.get(f"cache_generation:{mock_customer.business_id}:{SCHEDULE}")
+
+    assert len(claim_due_messages(db, limit=10)) == 1
+    assert int(fake_redis.get(f"cache_generation:{mock_customer.business_id}:{SCHEDULE}")) == int(before) + 1
+
+
+def test_without_redis_responses_still_revalidate(monkeypatch):
+    monkeypatch.setattr(response_cache_service, "redis_client", None)
+    first = cached_response(_request(), 1, INBOX, lambda: [1, 2])
+    assert cached_response(_request(etag=first.headers["ETag"]), 1, INBOX, lambda: [1, 2]).status_code == 304
+    assert cached_response(_request(etag=first.headers["ETag"]), 1, INBOX, lambda: [1, 2, 3]).status_code == 200
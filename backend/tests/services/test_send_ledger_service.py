@@ -0,0 +1,148 @@
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+
+from app.services.send_ledger_service import (
+    claim_sends,
+    get_ledger_entries,
+    mark_sending,
+    record_send_results,
+    resolve_abandoned_sends,
+    LEDGER_CLAIMED,
+    LEDGER_FAILED,
+    LEDGER_SENT,
+)
+from app.services.message_dispatch_service import requeue_stale_claims
+from app.celery_tasks import process_scheduled_messages_batch_task
+from app.models import Message, MessageSendLedger, Customer, MessageStatusEnum, MessageTypeEnum
+
+
+def _message(db: Session, customer: Customer, status: str = MessageStatusEnum.PROCESSING_SEND.value, claimed_at: datetime = None) -> int:
+    message = Message(
+        customer_id=customer.id,
+        business_id=customer.business_id,
+        content="Ledger hello",
+        message_type=MessageTypeEnum.SCHEDULED.value,
+        status=status,
+        scheduled_time=datetime.now(timezone.utc) - timedelta(minutes=1),
+        claimed_at=claimed_at or datetime.now(timezone.utc),
+        message_metadata={'source': 'roadmap'}
+    )
+    db.add(message)
+    db.commit()
+    return message.id
+
+
+async def _fake_send(to, message, business, customer=None, priority=None, before_send=None):
+    before_send()
+    return "SMledger0001"
+
+
+def test_claim_sends_is_exclusive_and_only_claims_processing_rows(db: Session, opted_in_customer: Customer):
+    claimable = _message(db, opted_in_customer)
+    scheduled = _message(db, opted_in_customer, status=MessageStatusEnum.SCHEDULED.value)
+
+    assert claim_sends(db, [claimable, scheduled], claimed_by="task-1") == {claimable}
+    assert claim_sends(db, [claimable, scheduled], claimed_by="task-2") == set()
+    entry = get_ledger_entries(db, [claimable])[claimable]
+    assert (entry.status, entry.claimed_by) == (LEDGER_CLAIMED, "task-1")
+
+
+def test_redelivered_task_records_previous_send_without_resending(db: Session, opted_in_customer: Customer):
+    message_id = _message(db, opted_in_customer)
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send, \
+         patch('app.celery_tasks.apply_send_outcomes', side_effect=RuntimeError("db went away")):
+        first = process_scheduled_messages_batch_task.run([message_id])
+    assert first == {"sent": 0, "failed": 1, "released": 0, "skipped": 0}
+    assert mock_send.call_count == 1
+
+    # The status write was lost, but the ledger recorded the SID before it.
+    db.expire_all()
+    assert db.query(Message).get(message_id).status == MessageStatusEnum.PROCESSING_SEND.value
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_resend:
+        second = process_scheduled_messages_batch_task.run([message_id])
+
+    assert second == {"sent": 1, "failed": 0, "released": 0, "skipped": 0}
+    mock_resend.assert_not_called()
+    db.expire_all()
+    message = db.query(Message).get(message_id)
+    assert message.status == MessageStatusEnum.SENT.value
+    assert message.twilio_sid == "SMledger0001"
+
+
+def test_send_in_flight_on_another_worker_is_skipped(db: Session, opted_in_customer: Customer):
+    message_id = _message(db, opted_in_customer)
+    claim_sends(db, [message_id], claimed_by="other-worker-task")
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send:
+        summary = process_scheduled_messages_batch_task.run([message_id])
+
+    assert summary == {"sent": 0, "failed": 0, "released": 0, "skipped": 1}
+    mock_send.assert_not_called()
+
+
+def test_stale_claims_with_ledger_rows_are_resolved_not_requeued(db: Session, opted_in_customer: Customer):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=2)
+    never_attempted = _message(db, opted_in_customer, claimed_at=long_ago)
+    claimed_only = _message(db, opted_in_customer, claimed_at=long_ago)
+    sent_unrecorded = _message(db, opted_in_customer, claimed_at=long_ago)
+    crashed_mid_send = _message(db, opted_in_customer, claimed_at=long_ago)
+    claim_sends(db, [claimed_only, sent_unrecorded, crashed_mid_send], claimed_by="dead-worker")
+    mark_sending(db, crashed_mid_send, "dead-worker")
+    record_send_results(db, sent={sent_unrecorded: "SMalready"})
+
+    assert requeue_stale_claims(db) == 1
+    assert resolve_abandoned_sends(db) == 3
+
+    db.expire_all()
+    assert db.query(Message).get(never_attempted).status == MessageStatusEnum.SCHEDULED.value
+    assert db.query(Message).get(claimed_only).status == MessageStatusEnum.SCHEDULED.value
+    assert db.query(MessageSendLedger).get(claimed_only) is None
+    assert db.query(Message).get(sent_unrecorded).status == MessageStatusEnum.SENT.value
+    assert db.query(Message).get(sent_unrecorded).twilio_sid == "SMalready"
+    assert db.query(Message).get(crashed_mid_send).status == MessageStatusEnum.FAILED.value
+    assert db.query(MessageSendLedger).get(sent_unrecorded).status == LEDGER_SENT
+    assert db.query(MessageSendLedger).get(crashed_mid_send).status == LEDGER_FAILED
+
+
+def test_retry_after_a_failure_before_sending_sends_the_batch(db: Session, opted_in_customer: Customer):
+    message_id = _message(db, opted_in_customer)
+
+    # The claim is committed, then the task fails before any Twilio call.
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.load_messages_for_send', side_effect=RuntimeError("db went away")), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send:
+        process_scheduled_messages_batch_task.run([message_id])
+    mock_send.assert_not_called()
+    assert get_ledger_entries(db, [message_id])[message_id].status == LEDGER_CLAIMED
+
+    # The retry keeps the task id (None when run directly) and re-sends the still-'claimed' row.
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send:
+        summary = process_scheduled_messages_batch_task.run([message_id])
+
+    assert summary == {"sent": 1, "failed": 0, "released": 0, "skipped": 0}
+    assert mock_send.call_count == 1
+    db.expire_all()
+    assert db.query(Message).get(message_id).status == MessageStatusEnum.SENT.value
+
+
+def test_retry_fails_a_send_whose_outcome_is_unknown(db: Session, opted_in_customer: Customer):
+    message_id = _message(db, opted_in_customer)
+    claim_sends(db, [message_id])
+    mark_sending(db, message_id)  # The worker died inside the Twilio call.
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_fake_send) as mock_send:
+        summary = process_scheduled_messages_batch_task.run([message_id])
+
+    assert summary == {"sent": 0, "failed": 1, "released": 0, "skipped": 0}
+    mock_send.assert_not_called()
+    db.expire_all()
+    assert db.query(Message).get(message_id).status == MessageStatusEnum.FAILED.value
+    assert db.query(MessageSendLedger).get(message_id).status == LEDGER_FAILED
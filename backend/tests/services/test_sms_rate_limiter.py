@@ -0,0 +1,151 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.sms_rate_limiter import (
+    build_buckets,
+    bulk_reserve,
+    wait_for_send_slot,
+    SmsRateLimitExceeded,
+    METRICS_KEY,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+)
+from app.celery_tasks import process_scheduled_message_task
+from app.models import Message, Customer, MessageStatusEnum, MessageTypeEnum
+
+
+def _mock_redis(script_results):
+    """A redis client whose token-bucket script returns `script_results` in order."""
+    client = MagicMock()
+    client.register_script.return_value = MagicMock(side_effect=script_results)
+    return client
+
+
+@pytest.fixture
+def no_sleep():
+    with patch('app.services.sms_rate_limiter.asyncio.sleep') as mock_sleep, \
+         patch('app.services.sms_rate_limiter.random.uniform', return_value=0):
+        async def _sleep(_seconds):
+            return None
+        mock_sleep.side_effect = _sleep
+        yield mock_sleep
+
+
+def test_build_buckets_covers_number_msid_and_account():
+    buckets = build_buckets("+15550001111", "MG123")
+
+    assert [(scope, key) for scope, key, _, _, _ in buckets] == [
+        ("number", "sms_rate_limit:number:+15550001111"),
+        ("messaging_service", "sms_rate_limit:msid:MG123"),
+        ("account", "sms_rate_limit:account"),
+    ]
+
+
+def test_build_buckets_skips_disabled_and_missing_senders(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_RATE_LIMIT_ACCOUNT_PER_SECOND", 0)
+
+    buckets = build_buckets(None, "MG123")
+
+    assert [scope for scope, _, _, _, _ in buckets] == ["messaging_service"]
+
+
+def test_build_buckets_reserves_headroom_only_for_bulk_sends():
+    interactive = build_buckets("+15550001111", "MG123", PRIORITY_INTERACTIVE)
+    bulk = build_buckets("+15550001111", "MG123", PRIORITY_BULK)
+
+    assert [reserve for _, _, _, _, reserve in interactive] == [0, 0, 0]
+    # 20% of the per-number (3), MSID (20) and account (100) bursts, rounded up: a single-number
+    # tenant's bucket still keeps one token for OTPs and inbox replies at the default config.
+    assert settings.SMS_RATE_LIMIT_PER_NUMBER_BURST == 3
+    assert [reserve for _, _, _, _, reserve in bulk] == [1, 4, 20]
+
+
+def test_bulk_reserve_rounds_up_but_never_takes_the_whole_bucket():
+    assert [bulk_reserve(burst, 0.2) for burst in (1, 2, 3, 5, 6)] == [0, 1, 1, 1, 2]
+    assert bulk_reserve(3, 0) == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_for_send_slot_acquires_immediately_when_tokens_available(no_sleep):
+    client = _mock_redis([[0, 0]])
+    with patch('app.services.sms_rate_limiter.redis_client', client):
+        waited = await wait_for_send_slot("+15550001111", "MG123")
+
+    assert waited == 0.0
+    no_sleep.assert_not_called()
+    client.pipeline.assert_not_called()
+    script = client.register_script.return_value
+    assert script.call_args.kwargs["keys"] == [
+        "sms_rate_limit:number:+15550001111", "sms_rate_limit:msid:MG123", "sms_rate_limit:account"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_send_slot_sleeps_for_refill_and_records_metrics(no_sleep):
+    # Per-number bucket (index 1) is empty for 400ms, then a token is available.
+    client = _mock_redis([[400, 1], [0, 0]])
+    with patch('app.services.sms_rate_limiter.redis_client', client):
+        waited = await wait_for_send_slot("+15550001111", "MG123")
+
+    assert waited == pytest.approx(0.4)
+    no_sleep.assert_called_once_with(pytest.approx(0.4))
+    pipe = client.pipeline.return_value
+    pipe.hincrbyfloat.assert_any_call(METRICS_KEY, "wait_seconds_total", pytest.approx(0.4))
+    pipe.hincrbyfloat.assert_any_call(METRICS_KEY, "wait_seconds:number", pytest.approx(0.4))
+    pipe.hincrby.assert_called_once_with(METRICS_KEY, "waited_sends_total", 1)
+    pipe.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_send_slot_raises_when_wait_exceeds_max(no_sleep):
+    client = _mock_redis([[2000, 3]])
+    with patch('app.services.sms_rate_limiter.redis_client', client):
+        with pytest.raises(SmsRateLimitExceeded) as exc_info:
+            await wait_for_send_slot("+15550001111", "MG123", max_wait_seconds=1)
+
+    assert exc_info.value.scope == "account"
+    no_sleep.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_send_slot_fails_open_without_redis():
+    with patch('app.services.sms_rate_limiter.redis_client', None):
+        assert await wait_for_send_slot("+15550001111", "MG123") == 0.0
+
+    client = _mock_redis(ConnectionError("redis down"))
+    with patch('app.services.sms_rate_limiter.redis_client', client):
+        assert await wait_for_send_slot("+15550001111", "MG123") == 0.0
+
+
+def test_rate_limited_scheduled_message_is_released_back_to_dispatcher(db: Session, mock_customer: Customer):
+    mock_customer.opted_in = True
+    message = Message(
+        customer_id=mock_customer.id,
+        business_id=mock_customer.business_id,
+        content="Paced hello",
+        message_type=MessageTypeEnum.SCHEDULED.value,
+        status=MessageStatusEnum.PROCESSING_SEND.value,
+        scheduled_time=datetime.now(timezone.utc) - timedelta(minutes=1),
+        claimed_at=datetime.now(timezone.utc),
+        message_metadata={'source': 'roadmap'}
+    )
+    db.add(message)
+    db.commit()
+    message_id = message.id
+
+    async def _rate_limited(*args, **kwargs):
+        raise HTTPException(status_code=429, detail="SMS send rate limit reached")
+
+    with patch('app.celery_tasks.SessionLocal', return_value=db), \
+         patch('app.celery_tasks.send_sms_via_twilio', side_effect=_rate_limited):
+        result = process_scheduled_message_task.run(message_id)
+
+    assert result == {"success": False, "rate_limited": True}
+    db.expire_all()
+    released = db.query(Message).get(message_id)
+    assert released.status == MessageStatusEnum.SCHEDULED.value
+    assert released.claimed_at is None
@@ -0,0 +1,69 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+
+from app.services import tenant_routing_service
+from app.services.tenant_routing_service import (
+    clear_local_cache,
+    get_business_for_number,
+    get_business_id_for_number,
+    get_business_id_for_slug,
+    invalidate_number,
+    invalidate_slug,
+)
+from app.models import BusinessProfile
+
+BUSINESS_NUMBER = "+15557778888"
+
+
+@pytest.fixture
+def routed_business(db: Session, mock_business: BusinessProfile) -> BusinessProfile:
+    mock_business.slug = "test-business"
+    mock_business.twilio_number = BUSINESS_NUMBER
+    db.commit()
+    return mock_business
+
+
+def test_lookups_are_served_from_the_local_cache_until_invalidated(db: Session, routed_business: BusinessProfile):
+    assert get_business_id_for_number(db, BUSINESS_NUMBER) == routed_business.id
+    assert get_business_id_for_slug(db, routed_business.slug) == routed_business.id
+    assert get_business_id_for_number(db, "+15550000000") is None
+
+    routed_business.twilio_number = "+15559990000"
+    db.commit()
+    # Still cached: the mapping change did not go through invalidate_number().
+    assert get_business_id_for_number(db, BUSINESS_NUMBER) == routed_business.id
+
+    invalidate_number(BUSINESS_NUMBER)
+    invalidate_number("+15559990000")
+    assert get_business_id_for_number(db, BUSINESS_NUMBER) is None
+    assert get_business_for_number(db, "+15559990000").id == routed_business.id
+
+
+def test_redis_entries_are_shared_and_negative_results_expire_sooner(db: Session, routed_business: BusinessProfile):
+    redis = MagicMock()
+    redis.get.return_value = None
+    with patch.object(tenant_routing_service, "redis_client", redis):
+        assert get_business_id_for_slug(db, routed_business.slug) == routed_business.id
+        assert get_business_id_for_slug(db, "no-such-business") is None
+        redis.set.assert_any_call(f"tenant_routing:slug:{routed_business.slug}", json.dumps(routed_business.id), ex=3600)
+        redis.set.assert_any_call("tenant_routing:slug:no-such-business", json.dumps(None), ex=60)
+
+        # Another process populated Redis: no DB query is needed.
+        clear_local_cache()
+        redis.get.return_value = json.dumps(4242)
+        with patch.object(db, "query") as query:
+            assert get_business_id_for_slug(db, "elsewhere") == 4242
+        query.assert_not_called()
+
+        invalidate_slug("elsewhere")
+        redis.delete.assert_called_with("tenant_routing:slug:elsewhere")
+
+
+def test_redis_errors_fall_back_to_the_database(db: Session, routed_business: BusinessProfile):
+    redis = MagicMock()
+    redis.get.side_effect = ConnectionError("redis down")
+    redis.set.side_effect = ConnectionError("redis down")
+    with patch.object(tenant_routing_service, "redis_client", redis):
+        assert get_business_id_for_slug(db, routed_business.slug) == routed_business.id
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import BusinessProfile, Customer, OptInStatus
+from app.services.twilio_service import TwilioService
+from app.twilio_client import close_async_twilio_client, get_async_twilio_client
+
+# Uses the `fake_twilio` fixture from conftest.py: a local aiohttp server speaking the
+# Messages.json API, with the pooled async Twilio client pointed at it.
+
+
+@pytest.fixture
+def sending_business(db: Session, mock_business: BusinessProfile) -> BusinessProfile:
+    mock_business.twilio_number = "+15550001111"
+    mock_business.messaging_service_sid = "MGbusiness000000000000000000000"
+    db.commit()
+    db.refresh(mock_business)
+    return mock_business
+
+
+@pytest.fixture
+def opted_in_customer(db: Session, sending_business: BusinessProfile) -> Customer:
+    customer = Customer(
+        customer_name="Async Customer",
+        phone="+15552223333",
+        business_id=sending_business.id,
+        opted_in=True,
+        sms_opt_in_status=OptInStatus.OPTED_IN.value,
+    )
+    db.add(customer)
+    db.commit()
+    db.refresh(customer)
+    return customer
+
+
+@pytest.mark.asyncio
+async def test_send_sms_posts_to_twilio_and_returns_sid(db, fake_twilio, sending_business, opted_in_customer):
+    service = TwilioService(db)
+    try:
+        sid = await service.send_sms(
+            to=opted_in_customer.phone,
+            message_body="Hello there",
+            business=sending_business,
+            customer=opted_in_customer,
+        )
+    finally:
+        await close_async_twilio_client()
+
+    assert sid.startswith("SM")
+    assert fake_twilio.requests == [{
+        "To": "+15552223333",
+        "MessagingServiceSid": "MGbusiness000000000000000000000",
+        "From": "+15550001111",
+        "Body": "Hello there",
+    }]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_do_not_block_event_loop(db, fake_twilio, sending_business, opted_in_customer):
+    fake_twilio.delay_seconds = 0.3
+    service = TwilioService(db)
+    started = time.monotonic()
+    try:
+        sids = await asyncio.gather(*[
+            service.send_sms(to=opted_in_customer.phone, message_body=f"msg {i}",
+                             business=sending_business, customer=opted_in_customer)
+            for i in range(5)
+        ])
+    finally:
+        await close_async_twilio_client()
+    elapsed = time.monotonic() - started
+
+    assert len(set(sids)) == 5
+    # Serial blocking sends would take >= 5 * 0.3s.
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_sequential_sends_reuse_pooled_connection(db, fake_twilio, sending_business, opted_in_customer):
+    service = TwilioService(db)
+    try:
+        for i in range(3):
+            await service.send_sms(to=opted_in_customer.phone, message_body=f"msg {i}",
+                                   business=sending_business, customer=opted_in_customer)
+        assert get_async_twilio_client() is get_async_twilio_client()
+    finally:
+        await close_async_twilio_client()
+
+    assert len(fake_twilio.requests) == 3
+    assert len(fake_twilio.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_twilio_opt_out_error_maps_to_403(db, fake_twilio, sending_business, opted_in_customer):
+    fake_twilio.error = (400, 21610, "Attempt to send to unsubscribed recipient")
+    service = TwilioService(db)
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            await service.send_sms(to=opted_in_customer.phone, message_body="Hi",
+                                   business=sending_business, customer=opted_in_customer)
+    finally:
+        await close_async_twilio_client()
+
+    assert exc_info.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_send_sms_times_out_with_configured_timeout(db, fake_twilio, monkeypatch, sending_business, opted_in_customer):
+    monkeypatch.setattr(settings, "TWILIO_HTTP_TIMEOUT_SECONDS", 0.2)
+    fake_twilio.delay_seconds = 1.0
+    service = TwilioService(db)
+    started = time.monotonic()
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            await service.send_sms(to=opted_in_customer.phone, message_body="Hi",
+                                   business=sending_business, customer=opted_in_customer)
+    finally:
+        await close_async_twilio_client()
+
+    assert exc_info.value.status_code == 500
+    assert time.monotonic() - started < 1.0
+
+
+@pytest.mark.asyncio
+async def test_send_otp_uses_support_messaging_service(db, fake_twilio):
+    service = TwilioService(db)
+    try:
+        sid = await service.send_otp("+15554445555", "123456")
+    finally:
+        await close_async_twilio_client()
+
+    assert sid.startswith("SM")
+    assert fake_twilio.requests[0]["MessagingServiceSid"] == settings.TWILIO_SUPPORT_MESSAGING_SERVICE_SID
+    assert "123456" in fake_twilio.requests[0]["Body"]
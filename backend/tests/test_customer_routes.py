@@ -7,6 +7,7 @@ from datetime import datetime, timedelta, timezone
 from typing import List
 import uuid
 
+from app.services.consent_service import apply_consent_state
 from app.models import BusinessProfile, Customer, Message, ConsentLog, OptInStatus, MessageTypeEnum, MessageStatusEnum, Tag, CustomerTag
 from app.schemas import (
     CustomerConversation, ConversationMessageForTimeline,
@@ -196,6 +197,7 @@ def create_consent_log_for_customer_tests(db: Session, business_id: int, custome
         sent_at=replied_at - timedelta(minutes=2)
     )
     db.add(consent_log)
+    apply_consent_state(db.get(Customer, customer_id), status.value, replied_at)
     db.commit()
     db.refresh(consent_log)
     return consent_log
@@ -312,3 +314,19 @@ def test_get_customers_by_business_non_existent_biz_id(test_app_client_fixture:
     assert response.status_code == 200 # Current behavior is to return empty list
     data = parse_obj_as(List[CustomerSummarySchema], response.json())
     assert len(data) == 0
+
+def test_get_customers_by_business_cursor_pages(test_app_client_fixture: TestClient, db: Session):
+    business = create_test_business_for_customer_tests(db, name="Biz Cursor Pages")
+    for i, name in enumerate(["Dana", "Ana", "Cal", "Ana", "Bo"]):
+        create_test_customer_for_customer_tests(db, business_id=business.id, name=name, phone=f"cur00{i}")
+
+    names, cursor = [], None
+    while True:
+        url = f"/customers/by-business/{business.id}?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        response = test_app_client_fixture.get(url)
+        assert response.status_code == 200
+        names += [c["customer_name"] for c in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert names == ["Ana", "Ana", "Bo", "Cal", "Dana"]
@@ -0,0 +1,69 @@
+# backend/tests/test_instant_nudge_routes.py
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import BusinessProfile, Customer, Message, MessageStatusEnum, MessageTypeEnum
+
+
+@pytest.fixture(autouse=True)
+def route_db(db: Session):
+    from main import app as main_app_for_overrides
+    main_app_for_overrides.dependency_overrides[get_db] = lambda: db
+    yield
+    main_app_for_overrides.dependency_overrides.clear()
+
+
+def _message(db: Session, customer: Customer, status: str, source: str = None, metadata: dict = None, **values) -> Message:
+    message = Message(customer_id=customer.id, business_id=customer.business_id, content="Hi",
+                      message_type=values.pop("message_type", MessageTypeEnum.SCHEDULED.value), status=status,
+                      source=source, message_metadata=metadata, **values)
+    db.add(message)
+    return message
+
+
+def _seed_outbound_messages(db: Session, customer: Customer) -> None:
+    now = datetime.now(timezone.utc)
+    sent, failed, scheduled = MessageStatusEnum.SENT.value, MessageStatusEnum.FAILED.value, MessageStatusEnum.SCHEDULED.value
+    _message(db, customer, sent, source="instant_nudge", sent_at=now - timedelta(hours=2))
+    # Older writers only recorded the source in message_metadata.
+    _message(db, customer, sent, metadata={"source": "instant_nudge"}, sent_at=now - timedelta(hours=1))
+    _message(db, customer, failed, source="instant_nudge")
+    # Went out, but the carrier reported it undelivered: still sent, never failed.
+    _message(db, customer, sent, source="instant_nudge", sent_at=now - timedelta(minutes=30), delivery_status=failed)
+    _message(db, customer, scheduled, source="instant_nudge", scheduled_time=now + timedelta(days=1))
+    _message(db, customer, scheduled, source="instant_nudge", scheduled_time=now - timedelta(days=1))  # Overdue
+    _message(db, customer, sent, source="roadmap", sent_at=now)
+    _message(db, customer, sent, metadata={"source": "copilot_growth_campaign", "nudge_id": "7"}, sent_at=now)
+    _message(db, customer, failed, metadata={"source": "copilot_growth_campaign", "nudge_id": "7"})
+    _message(db, customer, MessageStatusEnum.RECEIVED.value, message_type=MessageTypeEnum.INBOUND.value)
+    db.commit()
+
+
+def test_instant_nudge_analytics_counts_by_status(test_app_client_fixture: TestClient, db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    _seed_outbound_messages(db, mock_customer)
+
+    response = test_app_client_fixture.get(f"/instant-nudge/nudge/instant-analytics/business/{mock_business.id}")
+
+    assert response.status_code == 200
+    # Same definitions as the source analytics; roadmap, campaign and inbound messages are excluded.
+    assert response.json() == {"total_messages": 6, "sent": 3, "scheduled": 2, "failed": 1, "success_rate": 3 / 4}
+
+
+def test_source_analytics_groups_by_source_and_campaign(test_app_client_fixture: TestClient, db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    _seed_outbound_messages(db, mock_customer)
+
+    response = test_app_client_fixture.get(f"/instant-nudge/nudge/source-analytics/business/{mock_business.id}")
+
+    assert response.status_code == 200
+    rows = response.json()
+    assert all(row.pop("last_sent_at") is not None for row in rows)
+    assert rows == [
+        {"source": "copilot_growth_campaign", "nudge_id": 7, "total_messages": 2, "sent": 1, "scheduled": 0, "failed": 1, "success_rate": 0.5},
+        {"source": "instant_nudge", "nudge_id": None, "total_messages": 6, "sent": 3, "scheduled": 2, "failed": 1, "success_rate": 3 / 4},
+        {"source": "roadmap", "nudge_id": None, "total_messages": 1, "sent": 1, "scheduled": 0, "failed": 0, "success_rate": 1.0},
+    ]
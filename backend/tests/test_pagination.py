@@ -0,0 +1,115 @@
+# backend/tests/test_pagination.py
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models import BusinessProfile, ConversationSummary, Customer, Message, MessageTypeEnum, MessageStatusEnum
+from app.pagination import SortKey, decode_cursor, encode_cursor, keyset_filter, paginate, take_page
+from app.services.inbox_service import INBOX_SORT_KEYS, inbox_sort_values
+
+
+def _walk(query_factory, keys, sort_values, limit):
+    """Follows cursors until the last page; returns the ids per page."""
+    pages, cursor = [], None
+    while True:
+        rows, cursor = take_page(paginate(query_factory(), keys, cursor, limit).all(), limit, sort_values)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_every_row_once_with_ties_and_nulls(db: Session, mock_business: BusinessProfile):
+    names = ["Bea", None, "Al", "Bea", "Cy", None, "Al"]
+    for i, name in enumerate(names):
+        db.add(Customer(business_id=mock_business.id, customer_name=name, phone=f"+1555000{i:04d}", lifecycle_stage="Lead"))
+    db.commit()
+    keys = (SortKey(Customer.customer_name, nullable=True), SortKey(Customer.id))
+
+    pages = _walk(lambda: db.query(Customer).filter(Customer.business_id == mock_business.id), keys, lambda c: (c.customer_name, c.id), 2)
+
+    expected = db.query(Customer).filter(Customer.business_id == mock_business.id).order_by(*[k.order_by() for k in keys]).all()
+    assert [i for page in pages for i in page] == [c.id for c in expected]
+    assert [c.customer_name for c in expected][-2:] == [None, None]
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+
+def test_keyset_pages_stay_stable_when_rows_are_inserted_between_requests(db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    base = datetime.now(timezone.utc)
+    for i in range(4):
+        db.add(Message(business_id=mock_business.id, customer_id=mock_customer.id, content=f"m{i}",
+                       message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value,
+                       created_at=base - timedelta(minutes=i)))
+    db.commit()
+    keys = (SortKey(Message.created_at, descending=True), SortKey(Message.id, descending=True))
+    query = lambda: db.query(Message).filter(Message.customer_id == mock_customer.id)
+
+    first, cursor = take_page(paginate(query(), keys, None, 2).all(), 2, lambda m: (m.created_at, m.id))
+    db.add(Message(business_id=mock_business.id, customer_id=mock_customer.id, content="newest",
+                   message_type=MessageTypeEnum.INBOUND.value, created_at=base + timedelta(minutes=1)))
+    db.commit()
+    second, cursor = take_page(paginate(query(), keys, cursor, 2).all(), 2, lambda m: (m.created_at, m.id))
+
+    assert [m.content for m in first + second] == ["m0", "m1", "m2", "m3"]
+    assert cursor is None
+
+
+def test_cursor_round_trips_datetimes_and_rejects_garbage():
+    keys = (SortKey(Message.created_at), SortKey(Message.id))
+    at = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor([at, 7]), keys) == [at, 7]
+
+    for bad in ("not-a-cursor", encode_cursor([1]), encode_cursor([{"x": 1}, 2])):
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(bad, keys)
+        assert exc.value.status_code == 400
+
+
+def _inbox_rows(db: Session, business: BusinessProfile, activity) -> list:
+    summaries = []
+    for i, (unread, last_at) in enumerate(activity):
+        customer = Customer(business_id=business.id, customer_name=f"C{i}", phone=f"+1555100{i:04d}", lifecycle_stage="Lead")
+        db.add(customer)
+        db.flush()
+        summary = db.get(ConversationSummary, customer.id) or ConversationSummary(customer_id=customer.id, business_id=business.id)
+        summary.unread_count, summary.last_message_at = unread, last_at
+        summaries.append(db.merge(summary))
+    db.commit()
+    return summaries
+
+
+def test_inbox_keys_are_one_row_value_range_and_keep_inactive_conversations_last(db: Session, mock_business: BusinessProfile):
+    base = datetime.now(timezone.utc)
+    activity = [(0, base), (2, None), (0, None), (1, base - timedelta(hours=1)), (0, base), (0, base - timedelta(days=1))]
+    summaries = _inbox_rows(db, mock_business, activity)
+    query = lambda: db.query(ConversationSummary).filter(ConversationSummary.business_id == mock_business.id)
+
+    order, cursor = [], None
+    while True:
+        rows, cursor = take_page(paginate(query(), INBOX_SORT_KEYS, cursor, 2).all(), 2, inbox_sort_values)
+        order += [row.customer_id for row in rows]
+        if cursor is None:
+            break
+
+    # Newest activity first (ties by customer_id), unread counts ignored, inactive conversations last.
+    assert order == [summaries[i].customer_id for i in (4, 0, 3, 5, 2, 1)]
+    assert "OR" not in str(keyset_filter(INBOX_SORT_KEYS, [base, 1]).compile())
+
+
+def test_inbox_cursor_neither_repeats_nor_skips_when_the_inbox_changes(db: Session, mock_business: BusinessProfile):
+    base = datetime.now(timezone.utc) - timedelta(days=1)
+    summaries = _inbox_rows(db, mock_business, [(0, base - timedelta(hours=i)) for i in range(6)])
+    query = lambda: db.query(ConversationSummary).filter(ConversationSummary.business_id == mock_business.id)
+
+    first_page, cursor = take_page(paginate(query(), INBOX_SORT_KEYS, None, 2).all(), 2, inbox_sort_values)
+    seen = [row.customer_id for row in first_page]
+    # Between pages: unread counts change on a conversation not reached yet and on one already seen.
+    summaries[4].unread_count = 3
+    summaries[0].unread_count = 0
+    db.commit()
+    while cursor is not None:
+        rows, cursor = take_page(paginate(query(), INBOX_SORT_KEYS, cursor, 2).all(), 2, inbox_sort_values)
+        seen += [row.customer_id for row in rows]
+
+    assert seen == [summary.customer_id for summary in summaries]
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from typing import List
 
+from app.services.consent_service import apply_consent_state
 from app.models import BusinessProfile, Customer, Message, ConsentLog, OptInStatus, MessageTypeEnum, MessageStatusEnum
 from app.schemas import PaginatedInboxSummaries, InboxCustomerSummary # Assuming these are the correct schema names
 
@@ -65,6 +66,7 @@ def create_test_consent_log(db: Session, business_id: int, customer_id: int, sta
         sent_at=replied_at - timedelta(minutes=5) # Assume sent a bit before reply
     )
     db.add(consent_log)
+    apply_consent_state(db.get(Customer, customer_id), status.value, replied_at)
     db.commit()
     db.refresh(consent_log)
     return consent_log
@@ -252,4 +254,46 @@ def test_get_inbox_summaries_customer_no_consent_log_uses_opted_out_flag(test_ap
     item = data["items"][0]
     assert item["customer_name"] == "Flag OptedOut Cust"
     assert item["opted_in"] is False # Should be False from customer.opted_in
-    assert item["consent_status"] == "pending" # Service logic defaults to "pending" if no log and customer.opted_in is False
+    assert item["consent_status"] == OptInStatus.NOT_SET.value # No consent request was ever sent, so not "pending"
+
+
+def test_get_inbox_summaries_cursor_pagination(test_app_client_fixture: TestClient, db: Session):
+    business = create_test_business(db, name="Cursor Test Biz")
+    now = datetime.now(timezone.utc)
+    for i in range(5):
+        customer = create_test_customer(db, business_id=business.id, name=f"Cust {i:02d}", phone=f"555100{i:02d}")
+        create_test_message(db, business_id=business.id, customer_id=customer.id, content=f"Msg {i:02d}", sent_at=now - timedelta(minutes=i))
+
+    url = f"/review/inbox/summaries?business_id={business.id}&size=2"
+    data_p1 = test_app_client_fixture.get(url).json()
+    assert [item["customer_name"] for item in data_p1["items"]] == ["Cust 00", "Cust 01"]
+
+    # A conversation that becomes active after page 1 was served must not shift the next pages.
+    late = create_test_customer(db, business_id=business.id, name="Late", phone="55510099")
+    create_test_message(db, business_id=business.id, customer_id=late.id, content="New", sent_at=now + timedelta(minutes=1))
+
+    names = []
+    cursor = data_p1["next_cursor"]
+    while cursor:
+        data = test_app_client_fixture.get(f"{url}&cursor={cursor}").json()
+        names += [item["customer_name"] for item in data["items"]]
+        cursor = data["next_cursor"]
+    assert names == ["Cust 02", "Cust 03", "Cust 04"]
+
+    assert test_app_client_fixture.get(f"{url}&cursor=garbage").status_code == 400
+
+def test_get_inbox_unread_count(test_app_client_fixture: TestClient, db: Session):
+    business = create_test_business(db, name="Badge Test Biz")
+    customer = create_test_customer(db, business_id=business.id, name="Badge Cust", phone="555200001")
+    for content in ("Hello?", "Anyone there?"):
+        db.add(Message(business_id=business.id, customer_id=customer.id, content=content,
+                       message_type=MessageTypeEnum.INBOUND.value, status=MessageStatusEnum.RECEIVED.value))
+    db.commit()
+
+    response = test_app_client_fixture.get(f"/review/inbox/unread-count?business_id={business.id}")
+    assert response.status_code == 200
+    assert response.json() == {"business_id": business.id, "unread": 2}
+    assert test_app_client_fixture.get(f"/review/inbox/summaries?business_id={business.id}").json()["total_unread"] == 2
+
+    assert test_app_client_fixture.put(f"/conversations/customers/{customer.id}/mark-as-read").status_code == 200
+    assert test_app_client_fixture.get(f"/review/inbox/unread-count?business_id={business.id}").json()["unread"] == 0
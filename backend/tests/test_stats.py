@@ -1,8 +1,10 @@
 import pytest
-from datetime import datetime, timezone
-from app.models import Message, Engagement, Customer, BusinessProfile, Conversation
+from datetime import datetime, time, timedelta, timezone
+from app.models import Message, Engagement, Customer, BusinessProfile, Conversation, RoadmapMessage
+from app.services.daily_stats_service import utc_today
 from app.services.stats_service import calculate_stats, calculate_reply_stats
 from unittest.mock import patch
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 import uuid
 
@@ -194,4 +196,46 @@ def test_reply_rate_calculation(db: Session, test_data):
     # Verify reply rate
     assert stats["sent"] == 4 # Changed to "sent"
     assert reply_stats["received_count"] == 2 # Changed to "received_count"
-    # Removed: assert reply_stats["reply_rate"] == 50.0
\ No newline at end of file
+    # Removed: assert reply_stats["reply_rate"] == 50.0
+
+def test_last_7_days_counts_whole_utc_days(db: Session, test_data):
+    """The window starts at midnight UTC six days before today, not 168 hours before now"""
+    first_day = datetime.combine(utc_today() - timedelta(days=6), time.min, tzinfo=timezone.utc)
+    for sent_at in (first_day - timedelta(seconds=1), first_day, datetime.now(timezone.utc)):
+        db.add(Message(conversation_id=test_data["conversation"].id, business_id=test_data["business"].id,
+                       customer_id=test_data["customer"].id, content="Hi", message_type="scheduled", status="sent", sent_at=sent_at))
+    db.commit()
+
+    stats = calculate_stats(test_data["business"].id, db)
+
+    assert (stats["sent"], stats["sentLast7Days"]) == (3, 2)
+
+
+def _count_statements(db: Session, fn):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        return fn(), len(statements)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+def test_stats_query_count_does_not_grow_with_customers(db: Session, test_data):
+    """Dashboard stats are set-based: the same number of queries for 1 or 50 customers"""
+    business_id = test_data["business"].id
+    db.commit()
+    _, queries_for_one = _count_statements(db, lambda: calculate_stats(business_id, db))
+
+    for i in range(49):
+        customer = Customer(business_id=business_id, customer_name=f"Customer {i}", phone=f"+1555{i:07d}")
+        db.add(customer)
+        db.flush()
+        if i % 2:
+            db.add(RoadmapMessage(customer_id=customer.id, business_id=business_id, smsContent="Hi", status="scheduled"))
+    db.commit()
+    stats, queries_for_fifty = _count_statements(db, lambda: calculate_stats(business_id, db))
+
+    assert queries_for_fifty == queries_for_one <= 7
+    assert stats["communitySize"] == 50
+    assert stats["withoutPlanCount"] == 26
+    assert stats["optInPending"] == 50
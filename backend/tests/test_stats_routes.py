@@ -0,0 +1,28 @@
+# backend/tests/test_stats_routes.py
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import BusinessProfile, Customer, Message, MessageStatusEnum
+from app.services.daily_stats_service import rollup_daily_stats, utc_today
+
+
+def test_daily_stats_and_timeseries(test_app_client_fixture: TestClient, db: Session, mock_business: BusinessProfile, mock_customer: Customer):
+    now = datetime.now(timezone.utc).replace(hour=12)
+    for at in (now - timedelta(days=2), now):
+        db.add(Message(customer_id=mock_customer.id, business_id=mock_business.id, content="Hi", message_type="scheduled",
+                       status=MessageStatusEnum.SENT.value, sent_at=at))
+    db.commit()
+    rollup_daily_stats(db)
+
+    response = test_app_client_fixture.get(f"/stats/business/{mock_business.id}/daily?days=3")
+    assert response.status_code == 200
+    assert [(entry["day"], entry["sends"]) for entry in response.json()] == [
+        ((utc_today() - timedelta(days=offset)).isoformat(), sends) for offset, sends in ((2, 1), (1, 0), (0, 1))
+    ]
+
+    series = test_app_client_fixture.get(f"/stats/business/{mock_business.id}/timeseries/sends?days=3").json()
+    assert [point["value"] for point in series] == [1, 0, 1]
+    assert test_app_client_fixture.get(f"/stats/business/{mock_business.id}/timeseries/bogus").status_code == 422
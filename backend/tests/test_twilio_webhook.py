@@ -1,6 +1,9 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, AsyncMock, patch, ANY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import status, Request
 from fastapi.responses import PlainTextResponse
@@ -14,6 +17,7 @@ from app.models import Conversation as ConversationModel
 from app.models import Message as MessageModel
 from app.models import Engagement as EngagementModel
 from app.models import ConsentLog as ConsentLogModel
+from app.models import InboundEvent as InboundEventModel
 from app.models import OptInStatus, MessageStatusEnum, MessageTypeEnum
 from app.database import get_db
 from app.schemas import normalize_phone_number
@@ -65,15 +69,19 @@ def setup_webhook_test_overrides(
     app_instance = test_app_client_fixture.app
     app_instance.dependency_overrides[get_db] = lambda: mock_db_session
 
-    patcher_consent = patch('app.routes.twilio_webhook.ConsentService', return_value=mock_consent_service_instance)
-    patcher_ai = patch('app.routes.twilio_webhook.AIService', return_value=mock_ai_service_instance)
-    patcher_twilio = patch('app.routes.twilio_webhook.TwilioService', return_value=mock_twilio_service_instance)
+    patcher_consent = patch('app.services.inbound_pipeline_service.ConsentService', return_value=mock_consent_service_instance)
+    patcher_ai = patch('app.services.inbound_pipeline_service.AIService', return_value=mock_ai_service_instance)
+    patcher_twilio = patch('app.services.inbound_pipeline_service.TwilioService', return_value=mock_twilio_service_instance)
+
+    patcher_redis = patch('app.services.inbound_pipeline_service.redis_client', None)
 
-    started_patchers = [patcher_consent.start(), patcher_ai.start(), patcher_twilio.start()]
+    patchers = [patcher_consent, patcher_ai, patcher_twilio, patcher_redis]
+    for p in patchers:
+        p.start()
 
     yield
 
-    for p in started_patchers:
+    for p in patchers:
         p.stop()
     app_instance.dependency_overrides.clear()
 
@@ -85,74 +93,154 @@ async def test_receive_sms_basic_success(
     mock_consent_service_instance: MagicMock,
     mock_ai_service_instance: MagicMock,
     mock_twilio_service_instance: MagicMock,
-    mock_business: BusinessProfileModel,
-    mock_customer: CustomerModel
 ):
-    # Ensure mock_business and mock_customer have valid, normalizable phone numbers and consistent IDs
-    # These mock_business and mock_customer come from conftest.py and should have IDs.
-    # If not, they need to be set: e.g. mock_business.id = 1; mock_customer.id = 1;
-    mock_business.twilio_number = DEFAULT_FORM_DATA["To"]
-    mock_customer.phone = DEFAULT_FORM_DATA["From"]
-    if mock_business.id is None: mock_business.id = 1 # Ensure ID is set
-    mock_customer.business_id = mock_business.id
-    if mock_customer.id is None: mock_customer.id = 1
+    form_data = {**DEFAULT_FORM_DATA}
 
+    with patch('app.routes.twilio_webhook.enqueue_inbound_events') as mock_enqueue:
+        response = test_app_client_fixture.post("/twilio/inbound", data=form_data)
 
-    form_data = {**DEFAULT_FORM_DATA}
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text == "SMS Received"
 
-    mock_business.enable_ai_faq_auto_reply = False
-    mock_business.notify_owner_on_reply_with_link = False
-
-    normalized_to_phone = normalize_phone_number(form_data["To"])
-    normalized_from_phone = normalize_phone_number(form_data["From"])
-
-    # Specific query mocks
-    # Mock for BusinessProfile query
-    query_bp_mock = MagicMock()
-    query_bp_mock.filter(BusinessProfileModel.twilio_number == normalized_to_phone).first.return_value = mock_business
-
-    # Mock for Customer query
-    query_cust_mock = MagicMock()
-    query_cust_mock.filter(CustomerModel.phone == normalized_from_phone, CustomerModel.business_id == mock_business.id).first.return_value = mock_customer
-
-    # Mock for Conversation query
-    query_conv_mock = MagicMock()
-    query_conv_mock.filter(
-        ConversationModel.customer_id == mock_customer.id,
-        ConversationModel.business_id == mock_business.id,
-        ConversationModel.status == "active"
-    ).first.return_value = None
-
-    # Mock for ConsentLog query
-    mock_latest_consent_log = MagicMock(spec=ConsentLogModel)
-    mock_latest_consent_log.status = OptInStatus.OPTED_IN.value
-    query_consent_mock = MagicMock()
-    query_consent_mock.filter(
-        ConsentLogModel.customer_id == mock_customer.id,
-        ConsentLogModel.business_id == mock_business.id
-    ).order_by(ConsentLogModel.created_at.desc()).first.return_value = mock_latest_consent_log
-
-    def query_side_effect(model_class):
-        if model_class == BusinessProfileModel:
-            return query_bp_mock
-        elif model_class == CustomerModel:
-            return query_cust_mock
-        elif model_class == ConversationModel:
-            return query_conv_mock
-        elif model_class == ConsentLogModel:
-            return query_consent_mock
-        return MagicMock()
-
-    mock_db_session.query = MagicMock(side_effect=query_side_effect)
-
-    response = test_app_client_fixture.post("/twilio/inbound", data=form_data)
+    # The raw event is stored and committed before Twilio is acknowledged...
+    stored_event = mock_db_session.add.call_args.args[0]
+    assert isinstance(stored_event, InboundEventModel)
+    assert stored_event.message_sid == form_data["MessageSid"]
+    assert stored_event.body == form_data["Body"]
+    assert stored_event.payload == form_data
+    mock_db_session.commit.assert_called_once()
+    mock_enqueue.assert_called_once_with(mock_db_session, normalize_phone_number(form_data["To"]), normalize_phone_number(form_data["From"]))
+
+    # ...and nothing slow runs in the request.
+    mock_consent_service_instance.process_sms_response.assert_not_called()
+    mock_ai_service_instance.generate_sms_response.assert_not_called()
+    mock_twilio_service_instance.send_sms.assert_not_called()
+
+
+def test_receive_sms_missing_params_is_not_stored(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    form_data = {**DEFAULT_FORM_DATA, "Body": "  "}
+
+    with patch('app.routes.twilio_webhook.enqueue_inbound_events') as mock_enqueue:
+        response = test_app_client_fixture.post("/twilio/inbound", data=form_data)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text == "Missing params"
+    mock_db_session.add.assert_not_called()
+    mock_enqueue.assert_not_called()
+
+
+def test_receive_sms_acknowledges_when_broker_is_down(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    with patch('app.routes.twilio_webhook.enqueue_inbound_events') as mock_enqueue:
+        mock_enqueue.side_effect = ConnectionError("broker unreachable")
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
+
+    # Stored, so the sweep_inbound_events task processes it later.
+    assert response.status_code == status.HTTP_200_OK
+    mock_db_session.commit.assert_called_once()
+
+
+def test_receive_sms_retry_of_accepted_sid_is_acknowledged_without_processing(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    mock_redis = MagicMock()
+    mock_redis.exists.return_value = 1
+    with patch('app.services.inbound_pipeline_service.redis_client', mock_redis), \
+         patch('app.routes.twilio_webhook.enqueue_inbound_events') as mock_enqueue:
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
 
     assert response.status_code == status.HTTP_200_OK
     assert response.text == "SMS Received"
+    mock_redis.exists.assert_called_once_with(f"twilio:inbound_sid:{DEFAULT_FORM_DATA['MessageSid']}")
+    mock_db_session.add.assert_not_called()
+    mock_enqueue.assert_not_called()
 
-    mock_db_session.add.assert_called()
-    mock_db_session.commit.assert_called()
 
-    mock_consent_service_instance.process_sms_response.assert_called_once()
-    mock_ai_service_instance.generate_sms_response.assert_called_once()
-    mock_twilio_service_instance.send_sms.assert_not_called()
+def test_receive_sms_remembers_sid_only_after_commit(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    calls = []
+    mock_redis = MagicMock()
+    mock_redis.exists.return_value = 0
+    mock_redis.set.side_effect = lambda *args, **kwargs: calls.append("remember")
+    mock_db_session.commit.side_effect = lambda: calls.append("commit")
+    with patch('app.services.inbound_pipeline_service.redis_client', mock_redis), \
+         patch('app.routes.twilio_webhook.enqueue_inbound_events'):
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert calls == ["commit", "remember"]
+    assert mock_redis.set.call_args.args[0] == f"twilio:inbound_sid:{DEFAULT_FORM_DATA['MessageSid']}"
+
+
+def test_receive_sms_duplicate_sid_rejected_by_unique_index(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    mock_db_session.commit.side_effect = IntegrityError("INSERT INTO inbound_events", {}, Exception("duplicate key"))
+    with patch('app.services.inbound_pipeline_service.redis_client', None), \
+         patch('app.routes.twilio_webhook.enqueue_inbound_events') as mock_enqueue:
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_db_session.rollback.assert_called_once()
+    mock_enqueue.assert_not_called()
+
+
+def test_receive_sms_store_failure_leaves_sid_unmarked_so_retry_is_accepted(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    mock_db_session.commit.side_effect = RuntimeError("database unavailable")
+    mock_redis = MagicMock()
+    mock_redis.exists.return_value = 0
+    with patch('app.services.inbound_pipeline_service.redis_client', mock_redis), \
+         patch('app.routes.twilio_webhook.enqueue_inbound_events'):
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    mock_redis.set.assert_not_called()
+
+
+def _runs_on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def test_receive_sms_does_its_db_and_redis_work_off_the_event_loop(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    on_loop = {}
+    mock_redis = MagicMock()
+    mock_redis.exists.side_effect = lambda *args: on_loop.setdefault("dedupe", _runs_on_event_loop()) and 0
+    mock_db_session.commit.side_effect = lambda: on_loop.setdefault("commit", _runs_on_event_loop())
+    with patch('app.services.inbound_pipeline_service.redis_client', mock_redis), \
+         patch('app.routes.twilio_webhook.enqueue_inbound_events', side_effect=lambda *args: on_loop.setdefault("enqueue", _runs_on_event_loop())):
+        response = test_app_client_fixture.post("/twilio/inbound", data={**DEFAULT_FORM_DATA})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert on_loop == {"dedupe": False, "commit": False, "enqueue": False}
+
+def test_status_callback_buffers_delivery_receipt(test_app_client_fixture: TestClient, mock_db_session: MagicMock):
+    form_data = {**DEFAULT_FORM_DATA, "MessageStatus": "undelivered", "ErrorCode": "30003"}
+
+    with patch('app.routes.twilio_webhook.buffer_status_callback') as mock_buffer:
+        response = test_app_client_fixture.post("/twilio/status-callback", data=form_data)
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    mock_buffer.assert_called_once_with(mock_db_session, ANY)
+    receipt = mock_buffer.call_args.args[1]
+    assert receipt["sid"] == DEFAULT_FORM_DATA["MessageSid"]
+    assert receipt["status"] == MessageStatusEnum.FAILED.value
+    assert receipt["error_code"] == "30003"
+
+
+def test_status_callback_acknowledges_non_terminal_status_without_buffering(test_app_client_fixture: TestClient):
+    form_data = {**DEFAULT_FORM_DATA, "MessageStatus": "queued"}
+
+    with patch('app.routes.twilio_webhook.buffer_status_callback') as mock_buffer:
+        response = test_app_client_fixture.post("/twilio/status-callback", data=form_data)
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    mock_buffer.assert_not_called()
+
+
+def test_status_callback_buffers_off_the_event_loop(test_app_client_fixture: TestClient):
+    form_data = {**DEFAULT_FORM_DATA, "MessageStatus": "delivered"}
+    on_loop = []
+
+    with patch('app.routes.twilio_webhook.buffer_status_callback', side_effect=lambda *args: on_loop.append(_runs_on_event_loop())):
+        response = test_app_client_fixture.post("/twilio/status-callback", data=form_data)
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert on_loop == [False]
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.twilio_client import close_async_twilio_client, get_async_twilio_client
+from app.worker_loop import get_worker_loop, run_async, stop_worker_loop
+
+
+@pytest.fixture
+def worker_loop():
+    yield get_worker_loop()
+    stop_worker_loop(cleanup=close_async_twilio_client())
+
+
+async def _running_loop():
+    return asyncio.get_running_loop()
+
+
+async def _send(i: int) -> str:
+    message = await get_async_twilio_client().messages.create_async(
+        to="+15550000000", from_="+15551111111", body=f"task {i}"
+    )
+    return message.sid
+
+
+def test_run_async_reuses_one_loop_across_calls(worker_loop):
+    assert run_async(_running_loop()) is worker_loop
+    assert run_async(_running_loop()) is worker_loop
+
+
+def test_run_async_propagates_exceptions(worker_loop):
+    async def _boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_async(_boom())
+
+
+def test_sends_from_successive_tasks_share_pooled_connection(fake_twilio, worker_loop):
+    sids = [run_async(_send(i)) for i in range(3)]
+
+    assert len(set(sids)) == 3
+    assert len(fake_twilio.requests) == 3
+    assert len(fake_twilio.peers) == 1
+
+
+def test_stop_worker_loop_closes_loop_and_next_call_starts_fresh():
+    first = get_worker_loop()
+    stop_worker_loop()
+
+    assert first.is_closed()
+    second = get_worker_loop()
+    try:
+        assert second is not first
+        assert run_async(_running_loop()) is second
+    finally:
+        stop_worker_loop()